@@ -1,121 +1,222 @@
-import streamlit as st
+import os
+import time
 import pandas as pd
-import warnings
+import streamlit as st
 from src.db_logger import get_streamlit_db_connection
-
-# Suppress Pandas SQLAlchemy warning since we use direct psycopg2 connection here
-warnings.filterwarnings('ignore', message='.*pandas only supports SQLAlchemy connectable.*')
+from datetime import timedelta
+from src.trade_queries import change_counter, dashboard_summary, trade_page, trade_stats, filter_options
+from src.status_server import fetch_status
+from src.dashboard_events import DashboardListener, apply_events
 
 st.set_page_config(page_title="交易追蹤儀表板", layout="wide")
 st.title("📈 演算法交易追蹤儀表板")
 
-@st.cache_resource(ttl=3600) # Cache the Shioaji API instance, but refresh every hour to avoid token expiration
-def get_shioaji_api():
-    from src.connection import Trader
-    try:
-        trader = Trader()
-        trader.login()
-        return trader.api
-    except Exception as e:
-        st.error(f"Shioaji API 登入失敗: {e}")
-        return None
+STATUS_URL = os.environ.get("STATUS_URL", f"http://127.0.0.1:{os.environ.get('STATUS_PORT', '8765')}/status")
 
-def get_realtime_equity(api):
-    if not api: return None
+
+def get_live_status():
+    """讀取交易主程式的狀態端點 (權益、最新價、策略部位)；主程式未執行時回傳 None，改用資料庫數據"""
     try:
-        acc = api.futopt_account
-        if acc:
-            margin_res = api.margin(acc)
-            if margin_res:
-                margin_data = margin_res[0] if isinstance(margin_res, list) and len(margin_res) > 0 else margin_res
-                t_equity = getattr(margin_data, 'equity', 0.0) 
-                if not t_equity and isinstance(margin_data, dict):
-                    t_equity = margin_data.get('equity', 0.0)
-                return float(t_equity)
+        return fetch_status(STATUS_URL)
     except Exception as e:
-        print(f"取得即時權益數失敗: {e}")
-    return None
-
-api = get_shioaji_api()
-realtime_equity = get_realtime_equity(api)
+        print(f"讀取交易狀態端點失敗: {e}")
+        return None
 
 conn = get_streamlit_db_connection()
 if not conn:
     st.error("無法連線至資料庫，請檢查連線設定與網絡狀態。")
     st.stop()
 
-# 根據要求讀取資料庫
-try:
-    cursor = conn.cursor()
-    
-    # 1. 當前倉位 (最後一筆 status 為 Open 的紀錄)
-    cursor.execute("""
-        SELECT side, entry_price, entry_time
-        FROM trade_history
-        WHERE status = 'Open'
-        ORDER BY entry_time DESC
-        LIMIT 1;
-    """)
-    current_position = cursor.fetchone()
-    
-    # 2. 權益總額 (從資料庫當作備用 fallback)
-    cursor.execute("""
-        SELECT total_equity, available_margin, log_date
-        FROM equity_logs
-        ORDER BY log_date DESC
-        LIMIT 1;
-    """)
-    latest_equity_db = cursor.fetchone()
-    
-    # 3. 本週點數損益 (近 7 天)
-    cursor.execute("""
-        SELECT SUM(pnl_points)
-        FROM trade_history
-        WHERE status = 'Closed' 
-          AND exit_time >= CURRENT_DATE - INTERVAL '7 days';
-    """)
-    weekly_pnl = cursor.fetchone()[0]
-    
-    cursor.close()
-    
-    # --- 顯示數據列 ---
-    col1, col2, col3 = st.columns(3)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_dashboard(counter):
+    """
+    以資料庫變更計數為快取 key: 計數不變時直接回傳快取，整頁只需一個單列查詢。
+    彙總表尚未建立 (counter 為 None) 時以 30 秒時間窗當 key。
+    """
+    return dashboard_summary(get_streamlit_db_connection())
+
+
+@st.cache_resource
+def get_event_listener():
+    """整個 Streamlit 伺服器共用一條 LISTEN 連線 (資料庫變動時由觸發器推送事件)"""
+    return DashboardListener().start()
+
+
+def current_summary():
+    """
+    本 session 的儀表板資料: 第一次載入完整資料，之後只在記憶體中套用推送的事件，不查詢資料庫。
+    事件有遺失 (LISTEN 斷線重連) 或資料庫換日時重新載入；LISTEN 無法使用時退回以變更計數判斷是否重新查詢。
+    """
+    listener = get_event_listener()
+    state = st.session_state
+    if 'summary' in state and time.time() >= state['summary']['expires_at']:
+        # 資料庫已換日: 近 7 天 / 30 天的範圍需以新日期重新查詢
+        del state['summary']
+    if 'summary' in state:
+        cursor, events = listener.read(state['event_cursor'])
+        if events is not None:
+            if events:
+                state['summary'] = apply_events(state['summary'], events)
+            state['event_cursor'] = cursor
+            return state['summary']
+    if listener.connected:
+        # 先取得 cursor 再載入，載入期間發生的變動會在下一次以事件補上
+        state['event_cursor'] = listener.cursor()
+        state['summary'] = dashboard_summary(get_streamlit_db_connection())
+        return state['summary']
+    state.pop('summary', None)
+    counter = change_counter(get_streamlit_db_connection())
+    key = counter if counter is not None else f"t{int(time.time() // 30)}"
+    summary = load_dashboard(key)
+    if time.time() >= summary['expires_at']:
+        # 變更計數在換日時不會改變，快取的日期範圍已過期
+        load_dashboard.clear()
+        summary = load_dashboard(key)
+    return summary
+
+
+@st.fragment(run_every=1)
+def render_dashboard():
+    """每秒重繪 (只讀記憶體中的事件與本機狀態端點)"""
+    try:
+        summary = current_summary()
+        live_status = get_live_status()
+        live_data = live_status['data'] if live_status else {}
+        account = live_data.get('account') or {}
+        realtime_equity = account.get('total_equity')
+        current_position = summary['open_position']
+        latest_equity_db = summary['latest_equity']
+        weekly_pnl = summary['weekly_pnl']
+
+        # --- 顯示數據列 ---
+        col1, col2, col3 = st.columns(3)
     
-    # 當前倉位處理
-    if current_position:
-        side = "做多 (Buy)" if current_position[0] == "Buy" else "做空 (Sell)"
-        price = f"{current_position[1]:.1f}"
-        pos_text = f"{side} @ {price}"
-    else:
-        pos_text = "目前空手"
+        # 當前倉位處理
+        if current_position:
+            side = "做多 (Buy)" if current_position[0] == "Buy" else "做空 (Sell)"
+            price = f"{current_position[1]:.1f}"
+            pos_text = f"{side} @ {price}"
+        else:
+            pos_text = "目前空手"
         
-    col1.metric("📌 當前倉位", pos_text)
+        col1.metric("📌 當前倉位", pos_text)
     
-    # 權益總額處理
-    if realtime_equity is not None:
-        eq_val = f"{realtime_equity:,.0f}"
-    else:
-        eq_val = f"{latest_equity_db[0]:,.0f}" if latest_equity_db and latest_equity_db[0] is not None else "N/A"
+        # 權益總額處理
+        if realtime_equity is not None:
+            eq_val = f"{realtime_equity:,.0f}"
+        else:
+            eq_val = f"{latest_equity_db[0]:,.0f}" if latest_equity_db and latest_equity_db[0] is not None else "N/A"
         
-    col2.metric("💰 即時權益總額", eq_val)
+        col2.metric("💰 即時權益總額", eq_val)
     
-    # 本週點數損益處理
-    pnl_val = f"{weekly_pnl:+.1f} 點" if weekly_pnl is not None else "0 點"
-    col3.metric("📅 本週已實現損益", pnl_val)
+        # 本週點數損益處理
+        pnl_val = f"{weekly_pnl:+.1f} 點" if weekly_pnl is not None else "0 點"
+        col3.metric("📅 本週已實現損益", pnl_val)
     
-    st.markdown("---")
+        st.markdown("---")
+
+        # --- 交易主程式即時狀態 (狀態端點) ---
+        engine_data = live_data.get('engine')
+        if engine_data:
+            st.subheader("⚡ 即時策略狀態")
+            if engine_data.get('prices'):
+                price_cols = st.columns(len(engine_data['prices']))
+                for col, (code, price) in zip(price_cols, engine_data['prices'].items()):
+                    col.metric(f"{code} 最新價", f"{price:,.0f}" if price is not None else "N/A")
+            if engine_data.get('strategies'):
+                st.dataframe(engine_data['strategies'], width="stretch")
+            st.caption(f"狀態更新時間: {live_status.get('updated_at')}"
+                       + (f"，權益查詢時間: {account['as_of']}" if account.get('as_of') else ""))
+        elif live_status is None:
+            st.caption("⚠️ 交易主程式狀態端點無回應，權益數改以資料庫最新紀錄顯示。")
+
+        # --- 權益曲線與各策略每日損益 (彙總表) ---
+        chart1, chart2 = st.columns(2)
+        with chart1:
+            st.subheader("💹 權益曲線")
+            if not summary['equity_curve'].empty:
+                st.line_chart(summary['equity_curve'].set_index('log_date')['total_equity'])
+        with chart2:
+            st.subheader("📊 各策略每日損益 (近 30 天)")
+            if not summary['daily_pnl'].empty:
+                st.bar_chart(summary['daily_pnl'].pivot_table(index='trade_date', columns='strategy_name',
+                                                              values='pnl_points', aggfunc='sum'))
+
+        if not summary['positions'].empty:
+            st.subheader("📌 各策略虛擬部位")
+            st.dataframe(summary['positions'], width="stretch")
     
-    # --- 顯示詳細資料表 ---
-    st.subheader("📋 歷史交易紀錄 (近 50 筆)")
-    df_trades = pd.read_sql("""
-        SELECT id, strategy_name, side, entry_price, entry_time, exit_price, exit_time, pnl_points, status
-        FROM trade_history
-        ORDER BY id DESC
-        LIMIT 50;
-    """, conn)
-    st.dataframe(df_trades, width="stretch")
+        # --- 顯示詳細資料表 ---
+        st.subheader("📋 歷史交易紀錄 (近 50 筆)")
+        st.dataframe(summary['recent_trades'], width="stretch")
     
+    except Exception as e:
+        st.error(f"讀取資料庫時發生錯誤：{e}")
+
+
+render_dashboard()
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_filter_options():
+    return filter_options(get_streamlit_db_connection())
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_trade_stats(counter, filters, group_by=None):
+    """
+    彙總查詢以 (變更計數, 篩選條件) 為快取 key: 沒有新的交易寫入時，換頁與重繪都不重新彙總。
+    彙總表尚未建立 (counter 為 None) 時以 30 秒時間窗當 key。
+    """
+    return trade_stats(get_streamlit_db_connection(), filters, group_by=group_by)
+
+
+# --- 交易紀錄查詢 (keyset 分頁，只讀取目前這一頁) ---
+st.markdown("---")
+st.subheader("🔎 交易紀錄查詢")
+try:
+    options = load_filter_options()
+    f1, f2, f3, f4 = st.columns(4)
+    date_range = f4.date_input("進場日期", value=())
+    filters = {
+        'strategy_name': f1.multiselect("策略", options['strategy_name']),
+        'contract_symbol': f2.multiselect("合約", options['contract_symbol']),
+        'exit_reason': f3.multiselect("出場原因", options['exit_reason']),
+        'start': date_range[0] if len(date_range) >= 1 else None,
+        'end': date_range[1] + timedelta(days=1) if len(date_range) == 2 else None,
+    }
+
+    # 篩選條件改變時回到第一頁；cursors 保存每一頁的起點供「上一頁」使用
+    filter_key = repr(sorted(filters.items()))
+    if st.session_state.get('explorer_filter') != filter_key:
+        st.session_state['explorer_filter'] = filter_key
+        st.session_state['explorer_cursors'] = [None]
+    cursors = st.session_state['explorer_cursors']
+
+    counter = change_counter(conn)
+    stats_key = counter if counter is not None else f"t{int(time.time() // 30)}"
+    stats = load_trade_stats(stats_key, filters).iloc[0]
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("交易筆數", f"{stats['trades']} (未平倉 {stats['open_trades']})")
+    m2.metric("勝率", f"{stats['win_rate']:.1%}" if pd.notna(stats['win_rate']) else "N/A")
+    m3.metric("已實現損益", f"{stats['total_pnl']:+.1f} 點")
+    m4.metric("平均每筆", f"{stats['avg_pnl']:+.1f} 點" if pd.notna(stats['avg_pnl']) else "N/A")
+    with st.expander("各策略彙總"):
+        st.dataframe(load_trade_stats(stats_key, filters, group_by='strategy_name'), width="stretch")
+
+    page, next_cursor = trade_page(conn, filters, after=cursors[-1])
+    st.dataframe(page, width="stretch")
+    p1, p2, p3 = st.columns([1, 1, 4])
+    if p1.button("⬅️ 上一頁", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    if p2.button("下一頁 ➡️", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+    p3.caption(f"第 {len(cursors)} 頁")
 except Exception as e:
-    st.error(f"讀取資料庫時發生錯誤：{e}")
+    st.error(f"查詢交易紀錄時發生錯誤：{e}")
+
 
 # 備註：在 Streamlit 使用 st.cache_resource 快取的資料庫連線，不需要也不可以呼叫 conn.close()。
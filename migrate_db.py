@@ -1,28 +1,14 @@
-import os
-import psycopg2
+"""
+建立 / 升級資料庫結構。
+Schema 定義已移至 src/migrations.py (版本化遷移，記錄於 schema_migrations)，此腳本保留為相容入口，
+等同於 python -m src.migrations。
+"""
+import sys
 from dotenv import load_dotenv
 
 load_dotenv()
 
-db_url = os.environ.get("DATABASE_URL")
-if not db_url:
-    print("❌ ERROR: DATABASE_URL is not set.")
-    exit(1)
-
-alter_sql = """
-ALTER TABLE trade_history 
-ADD COLUMN IF NOT EXISTS exit_reason VARCHAR(100);
-"""
+from src.migrations import main
 
-try:
-    conn = psycopg2.connect(db_url)
-    cursor = conn.cursor()
-    print("Applying ALTER TABLE statement to add 'exit_reason' column...")
-    cursor.execute(alter_sql)
-    conn.commit()
-    print("✅ Successfully added 'exit_reason' column to trade_history table.")
-    
-    cursor.close()
-    conn.close()
-except Exception as e:
-    print(f"❌ Failed to run migration: {e}")
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,6 +13,9 @@ from src.connection import Trader
 from src.strategies.gatekeeper_bnf_b import GatekeeperBNFBStrategy
 from src.portfolio_manager import PortfolioManager
 from src.strategies.indicators import calculate_atr
+from src.research.bnf_b_vectorized import sweep_bnf_b
+from src.research.result_cache import ResultCache
+from src.research.execution import ExecutionModel
 
 # Disable Line notifications during backtest to prevent spam
 os.environ["DISABLE_LINE_NOTIFY"] = "true"
@@ -49,6 +52,7 @@ def get_historical_data(trader, contract, days=180):
     return df_60m, df_1d
 
 def run_simulation(df_60m, df_1d, bias, vol_ratio):
+    """逐根 K 棒呼叫策略的參考實作 (較慢)，用於驗證向量化掃描結果"""
     # Dummy Portfolio to silence errors
     strategy = GatekeeperBNFBStrategy(name="Gatekeeper-BNF-B_Opt", portfolio=None, contract=None)
     
@@ -101,45 +105,30 @@ def main():
     # 成交量爆量倍數 從 1.2倍 到 2.0倍
     vol_ratio_range = [1.2, 1.5, 1.8, 2.0]
     
-    results = []
     total_combinations = len(bias_range) * len(vol_ratio_range)
-    current_idx = 1
+    print(f"Evaluating {total_combinations} combinations (vectorized candidate scan)...")
     
-    print("-" * 60)
-    print(f"{'Bias %':>8} | {'Vol Ratio':>10} | {'Trades':>8} | {'Win Rate %':>12} | {'Total PnL':>10}")
-    print("-" * 60)
+    print("-" * 86)
+    print(f"{'Bias %':>8} | {'Vol Ratio':>10} | {'Trades':>8} | {'Win Rate %':>12} | {'Total PnL':>10} | {'Net PnL':>10} | {'Fill %':>7}")
+    print("-" * 86)
 
-    for bias, vol in itertools.product(bias_range, vol_ratio_range):
-        # 顯示進度
-        sys.stdout.write(f"\rEvaluating {current_idx}/{total_combinations}...")
-        sys.stdout.flush()
+    # 指標只計算一次，每組參數只模擬自己的進場候選點
+    # (逐根重算的 run_simulation 保留作為交叉驗證用)
+    # 已算過的網格點直接從本機快取取回，擴大網格時只計算新增的點
+    # 手續費、期交稅、滑價與 IOC 未成交直接套用在掃描出的交易上，不需重跑模擬
+    res_df = sweep_bnf_b(df_60m, bias_range, vol_ratio_range, cache=ResultCache(),
+                         execution=ExecutionModel(contract_code=target_contract.code))
         
-        trades_count, win_rate, pnl = run_simulation(df_60m, df_1d, bias, vol)
-        
-        # 儲存結果
-        results.append({
-            'Bias': bias,
-            'Vol_Ratio': vol,
-            'Trades': trades_count,
-            'Win_Rate': win_rate,
-            'PnL': pnl
-        })
-        current_idx += 1
-        
-    print("\n" + "-" * 60)
-    
-    # 將結果轉為 DataFrame 排序
-    res_df = pd.DataFrame(results)
-    # 根據 PnL 降冪排序，只顯示最好的一批
-    res_df = res_df.sort_values(by='PnL', ascending=False).reset_index(drop=True)
+    # 根據扣除成本後的 Net PnL 降冪排序，只顯示最好的一批
+    res_df = res_df.sort_values(by='Net_PnL', ascending=False).reset_index(drop=True)
     
     for idx, row in res_df.iterrows():
-        print(f"{row['Bias']:>8.1f} | {row['Vol_Ratio']:>10.1f} | {int(row['Trades']):>8d} | {row['Win_Rate']:>11.2f}% | {row['PnL']:>10.1f}")
+        print(f"{row['Bias']:>8.1f} | {row['Vol_Ratio']:>10.1f} | {int(row['Trades']):>8d} | {row['Win_Rate']:>11.2f}% | {row['PnL']:>10.1f} | {row['Net_PnL']:>10.1f} | {row['Fill_Rate']:>6.1f}%")
 
     best_setup = res_df.iloc[0]
-    print("-" * 60)
+    print("-" * 86)
     print(f"🏆 Best Combination Setup: Bias {best_setup['Bias']}%, Volume Ratio {best_setup['Vol_Ratio']}x")
-    print(f"=> Expected PnL: {best_setup['PnL']}, Trades: {int(best_setup['Trades'])}")
+    print(f"=> Expected PnL: {best_setup['PnL']} (Net {best_setup['Net_PnL']:.1f}), Trades: {int(best_setup['Trades'])}")
 
 if __name__ == "__main__":
     main()
@@ -12,6 +12,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.connection import Trader
 from src.strategies.dual_logic import DualTimeframeStrategy
 from src.strategies.indicators import calculate_atr, calculate_supertrend
+from src.research.parallel_runner import GridRunner, param_grid
+from src.research.result_cache import ResultCache, code_version, dataset_hash
+from src.research.metrics import batch_metrics
+from src.research.monte_carlo import robustness_table
+from src.research.execution import ExecutionModel, apply_execution_batch
 
 # Disable Line notifications during backtest to prevent spam
 os.environ["DISABLE_LINE_NOTIFY"] = "true"
@@ -107,12 +112,15 @@ def get_ut_bot_series(df, key_value=2.0, atr_period=10):
     
     return pd.Series(signal, index=df.index)
 
-def run_simulation(df_60m, df_1d, ut_key, trailing_drop):
+def run_simulation(df_60m, df_1d, ut_key, trailing_drop, **overrides):
     strategy = DualTimeframeStrategy(name="Gatekeeper-MXF-V1_Opt", portfolio=None, contract=None)
     
     # Apply parameters
     strategy.ut_bot_key = ut_key
     strategy.trailing_stop_drop = trailing_drop
+    # 其他策略屬性 (be_threshold, body_filter ...) 供搜尋模組覆寫
+    for attr, value in overrides.items():
+        setattr(strategy, attr, value)
     
     # Pre-calc UT-BOT for this specific key
     df_60m = df_60m.copy()
@@ -143,13 +151,26 @@ def run_simulation(df_60m, df_1d, ut_key, trailing_drop):
     trades = strategy.trades
     total_trades = len(trades)
     if total_trades == 0:
-        return 0, 0, 0
+        return 0, 0, 0, trades
         
     wins = [t for t in trades if t['pnl'] > 0]
     total_pnl = sum(t['pnl'] for t in trades)
     win_rate = (len(wins) / total_trades) * 100
     
-    return total_trades, win_rate, total_pnl
+    return total_trades, win_rate, total_pnl, trades
+
+def evaluate_params(data, ut_key, trailing_drop, **overrides):
+    """GridRunner 子程序的評估入口，data 為共享記憶體中的 60m / 1D K 線"""
+    trades_count, win_rate, pnl, trades = run_simulation(data['60m'], data['1d'], ut_key, trailing_drop, **overrides)
+    return {
+        **overrides,
+        'UT_Key': ut_key,
+        'Trail_Drop': trailing_drop,
+        'Trades': trades_count,
+        'Win_Rate': win_rate,
+        'PnL': pnl,
+        'trades': trades
+    }
 
 def main():
     print("Initializing MXF Dual-Logic Parameter Optimization...")
@@ -178,42 +199,51 @@ def main():
     # 移動停利折返點數 從 50 到 200
     trailing_drops = [50, 100, 150, 200]
     
-    results = []
-    total_combinations = len(ut_keys) * len(trailing_drops)
-    current_idx = 1
-    
-    print("-" * 65)
-    print(f"{'UT-Bot Key':>10} | {'Trail Drop':>10} | {'Trades':>8} | {'Win Rate %':>12} | {'Total PnL':>10}")
-    print("-" * 65)
-
-    for ut_k, t_drop in itertools.product(ut_keys, trailing_drops):
-        sys.stdout.write(f"\rEvaluating {current_idx}/{total_combinations}...")
-        sys.stdout.flush()
-        
-        trades_count, win_rate, pnl = run_simulation(df_60m, df_1d, ut_k, t_drop)
+    grid = param_grid(ut_key=ut_keys, trailing_drop=trailing_drops)
+    
+    print("-" * 108)
+    print(f"{'UT-Bot Key':>10} | {'Trail Drop':>10} | {'Trades':>8} | {'Win Rate %':>12} | {'Total PnL':>10} | {'PF':>6} | {'Max DD':>8} | {'Net PnL':>10}")
+    print("-" * 108)
+
+    # 多核心平行評估，K 線透過共享記憶體提供給各子程序
+    # 已算過的網格點直接從本機快取取回，只有新增的點才交給 runner
+    runner = GridRunner(evaluate_params, {'60m': df_60m, '1d': df_1d})
+    cache = ResultCache()
+    results = cache.run(
+        "Gatekeeper-MXF-V1",
+        code_version(DualTimeframeStrategy, run_simulation),
+        dataset_hash(df_60m, df_1d),
+        grid,
+        runner.run
+    )
         
-        results.append({
-            'UT_Key': ut_k,
-            'Trail_Drop': t_drop,
-            'Trades': trades_count,
-            'Win_Rate': win_rate,
-            'PnL': pnl
-        })
-        current_idx += 1
-        
-    print("\n" + "-" * 65)
-    
-    res_df = pd.DataFrame(results)
-    res_df = res_df.sort_values(by='PnL', ascending=False).reset_index(drop=True)
+    print("-" * 108)
+    
+    # 以逐筆損益一次算出所有組合的獲利因子與最大回撤 (點數)
+    extra = batch_metrics([[t['pnl'] for t in res['trades']] for res in results])
+    # 成本與 IOC 成交假設一次套用到所有組合的交易上，依扣除成本後的損益排序
+    net = apply_execution_batch([res['trades'] for res in results],
+                                ExecutionModel(contract_code=target_contract.code), df_60m)
+    res_df = pd.DataFrame(results).drop(columns=['trades'])
+    res_df['Profit_Factor'] = extra['Profit_Factor'].to_numpy()
+    res_df['Max_DD'] = extra['Max_DD'].to_numpy()
+    res_df['Net_PnL'] = net['Net_PnL'].to_numpy()
+    res_df = res_df.sort_values(by='Net_PnL', ascending=False).reset_index(drop=True)
     
     for idx, row in res_df.iterrows():
-        print(f"{row['UT_Key']:>10.1f} | {row['Trail_Drop']:>10.0f} | {int(row['Trades']):>8d} | {row['Win_Rate']:>11.2f}% | {row['PnL']:>10.1f}")
+        print(f"{row['UT_Key']:>10.1f} | {row['Trail_Drop']:>10.0f} | {int(row['Trades']):>8d} | {row['Win_Rate']:>11.2f}% | {row['PnL']:>10.1f} | {row['Profit_Factor']:>6.2f} | {row['Max_DD']:>8.1f} | {row['Net_PnL']:>10.1f}")
+
+    # 前 5 名組合的蒙地卡羅穩健度 (交易筆數少時回撤分布比單一路徑更有參考價值)
+    top = [results[i] for i in np.argsort(-net['Net_PnL'].to_numpy(), kind='stable')[:5]]
+    robust = robustness_table(top, ['UT_Key', 'Trail_Drop'], n_paths=20000, seed=0)
+    print("\nMonte Carlo (Top 5, TWD):")
+    print(robust.round(3).to_string(index=False))
 
     best_setup = res_df.iloc[0]
-    print("-" * 65)
+    print("-" * 108)
     # Fix encoding issue for Windows CMD
     print(f"Best MXF Setup: UT Key {best_setup['UT_Key']}, Trailing Drop {int(best_setup['Trail_Drop'])} pts")
-    print(f"=> Expected PnL: {best_setup['PnL']}, Trades: {int(best_setup['Trades'])}")
+    print(f"=> Expected PnL: {best_setup['PnL']} (Net {best_setup['Net_PnL']:.1f}), Trades: {int(best_setup['Trades'])}")
 
 if __name__ == "__main__":
     main()
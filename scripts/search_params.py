@@ -0,0 +1,67 @@
+"""
+Successive Halving 參數搜尋
+對 Gatekeeper-MXF-V1 與 Gatekeeper-BNF-B 的完整參數空間做自適應搜尋，
+先在近期短資料篩掉大部分組合，只有前段班才會跑完整 180 天歷史。
+
+用法: python scripts/search_params.py [mxf|bnf|all] [n_configs]
+"""
+import sys
+import os
+import logging
+import pandas as pd
+
+# Add project root to system path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.connection import Trader
+from src.research.bnf_b_vectorized import evaluate_bnf_b
+from src.research.search import successive_halving, MXF_SPACE, BNF_B_SPACE, space_size
+from optimize_mxf import get_historical_data, evaluate_params
+
+# Disable Line notifications during backtest to prevent spam
+os.environ["DISABLE_LINE_NOTIFY"] = "true"
+
+# 禁用策略中的 logging 輸出，避免洗版
+logging.getLogger().setLevel(logging.CRITICAL)
+
+
+def main():
+    target = sys.argv[1] if len(sys.argv) > 1 else "all"
+    n_configs = int(sys.argv[2]) if len(sys.argv) > 2 else 243
+
+    print("Initializing Successive Halving Parameter Search...")
+    trader = Trader()
+    trader.login()
+    print("Login successful.")
+
+    tmf_contracts = [c for c in trader.api.Contracts.Futures.TMF if c.code[-2:] not in ["R1", "R2"] and c.delivery_date != ""]
+    if not tmf_contracts:
+        print("No TMF contracts found.")
+        return
+    tmf_contracts.sort(key=lambda x: x.delivery_date)
+    target_contract = tmf_contracts[0]
+
+    df_60m, df_1d = get_historical_data(trader, target_contract, days=180)
+    if df_60m is None or df_60m.empty:
+        print("Failed to fetch historical data.")
+        return
+    datasets = {'60m': df_60m, '1d': df_1d}
+
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.width', 1000)
+
+    if target in ("mxf", "all"):
+        print("-" * 65)
+        print(f"Gatekeeper-MXF-V1 search space: {space_size(MXF_SPACE)} combinations")
+        final, _ = successive_halving(evaluate_params, datasets, MXF_SPACE, n_configs=n_configs)
+        print(final.head(10))
+
+    if target in ("bnf", "all"):
+        print("-" * 65)
+        print(f"Gatekeeper-BNF-B search space: {space_size(BNF_B_SPACE)} combinations")
+        final, _ = successive_halving(evaluate_bnf_b, datasets, BNF_B_SPACE, n_configs=n_configs)
+        print(final.head(10))
+
+
+if __name__ == "__main__":
+    main()
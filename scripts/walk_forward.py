@@ -0,0 +1,86 @@
+"""
+Walk-Forward 最佳化
+以滾動的訓練 / 測試視窗重新驗證 Gatekeeper-MXF-V1 與 Gatekeeper-BNF-B 的參數，
+輸出每個 fold 選出的參數與串接後的樣本外 (OOS) 權益曲線。
+
+用法: python scripts/walk_forward.py [mxf|bnf|all] [days]
+"""
+import sys
+import os
+import logging
+import pandas as pd
+
+# Add project root to system path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.connection import Trader
+from src.strategies.dual_logic import DualTimeframeStrategy
+from src.research.bnf_b_vectorized import evaluate_bnf_b, simulate_bnf_b
+from src.research.parallel_runner import param_grid
+from src.research.result_cache import ResultCache, code_version
+from src.research.walk_forward import walk_forward
+from optimize_mxf import get_historical_data, evaluate_params, run_simulation
+
+# Disable Line notifications during backtest to prevent spam
+os.environ["DISABLE_LINE_NOTIFY"] = "true"
+
+# 禁用策略中的 logging 輸出，避免洗版
+logging.getLogger().setLevel(logging.CRITICAL)
+
+
+def report(name, result):
+    print("-" * 65)
+    print(f"{name} Walk-Forward Folds")
+    print("-" * 65)
+    print(result.folds[['fold', 'test_start', 'test_end', 'params', 'train_score', 'oos_trades', 'oos_pnl']])
+    if result.equity.empty:
+        print("No out-of-sample trades.")
+        return
+    print(f"=> OOS Trades: {len(result.oos_trades)}, OOS PnL: {result.equity.iloc[-1]:.1f}")
+
+
+def main():
+    target = sys.argv[1] if len(sys.argv) > 1 else "all"
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+
+    print("Initializing Walk-Forward Optimization...")
+    trader = Trader()
+    trader.login()
+    print("Login successful.")
+
+    tmf_contracts = [c for c in trader.api.Contracts.Futures.TMF if c.code[-2:] not in ["R1", "R2"] and c.delivery_date != ""]
+    if not tmf_contracts:
+        print("No TMF contracts found.")
+        return
+    tmf_contracts.sort(key=lambda x: x.delivery_date)
+    target_contract = tmf_contracts[0]
+
+    df_60m, df_1d = get_historical_data(trader, target_contract, days=days)
+    if df_60m is None or df_60m.empty:
+        print("Failed to fetch historical data.")
+        return
+    datasets = {'60m': df_60m, '1d': df_1d}
+    cache = ResultCache()
+
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.width', 1000)
+
+    if target in ("mxf", "all"):
+        grid = param_grid(ut_key=[2.5, 3.0, 3.5, 4.0, 4.5], trailing_drop=[50, 100, 150, 200])
+        result = walk_forward(
+            evaluate_params, datasets, grid, train_days=90, test_days=30,
+            strategy="Gatekeeper-MXF-V1", version=code_version(DualTimeframeStrategy, run_simulation), cache=cache
+        )
+        report("Gatekeeper-MXF-V1", result)
+
+    if target in ("bnf", "all"):
+        grid = param_grid(bias_threshold=[-1.0, -1.5, -2.0, -2.5, -3.0], volume_spike_ratio=[1.2, 1.5, 1.8, 2.0])
+        result = walk_forward(
+            evaluate_bnf_b, datasets, grid, train_days=90, test_days=30,
+            strategy="Gatekeeper-BNF-B", version=code_version(simulate_bnf_b), cache=cache
+        )
+        report("Gatekeeper-BNF-B", result)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,14 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.connection import Trader
 from src.strategies.dual_logic import DualTimeframeStrategy
-from src.portfolio_manager import PortfolioManager
+from src.simulated_portfolio import SimulatedPortfolioManager
+from src.research.execution import ExecutionModel
+from src.contract_specs import spec_for
+from src.trade_ledger import TradeLedger
+from src.bar_store import BarStore
+from src.continuous_contract import RollRule, load_continuous
+from src.config import settings
+from src.research.metrics import metrics_by_strategy
 import logging
 
 # Disable Line notifications during backtest to prevent spam
@@ -27,6 +34,81 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+def print_report(trades, contract_code=None, df_1m=None):
+    """
+    輸出合併後的交易統計與明細
+    :param trades: TradeLedger 或交易 dict 列表
+    :param contract_code: 回測合約代碼，用於查詢每點價值 (contract_specs)
+    :param df_1m: 提供 1 分 K 時額外計算 MAE / MFE
+    """
+    print("-" * 50)
+    print("Backtest Results")
+    print("-" * 50)
+    
+    ledger = trades
+    if not isinstance(ledger, TradeLedger):
+        ledger = TradeLedger()
+        ledger.extend(trades)
+        
+    total_trades = len(ledger)
+    
+    if total_trades == 0:
+        print("No trades generated.")
+        return
+        
+    # 帳本依出場時間排序，直接共用緩衝區匯出
+    trade_df = ledger.to_dataframe()
+    spec = spec_for(contract_code)
+    summary = metrics_by_strategy(trade_df, multiplier=spec.point_value, bars=df_1m)
+    m = summary.loc['ALL']
+    wins = int(round(m['win_rate'] * total_trades / 100))
+
+    print(f"Contract: {spec.name} ({spec.root}, {spec.point_value:.0f} TWD / point)")
+    print(f"Total Trades: {total_trades}")
+    print(f"Win Rate: {m['win_rate']:.2f}% ({wins} Wins / {total_trades - wins} Losses)")
+    print(f"Total PnL (Points): {m['pnl_points']:.2f}")
+    print(f"Total PnL (TWD): {m['pnl_twd']:,.0f}")
+    print(f"Avg PnL per Trade: {m['avg_pnl_points']:.2f}")
+    print(f"Profit Factor: {m['profit_factor']:.2f}")
+    print(f"Max Drawdown: {m['max_drawdown_twd']:,.0f} TWD ({m['max_drawdown_pct']:.2f}%)")
+    print(f"Sharpe / Sortino: {m['sharpe']:.2f} / {m['sortino']:.2f}")
+    print(f"Exposure: {m['exposure_pct']:.1f}%")
+    if 'avg_mae_points' in summary.columns:
+        print(f"Avg MAE / MFE (Points): {m['avg_mae_points']:.1f} / {m['avg_mfe_points']:.1f}")
+
+    if len(summary) > 2:
+        print("\nBy Strategy:")
+        print(summary[['trades', 'win_rate', 'pnl_points', 'profit_factor', 'max_drawdown_twd', 'sharpe']]
+              .round(2).to_string())
+    
+    print("\nTrade Details:")
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.width', 1000)
+    pd.set_option('display.max_rows', None)
+    print(trade_df[['strategy', 'entry_time', 'exit_time', 'entry_price', 'exit_price', 'reason', 'pnl']])
+
+def print_order_flow(portfolio):
+    """輸出模擬 PortfolioManager 的淨額化委託流量、手續費與保證金占用"""
+    s = portfolio.summary()
+    print("\nNet Order Flow:")
+    print(f"  Orders Sent: {s['orders']} ({s['contracts_traded']} contracts)")
+    print(f"  Commission + Tax: {s['commission'] + s['tax']:,.0f} TWD")
+    print(f"  Peak Margin: {s['peak_margin']:,.0f} TWD (without netting: {s['peak_gross_margin']:,.0f} TWD)")
+    if s['open_net_positions']:
+        print(f"  Open Net Positions: {s['open_net_positions']}")
+
+def print_monte_carlo(trades, contract_code=None, n_paths=10000):
+    """以蒙地卡羅重抽交易序列，輸出最大回撤與破產機率的分布"""
+    from src.research.monte_carlo import monte_carlo
+    df = trades.to_dataframe() if isinstance(trades, TradeLedger) else pd.DataFrame(list(trades))
+    if df.empty:
+        return
+    print("\nMonte Carlo Robustness ({} paths):".format(n_paths))
+    for method in ('block', 'shuffle', 'sign'):
+        r = monte_carlo(df, n_paths=n_paths, method=method, contract_code=contract_code, seed=0).summary()
+        print(f"  {method:>7}: DD p50 {r['dd_p50']:>10,.0f} | DD p95 {r['dd_p95']:>10,.0f} | "
+              f"PnL p5 {r['pnl_p5']:>10,.0f} | Loss {r['loss_prob']:6.1%} | Ruin {r['ruin_prob']:6.1%}")
+
 def main():
     print("Initializing Backtest...")
     
@@ -88,6 +170,25 @@ def main():
     
     # Rename columns to standard lowercase
     df_1m.rename(columns={'ts': 'datetime'}, inplace=True)
+
+    # 存入本機 BarStore，合約到期後仍可用於連續月回測
+    store = BarStore()
+    try:
+        store.save(target_contract.code, df_1m, delivery_date=target_contract.delivery_date)
+    except Exception as e:
+        print(f"Failed to save bars to local store: {e}")
+
+    # --continuous: 以本機已累積的各月份拼接連續月 (--adjust=back|ratio|none)
+    if "--continuous" in sys.argv:
+        adjust = next((arg.split("=", 1)[1] for arg in sys.argv if arg.startswith("--adjust=")), "back")
+        rule = RollRule(days_before_expiry=settings.roll_days_before_expiry)
+        df_cont = load_continuous(store, target_contract.code[:3], rule, adjust=adjust)
+        if len(df_cont) > len(df_1m):
+            print(f"Continuous series: {df_cont['contract'].nunique()} contracts, {len(df_cont)} bars (adjust={adjust})")
+            df_1m = df_cont.drop(columns=['contract'])
+        else:
+            print("Local bar store has no older contracts yet, using near-month data only.")
+
     df_1m.set_index('datetime', inplace=True)
     
     # 4. Resample to 60m and 1D
@@ -217,15 +318,36 @@ def main():
     # Pre-calc ATR for 60m
     df_60m['atr'] = calculate_atr(df_60m)
 
+    # 5a. Intrabar mode: 持倉期間改以 1 分 K 路徑判定停損 / 保本 / 移動停利
+    if "--intrabar" in sys.argv:
+        from src.research.intrabar import simulate_mxf_intrabar, simulate_bnf_b_intrabar, trend_for_60m
+        print("Running intrabar simulation (1m resolution while in position)...")
+        trend_60m = trend_for_60m(df_60m, df_1d)
+        mxf = DualTimeframeStrategy(name="Gatekeeper-MXF-V1_Backtest", portfolio=None, contract=None)
+        trades = simulate_mxf_intrabar(
+            df_60m, df_1m, trend_60m,
+            be_threshold=mxf.be_threshold,
+            trailing_drop=mxf.trailing_stop_drop,
+            body_filter=mxf.body_filter,
+            name="Gatekeeper-MXF-V1_Intrabar"
+        )
+        trades += simulate_bnf_b_intrabar(df_60m, df_1m, bullish=trend_60m)
+        print_report(trades, target_contract.code, df_1m)
+        if "--monte-carlo" in sys.argv:
+            print_monte_carlo(trades, target_contract.code)
+        sys.exit(0)
+
     # 5. Simulation Loop
     print("Running simulation...")
-    portfolio = PortfolioManager(api=trader.api)
+    # 記憶體內的 PortfolioManager：與實盤相同地淨額化各策略部位，但不連資料庫也不送單
+    portfolio = SimulatedPortfolioManager(ExecutionModel(contract_code=target_contract.code))
     
     from src.strategies.gatekeeper_bnf_b import GatekeeperBNFBStrategy
     
+    ledger = TradeLedger()
     strategies = [
-        DualTimeframeStrategy(name="Gatekeeper-MXF-V1_Backtest", portfolio=portfolio, contract=target_contract),
-        GatekeeperBNFBStrategy(name="Gatekeeper-BNF-B_Backtest", portfolio=portfolio, contract=target_contract)
+        DualTimeframeStrategy(name="Gatekeeper-MXF-V1_Backtest", portfolio=portfolio, contract=target_contract, ledger=ledger),
+        GatekeeperBNFBStrategy(name="Gatekeeper-BNF-B_Backtest", portfolio=portfolio, contract=target_contract, ledger=ledger)
     ]
     
     # Pre-calculate 1d indices
@@ -243,6 +365,7 @@ def main():
         
         # Find 1d index
         current_60m_bar_time = df_60m.iloc[i]['datetime']
+        portfolio.now = current_60m_bar_time
         
         # Type compatibility check not needed if we ensure both are datetime64 or Timestamp.
         # df_60m['datetime'] and df_1d['datetime'] came from resample, likely timestamps.
@@ -333,62 +456,10 @@ def main():
     print(f"\nSimulation complete.")
         
     # 6. Report
-    print("-" * 50)
-    print("Backtest Results")
-    print("-" * 50)
-    
-    trades = []
-    for strategy in strategies:
-        trades.extend(strategy.trades)
-        
-    # Sort combined trades
-    if trades:
-        trades.sort(key=lambda x: x['exit_time'])
-        
-    total_trades = len(trades)
-    
-    if total_trades == 0:
-        print("No trades generated.")
-        return
-        
-    wins = [t for t in trades if t['pnl'] > 0]
-    losses = [t for t in trades if t['pnl'] <= 0]
-    
-    total_pnl = sum(t['pnl'] for t in trades)
-    win_rate = (len(wins) / total_trades) * 100
-    
-    # Calculate Max Drawdown (Capital Curve)
-    capital = 1000000 # Initial capital assumption
-    equity_curve = [capital]
-    current_equity = capital
-    max_equity = capital
-    max_dd = 0
-    
-    for t in trades:
-        current_equity += t['pnl'] * 50 # Assuming 1 point = 50 TWD (Mini) or 200 (Large). MXF is 50? 
-        # Micro is 50? Mxf is Micro Taiex, 1 pt = 10 NTD? No, Mini is 50, Micro is 10?
-        # Let's check contract category. MXF (Micro) is 10 TWD per point? 
-        # Or MTX (Mini) is 50. 
-        # Spec: Micro Taiex Futures (MXF) -> 10 TWD / point?
-        # User prompt mentioned "Maker 5m / 60m", "DualTimeframeStrategy".
-        # Let's assume PnL in points for now in the summary.
-        
-        equity_curve.append(current_equity)
-        max_equity = max(max_equity, current_equity)
-        dd = max_equity - current_equity
-        max_dd = max(max_dd, dd)
-
-    print(f"Total Trades: {total_trades}")
-    print(f"Win Rate: {win_rate:.2f}% ({len(wins)} Wins / {len(losses)} Losses)")
-    print(f"Total PnL (Points): {total_pnl:.2f}")
-    print(f"Avg PnL per Trade: {total_pnl / total_trades:.2f}")
-    
-    print("\nTrade Details:")
-    trade_df = pd.DataFrame(trades)
-    pd.set_option('display.max_columns', None)
-    pd.set_option('display.width', 1000)
-    pd.set_option('display.max_rows', None)
-    print(trade_df[['strategy', 'entry_time', 'exit_time', 'entry_price', 'exit_price', 'reason', 'pnl']])
+    print_report(ledger, target_contract.code, df_1m)
+    print_order_flow(portfolio)
+    if "--monte-carlo" in sys.argv:
+        print_monte_carlo(ledger, target_contract.code)
     
     # Determine exit code
     sys.exit(0)
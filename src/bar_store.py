@@ -0,0 +1,119 @@
+"""
+本機 K 線儲存 (Bar Store)
+永豐 API 只能查詢仍在交易中的合約，合約到期後就無法再取得其歷史 K 線。
+每次回測 / 最佳化 / 實盤啟動抓到的 1 分 K 都依合約代碼寫入本機 Parquet 檔，
+長期累積後即可用 continuous_contract 拼接出跨越多次到期的連續月序列。
+
+檔案配置:
+    <root>/<合約代碼>.parquet   datetime, open, high, low, close, volume
+    <root>/contracts.json       {合約代碼: 最後交易日 'YYYY-MM-DD'}
+"""
+import os
+import json
+import logging
+from datetime import datetime
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BAR_COLUMNS = ['datetime', 'open', 'high', 'low', 'close', 'volume']
+
+
+def parse_delivery_date(value) -> str:
+    """Shioaji delivery_date 可能是 'YYYY/MM/DD' 或 'YYYYMMDD'，統一成 'YYYY-MM-DD'"""
+    text = str(value).replace('/', '').replace('-', '')[:8]
+    return datetime.strptime(text, "%Y%m%d").strftime("%Y-%m-%d")
+
+
+def kbars_to_dataframe(kbars) -> pd.DataFrame:
+    """Shioaji api.kbars() 回傳值 → 1 分 K DataFrame (datetime 欄位)"""
+    return pd.DataFrame({
+        'datetime': pd.to_datetime(kbars.ts),
+        'open': kbars.Open,
+        'high': kbars.High,
+        'low': kbars.Low,
+        'close': kbars.Close,
+        'volume': kbars.Volume
+    })
+
+
+class BarStore:
+    def __init__(self, root: str = None):
+        self.root = root or os.environ.get("BAR_STORE_DIR") or os.path.join(PROJECT_ROOT, ".cache", "bars")
+        os.makedirs(self.root, exist_ok=True)
+        self._meta_path = os.path.join(self.root, "contracts.json")
+
+    def _path(self, code: str) -> str:
+        return os.path.join(self.root, f"{code}.parquet")
+
+    # ------------------------------------------------------------------
+    # 合約資訊
+    # ------------------------------------------------------------------
+    def expiries(self) -> dict:
+        if not os.path.exists(self._meta_path):
+            return {}
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def register_contract(self, code: str, delivery_date):
+        meta = self.expiries()
+        meta[code] = parse_delivery_date(delivery_date)
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp, self._meta_path)
+
+    def codes(self, root: str = None) -> list:
+        """已儲存的合約代碼 (依最後交易日排序)，可用商品前綴 (例如 'TMF') 篩選"""
+        meta = self.expiries()
+        codes = [code for code in meta if os.path.exists(self._path(code))]
+        if root:
+            codes = [code for code in codes if code.startswith(root)]
+        return sorted(codes, key=lambda code: meta[code])
+
+    # ------------------------------------------------------------------
+    # K 線讀寫
+    # ------------------------------------------------------------------
+    def save(self, code: str, df: pd.DataFrame, delivery_date=None) -> int:
+        """
+        合併寫入 (同一時間戳以新資料為準)，回傳儲存後的總根數。
+        df 可以是 datetime 欄位或 datetime index。
+        """
+        if delivery_date is not None:
+            self.register_contract(code, delivery_date)
+        if df is None or df.empty:
+            return len(self.load(code))
+        new = df.reset_index() if 'datetime' not in df.columns else df
+        new = new[BAR_COLUMNS]
+
+        existing = self.load(code)
+        merged = pd.concat([existing, new], ignore_index=True) if not existing.empty else new
+        merged = (merged.drop_duplicates(subset='datetime', keep='last')
+                  .sort_values('datetime', kind='stable').reset_index(drop=True))
+        tmp = self._path(code) + ".tmp"
+        merged.to_parquet(tmp, index=False)
+        os.replace(tmp, self._path(code))
+        return len(merged)
+
+    def load(self, code: str, start=None, end=None) -> pd.DataFrame:
+        """讀取 [start, end) 的 1 分 K；沒有資料時回傳空 DataFrame"""
+        path = self._path(code)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        filters = []
+        if start is not None:
+            filters.append(('datetime', '>=', pd.Timestamp(start)))
+        if end is not None:
+            filters.append(('datetime', '<', pd.Timestamp(end)))
+        try:
+            return pd.read_parquet(path, filters=filters or None)
+        except Exception as e:
+            logging.error(f"[BarStore] 讀取 {code} 失敗: {e}")
+            return pd.DataFrame(columns=BAR_COLUMNS)
+
+    def update_from_api(self, api, contract, start: str, end: str) -> pd.DataFrame:
+        """向永豐 API 抓取 1 分 K 並寫入本機，回傳該合約在 [start, end] 的完整資料"""
+        df = kbars_to_dataframe(api.kbars(contract=contract, start=start, end=end))
+        delivery = getattr(contract, 'delivery_date', None) or None
+        self.save(contract.code, df, delivery_date=delivery)
+        return self.load(contract.code, start=start, end=pd.Timestamp(end) + pd.Timedelta(days=1))
@@ -12,6 +12,15 @@ class Settings(BaseSettings):
     cert_path: str = Field(..., description="PFX 憑證路徑")
     cert_pass: str = Field(..., description="PFX 憑證密碼")
     simulation: bool = Field(False, description="是否使用模擬環境")
+    roll_days_before_expiry: int = Field(1, description="最後交易日前幾天換月 (實盤與連續月回測共用)")
+    trade_roots: str = Field("TMF", description="實盤交易的商品，逗號分隔 (例如 TMF,MXF,TXF)")
+    strategy_workers: int = Field(0, description="策略 worker 行程數，0 代表所有策略在主行程執行")
+    shadow_fleet: bool = Field(True, description="是否在實盤行情上同時跑影子參數變體 (紙上交易)")
+    async_db_writer: bool = Field(True, description="交易紀錄是否改由背景執行緒批次寫入資料庫 (不阻塞交易)")
+    db_outbox: bool = Field(True, description="寫入是否先落地到本機 Outbox 再補寫資料庫 (資料庫斷線時仍可交易)")
+    market_store: bool = Field(True, description="是否把即時 Tick / 1 分 K 存入 Postgres 分區表 (並用於暖機)")
+    db_outbox_sync: str = Field("FULL", description="Outbox 的 SQLite synchronous 設定: FULL 每筆 fsync / NORMAL")
+    status_port: int = Field(8765, description="本機狀態端點 (供儀表板讀取權益 / 策略狀態) 的埠號，0 代表停用")
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,214 @@
+"""
+連續月合約與自動換月
+- 回測: 從本機 BarStore 依換月規則拼接相鄰月份的 TMF / MXF 1 分 K，
+  可選擇價差回溯調整 (back)、比例調整 (ratio) 或不調整 (none)
+- 實盤: 依同一套規則判斷目前應交易的合約，到換月點時把各策略的虛擬部位
+  從舊合約移到新合約，並以換月價差平移策略的進場價 / 停損與 K 線歷史
+
+換月時點: 最後交易日前 days_before_expiry 個曆日的日盤開盤 (08:45)。
+by_volume=True 時，若次月日成交量提早超過近月，改在隔日開盤換月 (仍不晚於上述時點)。
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.bar_store import parse_delivery_date
+from src.db_logger import log_trade_exit
+
+ADJUST_MODES = ('back', 'ratio', 'none')
+SESSION_OPEN = timedelta(hours=8, minutes=45)
+
+
+@dataclass
+class RollRule:
+    days_before_expiry: int = 1
+    by_volume: bool = False
+
+    def calendar_roll(self, delivery_date) -> pd.Timestamp:
+        day = pd.Timestamp(parse_delivery_date(delivery_date)) - pd.Timedelta(days=self.days_before_expiry)
+        return day + SESSION_OPEN
+
+
+def _daily_volume(df: pd.DataFrame) -> pd.Series:
+    times = pd.to_datetime(df['datetime'])
+    return df['volume'].groupby(times.dt.normalize()).sum()
+
+
+def roll_schedule(bars_by_contract: dict, expiries: dict, rule: RollRule = None) -> pd.DataFrame:
+    """
+    計算每次換月的時點與價差。
+    :return: DataFrame[from_code, to_code, roll_at, old_price, new_price]
+    """
+    rule = rule or RollRule()
+    codes = sorted((c for c in bars_by_contract if c in expiries and not bars_by_contract[c].empty),
+                   key=lambda c: parse_delivery_date(expiries[c]))
+    rows = []
+    prev_roll = pd.Timestamp.min
+    for old, new in zip(codes[:-1], codes[1:]):
+        roll_at = rule.calendar_roll(expiries[old])
+        old_df, new_df = bars_by_contract[old], bars_by_contract[new]
+
+        if rule.by_volume:
+            vol = pd.concat([_daily_volume(old_df), _daily_volume(new_df)], axis=1, keys=['old', 'new']).fillna(0)
+            vol = vol[(vol.index + SESSION_OPEN > prev_roll) & (vol.index + SESSION_OPEN < roll_at)]
+            crossed = vol.index[vol['new'] > vol['old']]
+            if len(crossed):
+                roll_at = min(roll_at, crossed[0] + pd.Timedelta(days=1) + SESSION_OPEN)
+
+        # 換月價差: 換月前最後一根舊合約收盤，與新合約在同一時間 (或之前最近) 的收盤
+        old_times = pd.to_datetime(old_df['datetime'])
+        before = old_df[old_times < roll_at]
+        if before.empty:
+            continue
+        last_time = pd.Timestamp(before['datetime'].iloc[-1])
+        new_times = pd.to_datetime(new_df['datetime']).values
+        j = np.searchsorted(new_times, last_time.to_datetime64(), side='right') - 1
+        new_price = float(new_df['close'].iloc[j]) if j >= 0 else float(new_df['open'].iloc[0])
+        rows.append({
+            'from_code': old, 'to_code': new, 'roll_at': roll_at,
+            'old_price': float(before['close'].iloc[-1]), 'new_price': new_price,
+        })
+        prev_roll = roll_at
+    return pd.DataFrame(rows, columns=['from_code', 'to_code', 'roll_at', 'old_price', 'new_price'])
+
+
+def build_continuous(bars_by_contract: dict, expiries: dict, rule: RollRule = None,
+                     adjust: str = 'back') -> pd.DataFrame:
+    """
+    拼接連續月 1 分 K。
+    :param bars_by_contract: {合約代碼: 1 分 K DataFrame (datetime 欄位)}
+    :param expiries: {合約代碼: 最後交易日}
+    :param adjust: 'back' 以價差回溯調整較早月份 (最新合約價格不變)，
+                   'ratio' 以比例調整，'none' 保留原始價格
+    :return: DataFrame[datetime, open, high, low, close, volume, contract]
+    """
+    if adjust not in ADJUST_MODES:
+        raise ValueError(f"未知的調整方式: {adjust} (可用: {', '.join(ADJUST_MODES)})")
+    schedule = roll_schedule(bars_by_contract, expiries, rule)
+    if schedule.empty:
+        codes = [c for c in bars_by_contract if not bars_by_contract[c].empty]
+        if not codes:
+            return pd.DataFrame(columns=['datetime', 'open', 'high', 'low', 'close', 'volume', 'contract'])
+        code = max(codes, key=lambda c: parse_delivery_date(expiries.get(c, '2999-12-31')))
+        return bars_by_contract[code].assign(contract=code).reset_index(drop=True)
+
+    codes = [schedule['from_code'].iloc[0]] + list(schedule['to_code'])
+    bounds = [pd.Timestamp.min] + list(schedule['roll_at']) + [pd.Timestamp.max]
+
+    # 每段相對最新合約的調整量 (由後往前累積)
+    gaps = (schedule['new_price'] - schedule['old_price']).to_numpy()
+    ratios = (schedule['new_price'] / schedule['old_price']).to_numpy()
+    offsets = np.append(np.cumsum(gaps[::-1])[::-1], 0.0)
+    factors = np.append(np.cumprod(ratios[::-1])[::-1], 1.0)
+
+    pieces = []
+    for k, code in enumerate(codes):
+        df = bars_by_contract[code]
+        times = pd.to_datetime(df['datetime'])
+        seg = df[(times >= bounds[k]) & (times < bounds[k + 1])].copy()
+        if adjust == 'back':
+            seg[['open', 'high', 'low', 'close']] += offsets[k]
+        elif adjust == 'ratio':
+            seg[['open', 'high', 'low', 'close']] *= factors[k]
+        seg['contract'] = code
+        pieces.append(seg)
+    return pd.concat(pieces, ignore_index=True)
+
+
+def load_continuous(store, root: str = 'TMF', rule: RollRule = None, adjust: str = 'back',
+                    start=None, end=None) -> pd.DataFrame:
+    """從 BarStore 讀取某商品所有已儲存月份並拼接成連續月"""
+    expiries = store.expiries()
+    bars = {code: store.load(code) for code in store.codes(root)}
+    df = build_continuous(bars, expiries, rule, adjust)
+    if start is not None:
+        df = df[pd.to_datetime(df['datetime']) >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[pd.to_datetime(df['datetime']) < pd.Timestamp(end)]
+    return df.reset_index(drop=True)
+
+
+# ----------------------------------------------------------------------
+# 實盤換月
+# ----------------------------------------------------------------------
+def front_contract(contracts: list, now: datetime = None, rule: RollRule = None):
+    """
+    依換月規則選出目前應交易的合約 (尚未到換月點、最後交易日最早者)。
+    contracts 為 Shioaji 合約物件列表，會排除跨月價差 (R1 / R2) 與沒有到期日者。
+    """
+    rule = rule or RollRule()
+    now = pd.Timestamp(now or datetime.now())
+    if now.tzinfo is not None:
+        now = now.tz_localize(None)
+    candidates = [c for c in contracts if c.code[-2:] not in ("R1", "R2") and getattr(c, 'delivery_date', '')]
+    candidates.sort(key=lambda c: parse_delivery_date(c.delivery_date))
+    for contract in candidates:
+        if now < rule.calendar_roll(contract.delivery_date):
+            return contract
+    return candidates[-1] if candidates else None
+
+
+ROLL_KEPT_OLD = "kept_old"      # 換月失敗，部位仍在舊合約
+ROLL_FLATTENED = "flattened"    # 舊合約已平倉但新合約建倉失敗且無法回補，策略改為空手並改掛新合約
+
+
+def flatten_strategy(strategy, price: float, reason: str):
+    """
+    實際部位已不存在時清除策略的持倉狀態，並以 price 結算資料庫中的未平倉紀錄
+    (避免策略之後以不存在的部位出場、記錄從未發生的損益)
+    """
+    position = 1 if strategy.is_long else (-1 if getattr(strategy, 'is_short', False) else 0)
+    strategy.is_long = False
+    if hasattr(strategy, 'is_short'):
+        strategy.is_short = False
+    if hasattr(strategy, 'current_position_size'):
+        strategy.current_position_size = 0
+    trade_id = getattr(strategy, 'current_db_trade_id', -1)
+    if position != 0 and trade_id != -1:
+        log_trade_exit(trade_id=trade_id, exit_price=float(price), exit_time=datetime.now(),
+                       pnl_points=float((price - strategy.entry_price) * position), exit_reason=reason)
+        strategy.current_db_trade_id = -1
+
+
+def roll_strategies(portfolio, strategies: list, old_contract, new_contract, old_price: float,
+                    new_price: float) -> dict:
+    """
+    把各策略在舊合約上的虛擬部位移到新合約，並以價差平移進場價與停損 (維持原本的距離)。
+    新合約建倉失敗時先嘗試回補舊合約 (策略留在舊合約)；回補也失敗時策略已無實際部位，
+    改為空手 (以舊合約價格結算) 並改掛新合約。
+    :return: 換月失敗的策略 {名稱: ROLL_KEPT_OLD 或 ROLL_FLATTENED}
+    """
+    gap = new_price - old_price
+    failed = {}
+    for strategy in strategies:
+        position = 1 if strategy.is_long else (-1 if getattr(strategy, 'is_short', False) else 0)
+        if position != 0 and portfolio is not None:
+            closed = portfolio.set_virtual_position(strategy.name, old_contract.code, 0,
+                                                    contract_obj=old_contract, average_cost=old_price)
+            if not closed:
+                failed[strategy.name] = ROLL_KEPT_OLD
+                continue
+            opened = portfolio.set_virtual_position(strategy.name, new_contract.code, position,
+                                                    contract_obj=new_contract, average_cost=new_price)
+            if not opened:
+                reopened = portfolio.set_virtual_position(strategy.name, old_contract.code, position,
+                                                          contract_obj=old_contract, average_cost=old_price)
+                if reopened:
+                    failed[strategy.name] = ROLL_KEPT_OLD
+                else:
+                    logging.critical(f"[Roll] {strategy.name} 新合約建倉與舊合約回補皆失敗，策略改為空手")
+                    flatten_strategy(strategy, old_price, "換月失敗平倉")
+                    failed[strategy.name] = ROLL_FLATTENED
+                    # 已無部位，之後的訊號一律在新合約上進場
+                    strategy.contract = new_contract
+                continue
+        if position != 0:
+            for attr in ('entry_price', 'stop_loss', 'highest_price', 'lowest_price'):
+                value = getattr(strategy, attr, None)
+                if isinstance(value, (int, float)) and np.isfinite(value) and value != 0:
+                    setattr(strategy, attr, value + gap)
+        strategy.contract = new_contract
+    return failed
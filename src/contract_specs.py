@@ -0,0 +1,55 @@
+"""
+期貨合約規格表
+集中管理每點價值、最小跳動點與保證金，回測報表、績效指標與部位模擬都從這裡取值，
+避免在各處寫死 `* 50` 之類的乘數。
+
+保證金為期交所公告值的近似預設，公告調整時請更新此表。
+交易日的歸屬 (夜盤跨日) 也在此統一定義，績效指標與交易帳本的每日損益使用同一個規則。
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class ContractSpec:
+    root: str                  # 商品代碼前綴 (Shioaji contract.code 的開頭)
+    name: str
+    point_value: float         # 每點價值 (TWD)
+    tick_size: float           # 最小跳動點
+    initial_margin: float      # 原始保證金 (TWD / 口)
+    maintenance_margin: float  # 維持保證金 (TWD / 口)
+
+
+CONTRACT_SPECS = {
+    'TXF': ContractSpec('TXF', '臺股期貨', 200.0, 1.0, 184000.0, 141000.0),
+    'MXF': ContractSpec('MXF', '小型臺指期貨', 50.0, 1.0, 46000.0, 35250.0),
+    'TMF': ContractSpec('TMF', '微型臺指期貨', 10.0, 1.0, 9200.0, 7050.0),
+}
+
+DEFAULT_ROOT = 'TMF'
+
+
+def spec_for(code: str = None) -> ContractSpec:
+    """
+    依合約代碼 (例如 'TMFC5'、'MXF202510' 或直接 'TMF') 取得規格。
+    找不到或未提供時回傳系統預設交易的 TMF 規格。
+    """
+    if code:
+        code = str(code).upper()
+        for root in sorted(CONTRACT_SPECS, key=len, reverse=True):
+            if code.startswith(root):
+                return CONTRACT_SPECS[root]
+    return CONTRACT_SPECS[DEFAULT_ROOT]
+
+
+# 夜盤收盤時間: 此時間之前的凌晨屬於前一個交易日 (夜盤開盤的那一天)
+NIGHT_SESSION_END = np.timedelta64(5, 'h')
+
+
+def trading_day(times):
+    """
+    時間點所屬的交易日 (datetime64[D]，純量或陣列皆可)。
+    夜盤跨日到 05:00，凌晨的時間歸到夜盤開盤的那一天 (週六凌晨 → 週五)；交易日 D 涵蓋 D 05:00 ~ D+1 05:00
+    """
+    return (np.asarray(times, dtype='datetime64[ns]') - NIGHT_SESSION_END).astype('datetime64[D]')
@@ -0,0 +1,260 @@
+"""
+儀表板即時事件 (Dashboard Events)
+trade_history / equity_logs / virtual_positions 的每一列變動由觸發器送出 NOTIFY (migrations 版本 6)，
+不論寫入來自主程式、策略子行程或 Outbox 補送都會發出事件。儀表板以一條 LISTEN 連線接收，
+在記憶體中套用增量到 dashboard_summary() 的結果，不需重新查詢:
+
+    listener = DashboardListener().start()     # 每個 Streamlit 伺服器一個 (st.cache_resource)
+    cursor = listener.cursor()
+    summary = dashboard_summary(conn)
+    ...
+    cursor, events = listener.read(cursor)     # 每秒一次，只讀記憶體
+    if events is None: 重新載入 (斷線重連或事件溢出，期間的事件已遺失)
+    else: summary = apply_events(summary, events)
+
+事件類別 (kind): trade_opened / trade_closed / trade_updated / trade_deleted / position_changed / equity_updated
+"""
+import json
+import logging
+import select
+import threading
+from collections import deque
+from datetime import date, timedelta
+
+import pandas as pd
+
+from src.db_logger import get_db_connection
+from src.trade_queries import RECENT_TRADE_COLUMNS
+
+EVENT_CHANNEL = "dashboard_events"
+
+
+def parse_event(payload: str) -> dict:
+    """解析 NOTIFY payload 並標上事件類別"""
+    event = json.loads(payload)
+    table, op, row, old = event.get('table'), event.get('op'), event.get('row'), event.get('old')
+    if table == 'trade_history':
+        if op == 'DELETE':
+            kind = 'trade_deleted'
+        elif row.get('status') == 'Closed' and (old is None or old.get('status') != 'Closed'):
+            kind = 'trade_closed'
+        elif op == 'INSERT':
+            kind = 'trade_opened'
+        else:
+            kind = 'trade_updated'
+    elif table == 'virtual_positions':
+        kind = 'position_changed'
+    elif table == 'equity_logs':
+        kind = 'equity_updated'
+    else:
+        kind = 'unknown'
+    event['kind'] = kind
+    return event
+
+
+class DashboardListener:
+    def __init__(self, connect=get_db_connection, channel: str = EVENT_CHANNEL, max_events: int = 5000,
+                 poll_timeout: float = 1.0, max_retry_delay: float = 30.0):
+        """
+        背景執行緒 LISTEN 並將事件存入環狀佇列 (由各個 session 以 cursor 讀取)
+        :param max_events: 保留的事件數，讀取端落後超過此數量時需重新載入
+        :param poll_timeout: select() 等待時間，也是 stop() 的最長反應時間
+        """
+        self.connect = connect
+        self.channel = channel
+        self.poll_timeout = poll_timeout
+        self.max_retry_delay = max_retry_delay
+        self.events = deque(maxlen=max_events)   # [(seq, event)]
+        self.seq = 0
+        self.generation = 0     # 每次 (重新) LISTEN 成功 +1；斷線期間的事件無法補回
+        self.connected = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="DashboardListener", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def cursor(self) -> tuple:
+        """目前的讀取位置 (generation, seq)；載入完整資料前先取得，之後以 read() 接續"""
+        with self._lock:
+            return self.generation, self.seq
+
+    def read(self, cursor: tuple):
+        """
+        讀取 cursor 之後的事件
+        :return: (新 cursor, 事件列表)；事件列表為 None 代表有遺失 (未連線、重新連線或落後太多)，需重新載入
+        """
+        generation, seq = cursor
+        with self._lock:
+            current = (self.generation, self.seq)
+            if not self.connected or generation != self.generation:
+                return current, None
+            if seq == self.seq:
+                return current, []
+            if not self.events or self.events[0][0] > seq + 1:
+                return current, None
+            return current, [event for s, event in self.events if s > seq]
+
+    def _push(self, payload: str):
+        try:
+            event = parse_event(payload)
+        except (ValueError, AttributeError) as e:
+            logging.error(f"[DashboardListener] 無法解析事件: {e}")
+            return
+        with self._lock:
+            self.seq += 1
+            self.events.append((self.seq, event))
+
+    def _run(self):
+        delay = 1.0
+        while not self._stop.is_set():
+            conn = self.connect()
+            if conn is None:
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel};")
+                with self._lock:
+                    self.generation += 1
+                    self.connected = True
+                delay = 1.0
+                while not self._stop.is_set():
+                    readable, _, _ = select.select([conn], [], [], self.poll_timeout)
+                    if not readable:
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._push(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logging.error(f"[DashboardListener] LISTEN 連線中斷: {e}")
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+            finally:
+                with self._lock:
+                    self.connected = False
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+# ----------------------------------------------------------------------
+# 增量套用
+# ----------------------------------------------------------------------
+def _to_date(value) -> date:
+    return pd.Timestamp(value).date()
+
+
+def _pnl_contribution(row):
+    """平倉紀錄對 strategy_daily_pnl 的貢獻 (與 maintain_strategy_daily_pnl 觸發器相同條件)"""
+    if not row or row.get('status') != 'Closed' or not row.get('exit_time') or not row.get('strategy_name'):
+        return None
+    return row['strategy_name'], _to_date(row['exit_time']), float(row.get('pnl_points') or 0)
+
+
+def _add_daily_pnl(summary: dict, contribution, sign: int, today: date, pnl_days: int):
+    strategy, trade_date, pnl = contribution
+    if trade_date >= today - timedelta(days=7):
+        summary['weekly_pnl'] = (summary['weekly_pnl'] or 0.0) + sign * pnl
+    if trade_date < today - timedelta(days=pnl_days):
+        return
+    df = summary['daily_pnl']
+    mask = (df['strategy_name'] == strategy) & (df['trade_date'] == trade_date)
+    if mask.any():
+        df.loc[mask, 'pnl_points'] += sign * pnl
+        df.loc[mask, 'trades'] += sign
+    elif sign > 0:
+        new = pd.DataFrame([[strategy, trade_date, pnl, 1]], columns=df.columns)
+        df = pd.concat([df, new], ignore_index=True) if not df.empty else new
+    summary['daily_pnl'] = df.sort_values(['trade_date', 'strategy_name'], ignore_index=True)
+
+
+def _apply_trade(summary: dict, event: dict, recent: int, today: date, pnl_days: int):
+    row, old = event.get('row'), event.get('old')
+    trade_id = (row or old)['id']
+    trades = summary['recent_trades']
+    present = bool((trades['id'] == trade_id).any())
+    trades = trades[trades['id'] != trade_id]
+    if row is not None and (present or len(trades) < recent or trade_id > trades['id'].min()):
+        new = pd.DataFrame([[row.get(c) for c in RECENT_TRADE_COLUMNS]], columns=RECENT_TRADE_COLUMNS)
+        for col in ('entry_time', 'exit_time'):
+            new[col] = pd.to_datetime(new[col])
+        for col in ('entry_price', 'exit_price', 'pnl_points'):
+            new[col] = pd.to_numeric(new[col], errors='coerce')
+        trades = pd.concat([new, trades], ignore_index=True) if not trades.empty else new
+    summary['recent_trades'] = trades.sort_values('id', ascending=False, ignore_index=True).head(recent)
+
+    # 最新一筆未平倉 (近期紀錄中找不到時，只有在被平倉的正是目前顯示的那筆才清除)
+    open_trades = summary['recent_trades'][summary['recent_trades']['status'] == 'Open']
+    if not open_trades.empty:
+        latest = open_trades.loc[open_trades['entry_time'].idxmax()]
+        summary['open_position'] = (latest['side'], latest['entry_price'], latest['entry_time'])
+    elif summary['open_position'] is not None and old is not None and old.get('status') == 'Open' \
+            and pd.Timestamp(old.get('entry_time')) == pd.Timestamp(summary['open_position'][2]):
+        summary['open_position'] = None
+
+    for contribution, sign in ((_pnl_contribution(old), -1), (_pnl_contribution(row), 1)):
+        if contribution is not None:
+            _add_daily_pnl(summary, contribution, sign, today, pnl_days)
+
+
+def _apply_equity(summary: dict, event: dict):
+    row, old = event.get('row'), event.get('old')
+    curve = summary['equity_curve']
+    if old is not None:
+        curve = curve[curve['log_date'] != _to_date(old['log_date'])]
+    if row is not None:
+        log_date = _to_date(row['log_date'])
+        curve = curve[curve['log_date'] != log_date]
+        new = pd.DataFrame([[log_date, pd.to_numeric(row.get('total_equity'))]], columns=curve.columns)
+        curve = pd.concat([curve, new], ignore_index=True) if not curve.empty else new
+        latest = summary['latest_equity']
+        if latest is None or latest[2] is None or log_date >= _to_date(latest[2]):
+            summary['latest_equity'] = (row.get('total_equity'), row.get('available_margin'), log_date)
+    summary['equity_curve'] = curve.sort_values('log_date', ignore_index=True)
+
+
+def _apply_position(summary: dict, event: dict):
+    row, old = event.get('row'), event.get('old')
+    positions = summary['positions']
+    for r in (old, row):
+        if r is not None:
+            positions = positions[~((positions['strategy_name'] == r['strategy_name'])
+                                    & (positions['contract_symbol'] == r['contract_symbol']))]
+    if row is not None and row.get('position'):
+        new = pd.DataFrame([[row.get(c) for c in positions.columns]], columns=positions.columns)
+        new['updated_at'] = pd.to_datetime(new['updated_at'])
+        positions = pd.concat([positions, new], ignore_index=True) if not positions.empty else new
+    summary['positions'] = positions.sort_values(['contract_symbol', 'strategy_name'], ignore_index=True)
+
+
+def apply_events(summary: dict, events: list, recent: int = 50, pnl_days: int = 30, today: date = None) -> dict:
+    """
+    將事件依序套用到 dashboard_summary() 的結果，回傳新的 summary (不修改傳入的物件)
+    :param recent / pnl_days: 需與載入 summary 時的參數相同
+    :param today: 日期範圍的基準日，預設為載入 summary 時資料庫的 CURRENT_DATE (換日後應重新載入 summary)
+    """
+    today = today or summary.get('as_of') or date.today()
+    summary = {k: v.copy() if isinstance(v, pd.DataFrame) else v for k, v in summary.items()}
+    for event in events:
+        table = event.get('table')
+        if table == 'trade_history':
+            _apply_trade(summary, event, recent, today, pnl_days)
+        elif table == 'equity_logs':
+            _apply_equity(summary, event)
+        elif table == 'virtual_positions':
+            _apply_position(summary, event)
+    return summary
@@ -5,6 +5,21 @@ import logging
 
 load_dotenv()
 
+# 非同步批次寫入器 (src/db_writer.DBWriter)；設定後交易紀錄改為排入佇列，交易執行緒不等待資料庫
+_async_writer = None
+# 本機持久化佇列 (src/db_outbox.Outbox)；設定後優先於 _async_writer，資料庫斷線時紀錄也不會遺失
+_outbox = None
+
+def set_async_writer(writer):
+    """設定 (或以 None 取消) 非同步寫入器"""
+    global _async_writer
+    _async_writer = writer
+
+def set_outbox(outbox):
+    """設定 (或以 None 取消) 本機 Outbox"""
+    global _outbox
+    _outbox = outbox
+
 def get_db_connection():
     db_url = os.environ.get("DATABASE_URL")
     if not db_url:
@@ -16,8 +31,15 @@ def get_db_connection():
         logging.error(f"❌ Database connection failed: {e}")
         return None
 
-def log_trade_entry(strategy_name: str, side: str, entry_price: float, entry_time) -> int:
-    """Logs the entry of a trade to the trade_history table and returns the inserted ID."""
+def log_trade_entry(strategy_name: str, side: str, entry_price: float, entry_time, contract_symbol: str = None) -> int:
+    """Logs the entry of a trade to the trade_history table and returns the inserted ID.
+    若已設定 Outbox，回傳本機產生的 client_key；若已設定非同步寫入器，回傳 Future (寫入後結果為 id)。
+    兩者皆可直接交給 log_trade_exit。"""
+    if _outbox is not None:
+        return _outbox.log_trade_entry(strategy_name, side, entry_price, entry_time, contract_symbol)
+    if _async_writer is not None:
+        return _async_writer.submit('trade_entry', (strategy_name, side, entry_price, entry_time, contract_symbol))
+
     conn = get_db_connection()
     if not conn: return -1
     
@@ -26,11 +48,11 @@ def log_trade_entry(strategy_name: str, side: str, entry_price: float, entry_tim
         cursor = conn.cursor()
         cursor.execute(
             """
-            INSERT INTO trade_history (strategy_name, side, entry_price, entry_time, status)
-            VALUES (%s, %s, %s, %s, 'Open')
+            INSERT INTO trade_history (strategy_name, side, entry_price, entry_time, contract_symbol, status)
+            VALUES (%s, %s, %s, %s, %s, 'Open')
             RETURNING id;
             """,
-            (strategy_name, side, entry_price, entry_time)
+            (strategy_name, side, entry_price, entry_time, contract_symbol)
         )
         trade_id = cursor.fetchone()[0]
         conn.commit()
@@ -44,7 +66,13 @@ def log_trade_entry(strategy_name: str, side: str, entry_price: float, entry_tim
 def log_trade_exit(trade_id: int, exit_price: float, exit_time, pnl_points: float, exit_reason: str = ""):
     """Updates an existing trade record with exit information."""
     if trade_id == -1: return
-    
+    if _outbox is not None:
+        _outbox.log_trade_exit(trade_id, exit_price, exit_time, pnl_points, exit_reason)
+        return
+    if _async_writer is not None:
+        _async_writer.submit('trade_exit', (trade_id, exit_price, exit_time, pnl_points, exit_reason))
+        return
+
     conn = get_db_connection()
     if not conn: return
     
@@ -67,6 +95,13 @@ def log_trade_exit(trade_id: int, exit_price: float, exit_time, pnl_points: floa
 
 def log_daily_equity(log_date, total_equity: float, available_margin: float):
     """Logs daily equity to the equity_logs table."""
+    if _outbox is not None:
+        _outbox.log_daily_equity(log_date, total_equity, available_margin)
+        return
+    if _async_writer is not None:
+        _async_writer.submit('equity', (log_date, total_equity, available_margin))
+        return
+
     conn = get_db_connection()
     if not conn: return
     
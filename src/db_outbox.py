@@ -0,0 +1,393 @@
+"""
+本機持久化寫入佇列 (Outbox)
+Postgres 斷線時，原本 set_virtual_position 會拒絕交易、log_trade_entry 回傳 -1 導致之後的平倉紀錄遺失。
+改為所有寫入先 commit 到本機 SQLite (WAL 模式，synchronous 決定 fsync 策略)，
+再由背景執行緒 OutboxDrainer 依序補寫到 Postgres:
+
+- 交易紀錄以本機產生的 client_key 識別，進場 INSERT ... ON CONFLICT (client_key) DO NOTHING、
+  平倉 UPDATE ... WHERE client_key，重送任意次都不會重複 (idempotent replay)
+- 權益與虛擬部位為 upsert，依寫入順序重播即為最後狀態
+- 虛擬部位另有本機鏡像表 positions，PortfolioManager 以它計算淨部位，資料庫斷線時仍可交易
+- 連線錯誤時整批保留並退避重試；單筆資料錯誤重試 MAX_ATTEMPTS 次後標記為 dead 並記錄錯誤，不阻塞後續紀錄
+
+多個行程 (策略 worker) 可同時開啟同一個檔案寫入，只有主行程執行 OutboxDrainer。
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+
+import psycopg2
+from psycopg2.extras import execute_batch
+
+from src.bar_store import PROJECT_ROOT
+from src.db_logger import get_db_connection
+
+PENDING, DEAD = 0, 2
+MAX_ATTEMPTS = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    state INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS outbox_state_seq ON outbox (state, seq);
+CREATE TABLE IF NOT EXISTS positions (
+    strategy_name TEXT NOT NULL,
+    contract_symbol TEXT NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    average_cost REAL NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (strategy_name, contract_symbol)
+);
+"""
+
+# 各種紀錄補寫到 Postgres 的 SQL (皆可重複執行)
+REPLAY_SQL = {
+    'trade_entry': """
+        INSERT INTO trade_history (client_key, strategy_name, side, entry_price, entry_time, contract_symbol, status)
+        VALUES (%(client_key)s, %(strategy_name)s, %(side)s, %(entry_price)s, %(entry_time)s, %(contract_symbol)s,
+                'Open')
+        ON CONFLICT (client_key) DO NOTHING
+    """,
+    'trade_exit': """
+        UPDATE trade_history
+        SET exit_price = %(exit_price)s, exit_time = %(exit_time)s, pnl_points = %(pnl_points)s,
+            exit_reason = %(exit_reason)s, status = 'Closed'
+        WHERE client_key = %(client_key)s
+    """,
+    'trade_exit_id': """
+        UPDATE trade_history
+        SET exit_price = %(exit_price)s, exit_time = %(exit_time)s, pnl_points = %(pnl_points)s,
+            exit_reason = %(exit_reason)s, status = 'Closed'
+        WHERE id = %(trade_id)s
+    """,
+    'equity': """
+        INSERT INTO equity_logs (log_date, total_equity, available_margin)
+        VALUES (%(log_date)s, %(total_equity)s, %(available_margin)s)
+        ON CONFLICT (log_date)
+        DO UPDATE SET total_equity = EXCLUDED.total_equity, available_margin = EXCLUDED.available_margin
+    """,
+    'virtual_position': """
+        INSERT INTO virtual_positions (strategy_name, contract_symbol, position, average_cost, updated_at)
+        VALUES (%(strategy_name)s, %(contract_symbol)s, %(position)s, %(average_cost)s, CURRENT_TIMESTAMP)
+        ON CONFLICT (strategy_name, contract_symbol)
+        DO UPDATE SET position = EXCLUDED.position, average_cost = EXCLUDED.average_cost, updated_at = CURRENT_TIMESTAMP
+    """,
+}
+
+# 舊版寫入的紀錄缺少的欄位 (升級前已在佇列中的紀錄仍可補寫)
+REPLAY_DEFAULTS = {
+    'trade_entry': {'contract_symbol': None},
+}
+
+
+def _json_default(value):
+    """datetime / pandas Timestamp → ISO 字串，numpy 數值 → Python 數值"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def new_client_key() -> str:
+    return uuid.uuid4().hex
+
+
+class Outbox:
+    def __init__(self, path: str = None, synchronous: str = "FULL"):
+        """
+        :param path: SQLite 檔案路徑 (預設 DB_OUTBOX_PATH 或 <專案>/.cache/outbox.sqlite3)
+        :param synchronous: FULL 每次 commit 都 fsync (斷電不遺失)；NORMAL 只在 checkpoint 時 fsync (較快，斷電可能遺失最後幾筆)
+        """
+        self.path = path or os.environ.get("DB_OUTBOX_PATH") or os.path.join(PROJECT_ROOT, ".cache", "outbox.sqlite3")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # 寫入
+    # ------------------------------------------------------------------
+    def append(self, kind: str, payload: dict) -> int:
+        """寫入一筆待補寫紀錄 (commit 後才回傳)，回傳序號"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (kind, payload, created_at) VALUES (?, ?, ?)",
+                (kind, json.dumps(payload, default=_json_default, ensure_ascii=False), time.time())
+            )
+            return cursor.lastrowid
+
+    def log_trade_entry(self, strategy_name: str, side: str, entry_price: float, entry_time,
+                        contract_symbol: str = None) -> str:
+        """記錄進場，回傳 client_key (取代資料庫 id，交給 log_trade_exit)"""
+        client_key = new_client_key()
+        self.append('trade_entry', {'client_key': client_key, 'strategy_name': strategy_name, 'side': side,
+                                    'entry_price': entry_price, 'entry_time': entry_time,
+                                    'contract_symbol': contract_symbol})
+        return client_key
+
+    def log_trade_exit(self, trade_id, exit_price: float, exit_time, pnl_points: float, exit_reason: str = ""):
+        """trade_id 可為 client_key (Outbox 進場) 或資料庫 id (同步寫入的進場)"""
+        payload = {'exit_price': exit_price, 'exit_time': exit_time, 'pnl_points': pnl_points,
+                   'exit_reason': exit_reason}
+        if isinstance(trade_id, str):
+            self.append('trade_exit', dict(payload, client_key=trade_id))
+        else:
+            self.append('trade_exit_id', dict(payload, trade_id=int(trade_id)))
+
+    def log_daily_equity(self, log_date, total_equity: float, available_margin: float):
+        self.append('equity', {'log_date': log_date, 'total_equity': total_equity,
+                               'available_margin': available_margin})
+
+    # ------------------------------------------------------------------
+    # 虛擬部位 (本機鏡像)
+    # ------------------------------------------------------------------
+    def get_position(self, strategy_name: str, contract_symbol: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT position FROM positions WHERE strategy_name = ? AND contract_symbol = ?",
+                (strategy_name, contract_symbol)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def net_position(self, contract_symbol: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(position), 0) FROM positions WHERE contract_symbol = ?", (contract_symbol,)
+            ).fetchone()
+        return row[0]
+
+    def set_position(self, strategy_name: str, contract_symbol: str, position: int, average_cost: float = 0.0):
+        """更新本機部位並排入補寫紀錄 (同一個 SQLite 交易)"""
+        payload = {'strategy_name': strategy_name, 'contract_symbol': contract_symbol,
+                   'position': int(position), 'average_cost': float(average_cost)}
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO positions (strategy_name, contract_symbol, position, average_cost, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (strategy_name, contract_symbol, int(position), float(average_cost), now)
+                )
+                self._conn.execute("INSERT INTO outbox (kind, payload, created_at) VALUES (?, ?, ?)",
+                                   ('virtual_position', json.dumps(payload), now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def replace_positions(self, rows) -> bool:
+        """
+        以資料庫的 virtual_positions 覆蓋本機鏡像 (啟動時)。
+        仍有未補寫的部位紀錄時本機較新，不覆蓋並回傳 False。
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                pending = self._conn.execute(
+                    "SELECT COUNT(*) FROM outbox WHERE kind = 'virtual_position' AND state = ?", (PENDING,)
+                ).fetchone()[0]
+                if pending:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                now = time.time()
+                self._conn.execute("DELETE FROM positions")
+                self._conn.executemany(
+                    "INSERT INTO positions (strategy_name, contract_symbol, position, average_cost, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(s, c, int(p), float(a or 0), now) for s, c, p, a in rows]
+                )
+                self._conn.execute("COMMIT")
+                return True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # ------------------------------------------------------------------
+    # 補寫端
+    # ------------------------------------------------------------------
+    def pending(self, limit: int = 500) -> list:
+        """依序號取出待補寫紀錄 [(seq, kind, payload dict, attempts)]"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, kind, payload, attempts FROM outbox WHERE state = ? ORDER BY seq LIMIT ?",
+                (PENDING, limit)
+            ).fetchall()
+        return [(seq, kind, json.loads(payload), attempts) for seq, kind, payload, attempts in rows]
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE state = ?", (PENDING,)).fetchone()[0]
+
+    def mark_sent(self, seqs):
+        with self._lock:
+            self._conn.executemany("DELETE FROM outbox WHERE seq = ?", [(s,) for s in seqs])
+
+    def mark_failed(self, seq: int, error: str):
+        """單筆補寫失敗: 累計次數，超過 MAX_ATTEMPTS 標記為 dead (保留供人工檢查)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?, "
+                "state = CASE WHEN attempts + 1 >= ? THEN ? ELSE state END WHERE seq = ?",
+                (error[:500], MAX_ATTEMPTS, DEAD, seq)
+            )
+
+    def dead_letters(self) -> list:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT seq, kind, payload, last_error FROM outbox WHERE state = ? ORDER BY seq", (DEAD,)
+            ).fetchall()
+
+
+class OutboxDrainer:
+    def __init__(self, outbox: Outbox, connect=get_db_connection, batch_size: int = 500,
+                 interval: float = 1.0, max_retry_delay: float = 30.0):
+        """
+        背景執行緒: 依序把 Outbox 紀錄補寫到 Postgres，一批一個資料庫交易
+        :param connect: 建立 psycopg2 連線的函式 (失敗回傳 None)
+        """
+        self.outbox = outbox
+        self.connect = connect
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_retry_delay = max_retry_delay
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="OutboxDrainer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, drain_timeout: float = 10.0):
+        """停止前盡量補寫完 (資料仍保留在 Outbox，下次啟動會繼續)"""
+        deadline = time.monotonic() + drain_timeout
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=drain_timeout)
+            self._thread = None
+        try:
+            while self.outbox.pending_count() and time.monotonic() < deadline:
+                if not self.drain_once():
+                    break
+        except Exception as e:
+            logging.error(f"[Outbox] 停止前補寫失敗，{self.outbox.pending_count()} 筆留待下次啟動: {e}")
+        self._close_connection()
+
+    def _run(self):
+        delay = 0.0
+        while not self._stop.is_set():
+            try:
+                sent = self.drain_once()
+                delay = 0.0
+            except Exception as e:
+                delay = min(max(delay * 2, 0.5), self.max_retry_delay)
+                logging.error(f"[Outbox] 補寫 Postgres 失敗 ({self.outbox.pending_count()} 筆待補寫)，"
+                              f"{delay:.1f} 秒後重試: {e}")
+                self._close_connection()
+                self._stop.wait(delay)
+                continue
+            if sent < self.batch_size:
+                self._stop.wait(self.interval)
+
+    def _connection(self):
+        if self._conn is None or getattr(self._conn, 'closed', 0):
+            self._conn = self.connect()
+            if self._conn is None:
+                raise ConnectionError("無法連線至資料庫")
+        return self._conn
+
+    def _close_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+
+    def drain_once(self) -> int:
+        """
+        補寫一批，回傳成功筆數。連線錯誤往外拋 (整批保留)；
+        資料錯誤時改為逐筆寫入，只把有問題的紀錄標記失敗。
+        """
+        records = self.outbox.pending(self.batch_size)
+        if not records:
+            return 0
+        conn = self._connection()
+        try:
+            self._apply(conn, records)
+            conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            raise
+        except Exception as e:
+            conn.rollback()
+            logging.warning(f"[Outbox] 批次補寫失敗，改為逐筆重試: {e}")
+            return self._drain_one_by_one(conn, records)
+        self.outbox.mark_sent([r[0] for r in records])
+        return len(records)
+
+    def _drain_one_by_one(self, conn, records) -> int:
+        sent = []
+        for record in records:
+            try:
+                self._apply(conn, [record])
+                conn.commit()
+                sent.append(record[0])
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                self.outbox.mark_sent(sent)
+                raise
+            except Exception as e:
+                conn.rollback()
+                seq, kind = record[0], record[1]
+                logging.error(f"[Outbox] 紀錄 #{seq} ({kind}) 補寫失敗 (第 {record[3] + 1} 次): {e}")
+                self.outbox.mark_failed(seq, str(e))
+        self.outbox.mark_sent(sent)
+        return len(sent)
+
+    @staticmethod
+    def _apply(conn, records):
+        """相鄰同種類的紀錄以 execute_batch 合併送出"""
+        with conn.cursor() as cursor:
+            i = 0
+            while i < len(records):
+                kind = records[i][1]
+                j = i
+                while j < len(records) and records[j][1] == kind:
+                    j += 1
+                if kind not in REPLAY_SQL:
+                    raise ValueError(f"未知的紀錄種類: {kind}")
+                defaults = REPLAY_DEFAULTS.get(kind, {})
+                execute_batch(cursor, REPLAY_SQL[kind], [dict(defaults, **r[2]) for r in records[i:j]], page_size=100)
+                i = j
+
+    def sync_positions(self) -> bool:
+        """啟動時以資料庫的 virtual_positions 更新本機鏡像 (本機有未補寫的部位時保留本機)"""
+        conn = self._connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT strategy_name, contract_symbol, position, average_cost FROM virtual_positions")
+                rows = cursor.fetchall()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return self.outbox.replace_positions(rows)
@@ -0,0 +1,337 @@
+"""
+非同步批次資料庫寫入器 (DB Writer)
+db_logger 原本每筆紀錄都開一次連線、執行一句 SQL、commit 再關閉；
+這對交易紀錄尚可，但要持久化 Tick / K 線 / 訊號 / 影子策略交易時，寫入時間會超過交易本身。
+
+DBWriter 以一條背景執行緒負責所有寫入:
+- 每個資料表一條佇列，達到 batch_size 筆或最舊一筆等待超過 flush_interval 秒即批次寫入
+- 一般資料表以 execute_values 多列 INSERT / UPDATE；純附加的大量資料 (mode='copy') 以 COPY 寫入
+- submit() 立即回傳 Future (需要 RETURNING id 的表會在寫入後填入 id)，呼叫端永遠不會等待資料庫
+- 佇列有上限: 資料庫變慢時依表設定丟棄最舊的資料 (drop_oldest，適合行情) 或拒絕新資料 (reject)，記憶體不會無限成長
+- 連線中斷時整批保留並以指數退避重試；資料本身錯誤 (例如型別不符) 則讓該批 Future 失敗，不阻塞後續寫入
+
+Future 可以直接當作其他列的欄位值 (例如平倉 UPDATE 的 trade id)，寫入前會自動換成結果；
+佇列依註冊順序寫入，因此同一輪中進場的 INSERT 一定先於平倉的 UPDATE。
+"""
+import io
+import time
+import logging
+import threading
+import collections
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable
+from datetime import datetime, date
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from src.db_logger import get_db_connection
+
+
+class WriteDropped(Exception):
+    """佇列已滿 (或寫入器已關閉) 而未寫入的資料"""
+
+
+@dataclass
+class TableSpec:
+    name: str                 # submit() 使用的名稱
+    table: str                # 實際資料表
+    columns: tuple
+    sql: str = None           # mode='values' 時的 SQL (含 VALUES %s)
+    template: str = None      # execute_values 的列樣板
+    mode: str = 'values'      # 'values' | 'copy'
+    returning: bool = False   # SQL 含 RETURNING 時，Future 的結果為第一個欄位
+    dedupe: int = None        # 同批次中依此欄位索引去重 (保留最後一筆)，避免 ON CONFLICT 同批衝突
+    max_rows: int = 10000
+    overflow: str = 'reject'  # 'reject' | 'drop_oldest'
+    batch_size: int = None    # 覆寫 DBWriter.batch_size (大量行情可用較大批次)
+    prepare: Callable = None  # prepare(conn, rows): 寫入前執行並自行 commit (例如建立分區)
+
+
+DEFAULT_TABLES = (
+    TableSpec(
+        'trade_entry', 'trade_history', ('strategy_name', 'side', 'entry_price', 'entry_time', 'contract_symbol'),
+        sql="INSERT INTO trade_history (strategy_name, side, entry_price, entry_time, contract_symbol, status) "
+            "VALUES %s RETURNING id",
+        template="(%s, %s, %s, %s, %s, 'Open')", returning=True,
+    ),
+    TableSpec(
+        'trade_exit', 'trade_history', ('id', 'exit_price', 'exit_time', 'pnl_points', 'exit_reason'),
+        sql="""
+            UPDATE trade_history AS t
+            SET exit_price = v.exit_price, exit_time = v.exit_time, pnl_points = v.pnl_points,
+                exit_reason = v.exit_reason, status = 'Closed'
+            FROM (VALUES %s) AS v(id, exit_price, exit_time, pnl_points, exit_reason)
+            WHERE t.id = v.id
+        """,
+        template="(%s::integer, %s::numeric, %s::timestamp, %s::numeric, %s::varchar)",
+    ),
+    TableSpec(
+        'equity', 'equity_logs', ('log_date', 'total_equity', 'available_margin'),
+        sql="""
+            INSERT INTO equity_logs (log_date, total_equity, available_margin) VALUES %s
+            ON CONFLICT (log_date)
+            DO UPDATE SET total_equity = EXCLUDED.total_equity, available_margin = EXCLUDED.available_margin
+        """,
+        dedupe=0,
+    ),
+)
+
+RETRYABLE_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, ConnectionError)
+
+
+class _Pending:
+    __slots__ = ('row', 'future', 'queued_at')
+
+    def __init__(self, row, future, queued_at):
+        self.row = row
+        self.future = future
+        self.queued_at = queued_at
+
+
+def _copy_text(value) -> str:
+    """COPY text 格式的欄位值 (NULL 為 \\N，跳脫反斜線 / Tab / 換行)"""
+    if value is None:
+        return r'\N'
+    if isinstance(value, datetime):
+        text = value.isoformat(sep=' ')
+    elif isinstance(value, date):
+        text = value.isoformat()
+    else:
+        text = str(value)
+    return text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class DBWriter:
+    def __init__(self, connect=get_db_connection, tables=DEFAULT_TABLES, batch_size: int = 500,
+                 flush_interval: float = 1.0, max_retry_delay: float = 30.0):
+        """
+        :param connect: 建立 psycopg2 連線的函式 (失敗回傳 None)
+        :param tables: 預先註冊的 TableSpec
+        :param batch_size: 單批最多筆數，也是提早寫入的門檻
+        :param flush_interval: 最舊一筆等待超過此秒數即寫入
+        """
+        self.connect = connect
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retry_delay = max_retry_delay
+
+        self.specs = {}
+        self._queues = {}
+        self.dropped = collections.Counter()
+        self.written = collections.Counter()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._force = False
+        self._closed = False
+        self._conn = None
+        self._retry_delay = 0.0
+        self._thread = None
+        for spec in tables:
+            self.register_table(spec)
+
+    def register_table(self, spec: TableSpec):
+        if spec.mode == 'values' and not spec.sql:
+            raise ValueError(f"{spec.name}: mode='values' 需要 sql")
+        with self._cond:
+            self.specs[spec.name] = spec
+            self._queues.setdefault(spec.name, collections.deque())
+
+    # ------------------------------------------------------------------
+    # 呼叫端 (交易執行緒)
+    # ------------------------------------------------------------------
+    def submit(self, name: str, row: tuple) -> Future:
+        """排入一列資料，立即回傳 Future；不會等待資料庫"""
+        future = Future()
+        spec = self.specs[name]
+        with self._cond:
+            if self._closed:
+                future.set_exception(WriteDropped(f"{name}: 寫入器已關閉"))
+                return future
+            queue = self._queues[name]
+            if len(queue) >= spec.max_rows:
+                self.dropped[name] += 1
+                if spec.overflow != 'drop_oldest':
+                    logging.error(f"[DBWriter] {name} 佇列已滿 ({spec.max_rows} 筆)，拒絕寫入")
+                    future.set_exception(WriteDropped(f"{name}: 佇列已滿"))
+                    return future
+                queue.popleft().future.set_exception(WriteDropped(f"{name}: 佇列已滿，捨棄最舊資料"))
+            queue.append(_Pending(tuple(row), future, time.monotonic()))
+            if len(queue) >= (spec.batch_size or self.batch_size):
+                self._cond.notify()
+        return future
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(len(q) for q in self._queues.values()) + self._in_flight
+
+    def flush(self, timeout: float = None) -> bool:
+        """要求立即寫入並等待佇列清空 (關閉或測試用)，回傳是否在時限內完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._force = True
+            self._cond.notify_all()
+            while sum(len(q) for q in self._queues.values()) + self._in_flight > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(timeout=remaining if remaining is not None else 0.1)
+            self._force = False
+            return True
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="DBWriter", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout: float = 10.0):
+        """寫完剩餘資料後停止；逾時未寫入的資料其 Future 設為 WriteDropped"""
+        if self._thread is not None:
+            self.flush(timeout=timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            for name, queue in self._queues.items():
+                while queue:
+                    self.dropped[name] += 1
+                    queue.popleft().future.set_exception(WriteDropped(f"{name}: 寫入器已關閉"))
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    # ------------------------------------------------------------------
+    # 背景執行緒
+    # ------------------------------------------------------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                self._cond.wait(timeout=min(self.flush_interval, 0.25) if not self._force else 0.01)
+            if self._retry_delay:
+                time.sleep(self._retry_delay)
+            for name in list(self.specs):
+                self._flush_table(name)
+
+    def _take_batch(self, name: str) -> list:
+        batch_size = self.specs[name].batch_size or self.batch_size
+        with self._cond:
+            queue = self._queues[name]
+            if not queue:
+                return []
+            due = (self._force or len(queue) >= batch_size
+                   or time.monotonic() - queue[0].queued_at >= self.flush_interval)
+            if not due:
+                return []
+            batch = []
+            while queue and len(batch) < batch_size:
+                item = queue[0]
+                # 欄位引用尚未完成的 Future (例如進場 id 仍在重試) 時，這一列與之後的列留到下一輪
+                if any(isinstance(v, Future) and not v.done() for v in item.row):
+                    break
+                batch.append(queue.popleft())
+            self._in_flight += len(batch)
+            return batch
+
+    def _flush_table(self, name: str):
+        batch = self._take_batch(name)
+        if not batch:
+            return
+        spec = self.specs[name]
+        ready, rows = [], []
+        for item in batch:
+            try:
+                row = tuple(v.result() if isinstance(v, Future) else v for v in item.row)
+            except Exception as e:
+                item.future.set_exception(WriteDropped(f"{name}: 相依的寫入失敗 ({e})"))
+                continue
+            if any(v is None or v == -1 for v, col in zip(row, spec.columns) if col == 'id'):
+                item.future.set_exception(WriteDropped(f"{name}: 無效的 id"))
+                continue
+            ready.append(item)
+            rows.append(row)
+
+        try:
+            results = self._write(spec, rows) if rows else []
+        except RETRYABLE_ERRORS as e:
+            logging.error(f"[DBWriter] 寫入 {name} 失敗 (連線問題，{len(ready)} 筆稍後重試): {e}")
+            self._drop_connection()
+            self._retry_delay = min(max(self._retry_delay * 2, 0.5), self.max_retry_delay)
+            with self._cond:
+                self._in_flight -= len(batch)
+                self._queues[name].extendleft(reversed(ready))
+                self._cond.notify_all()
+            return
+        except Exception as e:
+            logging.error(f"[DBWriter] 寫入 {name} 失敗 (資料錯誤，捨棄 {len(ready)} 筆): {e}")
+            self._rollback()
+            for item in ready:
+                item.future.set_exception(e)
+            results = None
+
+        if results is not None:
+            self._retry_delay = 0.0
+            self.written[name] += len(ready)
+            for item, result in zip(ready, results):
+                item.future.set_result(result)
+        with self._cond:
+            self._in_flight -= len(batch)
+            self._cond.notify_all()
+
+    def _connection(self):
+        if self._conn is None or getattr(self._conn, 'closed', 0):
+            self._conn = self.connect()
+            if self._conn is None:
+                raise ConnectionError("無法連線至資料庫")
+        return self._conn
+
+    def _drop_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+
+    def _rollback(self):
+        try:
+            if self._conn is not None:
+                self._conn.rollback()
+        except Exception:
+            self._drop_connection()
+
+    def _write(self, spec: TableSpec, rows: list) -> list:
+        """寫入一批並 commit，回傳每列的結果 (RETURNING 的第一欄或 None)"""
+        if spec.dedupe is not None:
+            latest = {row[spec.dedupe]: row for row in rows}
+            unique_rows = list(latest.values())
+        else:
+            unique_rows = rows
+
+        conn = self._connection()
+        if spec.prepare is not None:
+            spec.prepare(conn, unique_rows)
+        with conn.cursor() as cursor:
+            if spec.mode == 'copy':
+                buffer = io.StringIO()
+                for row in unique_rows:
+                    buffer.write('\t'.join(_copy_text(v) for v in row))
+                    buffer.write('\n')
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {spec.table} ({', '.join(spec.columns)}) FROM STDIN", buffer)
+                returned = None
+            else:
+                returned = execute_values(cursor, spec.sql, unique_rows, template=spec.template,
+                                          page_size=len(unique_rows), fetch=spec.returning)
+        conn.commit()
+        if spec.returning and returned is not None:
+            return [r[0] for r in returned]
+        return [None] * len(rows)
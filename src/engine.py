@@ -0,0 +1,274 @@
+"""
+多合約交易引擎
+同一個行程內同時掛載多組 (合約, 策略, 參數)，例如 TMF + MXF + TXF 各自跑數個參數變體。
+
+- 每個合約一條 ContractPipeline: 自己的 60 分 / 日 K 合成器與最新報價，
+  K 棒完成時只把 DataFrame 建一次，再交給掛在該合約上的所有策略
+- Tick 依合約代碼查 dict 分派 (O(1))，新增商品只增加該商品自己的每筆 Tick 成本
+- 所有策略共用同一個 PortfolioManager (虛擬部位淨額化與實體下單) 與 TradeLedger
+"""
+import logging
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from src.processors.kline_maker import KLineMaker
+from src.trade_ledger import TradeLedger
+from src.continuous_contract import roll_strategies, ROLL_KEPT_OLD
+
+OHLC_AGG = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+
+
+@dataclass
+class StrategySpec:
+    """一個要掛載的策略實例: 商品 (TMF / MXF / TXF)、策略類別、名稱與參數覆寫"""
+    root: str
+    strategy_cls: type
+    name: str
+    params: dict = field(default_factory=dict)
+
+
+def default_specs(roots=('TMF',)) -> list:
+    """
+    預設策略組合: 每個商品各跑 Gatekeeper-MXF-V1 與 Gatekeeper-BNF-B。
+    TMF 沿用原本的策略名稱 (資料庫中的虛擬部位與交易紀錄以名稱對應)，其他商品加上商品後綴。
+    """
+    from src.strategies.dual_logic import DualTimeframeStrategy
+    from src.strategies.gatekeeper_bnf_b import GatekeeperBNFBStrategy
+
+    specs = []
+    for root in roots:
+        suffix = "" if root == 'TMF' else f"-{root}"
+        specs.append(StrategySpec(root, DualTimeframeStrategy, f"Gatekeeper-MXF-V1{suffix}"))
+        specs.append(StrategySpec(root, GatekeeperBNFBStrategy, f"Gatekeeper-BNF-B{suffix}"))
+    return specs
+
+
+def quote_to_dict(quote) -> dict:
+    """Shioaji quote 物件 → dict (to_dict / dict / 直接轉型)"""
+    if hasattr(quote, 'to_dict'):
+        return quote.to_dict()
+    if hasattr(quote, 'dict'):
+        return quote.dict()
+    try:
+        return dict(quote)
+    except Exception:
+        return {}
+
+
+class ContractPipeline:
+    def __init__(self, contract):
+        """
+        單一合約的行情處理管線
+        :param contract: Shioaji 合約物件 (需有 code)
+        """
+        self.contract = contract
+        self.maker_60m = KLineMaker(timeframe=60)
+        self.maker_1d = KLineMaker(timeframe=1440)
+        self.latest_quote = {}
+        self.strategies = []
+        self.shadows = []   # 影子策略群組 (紙上交易，不下單)
+        self.pending_roll = False   # 換月未完成: 只留下部位仍在舊合約的策略，等待重試換月
+
+    @property
+    def code(self) -> str:
+        return self.contract.code
+
+    def detach(self, strategies: list) -> 'ContractPipeline':
+        """
+        把指定策略移到同一合約的新管線 (K 線為獨立副本，之後平移本管線不影響新管線)
+        """
+        pipeline = ContractPipeline(self.contract)
+        pipeline.maker_60m = self.maker_60m.clone()
+        pipeline.maker_1d = self.maker_1d.clone()
+        pipeline.latest_quote = dict(self.latest_quote)
+        pipeline.strategies = list(strategies)
+        self.strategies = [s for s in self.strategies if s not in pipeline.strategies]
+        return pipeline
+
+    def load_history(self, df_1m: pd.DataFrame) -> tuple:
+        """以 1 分 K 預載 60 分 / 日 K，回傳 (60 分根數, 日 K 根數)"""
+        if df_1m is None or df_1m.empty:
+            return 0, 0
+        df = df_1m.set_index('datetime') if 'datetime' in df_1m.columns else df_1m
+        df_60m = df.resample('60min', label='left', closed='left').apply(OHLC_AGG).dropna().reset_index()
+        df_1d = df.resample('1D', label='left', closed='left').apply(OHLC_AGG).dropna().reset_index()
+        self.maker_60m.load_historical_dataframe(df_60m)
+        self.maker_1d.load_historical_dataframe(df_1d)
+        return len(df_60m), len(df_1d)
+
+    def on_tick(self, tick_data: dict) -> bool:
+        """
+        更新最新報價與 K 線；60 分 K 完成時依序呼叫各策略
+        :return: 是否完成了一根 60 分 K
+        """
+        self.latest_quote.update(tick_data)
+        if 'close' not in tick_data or 'volume' not in tick_data:
+            return False
+
+        self.maker_1d.update_with_tick(tick_data)
+        if not self.maker_60m.update_with_tick(tick_data):
+            return False
+
+        df_60m = self.maker_60m.get_dataframe()
+        df_1d = self.maker_1d.get_dataframe()
+        for strategy in self.strategies:
+            try:
+                strategy.check_signals(df_60m, df_1d)
+            except Exception as e:
+                # 單一策略出錯不影響同合約的其他策略
+                logging.error(f"[Engine] {strategy.name} @ {self.code} check_signals 失敗: {e}")
+        self.run_shadows(df_60m, df_1d)
+        return True
+
+    def run_shadows(self, df_60m: pd.DataFrame, df_1d: pd.DataFrame):
+        """實盤策略之後才更新影子群組，不影響實盤下單延遲"""
+        for fleet in self.shadows:
+            try:
+                fleet.check_signals(df_60m, df_1d)
+            except Exception as e:
+                logging.error(f"[Engine] 影子群組 {fleet.names[0]}... @ {self.code} 失敗: {e}")
+
+    @property
+    def price(self) -> float:
+        return self.latest_quote.get('close', self.latest_quote.get('price', 0))
+
+
+class TradingEngine:
+    def __init__(self, portfolio=None, ledger: TradeLedger = None, recorder=None):
+        """
+        :param portfolio: 所有策略共用的 PortfolioManager (或 SimulatedPortfolioManager)
+        :param ledger: 所有策略共用的交易帳本
+        :param recorder: 行情保存 (例如 MarketStore)，在策略處理完每筆 Tick 後呼叫 recorder.on_tick(code, tick_data)
+        """
+        self.portfolio = portfolio
+        self.ledger = ledger if ledger is not None else TradeLedger()
+        self.recorder = recorder
+        self.pipelines = {}  # {合約代碼: ContractPipeline}
+
+    def add_contract(self, contract, history_1m: pd.DataFrame = None) -> ContractPipeline:
+        """註冊合約 (重複註冊回傳既有管線)"""
+        pipeline = self.pipelines.get(contract.code)
+        if pipeline is None:
+            pipeline = ContractPipeline(contract)
+            self.pipelines[contract.code] = pipeline
+        if history_1m is not None:
+            pipeline.load_history(history_1m)
+        return pipeline
+
+    def add_strategy(self, contract, strategy_cls, name: str, **params):
+        """
+        在合約上建立一個策略實例；params 覆寫策略的同名參數屬性 (例如 bias_threshold=-2.0)
+        """
+        if any(s.name == name for s in self.strategies):
+            raise ValueError(f"策略名稱重複: {name}")
+        pipeline = self.add_contract(contract)
+        strategy = strategy_cls(name=name, portfolio=self.portfolio, contract=pipeline.contract, ledger=self.ledger)
+        for attr, value in params.items():
+            if not hasattr(strategy, attr):
+                raise AttributeError(f"{strategy_cls.__name__} 沒有參數 {attr}")
+            setattr(strategy, attr, value)
+        pipeline.strategies.append(strategy)
+        return strategy
+
+    def add_shadow(self, contract, fleet):
+        """在合約上掛載影子策略群組 (ShadowFleet)，使用該合約管線的 K 線"""
+        self.add_contract(contract).shadows.append(fleet)
+        return fleet
+
+    @property
+    def strategies(self) -> list:
+        return [s for pipeline in self.pipelines.values() for s in pipeline.strategies]
+
+    @property
+    def shadows(self) -> list:
+        return [fleet for pipeline in self.pipelines.values() for fleet in pipeline.shadows]
+
+    @property
+    def contracts(self) -> list:
+        return [pipeline.contract for pipeline in self.pipelines.values()]
+
+    def pipeline_for_root(self, root: str):
+        """
+        依商品代碼 (例如 'TMF') 取得管線；換月會改變 pipelines 的順序，不可依順序取。
+        換月未完成時同一商品有新舊兩條管線，優先回傳新合約的管線
+        """
+        pending = None
+        for code, pipeline in self.pipelines.items():
+            if code[:3] != root:
+                continue
+            if not pipeline.pending_roll:
+                return pipeline
+            pending = pending or pipeline
+        return pending
+
+    def on_quote(self, exchange, quote):
+        """Shioaji Tick / BidAsk callback: 依合約代碼分派到對應管線"""
+        tick_data = quote_to_dict(quote)
+        pipeline = self.pipelines.get(tick_data.get('code'))
+        if pipeline is None:
+            return
+        try:
+            pipeline.on_tick(tick_data)
+        except Exception as e:
+            print(f"Error in on_quote strategy logic ({pipeline.code}): {e}")
+        self._record(pipeline.code, tick_data)
+
+    def _record(self, code: str, tick_data: dict):
+        if self.recorder is None:
+            return
+        try:
+            self.recorder.on_tick(code, tick_data)
+        except Exception as e:
+            logging.error(f"[Engine] 行情保存失敗 ({code}): {e}")
+
+    def roll(self, old_code: str, new_contract, old_price: float, new_price: float) -> dict:
+        """
+        換月: 把舊合約管線改掛到新合約代碼，移轉策略部位並平移 K 線。
+        部位仍留在舊合約的策略 (ROLL_KEPT_OLD) 留在舊合約管線 (pending_roll)，由呼叫端保留訂閱並稍後重試換月
+        :return: 部位移轉失敗的策略 {名稱: ROLL_KEPT_OLD / ROLL_FLATTENED} (見 roll_strategies)
+        """
+        pipeline = self.pipelines[old_code]
+        failed = roll_strategies(self.portfolio, pipeline.strategies, pipeline.contract, new_contract,
+                                 old_price, new_price)
+        kept = {name for name, result in failed.items() if result == ROLL_KEPT_OLD}
+        self._move_pipeline(old_code, new_contract, new_price - old_price, kept)
+        return failed
+
+    def _move_pipeline(self, old_code: str, new_contract, gap: float, kept: set) -> ContractPipeline:
+        """
+        把舊合約管線改掛到新合約並平移 K 線
+        :param kept: 仍持有舊合約部位的策略名稱，留在舊合約管線 (K 線不平移) 等待重試
+        :return: 新合約管線；重試換月時新合約管線已存在，只把換月成功的策略併入，舊管線的 K 線捨棄
+        """
+        pipeline = self.pipelines.pop(old_code)
+        if kept:
+            leftover = pipeline.detach([s for s in pipeline.strategies if s.name in kept])
+            leftover.pending_roll = True
+            self.pipelines[old_code] = leftover
+        target = self.pipelines.get(new_contract.code)
+        if target is not None:
+            target.strategies.extend(pipeline.strategies)
+            target.shadows.extend(pipeline.shadows)
+            return target
+        pipeline.maker_60m.adjust_prices(gap)
+        pipeline.maker_1d.adjust_prices(gap)
+        for fleet in pipeline.shadows:
+            fleet.roll(gap)
+        pipeline.latest_quote.clear()
+        pipeline.contract = new_contract
+        pipeline.pending_roll = False
+        self.pipelines[new_contract.code] = pipeline
+        return pipeline
+
+    def start(self):
+        """單行程引擎不需要啟動背景工作 (與 MultiProcessEngine 介面一致)"""
+
+    def stop(self):
+        pass
+
+    def reconcile(self):
+        if self.portfolio is None:
+            return
+        for code in self.pipelines:
+            self.portfolio.reconcile_positions(code)
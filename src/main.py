@@ -48,13 +48,45 @@ if "CERT_BASE64" in os.environ:
         print(f"Warning: Failed to decode CERT_BASE64: {e}", flush=True)
 
 import time
-from datetime import datetime
+import pandas as pd
+from datetime import datetime, timedelta
 import shioaji as sj
 from src.connection import Trader
-from src.processors.kline_maker import KLineMaker
 from src.line_notify import send_line_push_message
-from src.db_logger import log_daily_equity
+from src.db_logger import log_daily_equity, set_async_writer, set_outbox
+from src.db_writer import DBWriter
+from src.db_outbox import Outbox, OutboxDrainer
+from src.migrations import run_migrations
+from src.market_store import MarketStore
 from src.portfolio_manager import PortfolioManager
+from src.trade_ledger import TradeLedger
+from src.bar_store import BarStore, kbars_to_dataframe
+from src.continuous_contract import RollRule, front_contract, ROLL_KEPT_OLD, ROLL_FLATTENED
+from src.engine import TradingEngine, default_specs
+from src.strategy_host import MultiProcessEngine
+from src.strategies.shadow_fleet import default_fleets
+from src.status_server import StatusBoard, StatusServer, engine_status
+from src.scheduler import Scheduler, TW_TZ
+from src.monitor_state import MonitorState
+from src.config import settings
+
+
+def fetch_margin(api):
+    """查詢期貨帳戶權益數與可用保證金，回傳 (total_equity, available_margin)；無帳戶或無資料時回傳 None"""
+    acc = api.futopt_account
+    if not acc:
+        return None
+    margin_res = api.margin(acc)
+    if not margin_res:
+        return None
+    margin_data = margin_res[0] if isinstance(margin_res, list) and len(margin_res) > 0 else margin_res
+    t_equity = getattr(margin_data, 'equity', 0.0)
+    if not t_equity and isinstance(margin_data, dict):
+        t_equity = margin_data.get('equity', 0.0)
+    a_margin = getattr(margin_data, 'available_margin', 0.0)
+    if not a_margin and isinstance(margin_data, dict):
+        a_margin = margin_data.get('available_margin', 0.0)
+    return float(t_equity), float(a_margin)
 
 
 def main():
@@ -85,319 +117,360 @@ def main():
         for acc in accounts:
             print(f" - {acc}")
         
-        # 尋找微型台指期 (TMF) 近月合約
-        print("正在尋找微型台指期 (TMF) 合約...")
-        # 這裡假設 TMF 在 Futures 下，且列表按到期日排序，第一個即為近月
-        # 注意: 實際代碼可能需要根據 Shioaji 版本調整查找方式
-        tmf_contracts = [
-            c for c in trader.api.Contracts.Futures.TMF 
-            if c.code[-2:] not in ["R1", "R2"] # 排除跨月價差單
-        ]
-        
-        if not tmf_contracts:
-            print("找不到 TMF 合約，請確認 API 連線或合約下載狀態。")
-            sys.exit(1)
-            
-        target_contract = tmf_contracts[0]
-        print(f"鎖定合約: {target_contract.name} ({target_contract.code})")
+        # 依設定尋找各商品 (TMF / MXF / TXF) 的近月合約，每個商品一條行情管線
+        roots = [r.strip().upper() for r in settings.trade_roots.split(",") if r.strip()]
+        roll_rule = RollRule(days_before_expiry=settings.roll_days_before_expiry)
+        contracts_by_root = {}
+        for root in roots:
+            print(f"正在尋找 {root} 合約...")
+            try:
+                contracts_by_root[root] = [
+                    c for c in getattr(trader.api.Contracts.Futures, root)
+                    if c.code[-2:] not in ["R1", "R2"] # 排除跨月價差單
+                ]
+            except Exception as e:
+                print(f"⚠️ 取得 {root} 合約失敗: {e}")
+        contracts_by_root = {root: cs for root, cs in contracts_by_root.items() if cs}
 
-        # 定義行情儲存變數
-        latest_quote = {}
+        if not contracts_by_root:
+            print(f"找不到 {', '.join(roots)} 合約，請確認 API 連線或合約下載狀態。")
+            sys.exit(1)
 
-        # KLineMaker 初始化 (60分K & 1D K線)
-        maker_60m = KLineMaker(timeframe=60)
-        maker_1d = KLineMaker(timeframe=1440)
-        
-        # 預載歷史 K 線以解決冷啟動 (Cold-Start) 指標 N/A 問題
+        # 套用尚未套用的資料庫 schema 遷移 (已套用的版本會略過)
         try:
-            from datetime import timedelta
-            import pandas as pd
-            
-            print("正在向永豐 API 調閱過去 30 天歷史 K 線以初始化指標...")
-            end_date = datetime.now().strftime("%Y-%m-%d")
-            start_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
-            
-            kbars = trader.api.kbars(contract=target_contract, start=start_date, end=end_date)
-            
-            df_1m = pd.DataFrame({
-                'datetime': pd.to_datetime(kbars.ts),
-                'open': kbars.Open,
-                'high': kbars.High,
-                'low': kbars.Low,
-                'close': kbars.Close,
-                'volume': kbars.Volume
-            })
-            
-            if not df_1m.empty:
-                df_1m.set_index('datetime', inplace=True)
-                ohlc_dict = {
-                    'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'
-                }
-                
-                df_60m_hist = df_1m.resample('60min', label='left', closed='left').apply(ohlc_dict).dropna().reset_index()
-                df_1d_hist = df_1m.resample('1D', label='left', closed='left').apply(ohlc_dict).dropna().reset_index()
-                
-                maker_60m.load_historical_dataframe(df_60m_hist)
-                maker_1d.load_historical_dataframe(df_1d_hist)
-                print(f"歷史資料載入完畢: 60M ({len(df_60m_hist)} 根), 1D ({len(df_1d_hist)} 根)")
-            else:
-                print("⚠️ 永豐 API 未回傳歷史資料，系統將空手啟動收集 K 線。")
+            applied = run_migrations()
+            if applied is None:
+                print("⚠️ 無法連線至資料庫，略過 schema 遷移")
+            elif applied:
+                print(f"✅ 已套用資料庫遷移版本: {applied}")
         except Exception as e:
-            print(f"⚠️ 載入歷史資料失敗: {e}")
-        
-        # 策略初始化
-        from src.strategies.dual_logic import DualTimeframeStrategy
-        from src.strategies.gatekeeper_bnf_b import GatekeeperBNFBStrategy
-        
-        # 建立投資組合管理員
-        portfolio = PortfolioManager(api=trader.api)
-        
-        strategies = [
-            DualTimeframeStrategy(name="Gatekeeper-MXF-V1", portfolio=portfolio, contract=target_contract),
-            GatekeeperBNFBStrategy(name="Gatekeeper-BNF-B", portfolio=portfolio, contract=target_contract),
-        ]
-
-        # 定義行情 Callback
-        def on_quote(exchange, quote):
-            # Shioaji quote object usually provides to_dict() or dict()
-            tick_data = {}
-            if hasattr(quote, 'to_dict'):
-                tick_data = quote.to_dict()
-            elif hasattr(quote, 'dict'):
-                tick_data = quote.dict()
-            else:
-                # Fallback: try to act like a dict
-                try:
-                    tick_data = dict(quote)
-                except:
-                    # print(f"DEBUG: Unknown quote type: {type(quote)}")
-                    return
-            
-            latest_quote.update(tick_data)
-            
-            # 更新 K 線
-            # 判斷是否為 Tick 資料 (含有 close 和 volume)
-            if 'close' in tick_data and 'volume' in tick_data:
+            print(f"⚠️ 資料庫遷移失敗: {e}")
+
+        # 建立投資組合管理員 (所有合約、所有策略共用) 與交易帳本 (供每日損益查詢)
+        outbox = None
+        if settings.db_outbox:
+            # 所有寫入先落地到本機 Outbox (SQLite WAL)，再由背景補寫 Postgres；資料庫斷線時仍可交易且不遺失紀錄
+            outbox = Outbox(synchronous=settings.db_outbox_sync)
+            outbox_drainer = OutboxDrainer(outbox)
+            try:
+                if not outbox_drainer.sync_positions():
+                    print(f"⚠️ 本機 Outbox 仍有 {outbox.pending_count()} 筆未補寫紀錄，虛擬部位以本機為準")
+            except Exception as e:
+                print(f"⚠️ 無法從資料庫載入虛擬部位，沿用本機 Outbox 鏡像: {e}")
+            outbox_drainer.start()
+            set_outbox(outbox)
+        portfolio = PortfolioManager(api=trader.api, outbox=outbox)
+        ledger = TradeLedger()
+        use_async_writer = settings.async_db_writer and outbox is None
+        if use_async_writer or settings.market_store:
+            db_writer = DBWriter().start()
+        if use_async_writer:
+            # 交易紀錄 / 權益改由背景執行緒批次寫入，行情 callback 不再等待資料庫
+            set_async_writer(db_writer)
+        # 行情保存: Tick / 1 分 K 由背景 COPY 寫入分區表，重啟時從資料庫暖機
+        market_store = MarketStore(writer=db_writer) if settings.market_store else None
+        if settings.strategy_workers > 0:
+            # 多行程模式: 策略分散到 worker 行程，行情經共享記憶體匯流排傳遞，下單集中在本行程的閘道
+            engine = MultiProcessEngine(portfolio=portfolio, ledger=ledger, workers=settings.strategy_workers,
+                                        async_db=settings.async_db_writer,
+                                        outbox_path=outbox.path if outbox is not None else None,
+                                        recorder=market_store)
+            for contracts in contracts_by_root.values():
+                engine.register_contracts(contracts)
+        else:
+            engine = TradingEngine(portfolio=portfolio, ledger=ledger, recorder=market_store)
+        bar_store = BarStore()
+
+        end_date = datetime.now().strftime("%Y-%m-%d")
+        start_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+
+        for root, contracts in contracts_by_root.items():
+            # 依換月規則選擇合約 (最後交易日前 N 天即改用次月)
+            contract = front_contract(contracts, datetime.now(), roll_rule) or contracts[0]
+            print(f"鎖定合約: {contract.name} ({contract.code})")
+            pipeline = engine.add_contract(contract)
+
+            # 預載歷史 K 線以解決冷啟動 (Cold-Start) 指標 N/A 問題
+            try:
+                # 先從資料庫讀取已保存的 1 分 K，API 只需補抓最後一天之後的部分
+                df_db = market_store.load_bars(contract.code, start_date) if market_store else None
+                api_start = start_date
+                if df_db is not None and not df_db.empty:
+                    api_start = df_db['datetime'].iloc[-1].strftime("%Y-%m-%d")
+                    print(f"{contract.code} 從資料庫載入 {len(df_db)} 根 1 分 K (至 {df_db['datetime'].iloc[-1]})")
+                print(f"正在向永豐 API 調閱 {contract.code} {api_start} 起的歷史 K 線以初始化指標...")
+                kbars = trader.api.kbars(contract=contract, start=api_start, end=end_date)
+                df_api = kbars_to_dataframe(kbars)
+                if market_store:
+                    market_store.save_bars(contract.code, df_api)
+                if df_db is not None and not df_db.empty:
+                    df_1m = (pd.concat([df_db, df_api], ignore_index=True)
+                             .drop_duplicates(subset='datetime', keep='last')
+                             .sort_values('datetime').reset_index(drop=True))
+                else:
+                    df_1m = df_api
+
+                # 同步寫入本機 BarStore，供日後連續月回測使用
                 try:
-                    # 同時餵給 60m 與 1d Maker
-                    is_new_1d = maker_1d.update_with_tick(tick_data)
-                    is_new_60m = maker_60m.update_with_tick(tick_data)
-                    
-                    # 當 60m K 線完成時，進行策略判斷
-                    if is_new_60m:
-                        df_60m = maker_60m.get_dataframe()
-                        df_1d = maker_1d.get_dataframe()
-                        
-                        # 呼叫策略檢查訊號
-                        for strategy in strategies:
-                            strategy.check_signals(df_60m, df_1d)
-                        
+                    bar_store.save(contract.code, df_1m, delivery_date=contract.delivery_date)
                 except Exception as e:
-                    print(f"Error in on_quote strategy logic: {e}")
+                    print(f"⚠️ 寫入本機 K 線儲存失敗: {e}")
+
+                if not df_1m.empty:
+                    n_60m, n_1d = pipeline.load_history(df_1m)
+                    print(f"{contract.code} 歷史資料載入完畢: 60M ({n_60m} 根), 1D ({n_1d} 根)")
+                else:
+                    print(f"⚠️ 永豐 API 未回傳 {contract.code} 歷史資料，系統將空手啟動收集 K 線。")
+            except Exception as e:
+                print(f"⚠️ 載入 {contract.code} 歷史資料失敗: {e}")
+
+        # 策略初始化 (每個商品各一組，名稱需唯一)
+        root_to_contract = {code[:3]: p.contract for code, p in engine.pipelines.items()}
+        for spec in default_specs(list(contracts_by_root)):
+            engine.add_strategy(root_to_contract[spec.root], spec.strategy_cls, spec.name, **spec.params)
+        strategies = engine.strategies
+
+        # 影子參數變體: 與實盤共用行情與 K 線，只把虛擬交易寫入帳本
+        if settings.shadow_fleet:
+            for root, contract in root_to_contract.items():
+                for fleet in default_fleets(ledger, suffix="" if root == 'TMF' else f"-{root}"):
+                    engine.add_shadow(contract, fleet)
+            print(f"影子策略群組已啟動: {sum(len(f) for f in engine.shadows)} 組參數變體")
+        engine.start()
 
-        # 設定 Callback (Futures/Options)
-        trader.api.quote.set_on_tick_fop_v1_callback(on_quote)
-        trader.api.quote.set_on_bidask_fop_v1_callback(on_quote)
+        # 設定 Callback (Futures/Options)：依合約代碼分派到各管線
+        trader.api.quote.set_on_tick_fop_v1_callback(engine.on_quote)
+        trader.api.quote.set_on_bidask_fop_v1_callback(engine.on_quote)
 
         # 訂閱行情
-        print(f"訂閱 {target_contract.code} 即時行情...")
-        trader.api.quote.subscribe(target_contract, quote_type=sj.constant.QuoteType.Tick)
-        trader.api.quote.subscribe(target_contract, quote_type=sj.constant.QuoteType.BidAsk)
+        for contract in engine.contracts:
+            print(f"訂閱 {contract.code} 即時行情...")
+            trader.api.quote.subscribe(contract, quote_type=sj.constant.QuoteType.Tick)
+            trader.api.quote.subscribe(contract, quote_type=sj.constant.QuoteType.BidAsk)
 
         # Keep the program running and print quote every 1 minute
         print("系統運行中，按 Ctrl+C 停止...")
         print("開始接收行情 (每 1 分鐘更新監控日誌)...")
         print("-" * 50)
         
+        # --- 狀態端點: 儀表板由此讀取權益 / 最新價 / 策略狀態，不再自行連線券商 ---
+        status_board = StatusBoard()
+        status_board.add_provider('engine', lambda: engine_status(engine))
+        if settings.status_port:
+            try:
+                status_server = StatusServer(status_board, port=settings.status_port).start()
+                print(f"狀態端點已啟動: {status_server.url}")
+            except OSError as e:
+                print(f"⚠️ 無法啟動狀態端點 (port {settings.status_port}): {e}")
+
+        def refresh_account(log_date: str = None):
+            """查詢券商權益並更新狀態端點；指定 log_date 時同時寫入資料庫"""
+            margin = fetch_margin(trader.api)
+            if margin is None:
+                return None
+            t_equity, a_margin = margin
+            status_board.set('account', {'total_equity': t_equity, 'available_margin': a_margin,
+                                         'as_of': datetime.now().isoformat(timespec='seconds')})
+            if log_date:
+                log_daily_equity(log_date, total_equity=t_equity, available_margin=a_margin)
+            return t_equity
+
         # --- 初始化取得最新權益數 ---
         try:
-            acc = trader.api.futopt_account
-            if acc:
-                margin_res = trader.api.margin(acc)
-                if margin_res:
-                    margin_data = margin_res[0] if isinstance(margin_res, list) and len(margin_res) > 0 else margin_res
-                    t_equity = getattr(margin_data, 'equity', 0.0) 
-                    if not t_equity and isinstance(margin_data, dict):
-                        t_equity = margin_data.get('equity', 0.0)
-                    a_margin = getattr(margin_data, 'available_margin', 0.0)
-                    if not a_margin and isinstance(margin_data, dict):
-                        a_margin = margin_data.get('available_margin', 0.0)
-                    init_date = time.strftime("%Y-%m-%d", time.localtime())
-                    log_daily_equity(init_date, total_equity=float(t_equity), available_margin=float(a_margin))
-                    print(f"✅ 已將初始權益數 ({t_equity}) 記錄至資料庫。")
+            init_date = time.strftime("%Y-%m-%d", time.localtime())
+            t_equity = refresh_account(init_date)
+            if t_equity is not None:
+                print(f"✅ 已將初始權益數 ({t_equity}) 記錄至資料庫。")
         except Exception as e:
             print(f"⚠️ 取得初始權益數或寫入資料庫失敗: {e}")
         # -----------------------------
-        import pytz
-        tw_tz = pytz.timezone('Asia/Taipei')
-        
-        notified_open = False
-        notified_close = False
-        notified_night_open = False
-        notified_night_close = False
-        last_date = ""
-        last_reconciliation_time = 0
-
-        while True:
+        # --- 排程: 交易時段通知、對帳、監控日誌、換月檢查都由排程器在到期時執行，其餘時間睡眠 ---
+        scheduler = Scheduler()
+        monitor_state = MonitorState()
+
+        # 開收盤通知與監控日誌以設定中的第一個商品 (預設 TMF) 為主
+        primary_root = next(iter(contracts_by_root))
+
+        def primary_pipeline():
+            return engine.pipeline_for_root(primary_root)
+
+        def schedule_roll_check():
+            """在最近一個換月點排定換月檢查"""
+            now_tw = datetime.now(TW_TZ).replace(tzinfo=None)
+            due = min(roll_rule.calendar_roll(p.contract.delivery_date) for p in engine.pipelines.values())
+            due = due.to_pydatetime()
+            if due <= now_tw:
+                # 已過換月點但沒有可換的次月合約，或仍有策略留在舊合約 (換月失敗)，一小時後再檢查
+                due = now_tw + timedelta(hours=1)
+            scheduler.call_at(due, 'roll', check_rolls)
+
+        def check_rolls():
+            """自動換月：到達換月點時把訂閱與各策略部位移到次月合約"""
             try:
-                # Use Asia/Taipei timezone explicitly to avoid UTC offset issues on cloud servers
-                now_tw = datetime.now(tw_tz)
-                current_time = now_tw.strftime("%Y-%m-%d %H:%M:%S")
-                current_date = now_tw.strftime("%Y-%m-%d")
-                current_hm = now_tw.strftime("%H:%M")
-                
-                if current_date != last_date:
-                    notified_open = False
-                    notified_close = False
-                    notified_night_open = False
-                    notified_night_close = False
-                    last_date = current_date
-                
-                if latest_quote:
-                    # 取得目前價格
-                    price = latest_quote.get('close', latest_quote.get('price', 0))
-                    
-                    # === LINE Notify ===
-                    # 日盤開盤 (08:45)
-                    if current_hm == "08:46" and not notified_open:
-                        df_5m = maker_5m.get_dataframe()
-                        atr_val = "N/A"
-                        if not df_5m.empty and 'atr' in df_5m.columns:
-                            atr_val = f"{df_5m.iloc[-1]['atr']:.2f}"
-                        elif not df_5m.empty:
-                            from src.strategies.indicators import calculate_atr
-                            atr_series = calculate_atr(df_5m, period=10)
-                            if not atr_series.empty:
-                                atr_val = f"{atr_series.iloc[-1]:.2f}"
-                                
-                        msg_open = f"☀️ [日盤] 門神已就位！今日開盤價：{price}，ATR 波動率：{atr_val}，Body Filter 閾值已鎖定。"
-                        send_line_push_message(msg_open)
-                        notified_open = True
-                    
-                    # 日盤收盤 (13:45)
-                    if current_hm == "13:46" and not notified_close:
-                        pos_status_list = []
-                        total_pnl = 0.0
-                        for strategy in strategies:
-                            status = "持倉中(多)" if strategy.is_long else "空手"
-                            pos_status_list.append(f"{strategy.name}: {status}")
-                            
-                            # 計算本日已實現損益 (包含可能未平倉的損益)
-                            today_trades = [t for t in strategy.trades if isinstance(t['exit_time'], datetime) and t['exit_time'].strftime("%Y-%m-%d") == current_date]
-                            for t in today_trades:
-                                total_pnl += t['pnl']
-                                
-                            if strategy.is_long:
-                                floating_pnl = price - strategy.entry_price
-                                total_pnl += floating_pnl
-                                pos_status_list[-1] += f" (未平倉損益: {floating_pnl:.1f})"
-                                
-                        pos_status_str = " | ".join(pos_status_list) if pos_status_list else "無"
-                        msg_close = f"📊 [日盤] 今日任務結束。\n狀態：{pos_status_str}\n本日盈虧：{total_pnl:.1f} 點。"
-                        send_line_push_message(msg_close)
-                        notified_close = True
-                        
-                        # --- Log Daily Equity to PostgreSQL ---
-                        try:
-                            acc = trader.api.futopt_account
-                            if acc:
-                                margin_res = trader.api.margin(acc)
-                                if margin_res:
-                                    margin_data = margin_res[0] if isinstance(margin_res, list) and len(margin_res) > 0 else margin_res
-                                    t_equity = getattr(margin_data, 'equity', 0.0) 
-                                    if not t_equity and isinstance(margin_data, dict):
-                                        t_equity = margin_data.get('equity', 0.0)
-                                    a_margin = getattr(margin_data, 'available_margin', 0.0)
-                                    if not a_margin and isinstance(margin_data, dict):
-                                        a_margin = margin_data.get('available_margin', 0.0)
-                                        
-                                    log_daily_equity(current_date, total_equity=float(t_equity), available_margin=float(a_margin))
-                                    print(f"[{current_time}] 已將本日權益數 ({t_equity}) 記錄至資料庫。")
-                        except Exception as e:
-                            print(f"取得權益數或寫入資料庫失敗: {e}")
-                        # --------------------------------------
-                    
-                    # 夜盤開盤 (15:00)
-                    if current_hm == "15:01" and not notified_night_open:
-                        msg_night_open = f"🌙 [夜盤] 門神已就位！夜盤開盤價：{price}，系統持續監控中。"
-                        send_line_push_message(msg_night_open)
-                        notified_night_open = True
-                        
-                    # 夜盤收盤 (05:00)
-                    if current_hm == "05:01" and not notified_night_close:
-                        # Optional: Add night session PnL summary here if needed
-                        msg_night_close = f"💤 [夜盤] 任務結束。狀態更新完畢，準備迎接日盤。"
-                        send_line_push_message(msg_night_close)
-                        notified_night_close = True
-                        
-                    # Dynamic Status Dashboard Lookups
-                    days_left = "N/A"
-                    if getattr(target_contract, 'delivery_date', None):
-                        try:
-                            # Usually format 'YYYY/MM/DD' or 'YYYYMMDD'
-                            delivery_str = str(target_contract.delivery_date).replace('/', '')
-                            if len(delivery_str) >= 8:
-                                del_date = datetime.strptime(delivery_str[:8], "%Y%m%d")
-                                days_left = (del_date - datetime.now()).days
-                        except:
-                            pass
-                            
-                    trend_status = "N/A"
-                    try:
-                        df_1d = maker_1d.get_dataframe()
-                        if not df_1d.empty and len(df_1d) >= 10:
-                            from src.strategies.indicators import calculate_supertrend
-                            is_bullish, _ = calculate_supertrend(df_1d)
-                            trend_status = "BULL (多)" if is_bullish else "BEAR (空)"
-                    except Exception as e:
-                        import traceback
-                        print(f"Failed to fetch 1D trend: {e}")
-                        traceback.print_exc()
-
-                    print(f"[{current_time}] [Monitor] Expiry: {days_left}d | 1D: {trend_status} | Current Price: {price}")
-                    
-                    # Print status for each strategy
-                    for strategy in strategies:
-                        if strategy.is_long:
-                            pos_status = "LONG"
-                        elif getattr(strategy, 'is_short', False):
-                            pos_status = "SHORT"
-                        else:
-                            pos_status = "EMPTY"
-                            
-                        print(f"   -> [{strategy.name}] Position: {pos_status} | Entry: {strategy.entry_price}")
-                    
-                else:
-                    # Dashboard Output (No Tick State)
-                    tw_tz_now = datetime.now(tw_tz)
-                    current_time_str = tw_tz_now.strftime('%Y-%m-%d %H:%M:%S')
-                    trend_status = "N/A"
-                    try:
-                        df_1d = maker_1d.get_dataframe()
-                        if not df_1d.empty and len(df_1d) >= 10:
-                            from src.strategies.indicators import calculate_supertrend
-                            is_bullish, _ = calculate_supertrend(df_1d)
-                            trend_status = "BULL (多)" if is_bullish else "BEAR (空)"
-                    except Exception as e:
-                        import traceback
-                        print(f"Failed to fetch 1D trend (No Tick State): {e}")
-                        traceback.print_exc()
-
-                    print(f"[{current_time_str}] 等待行情中... | 1D: {trend_status}")
-                
-                # --- Periodic Reconciliation (每 5 分鐘執行一次對帳) ---
-                current_unix_time = time.time()
-                if current_unix_time - last_reconciliation_time >= 300:
-                    portfolio.reconcile_positions(target_contract.code)
-                    last_reconciliation_time = current_unix_time
-
-                time.sleep(60)
+                now_tw = datetime.now(TW_TZ)
+                for pipeline in list(engine.pipelines.values()):
+                    old_contract = pipeline.contract
+                    if now_tw.replace(tzinfo=None) < roll_rule.calendar_roll(old_contract.delivery_date):
+                        continue
+                    next_contract = front_contract(contracts_by_root.get(old_contract.code[:3], []), now_tw, roll_rule)
+                    if next_contract is None or next_contract.code == old_contract.code:
+                        continue
+                    # 依合約代碼對應快照 (不假設回傳順序)
+                    snapshots = {s.code: float(s.close) for s in trader.api.snapshots([old_contract, next_contract])}
+                    old_price, new_price = snapshots[old_contract.code], snapshots[next_contract.code]
+                    # 重試換月時新合約已在訂閱中
+                    subscribed = next_contract.code in engine.pipelines
+                    failed = engine.roll(old_contract.code, next_contract, old_price, new_price)
+
+                    for quote_type in (sj.constant.QuoteType.Tick, sj.constant.QuoteType.BidAsk):
+                        # 仍有策略留在舊合約時保留舊合約行情，否則策略收不到 K 線
+                        if old_contract.code not in engine.pipelines:
+                            trader.api.quote.unsubscribe(old_contract, quote_type=quote_type)
+                        if not subscribed:
+                            trader.api.quote.subscribe(next_contract, quote_type=quote_type)
+
+                    msg_roll = (f"🔄 [換月] {old_contract.code} → {next_contract.code}\n"
+                                f"價差：{new_price - old_price:+.0f} 點 (舊 {old_price} / 新 {new_price})")
+                    kept = [name for name, result in failed.items() if result == ROLL_KEPT_OLD]
+                    flattened = [name for name, result in failed.items() if result == ROLL_FLATTENED]
+                    if kept:
+                        msg_roll += (f"\n⚠️ 以下策略新合約建倉失敗，部位仍留在舊合約 (每小時重試換月)："
+                                     f"{', '.join(kept)}")
+                    if flattened:
+                        msg_roll += (f"\n🚨 以下策略新合約建倉失敗且舊合約無法回補，已無部位並改為空手 "
+                                     f"(以 {old_price} 結算)：{', '.join(flattened)}")
+                    send_line_push_message(msg_roll)
+                    print(msg_roll)
+            finally:
+                schedule_roll_check()
+
+        # === LINE Notify ===
+        def on_day_open():
+            """日盤開盤 (08:45)"""
+            primary = primary_pipeline()
+            if not primary.latest_quote:
+                return
+            # 門神策略以 60 分 K 的 ATR(10) 計算實體過濾與停損距離
+            atr = monitor_state.atr(primary)
+            atr_val = f"{atr:.2f}" if atr is not None else "N/A"
+
+            msg_open = f"☀️ [日盤] 門神已就位！今日開盤價：{primary.price}，ATR 波動率：{atr_val}，Body Filter 閾值已鎖定。"
+            send_line_push_message(msg_open)
+
+        def on_day_close():
+            """日盤收盤 (13:45): 當日損益通知、影子策略績效、寫入本日權益數"""
+            primary = primary_pipeline()
+            if not primary.latest_quote:
+                return
+            now_tw = datetime.now(TW_TZ)
+            current_time = now_tw.strftime("%Y-%m-%d %H:%M:%S")
+            current_date = now_tw.strftime("%Y-%m-%d")
+            pos_status_list = []
+            total_pnl = 0.0
+            for strategy in strategies:
+                status = "持倉中(多)" if strategy.is_long else "空手"
+                pos_status_list.append(f"{strategy.name}: {status}")
+
+                # 計算本日已實現損益 (包含可能未平倉的損益)
+                total_pnl += ledger.daily_pnl(current_date, strategy.name)
+
+                if strategy.is_long:
+                    pipeline = engine.pipelines.get(strategy.contract.code, primary)
+                    floating_pnl = pipeline.price - strategy.entry_price
+                    total_pnl += floating_pnl
+                    pos_status_list[-1] += f" (未平倉損益: {floating_pnl:.1f})"
+
+            pos_status_str = " | ".join(pos_status_list) if pos_status_list else "無"
+            msg_close = f"📊 [日盤] 今日任務結束。\n狀態：{pos_status_str}\n本日盈虧：{total_pnl:.1f} 點。"
+            send_line_push_message(msg_close)
+
+            # 影子參數變體累積績效 (只寫日誌)
+            for fleet in engine.shadows:
+                print(f"[{current_time}] [Shadow] 累積損益前 5 名:\n{fleet.summary().head(5).to_string()}")
+
+            # --- Log Daily Equity to PostgreSQL ---
+            try:
+                t_equity = refresh_account(current_date)
+                if t_equity is not None:
+                    print(f"[{current_time}] 已將本日權益數 ({t_equity}) 記錄至資料庫。")
+            except Exception as e:
+                print(f"取得權益數或寫入資料庫失敗: {e}")
+
+        def on_night_open():
+            """夜盤開盤 (15:00)"""
+            primary = primary_pipeline()
+            if primary.latest_quote:
+                send_line_push_message(f"🌙 [夜盤] 門神已就位！夜盤開盤價：{primary.price}，系統持續監控中。")
+
+        def on_night_close():
+            """夜盤收盤 (05:00)"""
+            if primary_pipeline().latest_quote:
+                send_line_push_message(f"💤 [夜盤] 任務結束。狀態更新完畢，準備迎接日盤。")
+
+        def log_monitor():
+            """每分鐘的監控日誌 (趨勢 / 到期天數讀快取，只在 K 線完成或換日時重算)"""
+            primary = primary_pipeline()
+            current_time = datetime.now(TW_TZ).strftime("%Y-%m-%d %H:%M:%S")
+
+            trend_status = "N/A"
+            try:
+                trend_status = monitor_state.trend_status(primary)
             except Exception as e:
-                print(f"Error in monitor loop: {e}")
-                time.sleep(60)
+                import traceback
+                print(f"Failed to fetch 1D trend: {e}")
+                traceback.print_exc()
+
+            if not primary.latest_quote:
+                # Dashboard Output (No Tick State)
+                print(f"[{current_time}] 等待行情中... | 1D: {trend_status}")
+                return
+
+            days_left = monitor_state.expiry_days(primary.contract)
+            print(f"[{current_time}] [Monitor] Expiry: {days_left}d | 1D: {trend_status} | Current Price: {primary.price}")
+            for pipeline in engine.pipelines.values():
+                if pipeline is not primary:
+                    print(f"   [{pipeline.code}] Current Price: {pipeline.price}")
+
+            # Print status for each strategy
+            for line in monitor_state.strategy_lines(strategies):
+                print(line)
+
+        def reconcile():
+            """Periodic Reconciliation (每 5 分鐘執行一次對帳)"""
+            engine.reconcile()
+            # 同時更新狀態端點的權益數 (儀表板不再自行查詢券商)
+            try:
+                refresh_account()
+            except Exception as e:
+                print(f"更新權益數失敗: {e}")
+
+        # 開盤 / 收盤後 1 分鐘通知 (開盤價與最後成交已進來)
+        notify_delay = timedelta(minutes=1)
+        scheduler.session('day_open', 'day_open', on_day_open, delay=notify_delay)
+        scheduler.session('day_close', 'day_close', on_day_close, delay=notify_delay)
+        scheduler.session('night_open', 'night_open', on_night_open, delay=notify_delay)
+        scheduler.session('night_close', 'night_close', on_night_close, delay=notify_delay)
+        now_tw = datetime.now(TW_TZ)
+        scheduler.every(300, 'reconcile', reconcile, first=now_tw)
+        scheduler.every(60, 'monitor', log_monitor,
+                        first=now_tw.replace(second=0, microsecond=0) + timedelta(minutes=1))
+        schedule_roll_check()
+
+        scheduler.run_forever()
 
     except KeyboardInterrupt:
         print("\n系統正在停止...")
+        if 'engine' in locals():
+            engine.stop()
+        if 'status_server' in locals():
+            status_server.stop()
+        if 'db_writer' in locals():
+            print("正在寫入剩餘的資料庫紀錄...")
+            db_writer.close()
+        if 'outbox_drainer' in locals():
+            outbox_drainer.stop()
+            if outbox.pending_count():
+                print(f"⚠️ 本機 Outbox 尚有 {outbox.pending_count()} 筆未補寫，下次啟動時繼續")
         try:
             if 'trader' in locals() and trader.api:
                 print("正在登出券商 API...")
@@ -0,0 +1,135 @@
+"""
+共享記憶體行情匯流排 (Market Data Bus)
+單一寫入者、多讀取者的固定長度環狀緩衝區，建立在 multiprocessing.shared_memory 上:
+
+- 行情行程 (feed) 只解析一次 Tick / 完成的 K 棒，寫入 MARKET_DTYPE 記錄
+- 各策略行程各自保存讀取游標，不需要鎖；落後超過容量時跳過被覆寫的記錄並回報遺失筆數
+- 委託意圖 (策略行程 → 下單閘道) 與回覆 (閘道 → 策略行程) 也使用同一種環狀緩衝區，
+  每個方向只有一個寫入者與一個讀取者 (SPSC)
+
+寫入採 seqlock 協定: 先把槽位序號設為 -1，寫完欄位後再寫入正式序號並推進 head；
+讀取者複製後再檢查一次序號，序號不符的記錄視為寫入中被覆寫而捨棄。
+"""
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+
+HEADER_BYTES = 64
+
+# 行情記錄種類
+KIND_TICK = 0
+KIND_BAR_60M = 1
+KIND_BAR_1D = 2
+KIND_ROLL = 3   # code=舊合約, ref=新合約, open=舊價格, close=新價格, strategy=移轉的策略 (-1 代表移轉 K 線歷史)
+KIND_FLATTEN = 4   # 換月失敗且已無部位: code=舊合約, ref=新合約, open=結算價, strategy=改為空手並改掛新合約的策略
+KIND_STOP = 9
+
+MARKET_DTYPE = np.dtype([
+    ('seq', 'i8'), ('kind', 'i1'), ('code', 'i2'), ('ts', 'i8'),
+    ('open', 'f8'), ('high', 'f8'), ('low', 'f8'), ('close', 'f8'), ('volume', 'f8'),
+    ('ref', 'i4'), ('strategy', 'i2'),
+])
+
+# 委託意圖 / 回覆種類
+INTENT_ORDER = 0   # 設定虛擬部位: strategy, code, position, price, request
+INTENT_TRADE = 1   # 已平倉交易: strategy, direction, entry/exit 時間與價格, pnl, reason
+INTENT_ACK = 2     # 閘道回覆: request, position = 1 成功 / 0 失敗
+
+INTENT_DTYPE = np.dtype([
+    ('seq', 'i8'), ('kind', 'i1'), ('strategy', 'i2'), ('code', 'i2'), ('position', 'i4'),
+    ('price', 'f8'), ('request', 'i8'), ('direction', 'i1'),
+    ('entry_ts', 'i8'), ('exit_ts', 'i8'), ('entry_price', 'f8'), ('exit_price', 'f8'),
+    ('pnl', 'f8'), ('reason', 'S48'),
+])
+
+
+def attach_shm(name: str) -> shared_memory.SharedMemory:
+    """
+    附掛既有的共享記憶體區塊 (行情匯流排與 research.parallel_runner 共用)。
+    Python 3.13 起以 track=False 附掛，不向 resource_tracker 登記；較舊版本附掛時也會登記，
+    但子程序與建立者共用同一個 resource_tracker。刪除 (unlink) 一律由建立者負責。
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+class ShmRing:
+    def __init__(self, dtype: np.dtype = MARKET_DTYPE, capacity: int = 1 << 16, name: str = None):
+        """
+        :param dtype: 記錄格式 (第一個欄位必須是 int64 的 seq)
+        :param capacity: 槽位數 (2 的次方)；name 有值時代表附加既有緩衝區，容量由標頭讀取
+        :param name: 既有共享記憶體名稱，None 代表建立新的
+        """
+        self.dtype = np.dtype(dtype)
+        self.owner = name is None
+        if self.owner:
+            if capacity <= 0 or capacity & (capacity - 1):
+                raise ValueError(f"capacity 必須是 2 的次方: {capacity}")
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + capacity * self.dtype.itemsize)
+        else:
+            self.shm = attach_shm(name)
+
+        self._header = np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf, offset=0)
+        if self.owner:
+            self._header[:] = (0, capacity)
+        self.capacity = int(self._header[1])
+        self._mask = self.capacity - 1
+        self._slots = np.ndarray((self.capacity,), dtype=self.dtype, buffer=self.shm.buf, offset=HEADER_BYTES)
+        if self.owner:
+            self._slots['seq'] = -1
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def head(self) -> int:
+        """下一筆要寫入的序號 (= 已寫入總筆數)"""
+        return int(self._header[0])
+
+    def publish(self, *values) -> int:
+        """寫入一筆記錄 (values 依 dtype 欄位順序，不含 seq)，回傳序號"""
+        seq = int(self._header[0])
+        i = seq & self._mask
+        self._slots['seq'][i] = -1
+        self._slots[i] = (-1, *values)
+        self._slots['seq'][i] = seq
+        self._header[0] = seq + 1
+        return seq
+
+    def read(self, cursor: int, limit: int = None) -> tuple:
+        """
+        讀取 [cursor, head) 的記錄
+        :return: (records 複本, 新游標, 遺失筆數)
+        """
+        head = int(self._header[0])
+        if limit is not None:
+            head = min(head, cursor + limit)
+        if cursor >= head:
+            return self._slots[:0].copy(), cursor, 0
+
+        dropped = 0
+        if head - cursor > self.capacity:
+            dropped = head - self.capacity - cursor
+            cursor = head - self.capacity
+        expected = np.arange(cursor, head, dtype=np.int64)
+        idx = expected & self._mask
+        records = self._slots[idx]
+        valid = (records['seq'] == expected) & (self._slots['seq'][idx] == expected)
+        if not valid.all():
+            dropped += int((~valid).sum())
+            records = records[valid]
+        return records, head, dropped
+
+    def close(self):
+        # 先釋放指向緩衝區的 ndarray，否則 SharedMemory.close() 會因仍有 export 而失敗
+        self._header = None
+        self._slots = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,148 @@
+"""
+行情資料庫 (Market Store)
+即時 Tick 與 1 分 K 寫入 Postgres 分區表 (market_ticks 依日、market_bars 依月分區，見 migrations 版本 4)，
+重新啟動時可直接從資料庫暖機，回測也能讀取 API 已查不到的歷史。
+
+- 寫入走 DBWriter 背景執行緒: Tick 以 COPY 大批寫入 (佇列滿時丟棄最舊的 Tick，不影響交易)，
+  K 線以多列 INSERT ... ON CONFLICT DO NOTHING (重啟後重送同一根不會重複)
+- 每個合約第一根即時 1 分 K 從收到第一筆 Tick 才開始，不是完整的一分鐘，不寫入
+  (否則會因 DO NOTHING 擋掉之後 API 補抓的完整 K 線)
+- 子表在第一次寫入該日期的資料前建立 (已建立的日期會快取，不重複下 DDL)
+- load_bars / load_ticks 以時間範圍查詢，只掃描範圍內的分區
+"""
+import logging
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from src.bar_store import BAR_COLUMNS
+from src.db_logger import get_db_connection
+from src.db_writer import DBWriter, TableSpec
+from src.migrations import ensure_partitions
+from src.processors.kline_maker import KLineMaker
+
+PARTITION_INTERVAL = {'market_ticks': 'day', 'market_bars': 'month'}
+
+
+class MarketStore:
+    def __init__(self, writer: DBWriter = None, connect=get_db_connection, record_ticks: bool = True,
+                 tick_queue_rows: int = 200000):
+        """
+        :param writer: 背景寫入器 (None 時只能讀取)
+        :param record_ticks: 是否保存逐筆 Tick (False 時只保存 1 分 K)
+        :param tick_queue_rows: Tick 佇列上限，資料庫變慢時超過的部分丟棄最舊的 Tick
+        """
+        self.writer = writer
+        self.connect = connect
+        self.record_ticks = record_ticks
+        self.makers = {}             # {合約代碼: 1 分 KLineMaker}
+        self._partitions = set()     # 已確認存在的子表
+        self._lock = threading.Lock()
+        if writer is not None:
+            writer.register_table(TableSpec(
+                'market_tick', 'market_ticks', ('code', 'ts', 'price', 'volume'), mode='copy',
+                max_rows=tick_queue_rows, overflow='drop_oldest', batch_size=5000,
+                prepare=lambda conn, rows: self._ensure_partitions(conn, 'market_ticks', rows, 1),
+            ))
+            writer.register_table(TableSpec(
+                'market_bar', 'market_bars', ('code', 'timeframe', 'ts', 'open', 'high', 'low', 'close', 'volume'),
+                sql="INSERT INTO market_bars (code, timeframe, ts, open, high, low, close, volume) VALUES %s "
+                    "ON CONFLICT (code, timeframe, ts) DO NOTHING",
+                max_rows=50000, overflow='drop_oldest', batch_size=2000,
+                prepare=lambda conn, rows: self._ensure_partitions(conn, 'market_bars', rows, 2),
+            ))
+
+    # ------------------------------------------------------------------
+    # 寫入
+    # ------------------------------------------------------------------
+    def _ensure_partitions(self, conn, table: str, rows: list, ts_index: int):
+        """建立這批資料所需的子表並 commit (在 DBWriter 執行緒中、寫入資料前呼叫)"""
+        interval = PARTITION_INTERVAL[table]
+        days = {row[ts_index].date() for row in rows}
+        missing = [d for d in sorted(days) if (table, self._period_key(d, interval)) not in self._partitions]
+        if not missing:
+            return
+        with conn.cursor() as cursor:
+            for day in missing:
+                ensure_partitions(cursor, table, day, day, interval)
+        conn.commit()
+        with self._lock:
+            self._partitions.update((table, self._period_key(d, interval)) for d in missing)
+
+    @staticmethod
+    def _period_key(day, interval: str):
+        return (day.year, day.month) if interval == 'month' else day
+
+    def on_tick(self, code: str, tick_data: dict):
+        """行情 callback 中呼叫: 排入 Tick，並在 1 分 K 完成時排入 K 線 (不等待資料庫)"""
+        if self.writer is None or 'close' not in tick_data:
+            return
+        ts = tick_data.get('datetime')
+        if isinstance(ts, str):
+            ts = datetime.fromisoformat(ts)
+        if ts is None:
+            return
+        if self.record_ticks:
+            self.writer.submit('market_tick', (code, ts, float(tick_data['close']), int(tick_data.get('volume') or 0)))
+        maker = self.makers.get(code)
+        if maker is None:
+            maker = self.makers[code] = KLineMaker(timeframe=1, verbose=False)
+        # version 1 是第一根完成的 K 線 (只有部分 Tick)
+        if maker.update_with_tick(dict(tick_data, datetime=ts)) and maker.version > 1:
+            self.save_bar(code, maker.bars[-1])
+
+    def save_bar(self, code: str, bar, timeframe: int = 1):
+        self.writer.submit('market_bar', (code, timeframe, bar.time, bar.open, bar.high, bar.low, bar.close,
+                                          int(bar.volume)))
+
+    def save_bars(self, code: str, df: pd.DataFrame, timeframe: int = 1) -> int:
+        """批次排入 K 線 DataFrame (例如 API 抓回的 1 分 K)，回傳排入筆數"""
+        if self.writer is None or df is None or df.empty:
+            return 0
+        df = df.reset_index() if 'datetime' not in df.columns else df
+        for row in df[BAR_COLUMNS].itertuples(index=False):
+            self.writer.submit('market_bar', (code, timeframe, pd.Timestamp(row.datetime).to_pydatetime(),
+                                              float(row.open), float(row.high), float(row.low), float(row.close),
+                                              int(row.volume)))
+        return len(df)
+
+    # ------------------------------------------------------------------
+    # 讀取
+    # ------------------------------------------------------------------
+    def _query(self, sql: str, params: tuple, columns: list) -> pd.DataFrame:
+        conn = self.connect()
+        if conn is None:
+            return pd.DataFrame(columns=columns)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+            conn.commit()
+        except Exception as e:
+            logging.error(f"[MarketStore] 查詢失敗: {e}")
+            return pd.DataFrame(columns=columns)
+        finally:
+            conn.close()
+        df = pd.DataFrame(rows, columns=columns)
+        if not df.empty:
+            df['datetime'] = pd.to_datetime(df['datetime'])
+        return df
+
+    def load_bars(self, code: str, start, end=None, timeframe: int = 1) -> pd.DataFrame:
+        """讀取 [start, end) 的 K 線 (欄位同 BarStore)；無法連線或沒有資料時回傳空 DataFrame"""
+        sql = ("SELECT ts, open, high, low, close, volume FROM market_bars "
+               "WHERE code = %s AND timeframe = %s AND ts >= %s")
+        params = [code, timeframe, pd.Timestamp(start).to_pydatetime()]
+        if end is not None:
+            sql += " AND ts < %s"
+            params.append(pd.Timestamp(end).to_pydatetime())
+        return self._query(sql + " ORDER BY ts", tuple(params), BAR_COLUMNS)
+
+    def load_ticks(self, code: str, start, end) -> pd.DataFrame:
+        """讀取 [start, end) 的逐筆 Tick (datetime, close, volume)"""
+        return self._query(
+            "SELECT ts, price, volume FROM market_ticks WHERE code = %s AND ts >= %s AND ts < %s ORDER BY ts",
+            (code, pd.Timestamp(start).to_pydatetime(), pd.Timestamp(end).to_pydatetime()),
+            ['datetime', 'close', 'volume'],
+        )
@@ -0,0 +1,371 @@
+"""
+版本化資料庫遷移 (Schema Migrations)
+取代 init_db.py / migrate_db.py 的一次性腳本: 每個遷移有遞增的版本號，
+套用後記錄在 schema_migrations，重複執行只會套用尚未套用的版本。
+
+- 每個版本在自己的交易中執行 (失敗整個回滾，不會留下半套 schema)
+- 以 pg_advisory_xact_lock 序列化，交易主程式與儀表板同時啟動也不會重複套用
+- 分區表: create_partitioned_table / ensure_partitions 以時間範圍 (日 / 月) 建立子表，
+  大量 Tick / K 線 / 歷史資料只掃描查詢範圍內的分區
+
+用法:
+    python -m src.migrations            套用所有未套用的版本
+    python -m src.migrations --list     列出各版本狀態
+"""
+import sys
+import logging
+import argparse
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable, Union
+
+from src.db_logger import get_db_connection
+
+ADVISORY_LOCK_ID = 0x46545331  # 任意固定值，只用來序列化遷移
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    up: Union[str, Callable]   # SQL 字串，或 up(cursor) 函式
+
+
+# ----------------------------------------------------------------------
+# 分區表工具
+# ----------------------------------------------------------------------
+def _period_start(day: date, interval: str) -> date:
+    return day.replace(day=1) if interval == 'month' else day
+
+
+def _next_period(day: date, interval: str) -> date:
+    if interval == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    if interval == 'day':
+        return day + timedelta(days=1)
+    raise ValueError(f"不支援的分區間隔: {interval}")
+
+
+def partition_bounds(start, end, interval: str = 'month') -> list:
+    """
+    涵蓋 [start, end] 的分區範圍
+    :return: [(子表後綴, 下界含, 上界不含)]，後綴為 YYYYMM (月) 或 YYYYMMDD (日)
+    """
+    start = start.date() if isinstance(start, datetime) else start
+    end = end.date() if isinstance(end, datetime) else end
+    fmt = "%Y%m" if interval == 'month' else "%Y%m%d"
+    bounds = []
+    lo = _period_start(start, interval)
+    while lo <= end:
+        hi = _next_period(lo, interval)
+        bounds.append((lo.strftime(fmt), lo, hi))
+        lo = hi
+    return bounds
+
+
+def create_partitioned_table(cursor, table: str, columns_sql: str, partition_key: str):
+    """建立以 partition_key 做範圍分區的母表 (columns_sql 為括號內的欄位定義)"""
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns_sql}) PARTITION BY RANGE ({partition_key});")
+
+
+def ensure_partitions(cursor, table: str, start, end, interval: str = 'month') -> list:
+    """建立涵蓋 [start, end] 的子表 (已存在則略過)，回傳子表名稱"""
+    names = []
+    for suffix, lo, hi in partition_bounds(start, end, interval):
+        name = f"{table}_{suffix}"
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}');"
+        )
+        names.append(name)
+    return names
+
+
+def _create_market_tables(cursor):
+    """行情 Tick / K 線母表 (子表由 MarketStore 寫入時依日期建立)"""
+    create_partitioned_table(cursor, "market_ticks", """
+        code VARCHAR(20) NOT NULL,
+        ts TIMESTAMP NOT NULL,
+        price DOUBLE PRECISION NOT NULL,
+        volume INTEGER NOT NULL DEFAULT 0
+    """, "ts")
+    cursor.execute("CREATE INDEX IF NOT EXISTS market_ticks_code_ts ON market_ticks (code, ts);")
+    create_partitioned_table(cursor, "market_bars", """
+        code VARCHAR(20) NOT NULL,
+        timeframe SMALLINT NOT NULL,
+        ts TIMESTAMP NOT NULL,
+        open DOUBLE PRECISION NOT NULL,
+        high DOUBLE PRECISION NOT NULL,
+        low DOUBLE PRECISION NOT NULL,
+        close DOUBLE PRECISION NOT NULL,
+        volume BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (code, timeframe, ts)
+    """, "ts")
+
+
+# ----------------------------------------------------------------------
+# 遷移版本 (只能新增，不可修改已發佈的版本)
+# ----------------------------------------------------------------------
+MIGRATIONS = [
+    Migration(1, "baseline tables", """
+        CREATE TABLE IF NOT EXISTS trade_history (
+            id SERIAL PRIMARY KEY,
+            strategy_name VARCHAR(50) DEFAULT 'Gatekeeper_V1',
+            side VARCHAR(10),
+            entry_price NUMERIC,
+            entry_time TIMESTAMP,
+            exit_price NUMERIC,
+            exit_time TIMESTAMP,
+            pnl_points NUMERIC,
+            status VARCHAR(20)
+        );
+        ALTER TABLE trade_history ADD COLUMN IF NOT EXISTS exit_reason VARCHAR(100);
+        ALTER TABLE trade_history ADD COLUMN IF NOT EXISTS contract_symbol VARCHAR(30);
+        CREATE TABLE IF NOT EXISTS equity_logs (
+            id SERIAL PRIMARY KEY,
+            log_date DATE UNIQUE,
+            total_equity NUMERIC,
+            available_margin NUMERIC
+        );
+        CREATE TABLE IF NOT EXISTS virtual_positions (
+            strategy_name VARCHAR(50),
+            contract_symbol VARCHAR(30),
+            position INTEGER DEFAULT 0,
+            average_cost NUMERIC DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (strategy_name, contract_symbol)
+        );
+    """),
+    Migration(2, "trade_history client_key for outbox replay", """
+        ALTER TABLE trade_history ADD COLUMN IF NOT EXISTS client_key VARCHAR(64);
+        CREATE UNIQUE INDEX IF NOT EXISTS trade_history_client_key ON trade_history (client_key);
+    """),
+    Migration(3, "indexes for dashboard and order hot paths", """
+        -- 儀表板: WHERE status = 'Open' ORDER BY entry_time DESC LIMIT 1
+        CREATE INDEX IF NOT EXISTS trade_history_open_entry_time
+            ON trade_history (entry_time DESC) WHERE status = 'Open';
+        -- 儀表板: WHERE status = 'Closed' AND exit_time >= ... 的 SUM(pnl_points) (index-only scan)
+        CREATE INDEX IF NOT EXISTS trade_history_closed_exit_time
+            ON trade_history (exit_time) INCLUDE (pnl_points) WHERE status = 'Closed';
+        -- 各策略交易查詢
+        CREATE INDEX IF NOT EXISTS trade_history_strategy_entry_time
+            ON trade_history (strategy_name, entry_time DESC);
+        -- 每次下單: SUM(position) WHERE contract_symbol = ... (主鍵以 strategy_name 開頭，無法使用)
+        CREATE INDEX IF NOT EXISTS virtual_positions_contract
+            ON virtual_positions (contract_symbol) INCLUDE (position);
+    """),
+    Migration(4, "partitioned market_ticks / market_bars", _create_market_tables),
+    Migration(5, "dashboard aggregates maintained by triggers", """
+        -- 每策略每日已實現損益 (以出場日計)，由 trade_history 觸發器增量維護
+        CREATE TABLE IF NOT EXISTS strategy_daily_pnl (
+            strategy_name VARCHAR(50) NOT NULL,
+            trade_date DATE NOT NULL,
+            pnl_points NUMERIC NOT NULL DEFAULT 0,
+            trades INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (strategy_name, trade_date)
+        );
+        CREATE INDEX IF NOT EXISTS strategy_daily_pnl_date ON strategy_daily_pnl (trade_date);
+
+        -- 儀表板快取失效用的變更計數 (交易 / 權益 / 部位有任何寫入就 +1)
+        CREATE TABLE IF NOT EXISTS dashboard_state (
+            id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            change_counter BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT INTO dashboard_state (id) VALUES (1) ON CONFLICT DO NOTHING;
+
+        CREATE OR REPLACE FUNCTION bump_dashboard_counter() RETURNS trigger AS $$
+        BEGIN
+            UPDATE dashboard_state SET change_counter = change_counter + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- 先扣掉舊列的貢獻再加上新列，平倉紀錄被重送 (Outbox replay) 或修正時不會重複計算
+        CREATE OR REPLACE FUNCTION maintain_strategy_daily_pnl() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'Closed'
+               AND OLD.exit_time IS NOT NULL AND OLD.strategy_name IS NOT NULL THEN
+                UPDATE strategy_daily_pnl
+                SET pnl_points = pnl_points - COALESCE(OLD.pnl_points, 0), trades = trades - 1
+                WHERE strategy_name = OLD.strategy_name AND trade_date = OLD.exit_time::date;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'Closed'
+               AND NEW.exit_time IS NOT NULL AND NEW.strategy_name IS NOT NULL THEN
+                INSERT INTO strategy_daily_pnl (strategy_name, trade_date, pnl_points, trades)
+                VALUES (NEW.strategy_name, NEW.exit_time::date, COALESCE(NEW.pnl_points, 0), 1)
+                ON CONFLICT (strategy_name, trade_date)
+                DO UPDATE SET pnl_points = strategy_daily_pnl.pnl_points + EXCLUDED.pnl_points,
+                              trades = strategy_daily_pnl.trades + 1;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS trade_history_daily_pnl ON trade_history;
+        CREATE TRIGGER trade_history_daily_pnl AFTER INSERT OR UPDATE OR DELETE ON trade_history
+            FOR EACH ROW EXECUTE FUNCTION maintain_strategy_daily_pnl();
+
+        DROP TRIGGER IF EXISTS trade_history_dashboard_counter ON trade_history;
+        CREATE TRIGGER trade_history_dashboard_counter AFTER INSERT OR UPDATE OR DELETE ON trade_history
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_dashboard_counter();
+        DROP TRIGGER IF EXISTS equity_logs_dashboard_counter ON equity_logs;
+        CREATE TRIGGER equity_logs_dashboard_counter AFTER INSERT OR UPDATE OR DELETE ON equity_logs
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_dashboard_counter();
+        DROP TRIGGER IF EXISTS virtual_positions_dashboard_counter ON virtual_positions;
+        CREATE TRIGGER virtual_positions_dashboard_counter AFTER INSERT OR UPDATE OR DELETE ON virtual_positions
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_dashboard_counter();
+
+        -- 回填既有的平倉紀錄
+        INSERT INTO strategy_daily_pnl (strategy_name, trade_date, pnl_points, trades)
+        SELECT strategy_name, exit_time::date, COALESCE(SUM(pnl_points), 0), COUNT(*)
+        FROM trade_history
+        WHERE status = 'Closed' AND exit_time IS NOT NULL AND strategy_name IS NOT NULL
+        GROUP BY strategy_name, exit_time::date
+        ON CONFLICT (strategy_name, trade_date)
+        DO UPDATE SET pnl_points = EXCLUDED.pnl_points, trades = EXCLUDED.trades;
+    """),
+    Migration(6, "dashboard change events via NOTIFY", """
+        -- 每一列變動送出 NOTIFY (交易 commit 後才會送達)，儀表板 LISTEN 後套用增量，不需輪詢
+        -- payload: {"table", "op", "row", "old"}，UPDATE / DELETE 附上舊列供扣除舊貢獻
+        CREATE OR REPLACE FUNCTION notify_dashboard_event() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('dashboard_events', json_build_object(
+                'table', TG_TABLE_NAME,
+                'op', TG_OP,
+                'row', CASE WHEN TG_OP = 'DELETE' THEN NULL ELSE row_to_json(NEW) END,
+                'old', CASE WHEN TG_OP = 'INSERT' THEN NULL ELSE row_to_json(OLD) END
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS trade_history_notify ON trade_history;
+        CREATE TRIGGER trade_history_notify AFTER INSERT OR UPDATE OR DELETE ON trade_history
+            FOR EACH ROW EXECUTE FUNCTION notify_dashboard_event();
+        DROP TRIGGER IF EXISTS equity_logs_notify ON equity_logs;
+        CREATE TRIGGER equity_logs_notify AFTER INSERT OR UPDATE OR DELETE ON equity_logs
+            FOR EACH ROW EXECUTE FUNCTION notify_dashboard_event();
+        DROP TRIGGER IF EXISTS virtual_positions_notify ON virtual_positions;
+        CREATE TRIGGER virtual_positions_notify AFTER INSERT OR UPDATE OR DELETE ON virtual_positions
+            FOR EACH ROW EXECUTE FUNCTION notify_dashboard_event();
+    """),
+    Migration(7, "indexes for trade explorer keyset pagination", """
+        -- 交易紀錄查詢以 (entry_time DESC, id DESC) 做 keyset 分頁；各篩選欄位開頭的索引帶出同樣排序，
+        -- 翻到任何一頁都只讀該頁的索引範圍，也供 filter_options 的 skip scan 使用
+        CREATE INDEX IF NOT EXISTS trade_history_entry_time_id
+            ON trade_history (entry_time DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS trade_history_strategy_entry_time_id
+            ON trade_history (strategy_name, entry_time DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS trade_history_contract_entry_time_id
+            ON trade_history (contract_symbol, entry_time DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS trade_history_exit_reason_entry_time_id
+            ON trade_history (exit_reason, entry_time DESC, id DESC);
+        -- 已被 trade_history_strategy_entry_time_id 涵蓋
+        DROP INDEX IF EXISTS trade_history_strategy_entry_time;
+    """),
+]
+
+
+# ----------------------------------------------------------------------
+# 執行器
+# ----------------------------------------------------------------------
+def _ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+
+def applied_versions(conn) -> set:
+    with conn.cursor() as cursor:
+        _ensure_version_table(cursor)
+        cursor.execute("SELECT version FROM schema_migrations;")
+        versions = {row[0] for row in cursor.fetchall()}
+    conn.commit()
+    return versions
+
+
+def migrate(conn, migrations=None, target: int = None) -> list:
+    """
+    依版本順序套用尚未套用的遷移 (每個版本一個交易)
+    :param target: 只套用到此版本 (含)
+    :return: 本次套用的版本號
+    """
+    migrations = sorted(migrations if migrations is not None else MIGRATIONS, key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"遷移版本號重複: {versions}")
+
+    applied = []
+    for migration in migrations:
+        if target is not None and migration.version > target:
+            break
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s);", (ADVISORY_LOCK_ID,))
+                _ensure_version_table(cursor)
+                # 取得鎖之後再確認一次，避免另一個行程剛套用完
+                cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s;", (migration.version,))
+                if cursor.fetchone():
+                    conn.commit()
+                    continue
+                if callable(migration.up):
+                    migration.up(cursor)
+                else:
+                    cursor.execute(migration.up)
+                cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s);",
+                               (migration.version, migration.name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logging.error(f"[Migrations] 版本 {migration.version} ({migration.name}) 套用失敗")
+            raise
+        logging.info(f"[Migrations] 已套用版本 {migration.version}: {migration.name}")
+        applied.append(migration.version)
+    return applied
+
+
+def run_migrations(target: int = None) -> list:
+    """以 DATABASE_URL 連線並套用遷移；無法連線時回傳 None"""
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    try:
+        return migrate(conn, target=target)
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="套用資料庫 schema 遷移")
+    parser.add_argument("--list", action="store_true", help="列出各版本狀態，不套用")
+    parser.add_argument("--target", type=int, default=None, help="只套用到此版本")
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    if conn is None:
+        print("❌ 無法連線至資料庫 (請確認 DATABASE_URL)")
+        return 1
+    try:
+        if args.list:
+            done = applied_versions(conn)
+            for m in sorted(MIGRATIONS, key=lambda m: m.version):
+                print(f"{'✅' if m.version in done else '⏳'} {m.version:>4}  {m.name}")
+            return 0
+        applied = migrate(conn, target=args.target)
+        print(f"✅ 已套用 {len(applied)} 個版本: {applied}" if applied else "✅ 資料庫已是最新版本")
+        return 0
+    except Exception as e:
+        print(f"❌ 遷移失敗: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
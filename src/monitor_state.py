@@ -0,0 +1,99 @@
+"""
+監控衍生狀態快取 (Monitor State)
+main.py 的監控日誌每分鐘都重新建立日 K DataFrame、跑一次完整的 calculate_supertrend
+(逐列 .iloc 的 Python 迴圈)，並以 strptime 解析到期日；這些值只在 K 線完成或換日時才會改變。
+改為快取，依失效事件才重算:
+
+- 日 K 趨勢 / 60 分 ATR: KLineMaker.version 改變時 (K 線完成、載入歷史、換月平移)
+- 到期天數: 合約或日期 (台北時間) 改變時
+- 策略狀態列: 策略屬性每次讀取 (多行程模式下由 worker 更新，與本行程 K 線完成不同步)，
+  只有內容改變時才重新組字串
+
+平常每分鐘的監控日誌只剩幾次 dict 查詢。
+"""
+from datetime import datetime
+
+import pandas as pd
+
+from src.bar_store import parse_delivery_date
+from src.scheduler import TW_TZ
+from src.strategies.indicators import calculate_atr, calculate_supertrend_fast
+
+TREND_MIN_BARS = 10
+
+
+class MonitorState:
+    def __init__(self, clock=None):
+        """
+        :param clock: 回傳目前時間 (台北時區) 的函式，測試時可替換
+        """
+        self.clock = clock or (lambda: datetime.now(TW_TZ))
+        self._cache = {}     # {(種類, 合約代碼): (失效 key, 值)}
+        self.misses = 0      # 實際重算次數
+
+    def _cached(self, kind: str, code: str, key, compute):
+        entry = self._cache.get((kind, code))
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        self.misses += 1
+        value = compute()
+        self._cache[(kind, code)] = (key, value)
+        return value
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def trend_status(self, pipeline) -> str:
+        """日 K SuperTrend 方向 ("BULL (多)" / "BEAR (空)"，日 K 不足時 "N/A")"""
+        maker = pipeline.maker_1d
+        return self._cached('trend', pipeline.code, maker.version, lambda: self._trend(maker))
+
+    @staticmethod
+    def _trend(maker) -> str:
+        df_1d = maker.get_dataframe()
+        if df_1d.empty or len(df_1d) < TREND_MIN_BARS:
+            return "N/A"
+        is_bullish, _ = calculate_supertrend_fast(df_1d)
+        return "BULL (多)" if is_bullish else "BEAR (空)"
+
+    def atr(self, pipeline, period: int = 10):
+        """60 分 K 最新一根的 ATR(period)，資料不足時回傳 None"""
+        maker = pipeline.maker_60m
+        return self._cached(f'atr{period}', pipeline.code, maker.version, lambda: self._atr(maker, period))
+
+    @staticmethod
+    def _atr(maker, period: int):
+        df_60m = maker.get_dataframe()
+        if df_60m.empty:
+            return None
+        atr_series = calculate_atr(df_60m, period=period).dropna()
+        return float(atr_series.iloc[-1]) if not atr_series.empty else None
+
+    def expiry_days(self, contract):
+        """距到期日的完整天數 (不含今天剩餘時間)；沒有到期日時回傳 "N/A" """
+        delivery = getattr(contract, 'delivery_date', None)
+        if not delivery:
+            return "N/A"
+        today = self.clock().date()
+        return self._cached('expiry', contract.code, (delivery, today), lambda: self._expiry(delivery, today))
+
+    @staticmethod
+    def _expiry(delivery, today):
+        try:
+            # 與 (到期日 00:00 - 現在).days 相同: 今天任何時刻都比到期日差一天不滿
+            return (pd.Timestamp(parse_delivery_date(delivery)).date() - today).days - 1
+        except ValueError:
+            return "N/A"
+
+    def strategy_lines(self, strategies: list) -> list:
+        """各策略的監控日誌行"""
+        snapshot = tuple(
+            (s.name, s.contract.code if s.contract is not None else None, bool(s.is_long),
+             bool(getattr(s, 'is_short', False)), s.entry_price)
+            for s in strategies
+        )
+        return self._cached('strategies', None, snapshot, lambda: [
+            f"   -> [{name}] {code} Position: {'LONG' if is_long else 'SHORT' if is_short else 'EMPTY'}"
+            f" | Entry: {entry_price}"
+            for name, code, is_long, is_short, entry_price in snapshot
+        ])
@@ -4,15 +4,20 @@ from src.db_logger import get_db_connection
 from src.line_notify import send_line_push_message
 
 class PortfolioManager:
-    def __init__(self, api=None):
+    def __init__(self, api=None, outbox=None):
         """
         初始化 PortfolioManager
         :param api: Shioaji API instance
+        :param outbox: 本機 Outbox (src/db_outbox)；設定後虛擬部位以本機鏡像為準，
+                       資料庫由背景補寫，斷線時仍可交易
         """
         self.api = api
+        self.outbox = outbox
 
     def get_virtual_position(self, strategy_name: str, contract_symbol: str) -> int:
         """從資料庫中取得策略當前的虛擬部位"""
+        if self.outbox is not None:
+            return self.outbox.get_position(strategy_name, contract_symbol)
         conn = get_db_connection()
         if not conn: return 0
         try:
@@ -36,6 +41,10 @@ class PortfolioManager:
         如果 Delta != 0，則代為呼叫 API 發送實體委託單進行對沖對應。
         回傳: True/False (若實體單被拒絕則回傳 False，且不更新資料庫)
         """
+        if self.outbox is not None:
+            return self._set_virtual_position_local(strategy_name, contract_symbol, new_position, contract_obj,
+                                                    average_cost)
+
         conn = get_db_connection()
         if not conn: 
             error_msg = f"🚨 [嚴重錯誤] 無法連線至資料庫！({strategy_name} 欲更新部位)。為避免資料不一致，系統已取消這次的實體下單動作。"
@@ -43,7 +52,6 @@ class PortfolioManager:
             send_line_push_message(error_msg)
             return False
 
-        delta = 0
         old_net_position = 0
         new_net_position = 0
 
@@ -67,7 +75,6 @@ class PortfolioManager:
                 old_strategy_position = row[0] if row else 0
                 
                 new_net_position = old_net_position - old_strategy_position + new_position
-                delta = new_net_position - old_net_position
                 
         except Exception as e:
             error_msg = f"🚨 [嚴重錯誤] 查詢資料庫虛擬部位時發生異常: {e}。"
@@ -77,24 +84,8 @@ class PortfolioManager:
             return False
 
         # ========== STEP 2: 如果總部位有變動，先發送實體訂單 ==========
-        order_success = True
-        if delta != 0:
-            logging.info(f"[PortfolioManager] {contract_symbol} 預期淨部位變更: {old_net_position} -> {new_net_position} (Delta: {delta})")
-            if self.api and contract_obj:
-                # 這裡會卡住等待送單回覆
-                order_success = self._execute_real_order(contract_obj, delta, price=average_cost)
-            elif not contract_obj:
-                msg = f"⚠️ [PortfolioManager] 警告：需要下單 Delta: {delta} 但未提供合約物件！"
-                logging.warning(msg)
-                send_line_push_message(msg)
-                order_success = False
-            elif not self.api:
-                logging.info(f"[PortfolioManager] 無 API 實例，跳過實體委託 (Delta: {delta})，視為成功。")
-                
-        if not order_success:
-            msg = f"❌ [{strategy_name}] API 實體單委託失敗，系統已自動取消寫入虛擬部位，避免狀態不同步！"
-            logging.warning(msg)
-            send_line_push_message(msg)
+        if not self._submit_net_change(strategy_name, contract_symbol, old_net_position, new_net_position,
+                                       contract_obj, average_cost):
             conn.close()
             return False
 
@@ -123,6 +114,50 @@ class PortfolioManager:
         finally:
             conn.close()
 
+    def _submit_net_change(self, strategy_name: str, contract_symbol: str, old_net_position: int,
+                           new_net_position: int, contract_obj, average_cost: float) -> bool:
+        """淨部位有變動時送出實體委託，回傳是否可以寫入新的虛擬部位"""
+        delta = new_net_position - old_net_position
+        order_success = True
+        if delta != 0:
+            logging.info(f"[PortfolioManager] {contract_symbol} 預期淨部位變更: {old_net_position} -> {new_net_position} (Delta: {delta})")
+            if self.api and contract_obj:
+                # 這裡會卡住等待送單回覆
+                order_success = self._execute_real_order(contract_obj, delta, price=average_cost)
+            elif not contract_obj:
+                msg = f"⚠️ [PortfolioManager] 警告：需要下單 Delta: {delta} 但未提供合約物件！"
+                logging.warning(msg)
+                send_line_push_message(msg)
+                order_success = False
+            elif not self.api:
+                logging.info(f"[PortfolioManager] 無 API 實例，跳過實體委託 (Delta: {delta})，視為成功。")
+                
+        if not order_success:
+            msg = f"❌ [{strategy_name}] API 實體單委託失敗，系統已自動取消寫入虛擬部位，避免狀態不同步！"
+            logging.warning(msg)
+            send_line_push_message(msg)
+            return False
+        return True
+
+    def _set_virtual_position_local(self, strategy_name: str, contract_symbol: str, new_position: int,
+                                    contract_obj=None, average_cost: float = 0.0) -> bool:
+        """Outbox 模式: 以本機鏡像計算淨部位，下單成功後寫入本機 (fsync) 並排入補寫，不等待資料庫"""
+        old_net_position = self.outbox.net_position(contract_symbol)
+        old_strategy_position = self.outbox.get_position(strategy_name, contract_symbol)
+        new_net_position = old_net_position - old_strategy_position + new_position
+
+        if not self._submit_net_change(strategy_name, contract_symbol, old_net_position, new_net_position,
+                                       contract_obj, average_cost):
+            return False
+        try:
+            self.outbox.set_position(strategy_name, contract_symbol, new_position, average_cost)
+            return True
+        except Exception as e:
+            error_msg = f"🚨 [嚴重錯誤] 寫入本機部位紀錄時發生異常: {e}。這可能導致資料不同步！"
+            logging.error(error_msg)
+            send_line_push_message(error_msg)
+            return False
+
     def _execute_real_order(self, contract, delta: int, price: float = 0.0) -> bool:
         """
         執行實體委託單送出。
@@ -212,9 +247,10 @@ class PortfolioManager:
                     logging.error(f"[PortfolioManager] 重新登入失敗: {relogin_e}")
             return # 取得失敗不當作異常對帳
 
-        # 取回資料庫中的虛擬總淨部位
-        conn = get_db_connection()
-        if conn:
+        # 取回資料庫 (或本機 Outbox 鏡像) 中的虛擬總淨部位
+        if self.outbox is not None:
+            virtual_net_position = self.outbox.net_position(contract_symbol)
+        elif (conn := get_db_connection()):
             try:
                 with conn.cursor() as cursor:
                     cursor.execute(
@@ -1,6 +1,6 @@
 import collections
 import pandas as pd
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta
 
 @dataclass
@@ -13,14 +13,18 @@ class Bar:
     volume: int
 
 class KLineMaker:
-    def __init__(self, timeframe: int = 1):
+    def __init__(self, timeframe: int = 1, verbose: bool = True):
         """
         初始化 KLineMaker
         :param timeframe: K 線週期 (分鐘), 例如 1, 5, 60
+        :param verbose: 是否印出每根完成的 K 線 (高頻週期如行情錄製的 1 分 K 應關閉)
         """
         self.timeframe = timeframe
+        self.verbose = verbose
         self.bars = collections.deque(maxlen=100)
         self.current_bar = None
+        # 已完成 K 線的變更版本: 完成新 K 線、載入歷史或換月平移時 +1 (供衍生狀態快取判斷是否需要重算)
+        self.version = 0
 
     def update_with_tick(self, tick_data: dict) -> bool:
         """
@@ -76,10 +80,12 @@ class KLineMaker:
             elif bar_time > self.current_bar.time:
                 # 時間推進，結算上一根 Bar
                 self.bars.append(self.current_bar)
+                self.version += 1
                 is_new_bar_completed = True
                 
                 # 印出日誌 (Zeabur Log)
-                print(f"[KLine {self.timeframe}m] New Bar: {self.current_bar}", flush=True)
+                if self.verbose:
+                    print(f"[KLine {self.timeframe}m] New Bar: {self.current_bar}", flush=True)
 
                 # 建立新 Bar
                 self.current_bar = Bar(
@@ -133,6 +139,30 @@ class KLineMaker:
         df = pd.DataFrame(data)
         return df
 
+    def adjust_prices(self, offset: float):
+        """
+        換月時以價差平移既有 K 線 (回溯調整)，讓指標在新合約上延續
+        :param offset: 新合約價格 - 舊合約價格
+        """
+        bars = list(self.bars) + ([self.current_bar] if self.current_bar else [])
+        for bar in bars:
+            bar.open += offset
+            bar.high += offset
+            bar.low += offset
+            bar.close += offset
+        self.version += 1
+
+    def clone(self) -> 'KLineMaker':
+        """
+        複製 K 線狀態 (Bar 為獨立副本)。
+        換月時部分策略仍留在舊合約，需要一份未平移的 K 線；adjust_prices 直接修改 Bar，不可共用同一批物件
+        """
+        copy = KLineMaker(timeframe=self.timeframe, verbose=self.verbose)
+        copy.bars = collections.deque((replace(bar) for bar in self.bars), maxlen=self.bars.maxlen)
+        copy.current_bar = replace(self.current_bar) if self.current_bar else None
+        copy.version = self.version
+        return copy
+
     def load_historical_dataframe(self, df: pd.DataFrame):
         """
         將歷史 DataFrame 直接轉換為內部 Bar 結構並載入
@@ -156,6 +186,7 @@ class KLineMaker:
                 volume=int(row['volume']) if pd.notna(row['volume']) else 0
             )
             self.bars.append(bar)
+        self.version += 1
         
         # Optionally print completion
         print(f"[KLine {self.timeframe}m] Preloaded {len(df)} historical bars.")
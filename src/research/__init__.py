@@ -0,0 +1,9 @@
+from .bnf_b_vectorized import BNFBFeatures, simulate_bnf_b, sweep_bnf_b, evaluate_bnf_b
+from .parallel_runner import GridRunner, param_grid
+from .result_cache import ResultCache
+from .search import successive_halving
+from .walk_forward import walk_forward
+from .intrabar import simulate_mxf_intrabar, simulate_bnf_b_intrabar
+from .metrics import compute_metrics, metrics_by_strategy, batch_metrics
+from .monte_carlo import monte_carlo, robustness_table
+from .execution import ExecutionModel, apply_execution, apply_execution_batch
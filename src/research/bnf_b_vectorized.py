@@ -0,0 +1,292 @@
+"""
+Gatekeeper-BNF-B 向量化回測模組
+一次性預先計算 Bias / 量比 / ATR 陣列，再以遮罩 (mask) 篩出進場候選點，
+只從候選點往後模擬出場 (固定停損、80 點啟動移動停利、ATR 追蹤、60MA 修復、3 日時間停損)。
+
+與 GatekeeperBNFBStrategy.check_signals 逐根 K 棒重算 100 根視窗指標的結果一致，
+但整個參數網格的掃描成本約等於一次特徵計算。
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.strategies.indicators import calculate_atr
+from .parallel_runner import param_grid
+from .result_cache import code_version, dataset_hash
+from .execution import apply_execution_batch
+
+ONE_DAY = np.timedelta64(1, 'D')
+
+
+def default_bnf_b_params() -> dict:
+    """從策略本身讀出預設參數，確保回測與實盤使用同一份設定來源。"""
+    from src.strategies.gatekeeper_bnf_b import GatekeeperBNFBStrategy
+
+    strategy = GatekeeperBNFBStrategy(name="Gatekeeper-BNF-B_Opt", portfolio=None, contract=None)
+    return {
+        'sma_period': strategy.sma_period,
+        'volume_ma_period': strategy.volume_ma_period,
+        'bias_threshold': strategy.bias_threshold,
+        'volume_spike_ratio': strategy.volume_spike_ratio,
+        'fixed_sl_points': strategy.fixed_sl_points,
+        'partial_tp_points': strategy.partial_tp_points,
+        'trailing_atr_mult': strategy.trailing_atr_mult,
+        'time_stop_days': strategy.time_stop_days,
+    }
+
+
+@dataclass
+class BNFBFeatures:
+    """BNF-B 所需的預計算特徵 (全部為與 60m K 棒對齊的 NumPy 陣列)"""
+    times: np.ndarray      # datetime64[ns]
+    close: np.ndarray
+    volume: np.ndarray
+    sma: np.ndarray
+    bias: np.ndarray
+    vol_ma: np.ndarray
+    atr: np.ndarray
+    day: np.ndarray        # 日曆日序號 (用於單日進場限制)
+    valid: np.ndarray      # 指標皆已就緒的 K 棒 (對應策略中的提前 return)
+
+    @classmethod
+    def from_dataframe(cls, df_60m: pd.DataFrame, sma_period: int = 60,
+                       volume_ma_period: int = 20, atr_period: int = 14) -> "BNFBFeatures":
+        """
+        由 60 分 K DataFrame 建立特徵。
+        df_60m 需包含 datetime, high, low, close, volume 欄位。
+        """
+        close_s = df_60m['close'].astype(float)
+        sma = close_s.rolling(window=sma_period).mean()
+        bias = (close_s - sma) / sma * 100.0
+        vol_ma = df_60m['volume'].astype(float).rolling(window=volume_ma_period).mean()
+        atr = calculate_atr(df_60m, period=atr_period)
+
+        times = pd.to_datetime(df_60m['datetime']).values.astype('datetime64[ns]')
+        sma_v = sma.to_numpy()
+        vol_ma_v = vol_ma.to_numpy()
+
+        return cls(
+            times=times,
+            close=close_s.to_numpy(),
+            volume=df_60m['volume'].astype(float).to_numpy(),
+            sma=sma_v,
+            bias=bias.to_numpy(),
+            vol_ma=vol_ma_v,
+            atr=atr.to_numpy(),
+            day=times.astype('datetime64[D]').astype(np.int64),
+            valid=~np.isnan(sma_v) & ~np.isnan(vol_ma_v),
+        )
+
+    def __len__(self):
+        return len(self.close)
+
+
+def entry_candidates(features: BNFBFeatures, bias_threshold: float, volume_spike_ratio: float,
+                     bullish=None):
+    """
+    以遮罩找出所有符合進場條件的 K 棒 (尚未考慮持倉中與單日進場限制)。
+    :param bullish: 與 K 棒對齊的日 K 多空陣列；None 代表全部視為多頭 (與 optimize_bnf.py 相同)
+    :return: (候選 index 陣列, 方向陣列 +1 多 / -1 空)
+    """
+    f = features
+    if bullish is None:
+        bullish = np.ones(len(f), dtype=bool)
+    else:
+        bullish = np.asarray(bullish, dtype=bool)
+
+    with np.errstate(invalid='ignore'):
+        cond_vol = f.volume > (f.vol_ma * volume_spike_ratio)
+        long_mask = f.valid & cond_vol & bullish & (f.bias < bias_threshold)
+        short_mask = f.valid & cond_vol & ~bullish & (f.bias > abs(bias_threshold))
+
+    idx = np.flatnonzero(long_mask | short_mask)
+    direction = np.where(long_mask[idx], 1, -1)
+    return idx, direction
+
+
+def _simulate_exit(f: BNFBFeatures, i: int, direction: int, fixed_sl_points: float,
+                   partial_tp_points: float, trailing_atr_mult: float, time_stop_days: int):
+    """
+    從進場 K 棒 i 往後模擬單筆部位的出場。
+    回傳 (出場 index, 出場原因)；若資料結束仍未出場則回傳 (None, None)。
+    """
+    n = len(f)
+    entry_price = f.close[i]
+    entry_time = f.times[i]
+
+    # 時間停損保證在 time_stop_days 內出場，因此只需看這段範圍
+    horizon = np.searchsorted(f.times, entry_time + time_stop_days * ONE_DAY, side='left')
+    end = min(horizon, n - 1)
+    if end <= i:
+        return None, None
+
+    seg = slice(i + 1, end + 1)
+    c = f.close[seg]
+    trail_atr = trailing_atr_mult * f.atr[seg]
+    elapsed_days = (f.times[seg] - entry_time) // ONE_DAY
+
+    if direction > 0:
+        extreme = np.maximum.accumulate(np.concatenate(([entry_price], c)))[1:]
+        profit = c - entry_price
+        stop = np.full(len(c), entry_price - fixed_sl_points)
+        activated = np.flatnonzero(profit >= partial_tp_points)
+        if activated.size:
+            a = activated[0]
+            stop[a:] = np.maximum(entry_price, np.maximum.accumulate(extreme[a:] - trail_atr[a:]))
+        hit_stop = c <= stop
+        hit_sma = c >= f.sma[seg]
+    else:
+        extreme = np.minimum.accumulate(np.concatenate(([entry_price], c)))[1:]
+        profit = entry_price - c
+        stop = np.full(len(c), entry_price + fixed_sl_points)
+        activated = np.flatnonzero(profit >= partial_tp_points)
+        if activated.size:
+            a = activated[0]
+            stop[a:] = np.minimum(entry_price, np.minimum.accumulate(extreme[a:] + trail_atr[a:]))
+        hit_stop = c >= stop
+        hit_sma = c <= f.sma[seg]
+
+    hit_time = elapsed_days >= time_stop_days
+    any_exit = hit_stop | hit_sma | hit_time
+    if not any_exit.any():
+        return None, None
+
+    k = int(np.argmax(any_exit))
+    if hit_stop[k]:
+        reason = "Stop Loss/Trailing Stop"
+    elif hit_sma[k]:
+        reason = "Mean Reversion (Touch 60MA)"
+    else:
+        reason = f"Time Stop (Max {time_stop_days} Days)"
+    return i + 1 + k, reason
+
+
+def simulate_bnf_b(features: BNFBFeatures, bias_threshold: float = -1.5, volume_spike_ratio: float = 2.0,
+                   fixed_sl_points: float = 100.0, partial_tp_points: float = 80.0,
+                   trailing_atr_mult: float = 2.0, time_stop_days: int = 3,
+                   bullish=None, name: str = "Gatekeeper-BNF-B_Opt") -> list:
+    """
+    對單一參數組合進行向量化模擬。
+    回傳與 GatekeeperBNFBStrategy.trades 相同格式的交易列表。
+    """
+    f = features
+    candidates, directions = entry_candidates(f, bias_threshold, volume_spike_ratio, bullish)
+
+    trades = []
+    last_exit_idx = -1
+    last_entry_day = None
+
+    for i, direction in zip(candidates, directions):
+        # 持倉中的候選點與同日二次進場皆略過
+        if i <= last_exit_idx or f.day[i] == last_entry_day:
+            continue
+
+        exit_idx, reason = _simulate_exit(
+            f, i, direction, fixed_sl_points, partial_tp_points, trailing_atr_mult, time_stop_days
+        )
+        if exit_idx is None:
+            break  # 資料結束仍持倉，與逐根模擬相同不計入交易
+
+        entry_price = f.close[i]
+        exit_price = f.close[exit_idx]
+        trades.append({
+            'strategy': name,
+            'direction': 'Long' if direction > 0 else 'Short',
+            'entry_time': pd.Timestamp(f.times[i]),
+            'exit_time': pd.Timestamp(f.times[exit_idx]),
+            'entry_price': entry_price,
+            'exit_price': exit_price,
+            'pnl': (exit_price - entry_price) * direction,
+            'reason': reason
+        })
+        last_exit_idx = exit_idx
+        last_entry_day = f.day[i]
+
+    return trades
+
+
+def summarize_trades(trades: list):
+    """回傳 (交易次數, 勝率 %, 總損益點數)，與 optimize 腳本的輸出格式相同。"""
+    total_trades = len(trades)
+    if total_trades == 0:
+        return 0, 0, 0
+    wins = sum(1 for t in trades if t['pnl'] > 0)
+    total_pnl = sum(t['pnl'] for t in trades)
+    return total_trades, wins / total_trades * 100, total_pnl
+
+
+# 最近一次使用的特徵 (同一份 DataFrame 連續評估多組參數時免重算)
+_FEATURE_MEMO = {'df': None, 'key': None, 'features': None}
+
+
+def evaluate_bnf_b(data: dict, bullish=None, **params) -> dict:
+    """
+    GridRunner / 搜尋模組使用的評估入口。
+    :param data: {'60m': df_60m, ...}
+    :param params: 任意 default_bnf_b_params() 中的參數，未提供者使用策略預設值
+    """
+    full = default_bnf_b_params()
+    full.update(params)
+    df_60m = data['60m']
+    key = (full.pop('sma_period'), full.pop('volume_ma_period'))
+
+    if _FEATURE_MEMO['df'] is not df_60m or _FEATURE_MEMO['key'] != key:
+        _FEATURE_MEMO.update(
+            df=df_60m, key=key,
+            features=BNFBFeatures.from_dataframe(df_60m, sma_period=key[0], volume_ma_period=key[1])
+        )
+
+    trades = simulate_bnf_b(_FEATURE_MEMO['features'], bullish=bullish, **full)
+    trades_count, win_rate, pnl = summarize_trades(trades)
+    return dict(params, Trades=trades_count, Win_Rate=win_rate, PnL=pnl, trades=trades)
+
+
+def sweep_bnf_b(df_60m: pd.DataFrame, bias_range, vol_ratio_range, bullish=None, cache=None,
+                execution=None, **fixed_params) -> pd.DataFrame:
+    """
+    對 (bias_threshold, volume_spike_ratio) 網格做完整掃描。
+    特徵只計算一次，每個參數組合只需處理自己的進場候選點。
+    :param cache: ResultCache，提供時只計算快取中沒有的網格點
+    :param execution: ExecutionModel，提供時另外輸出扣除成本與成交假設後的 Net_* 欄位
+    """
+    params = default_bnf_b_params()
+    params.update(fixed_params)
+    features = BNFBFeatures.from_dataframe(
+        df_60m, sma_period=params.pop('sma_period'), volume_ma_period=params.pop('volume_ma_period')
+    )
+    params.pop('bias_threshold')
+    params.pop('volume_spike_ratio')
+
+    grid = [dict(params, **point) for point in
+            param_grid(bias_threshold=bias_range, volume_spike_ratio=vol_ratio_range)]
+
+    def compute(points):
+        out = []
+        for point in points:
+            trades = simulate_bnf_b(features, bullish=bullish, **point)
+            trades_count, win_rate, pnl = summarize_trades(trades)
+            out.append({'trades': trades, 'Trades': trades_count, 'Win_Rate': win_rate, 'PnL': pnl})
+        return out
+
+    if cache is not None:
+        frames = [df_60m] if bullish is None else [df_60m, pd.DataFrame({'bullish': np.asarray(bullish)})]
+        evaluated = cache.run("Gatekeeper-BNF-B", code_version(simulate_bnf_b), dataset_hash(*frames),
+                              grid, compute)
+    else:
+        evaluated = compute(grid)
+
+    result = pd.DataFrame([
+        {
+            'Bias': point['bias_threshold'],
+            'Vol_Ratio': point['volume_spike_ratio'],
+            'Trades': res['Trades'],
+            'Win_Rate': res['Win_Rate'],
+            'PnL': res['PnL']
+        }
+        for point, res in zip(grid, evaluated)
+    ])
+    if execution is not None:
+        net = apply_execution_batch([res['trades'] for res in evaluated], execution, df_60m)
+        result = pd.concat([result, net], axis=1)
+    return result
@@ -0,0 +1,123 @@
+"""
+成交與交易成本模型
+回測原本假設在 K 棒收盤價完美成交且零成本；實盤則由 PortfolioManager 以 ±limit_offset 點的
+IOC 限價單送出，可能因行情跑掉而未成交。本模組在「不重跑訊號模擬」的前提下，
+把成本與成交假設以向量化方式套用到既有的交易列表 (或整批最佳化結果) 上:
+
+- 手續費 (含期交所費用) 與期交稅，換算成點數
+- 滑價: 固定 tick + 與 K 棒振幅成比例的部分，呈指數分布且不超過 IOC 讓價
+- IOC 未成交: 委託延遲期間的不利變動視為指數分布 (尺度與 K 棒振幅成比例)，
+  超過讓價即未成交。進場未成交 = 放棄該筆交易；出場未成交 = 下一次重送時至少多付一個讓價
+
+預設計算期望值 (排序參數時不受隨機雜訊影響)；提供 rng 時改為抽樣單一情境。
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.contract_specs import spec_for
+from .metrics import as_columns
+
+
+@dataclass
+class ExecutionModel:
+    commission: float = 20.0            # 每口單邊手續費 (TWD，含期交所費用)
+    tax_rate: float = 2e-5              # 期交稅率 (單邊，契約價值比例)
+    slippage_ticks: float = 1.0         # 平均固定滑價 (tick)
+    slippage_range_frac: float = 0.05   # 平均滑價中與 K 棒振幅成比例的部分
+    limit_offset: float = 50.0          # IOC 限價讓價 (點)，與 PortfolioManager._execute_real_order 相同
+    latency_range_frac: float = 0.02    # 委託延遲期間不利變動的尺度 (K 棒振幅比例)
+    contract_code: str = None
+
+    @property
+    def spec(self):
+        return spec_for(self.contract_code)
+
+    def cost_points(self, entry_price: np.ndarray, exit_price: np.ndarray) -> np.ndarray:
+        """來回手續費與期交稅 (點)"""
+        point_value = self.spec.point_value
+        tax = self.tax_rate * (entry_price + exit_price) * point_value
+        return (2 * self.commission + tax) / point_value
+
+    def miss_probability(self, bar_range: np.ndarray) -> np.ndarray:
+        """IOC 限價單因不利變動超過讓價而未成交的機率"""
+        scale = np.maximum(self.latency_range_frac * bar_range, 1e-9)
+        return np.exp(-self.limit_offset / scale)
+
+    def slippage(self, bar_range: np.ndarray, rng: np.random.Generator = None) -> np.ndarray:
+        """單邊滑價 (點)；期望值模式使用截斷指數分布的平均值 m * (1 - exp(-a / m))"""
+        mean = np.maximum(self.slippage_ticks * self.spec.tick_size + self.slippage_range_frac * bar_range, 1e-9)
+        if rng is None:
+            return mean * (1.0 - np.exp(-self.limit_offset / mean))
+        return np.minimum(rng.exponential(mean), self.limit_offset)
+
+
+def _bar_ranges(bars: pd.DataFrame, times: np.ndarray) -> np.ndarray:
+    """每個時間點所在 K 棒的振幅 (high - low)"""
+    bar_times = pd.to_datetime(bars['datetime'] if 'datetime' in bars.columns else bars.index)
+    bar_times = bar_times.values.astype('datetime64[ns]')
+    ranges = bars['high'].to_numpy(dtype=float) - bars['low'].to_numpy(dtype=float)
+    idx = np.clip(np.searchsorted(bar_times, times, side='right') - 1, 0, len(ranges) - 1)
+    return ranges[idx]
+
+
+def apply_execution(trades, model: ExecutionModel, bars: pd.DataFrame,
+                    rng: np.random.Generator = None) -> dict:
+    """
+    :param trades: 交易 dict 列表 / DataFrame / {欄位: 陣列}
+    :param bars: 計算振幅用的 K 線 (通常是回測的 60 分 K)
+    :return: {'gross': 原始點數, 'net': 扣除成本後點數 (已乘上成交機率), 'fill': 進場成交機率 (或 0/1),
+              'cost': 成交時的單筆成本點數}
+    """
+    cols = as_columns(trades, sort=False)
+    gross = cols['pnl']
+    if len(gross) == 0:
+        empty = np.zeros(0)
+        return {'gross': empty, 'net': empty, 'fill': empty, 'cost': empty}
+
+    entry_range = _bar_ranges(bars, cols['entry_time'])
+    exit_range = _bar_ranges(bars, cols['exit_time'])
+    entry_price = cols['entry_price'].astype(float)
+    exit_price = cols['exit_price'].astype(float)
+
+    miss_entry = model.miss_probability(entry_range)
+    miss_exit = model.miss_probability(exit_range)
+    if rng is None:
+        fill = 1.0 - miss_entry
+        exit_penalty = miss_exit * model.limit_offset
+    else:
+        fill = (rng.random(len(gross)) >= miss_entry).astype(float)
+        exit_penalty = (rng.random(len(gross)) < miss_exit) * model.limit_offset
+
+    cost = (model.slippage(entry_range, rng) + model.slippage(exit_range, rng)
+            + model.cost_points(entry_price, exit_price) + exit_penalty)
+    net = fill * (gross - cost)
+    return {'gross': gross, 'net': net, 'fill': fill, 'cost': cost}
+
+
+def apply_execution_batch(trade_lists: list, model: ExecutionModel, bars: pd.DataFrame,
+                          rng: np.random.Generator = None) -> pd.DataFrame:
+    """
+    一次套用到整批最佳化結果 (每個元素為一組參數的交易列表)。
+    所有交易串成同一組欄位計算後再以 bincount 依組別彙總，成本與參數組數無關。
+    """
+    k = len(trade_lists)
+    counts = np.fromiter((len(t) for t in trade_lists), dtype=np.int64, count=k)
+    flat = [t for trades in trade_lists for t in trades]
+    result = apply_execution(flat, model, bars, rng)
+
+    run_id = np.repeat(np.arange(k), counts)
+    net = result['net']
+    net_pnl = np.bincount(run_id, weights=net, minlength=k)
+    fill = result['fill']
+    net_wins = np.bincount(run_id, weights=fill * (result['gross'] > result['cost']), minlength=k)
+    filled = np.bincount(run_id, weights=fill, minlength=k)
+    cost = np.bincount(run_id, weights=fill * result['cost'], minlength=k)
+    net_win_rate = np.where(filled > 0, net_wins / np.maximum(filled, 1e-12) * 100, 0.0)
+    return pd.DataFrame({
+        'Net_PnL': net_pnl,
+        'Net_Win_Rate': net_win_rate,
+        'Fill_Rate': np.where(counts > 0, filled / np.maximum(counts, 1) * 100, 0.0),
+        'Cost': cost,
+    })
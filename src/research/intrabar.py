@@ -0,0 +1,244 @@
+"""
+盤中 (Intrabar) 精確回測模組
+原本的回測只在 60 分 K 收盤時檢查停損，無法分辨一根 K 棒內是先碰到停損還是先創高。
+本模組在「有持倉時」才沿著 1 分 K 的 high / low 路徑前進，以 1 分鐘解析度判定
+停損、保本與移動停利的觸發點；空手時的進場判斷仍維持 60 分 K 的向量化遮罩。
+
+同一根 1 分 K 內採保守假設：先檢查不利方向 (用此 K 棒之前的停損價)，再以此 K 棒的高低點更新極值。
+跳空穿越停損價時以該分鐘開盤價成交。
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .bnf_b_vectorized import BNFBFeatures, entry_candidates, default_bnf_b_params
+
+ONE_HOUR = np.timedelta64(60, 'm')
+ONE_DAY = np.timedelta64(1, 'D')
+SCAN_CHUNK = 2000  # 每次向後掃描的 1 分 K 數量，未出場再加倍
+
+
+@dataclass
+class MinuteBars:
+    times: np.ndarray   # datetime64[ns]
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+
+    @classmethod
+    def from_dataframe(cls, df_1m: pd.DataFrame) -> "MinuteBars":
+        """df_1m 可以是以 datetime 為 index (backtest.py) 或含 datetime 欄位"""
+        times = df_1m['datetime'] if 'datetime' in df_1m.columns else df_1m.index
+        return cls(
+            times=pd.to_datetime(times).values.astype('datetime64[ns]'),
+            open=df_1m['open'].to_numpy(dtype=float),
+            high=df_1m['high'].to_numpy(dtype=float),
+            low=df_1m['low'].to_numpy(dtype=float),
+            close=df_1m['close'].to_numpy(dtype=float),
+        )
+
+    def __len__(self):
+        return len(self.times)
+
+    def first_after(self, ts) -> int:
+        """第一根時間 >= ts 的 1 分 K index"""
+        return int(np.searchsorted(self.times, ts, side='left'))
+
+
+def trend_for_60m(df_60m: pd.DataFrame, df_1d: pd.DataFrame) -> np.ndarray:
+    """
+    向量化版本的 backtest.py 日 K 趨勢對應：取每根 60 分 K 時點之前已完成的日 K Supertrend 狀態。
+    df_1d 需已含 is_uptrend 欄位。
+    """
+    times_60m = pd.to_datetime(df_60m['datetime']).values.astype('datetime64[ns]')
+    times_1d = pd.to_datetime(df_1d['datetime']).values.astype('datetime64[ns]')
+    idx = np.searchsorted(times_1d, times_60m - ONE_DAY, side='right') - 1
+    trend = df_1d['is_uptrend'].to_numpy(dtype=bool)
+    return np.where(idx >= 0, trend[np.clip(idx, 0, None)], False)
+
+
+def _prev_extreme(values: np.ndarray, start_value: float, direction: int) -> np.ndarray:
+    """每根 1 分 K「之前」的最高 (多) / 最低 (空) 價，初始值為進場價"""
+    acc = np.maximum.accumulate if direction > 0 else np.minimum.accumulate
+    return acc(np.concatenate(([start_value], values)))[:-1]
+
+
+def _scan(m: MinuteBars, start: int, resolve):
+    """
+    以 SCAN_CHUNK 為單位往後掃描，resolve(seg_slice) 回傳 (相對 index, 成交價, 原因) 或 None。
+    段落需從 start 重新計算，因此每次加倍長度以維持攤銷 O(持倉長度)。
+    """
+    n = len(m)
+    length = SCAN_CHUNK
+    while start < n:
+        end = min(n, start + length)
+        hit = resolve(slice(start, end))
+        if hit is not None:
+            k, price, reason = hit
+            return start + k, price, reason
+        if end == n:
+            return None
+        length *= 2
+    return None
+
+
+def _mxf_exit(m: MinuteBars, start: int, direction: int, entry_price: float, initial_stop: float,
+              be_threshold: float, trailing_drop: float):
+    """Gatekeeper-MXF-V1 出場規則 (ATR 初始停損 → 保本 → 折返停利) 的 1 分 K 判定"""
+    d = direction
+
+    def resolve(seg):
+        o, h, l = m.open[seg], m.high[seg], m.low[seg]
+        fav = h if d > 0 else l
+        prev = _prev_extreme(fav, entry_price, d)
+        activated = (prev - entry_price) * d >= be_threshold
+        trail = prev - d * trailing_drop
+        # 原策略只在獲利仍 >= be_threshold 時才以折返出場，否則退守成本價
+        trailing_ok = (trail - entry_price) * d >= be_threshold
+        level = np.where(activated, np.where(trailing_ok, trail, entry_price), initial_stop)
+
+        adverse = l if d > 0 else h
+        hit = (adverse <= level) if d > 0 else (adverse >= level)
+        if not hit.any():
+            return None
+        k = int(np.argmax(hit))
+        price = min(o[k], level[k]) if d > 0 else max(o[k], level[k])
+        if not activated[k]:
+            reason = "Stop Loss"
+        elif trailing_ok[k]:
+            reason = "Trailing Stop"
+        else:
+            reason = "Break Even"
+        return k, price, reason
+
+    return _scan(m, start, resolve)
+
+
+def simulate_mxf_intrabar(df_60m: pd.DataFrame, df_1m: pd.DataFrame, bullish, be_threshold: float = 150.0,
+                          trailing_drop: float = 200.0, body_filter: float = 100.0, atr_stop_mult: float = 2.0,
+                          name: str = "Gatekeeper-MXF-V1_Intrabar") -> list:
+    """
+    Gatekeeper-MXF-V1 盤中精確回測。
+    df_60m 需已含 signal (UT Bot) 與 atr 欄位 (與 backtest.py 的預計算相同)。
+    """
+    m = MinuteBars.from_dataframe(df_1m)
+    times = pd.to_datetime(df_60m['datetime']).values.astype('datetime64[ns]')
+    close = df_60m['close'].to_numpy(dtype=float)
+    body = close - df_60m['open'].to_numpy(dtype=float)
+    signal = df_60m['signal'].to_numpy()
+    atr = df_60m['atr'].to_numpy(dtype=float)
+    bullish = np.asarray(bullish, dtype=bool)
+
+    long_mask = bullish & (signal == "Buy") & (body > body_filter)
+    short_mask = ~bullish & (signal == "Sell") & (-body > body_filter)
+    candidates = np.flatnonzero(long_mask | short_mask)
+
+    trades = []
+    flat_after = np.datetime64('NaT')
+    for i in candidates:
+        bar_close = times[i] + ONE_HOUR
+        if not np.isnat(flat_after) and bar_close <= flat_after:
+            continue  # 仍在持倉中
+        d = 1 if long_mask[i] else -1
+        entry_price = close[i]
+        initial_stop = entry_price - d * atr_stop_mult * atr[i]
+
+        hit = _mxf_exit(m, m.first_after(bar_close), d, entry_price, initial_stop, be_threshold, trailing_drop)
+        if hit is None:
+            break  # 資料結束仍持倉
+        k, exit_price, reason = hit
+        trades.append({
+            'strategy': name,
+            'direction': 'Long' if d > 0 else 'Short',
+            'entry_time': pd.Timestamp(times[i]),
+            'exit_time': pd.Timestamp(m.times[k]),
+            'entry_price': entry_price,
+            'exit_price': exit_price,
+            'pnl': (exit_price - entry_price) * d,
+            'reason': reason
+        })
+        flat_after = m.times[k]
+    return trades
+
+
+def simulate_bnf_b_intrabar(df_60m: pd.DataFrame, df_1m: pd.DataFrame, bullish=None,
+                            name: str = "Gatekeeper-BNF-B_Intrabar", **overrides) -> list:
+    """
+    Gatekeeper-BNF-B 盤中精確回測。
+    固定停損與 ATR 移動停利以 1 分 K 判定 (ATR 取最近一根已完成的 60 分 K)，
+    60MA 修復與時間停損仍依策略定義在 60 分 K 收盤判定。
+    """
+    params = default_bnf_b_params()
+    params.update(overrides)
+    f = BNFBFeatures.from_dataframe(df_60m, sma_period=params['sma_period'],
+                                    volume_ma_period=params['volume_ma_period'])
+    m = MinuteBars.from_dataframe(df_1m)
+    candidates, directions = entry_candidates(f, params['bias_threshold'], params['volume_spike_ratio'], bullish)
+
+    # 每根 1 分 K 所屬的 60 分 K，以及是否為該 60 分 K 的最後一分鐘 (收盤判定點)
+    bar_of_minute = np.searchsorted(f.times, m.times, side='right') - 1
+    is_bar_close = np.append(bar_of_minute[1:] != bar_of_minute[:-1], True)
+    sl, tp = params['fixed_sl_points'], params['partial_tp_points']
+    mult, stop_days = params['trailing_atr_mult'], params['time_stop_days']
+
+    def bnf_exit(start, i, d):
+        entry_price = f.close[i]
+
+        def resolve(seg):
+            o, h, l = m.open[seg], m.high[seg], m.low[seg]
+            bars = bar_of_minute[seg]
+            prev = _prev_extreme(h if d > 0 else l, entry_price, d)
+            activated = (prev - entry_price) * d >= tp
+            atr_prev = f.atr[np.clip(bars - 1, 0, None)]
+            raw_trail = prev - d * mult * atr_prev
+            if d > 0:
+                trail = np.maximum.accumulate(np.where(activated, raw_trail, -np.inf))
+                level = np.where(activated, np.maximum(entry_price, trail), entry_price - sl)
+                hit_stop = l <= level
+            else:
+                trail = np.minimum.accumulate(np.where(activated, raw_trail, np.inf))
+                level = np.where(activated, np.minimum(entry_price, trail), entry_price + sl)
+                hit_stop = h >= level
+
+            closing = is_bar_close[seg]
+            hit_sma = closing & ((f.close[bars] - f.sma[bars]) * d >= 0)
+            hit_time = closing & ((f.times[bars] - f.times[i]) // ONE_DAY >= stop_days)
+            any_exit = hit_stop | hit_sma | hit_time
+            if not any_exit.any():
+                return None
+            k = int(np.argmax(any_exit))
+            if hit_stop[k]:
+                price = min(o[k], level[k]) if d > 0 else max(o[k], level[k])
+                return k, price, "Stop Loss/Trailing Stop"
+            if hit_sma[k]:
+                return k, f.close[bars[k]], "Mean Reversion (Touch 60MA)"
+            return k, f.close[bars[k]], f"Time Stop (Max {stop_days} Days)"
+
+        return _scan(m, start, resolve)
+
+    trades = []
+    flat_after = np.datetime64('NaT')
+    last_entry_day = None
+    for i, d in zip(candidates, directions):
+        bar_close = f.times[i] + ONE_HOUR
+        if (not np.isnat(flat_after) and bar_close <= flat_after) or f.day[i] == last_entry_day:
+            continue
+        hit = bnf_exit(m.first_after(bar_close), i, d)
+        if hit is None:
+            break
+        k, exit_price, reason = hit
+        trades.append({
+            'strategy': name,
+            'direction': 'Long' if d > 0 else 'Short',
+            'entry_time': pd.Timestamp(f.times[i]),
+            'exit_time': pd.Timestamp(m.times[k]),
+            'entry_price': f.close[i],
+            'exit_price': exit_price,
+            'pnl': (exit_price - f.close[i]) * d,
+            'reason': reason
+        })
+        flat_after = m.times[k]
+        last_entry_day = f.day[i]
+    return trades
@@ -0,0 +1,221 @@
+"""
+績效指標模組
+以 NumPy 從欄位式 (columnar) 交易資料計算權益曲線、最大回撤、Sharpe / Sortino、
+獲利因子、曝險比例、MAE / MFE 與分策略統計。點數轉換金額的乘數取自 contract_specs。
+
+輸入可以是交易 dict 列表 (strategy.trades)、DataFrame 或 {欄位: 陣列} 的 dict，
+欄位名稱與 strategy.trades 相同: strategy, direction, entry_time, exit_time, entry_price, exit_price, pnl。
+"""
+import numpy as np
+import pandas as pd
+
+from src.contract_specs import spec_for, trading_day
+
+TRADING_DAYS = 252
+
+
+def as_columns(trades, sort: bool = True) -> dict:
+    """將各種交易資料格式統一轉為 {欄位: NumPy 陣列}，預設依出場時間排序"""
+    if isinstance(trades, dict):
+        cols = {k: np.asarray(v) for k, v in trades.items()}
+    else:
+        df = trades if isinstance(trades, pd.DataFrame) else pd.DataFrame(list(trades))
+        cols = {k: df[k].to_numpy() for k in df.columns}
+
+    if not cols or len(next(iter(cols.values()))) == 0:
+        return {'pnl': np.zeros(0)}
+
+    for key in ('entry_time', 'exit_time'):
+        if key in cols:
+            cols[key] = pd.to_datetime(cols[key]).values.astype('datetime64[ns]')
+    cols['pnl'] = cols['pnl'].astype(float)
+
+    if sort and 'exit_time' in cols:
+        order = np.argsort(cols['exit_time'], kind='stable')
+        cols = {k: v[order] for k, v in cols.items()}
+    return cols
+
+
+def equity_curve(pnl_points: np.ndarray, multiplier: float = 1.0, initial_capital: float = 0.0) -> np.ndarray:
+    """逐筆交易後的權益 (第 0 個元素為初始資金)"""
+    return initial_capital + np.concatenate(([0.0], np.cumsum(pnl_points * multiplier)))
+
+
+def max_drawdown(equity: np.ndarray):
+    """回傳 (最大回撤金額, 最大回撤比例)；比例以當時的權益高點為分母"""
+    if len(equity) == 0:
+        return 0.0, 0.0
+    peak = np.maximum.accumulate(equity)
+    dd = peak - equity
+    i = int(np.argmax(dd))
+    pct = dd[i] / peak[i] if peak[i] > 0 else 0.0
+    return float(dd[i]), float(pct)
+
+
+def daily_pnl(exit_time: np.ndarray, pnl: np.ndarray) -> np.ndarray:
+    """
+    依交易日彙總損益，並補上期間內沒有交易的日子 (0)。
+    交易日的歸屬見 contract_specs.trading_day (凌晨夜盤出場的交易歸到夜盤開盤的那一天)。
+    """
+    if len(pnl) == 0:
+        return np.zeros(0)
+    days = trading_day(exit_time).astype(np.int64)
+    offset = days - days.min()
+    per_day = np.bincount(offset, weights=pnl)
+    # 週末只保留有損益的日子 (例如假日補班)，避免週末的 0 稀釋波動度
+    weekday = (np.arange(days.min(), days.max() + 1) + 3) % 7  # 1970-01-01 是週四
+    return per_day[(weekday < 5) | (per_day != 0)]
+
+
+def sharpe_sortino(daily: np.ndarray, capital: float):
+    """以日報酬 (日損益 / 資金) 計算年化 Sharpe 與 Sortino (無風險利率視為 0)"""
+    if len(daily) < 2 or capital <= 0:
+        return 0.0, 0.0
+    returns = daily / capital
+    mean = returns.mean()
+    std = returns.std(ddof=1)
+    downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))
+    sharpe = mean / std * np.sqrt(TRADING_DAYS) if std > 0 else 0.0
+    sortino = mean / downside * np.sqrt(TRADING_DAYS) if downside > 0 else 0.0
+    return float(sharpe), float(sortino)
+
+
+def exposure(entry_time: np.ndarray, exit_time: np.ndarray) -> float:
+    """持倉時間 (重疊部分只算一次) 佔整個回測期間的比例"""
+    if len(entry_time) == 0:
+        return 0.0
+    order = np.argsort(entry_time, kind='stable')
+    start = entry_time[order].astype(np.int64)
+    end = exit_time[order].astype(np.int64)
+    running_end = np.maximum.accumulate(end)
+    # 與前面任何區間都不重疊者開啟新區段
+    new_block = np.concatenate(([True], start[1:] > running_end[:-1]))
+    block_id = np.cumsum(new_block) - 1
+    block_start = start[new_block]
+    block_end = np.zeros(block_id[-1] + 1, dtype=np.int64)
+    np.maximum.at(block_end, block_id, end)
+    span = running_end[-1] - start[0]
+    return float((block_end - block_start).sum() / span) if span > 0 else 0.0
+
+
+def excursions(cols: dict, bars: pd.DataFrame):
+    """
+    以 K 線 (1 分或 60 分) 計算每筆交易的 MAE / MFE (點數，皆為正值)。
+    使用 np.minimum.reduceat / np.maximum.reduceat 一次處理所有交易。
+    進場價是進場 K 棒的收盤價，區間從進場 K 棒的下一根開始 (進場前的高低點不算)，到出場 K 棒為止。
+    """
+    n = len(cols['pnl'])
+    if n == 0:
+        return np.zeros(0), np.zeros(0)
+    times = pd.to_datetime(bars['datetime'] if 'datetime' in bars.columns else bars.index)
+    times = times.values.astype('datetime64[ns]')
+    high = np.append(bars['high'].to_numpy(dtype=float), np.nan)
+    low = np.append(bars['low'].to_numpy(dtype=float), np.nan)
+
+    start = np.searchsorted(times, cols['entry_time'], side='right')
+    end = np.searchsorted(times, cols['exit_time'], side='right')
+    # 進場與出場在同一根 K 棒: 沒有持倉中的 K 棒，MAE / MFE 為 0
+    held = end > start
+    end = np.maximum(end, start + 1)
+    idx = np.empty(2 * n, dtype=np.int64)
+    idx[0::2], idx[1::2] = start, end
+    idx = np.clip(idx, 0, len(times))
+    seg_high = np.maximum.reduceat(high, idx)[0::2]
+    seg_low = np.minimum.reduceat(low, idx)[0::2]
+
+    sign = np.where(cols.get('direction', np.full(n, 'Long')) == 'Short', -1.0, 1.0)
+    entry = cols['entry_price'].astype(float)
+    favorable = np.where(sign > 0, seg_high - entry, entry - seg_low)
+    adverse = np.where(sign > 0, entry - seg_low, seg_high - entry)
+    adverse = np.where(held, np.maximum(adverse, 0.0), 0.0)
+    favorable = np.where(held, np.maximum(favorable, 0.0), 0.0)
+    return adverse, favorable
+
+
+def compute_metrics(trades, multiplier: float = None, contract_code: str = None,
+                    initial_capital: float = 1_000_000.0, bars: pd.DataFrame = None) -> dict:
+    """
+    計算完整績效指標。
+    :param multiplier: 每點價值；未指定時依 contract_code 查 contract_specs (預設 TMF)
+    :param bars: 提供 K 線時額外計算平均 MAE / MFE
+    """
+    cols = as_columns(trades)
+    pnl = cols['pnl']
+    n = len(pnl)
+    if multiplier is None:
+        multiplier = spec_for(contract_code).point_value
+
+    wins = pnl > 0
+    gross_profit = pnl[wins].sum()
+    gross_loss = -pnl[~wins].sum()
+    equity = equity_curve(pnl, multiplier, initial_capital)
+    dd, dd_pct = max_drawdown(equity)
+
+    result = {
+        'trades': n,
+        'win_rate': float(wins.mean() * 100) if n else 0.0,
+        'pnl_points': float(pnl.sum()),
+        'pnl_twd': float(pnl.sum() * multiplier),
+        'avg_pnl_points': float(pnl.mean()) if n else 0.0,
+        'profit_factor': float(gross_profit / gross_loss) if gross_loss > 0 else (float('inf') if gross_profit > 0 else 0.0),
+        'max_drawdown_twd': dd,
+        'max_drawdown_pct': dd_pct * 100,
+        'final_equity': float(equity[-1]),
+        'sharpe': 0.0,
+        'sortino': 0.0,
+        'exposure_pct': 0.0,
+    }
+    if n and 'exit_time' in cols:
+        result['sharpe'], result['sortino'] = sharpe_sortino(
+            daily_pnl(cols['exit_time'], pnl * multiplier), initial_capital
+        )
+        if 'entry_time' in cols:
+            result['exposure_pct'] = exposure(cols['entry_time'], cols['exit_time']) * 100
+    if bars is not None and n:
+        mae, mfe = excursions(cols, bars)
+        result['avg_mae_points'] = float(mae.mean())
+        result['avg_mfe_points'] = float(mfe.mean())
+    return result
+
+
+def metrics_by_strategy(trades, **kwargs) -> pd.DataFrame:
+    """依 strategy 欄位分組計算指標，並附上合併後的 'ALL' 列"""
+    cols = as_columns(trades)
+    rows = {}
+    if 'strategy' in cols and len(cols['pnl']):
+        for name in np.unique(cols['strategy']):
+            mask = cols['strategy'] == name
+            rows[name] = compute_metrics({k: v[mask] for k, v in cols.items()}, **kwargs)
+    rows['ALL'] = compute_metrics(cols, **kwargs)
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def batch_metrics(pnl_runs: list, multiplier: float = 1.0) -> pd.DataFrame:
+    """
+    一次計算大量最佳化結果 (每個元素為一組參數的逐筆損益點數) 的核心指標。
+    以補零的 2D 陣列向量化處理，適合每秒評分數千組參數。
+    """
+    k = len(pnl_runs)
+    lengths = np.fromiter((len(r) for r in pnl_runs), dtype=np.int64, count=k)
+    width = int(lengths.max()) if k else 0
+    mat = np.zeros((k, width))
+    mask = np.arange(width) < lengths[:, None]
+    if width:
+        mat[mask] = np.concatenate([np.asarray(r, dtype=float) for r in pnl_runs])
+    mat *= multiplier
+
+    equity = np.concatenate((np.zeros((k, 1)), np.cumsum(mat, axis=1)), axis=1)
+    drawdown = (np.maximum.accumulate(equity, axis=1) - equity).max(axis=1)
+    gross_profit = np.where(mat > 0, mat, 0.0).sum(axis=1)
+    gross_loss = -np.where(mat < 0, mat, 0.0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = np.where(lengths > 0, (mat > 0).sum(axis=1) / lengths * 100, 0.0)
+        profit_factor = np.where(gross_loss > 0, gross_profit / gross_loss,
+                                 np.where(gross_profit > 0, np.inf, 0.0))
+    return pd.DataFrame({
+        'Trades': lengths,
+        'Win_Rate': win_rate,
+        'PnL': mat.sum(axis=1),
+        'Profit_Factor': profit_factor,
+        'Max_DD': drawdown,
+    })
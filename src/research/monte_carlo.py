@@ -0,0 +1,149 @@
+"""
+蒙地卡羅交易序列重抽模組
+回測只有十幾筆交易時，單一條權益曲線的最大回撤幾乎沒有參考價值。
+本模組把逐筆損益重抽成數千至數十萬條路徑 (一次以 2D 陣列向量化計算)，
+估計最大回撤與破產機率的分布:
+
+- block:   區塊拔靴法 (circular block bootstrap)，保留連續交易間的相關性
+- shuffle: 只打亂交易順序，總損益不變，觀察順序風險
+- sign:    打亂順序並隨機翻轉正負號，作為「策略沒有優勢」的虛無分布
+
+破產定義為路徑中任一時點權益低於 ruin_equity (預設為一口的原始保證金，即無法再進場)。
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.contract_specs import spec_for
+from .metrics import as_columns
+
+METHODS = ('block', 'shuffle', 'sign')
+CHUNK_CELLS = 4_000_000  # 每批 (路徑數 × 交易數) 的上限，控制記憶體用量
+
+
+@dataclass
+class MonteCarloResult:
+    method: str
+    final_pnl: np.ndarray       # 每條路徑的總損益 (TWD)
+    max_drawdown: np.ndarray    # 每條路徑的最大回撤 (TWD)
+    ruined: np.ndarray          # 每條路徑是否觸及破產水位
+    observed_pnl: float         # 原始交易序列的總損益 (TWD)
+    observed_drawdown: float    # 原始交易序列的最大回撤 (TWD)
+
+    def summary(self, percentiles=(5, 50, 95, 99)) -> dict:
+        result = {
+            'method': self.method,
+            'paths': len(self.final_pnl),
+            'observed_pnl': self.observed_pnl,
+            'observed_dd': self.observed_drawdown,
+            'ruin_prob': float(self.ruined.mean()) if len(self.ruined) else 0.0,
+            'pnl_mean': float(self.final_pnl.mean()) if len(self.final_pnl) else 0.0,
+            'loss_prob': float((self.final_pnl <= 0).mean()) if len(self.final_pnl) else 0.0,
+        }
+        if len(self.final_pnl):
+            for p, dd, pnl in zip(percentiles,
+                                  np.percentile(self.max_drawdown, percentiles),
+                                  np.percentile(self.final_pnl, percentiles)):
+                result[f'dd_p{p}'] = float(dd)
+                result[f'pnl_p{p}'] = float(pnl)
+        # 原始回撤在重抽分布中的百分位，越高代表實際路徑越幸運/不幸
+        result['observed_dd_rank'] = float((self.max_drawdown <= self.observed_drawdown).mean()) \
+            if len(self.max_drawdown) else 0.0
+        return result
+
+
+def block_indices(n_trades: int, n_paths: int, block_size: int, rng: np.random.Generator) -> np.ndarray:
+    """環狀區塊拔靴法的索引矩陣 (n_paths, n_trades)"""
+    n_blocks = -(-n_trades // block_size)
+    starts = rng.integers(0, n_trades, size=(n_paths, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block_size)) % n_trades
+    return idx.reshape(n_paths, n_blocks * block_size)[:, :n_trades]
+
+
+def resample_paths(pnl: np.ndarray, n_paths: int, method: str = 'block', block_size: int = None,
+                   rng: np.random.Generator = None) -> np.ndarray:
+    """產生 (n_paths, n_trades) 的損益路徑矩陣"""
+    if method not in METHODS:
+        raise ValueError(f"未知的重抽方法: {method} (可用: {', '.join(METHODS)})")
+    rng = rng or np.random.default_rng()
+    n = len(pnl)
+    if method == 'block':
+        block_size = block_size or max(1, int(round(np.sqrt(n))))
+        return pnl[block_indices(n, n_paths, min(block_size, n), rng)]
+
+    paths = rng.permuted(np.broadcast_to(pnl, (n_paths, n)), axis=1)
+    if method == 'sign':
+        paths *= rng.choice(np.array([-1.0, 1.0]), size=paths.shape)
+    return paths
+
+
+def path_stats(paths: np.ndarray, initial_capital: float, ruin_equity: float):
+    """回傳每條路徑的 (總損益, 最大回撤, 是否破產)；paths 為 TWD"""
+    equity = np.cumsum(paths, axis=1)
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0), axis=1)
+    max_dd = (peak - equity).max(axis=1)
+    ruined = (initial_capital + equity.min(axis=1)) < ruin_equity
+    return equity[:, -1], max_dd, ruined
+
+
+def monte_carlo(trades, n_paths: int = 10_000, method: str = 'block', block_size: int = None,
+                multiplier: float = None, contract_code: str = None, initial_capital: float = 100_000.0,
+                ruin_equity: float = None, seed: int = None) -> MonteCarloResult:
+    """
+    :param trades: 交易 dict 列表、DataFrame、TradeLedger 匯出或單純的逐筆損益點數陣列
+    :param multiplier: 每點價值；未指定時依 contract_code 查 contract_specs
+    :param ruin_equity: 破產水位 (TWD)，預設為該合約一口的原始保證金
+    """
+    if isinstance(trades, np.ndarray) and trades.dtype.kind == 'f':
+        pnl = trades
+    else:
+        pnl = as_columns(trades)['pnl']
+    spec = spec_for(contract_code)
+    multiplier = spec.point_value if multiplier is None else multiplier
+    ruin_equity = spec.initial_margin if ruin_equity is None else ruin_equity
+    pnl = np.asarray(pnl, dtype=float) * multiplier
+
+    if len(pnl) == 0:
+        empty = np.zeros(0)
+        return MonteCarloResult(method, empty, empty, np.zeros(0, dtype=bool), 0.0, 0.0)
+
+    observed = path_stats(pnl[None, :], initial_capital, ruin_equity)
+    rng = np.random.default_rng(seed)
+    chunk = max(1, CHUNK_CELLS // len(pnl))
+    finals, dds, ruins = [], [], []
+    for start in range(0, n_paths, chunk):
+        paths = resample_paths(pnl, min(chunk, n_paths - start), method, block_size, rng)
+        final, dd, ruined = path_stats(paths, initial_capital, ruin_equity)
+        finals.append(final)
+        dds.append(dd)
+        ruins.append(ruined)
+
+    return MonteCarloResult(
+        method=method,
+        final_pnl=np.concatenate(finals),
+        max_drawdown=np.concatenate(dds),
+        ruined=np.concatenate(ruins),
+        observed_pnl=float(observed[0][0]),
+        observed_drawdown=float(observed[1][0]),
+    )
+
+
+def robustness_table(results: list, param_keys: list, methods=('block', 'sign'), **kwargs) -> pd.DataFrame:
+    """
+    對最佳化結果 (每筆 dict 需含 'trades') 逐組參數跑蒙地卡羅，彙整回撤與破產機率。
+    :param param_keys: 用來識別參數組合的欄位，例如 ['UT_Key', 'Trail_Drop']
+    :param kwargs: 傳給 monte_carlo 的其他參數 (n_paths, contract_code, initial_capital, ...)
+    """
+    rows = []
+    for res in results:
+        row = {k: res[k] for k in param_keys}
+        for method in methods:
+            summary = monte_carlo(res['trades'], method=method, **kwargs).summary()
+            prefix = method.capitalize()
+            row[f'{prefix}_DD_p50'] = summary.get('dd_p50', 0.0)
+            row[f'{prefix}_DD_p95'] = summary.get('dd_p95', 0.0)
+            row[f'{prefix}_Ruin'] = summary['ruin_prob']
+            row[f'{prefix}_Loss'] = summary['loss_prob']
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,160 @@
+"""
+平行網格搜尋模組
+以 ProcessPoolExecutor 平行評估參數組合，市場資料 (60m / 1D K 線) 透過
+multiprocessing.shared_memory 只放一份，子程序直接附掛 (attach) 而不必每個任務 pickle DataFrame。
+
+用法:
+    def evaluate(data, ut_key, trailing_drop):
+        df_60m, df_1d = data['60m'], data['1d']
+        ...
+        return {'Trades': ..., 'PnL': ...}
+
+    runner = GridRunner(evaluate, {'60m': df_60m, '1d': df_1d}, max_workers=8)
+    results = runner.run(param_grid(ut_key=[3.0, 4.0], trailing_drop=[100, 200]))
+
+評估函式必須定義在模組最上層 (可被 pickle)，結果順序與輸入參數順序一致。
+"""
+import itertools
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from src.market_bus import attach_shm
+
+# 子程序中已附掛的資料 (由 initializer 設定)
+_WORKER_DATA = None
+_WORKER_HANDLES = []
+
+
+def param_grid(**ranges) -> list:
+    """將各參數的候選值展開為 itertools.product 順序的參數字典列表"""
+    keys = list(ranges.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*ranges.values())]
+
+
+class SharedFrame:
+    """
+    將 DataFrame 的每個欄位各自放入一塊共享記憶體。
+    只支援數值 / bool / datetime64 欄位 (object 欄位無法零複製共享)。
+    """
+    def __init__(self, df: pd.DataFrame):
+        self.length = len(df)
+        self.columns = []
+        self._blocks = []
+
+        for col in df.columns:
+            values = df[col].to_numpy()
+            kind = values.dtype.str if np.issubdtype(values.dtype, np.datetime64) else 'plain'
+            if kind != 'plain':
+                values = values.view(np.int64)  # 保留原本的時間單位 (ns / us)
+            elif values.dtype == object:
+                raise ValueError(f"欄位 {col} 為 object 型別，無法放入共享記憶體")
+
+            shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            buf = np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)
+            buf[:] = values
+            self._blocks.append(shm)
+            self.columns.append((col, shm.name, values.dtype.str, kind))
+
+    @property
+    def spec(self) -> dict:
+        """可 pickle 的描述資訊，子程序用來附掛資料"""
+        return {'length': self.length, 'columns': list(self.columns)}
+
+    @staticmethod
+    def attach(spec: dict, handles: list) -> pd.DataFrame:
+        """依 spec 附掛共享記憶體並組回 DataFrame (handles 需保留以免緩衝區被釋放)"""
+        data = {}
+        for col, name, dtype, kind in spec['columns']:
+            shm = attach_shm(name)
+            handles.append(shm)
+            arr = np.ndarray((spec['length'],), dtype=np.dtype(dtype), buffer=shm.buf)
+            data[col] = arr if kind == 'plain' else arr.view(np.dtype(kind))
+        return pd.DataFrame(data, copy=False)
+
+    def close(self):
+        """釋放並刪除共享記憶體 (只由建立者呼叫)"""
+        for shm in self._blocks:
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks = []
+
+
+def _init_worker(specs: dict):
+    global _WORKER_DATA
+    _WORKER_DATA = {key: SharedFrame.attach(spec, _WORKER_HANDLES) for key, spec in specs.items()}
+
+
+def _run_chunk(func, chunk: list) -> list:
+    return [(idx, func(_WORKER_DATA, **params)) for idx, params in chunk]
+
+
+def print_progress(done: int, total: int):
+    """預設的進度輸出 (與 optimize 腳本原本的格式相同)"""
+    sys.stdout.write(f"\rEvaluating {done}/{total}...")
+    sys.stdout.flush()
+    if done == total:
+        sys.stdout.write("\n")
+
+
+class GridRunner:
+    def __init__(self, func, datasets: dict, max_workers: int = None, chunk_size: int = None,
+                 progress=print_progress):
+        """
+        :param func: 評估函式 func(data: dict[str, DataFrame], **params) -> 結果
+        :param datasets: 共享給所有子程序的 DataFrame，例如 {'60m': df_60m, '1d': df_1d}
+        :param max_workers: 子程序數量，預設為 CPU 核心數；1 代表在本程序內直接執行
+        :param chunk_size: 每個任務包含的參數組數，預設約為每個 worker 分到 4 包
+        :param progress: 進度回呼 progress(done, total)，None 代表不輸出
+        """
+        self.func = func
+        self.datasets = datasets
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+    def _chunks(self, indexed: list) -> list:
+        size = self.chunk_size or max(1, math.ceil(len(indexed) / (self.max_workers * 4)))
+        return [indexed[i:i + size] for i in range(0, len(indexed), size)]
+
+    def run(self, params_list: list) -> list:
+        """評估所有參數組合，回傳與 params_list 同順序的結果列表"""
+        total = len(params_list)
+        results = [None] * total
+        if total == 0:
+            return results
+
+        if self.max_workers == 1:
+            for idx, params in enumerate(params_list):
+                results[idx] = self.func(self.datasets, **params)
+                if self.progress:
+                    self.progress(idx + 1, total)
+            return results
+
+        shared = {key: SharedFrame(df) for key, df in self.datasets.items()}
+        try:
+            specs = {key: frame.spec for key, frame in shared.items()}
+            done = 0
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                     initargs=(specs,)) as pool:
+                futures = [pool.submit(_run_chunk, self.func, chunk)
+                           for chunk in self._chunks(list(enumerate(params_list)))]
+                for future in as_completed(futures):
+                    chunk_results = future.result()
+                    for idx, result in chunk_results:
+                        results[idx] = result
+                    done += len(chunk_results)
+                    if self.progress:
+                        self.progress(done, total)
+        finally:
+            for frame in shared.values():
+                frame.close()
+        return results
@@ -0,0 +1,133 @@
+"""
+模擬結果快取模組
+將每組參數的模擬結果 (交易列表 + 摘要指標) 存在本機檔案，
+鍵值由 (策略名稱, 參數, 策略程式碼版本, 資料集雜湊) 組成。
+擴大網格後重跑 optimize 腳本時，只需計算新增的網格點。
+"""
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+import time
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_CACHE_DIR = os.path.join(PROJECT_ROOT, ".cache", "results")
+# 所有策略模擬共用、但不一定是傳入物件所在模組的程式碼: 指標計算與摘要指標
+SHARED_MODULES = ("src.strategies.indicators", "src.research.metrics")
+
+
+def dataset_hash(*frames) -> str:
+    """計算一或多個 DataFrame 的內容雜湊 (欄位名稱 + 每列數值)"""
+    h = hashlib.sha1()
+    for df in frames:
+        h.update(",".join(map(str, df.columns)).encode())
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def code_version(*objs) -> str:
+    """
+    以物件所在模組與共用模組 (SHARED_MODULES) 的原始碼計算版本雜湊，
+    策略邏輯、指標或摘要指標一改動舊結果就自動失效
+    """
+    modules = [inspect.getmodule(obj) for obj in objs]
+    modules += [importlib.import_module(name) for name in SHARED_MODULES]
+    h = hashlib.sha1()
+    for module in dict.fromkeys(modules):
+        h.update(inspect.getsource(module).encode())
+    return h.hexdigest()[:16]
+
+
+class ResultCache:
+    def __init__(self, root: str = None, max_bytes: int = 512 * 1024 * 1024, max_age_days: float = 30):
+        """
+        :param root: 快取目錄，預設為環境變數 RESULT_CACHE_DIR 或專案下的 .cache/results
+        :param max_bytes: 快取總容量上限，超過時由最久未使用的項目開始刪除
+        :param max_age_days: 超過此天數未使用的項目會被刪除
+        """
+        self.root = root or os.environ.get("RESULT_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def make_key(strategy: str, params: dict, version: str, data_hash: str) -> str:
+        payload = json.dumps(
+            {'strategy': strategy, 'params': params, 'version': version, 'data': data_hash},
+            sort_keys=True, default=str
+        )
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.pkl")
+
+    def get(self, key: str):
+        """讀取快取結果，不存在則回傳 None；命中時更新 mtime 作為最近使用時間"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        os.utime(path)
+        return value
+
+    def put(self, key: str, value):
+        """寫入快取 (先寫暫存檔再原子替換，避免中斷時留下半個檔案)"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def _entries(self) -> list:
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".pkl"):
+                    path = os.path.join(dirpath, name)
+                    st = os.stat(path)
+                    entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self) -> int:
+        """依年齡與容量上限清除快取，回傳刪除的項目數"""
+        entries = sorted(self._entries())
+        cutoff = time.time() - self.max_age_days * 86400
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            if mtime >= cutoff and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def run(self, strategy: str, version: str, data_hash: str, params_list: list, compute) -> list:
+        """
+        對 params_list 取回快取結果，只把缺少的參數組交給 compute 計算後寫回快取。
+        :param compute: compute(missing_params_list) -> 同順序的結果列表 (例如 GridRunner.run)
+        :return: 與 params_list 同順序的結果列表
+        """
+        keys = [self.make_key(strategy, params, version, data_hash) for params in params_list]
+        results = [self.get(key) for key in keys]
+        missing = [i for i, res in enumerate(results) if res is None]
+
+        print(f"[ResultCache] {strategy}: {len(params_list) - len(missing)} hit / {len(missing)} to evaluate")
+        if missing:
+            computed = compute([params_list[i] for i in missing])
+            for i, res in zip(missing, computed):
+                self.put(keys[i], res)
+                results[i] = res
+            self.evict()
+        return results
@@ -0,0 +1,122 @@
+"""
+自適應參數搜尋模組 (Successive Halving)
+先在較短的近期資料上評估大量參數組合，只把表現最好的 1/eta 晉級到更長的歷史，
+最後只有少數組合需要跑完整資料，取代維度一多就爆炸的 itertools.product 全網格。
+
+評估函式與 GridRunner 相同: evaluate(data: dict[str, DataFrame], **params) -> dict
+"""
+import math
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from .parallel_runner import GridRunner
+
+# 兩套策略可調整的完整參數空間 (離散候選值)
+MXF_SPACE = {
+    'ut_key': [2.5, 3.0, 3.5, 4.0, 4.5],
+    'trailing_drop': [50, 100, 150, 200, 250],
+    'be_threshold': [100.0, 150.0, 200.0],
+    'body_filter': [60.0, 80.0, 100.0, 120.0],
+}
+
+BNF_B_SPACE = {
+    'bias_threshold': [-1.0, -1.5, -2.0, -2.5, -3.0],
+    'volume_spike_ratio': [1.2, 1.5, 1.8, 2.0, 2.5],
+    'fixed_sl_points': [60.0, 80.0, 100.0, 150.0],
+    'partial_tp_points': [50.0, 80.0, 120.0],
+    'trailing_atr_mult': [1.5, 2.0, 2.5, 3.0],
+    'time_stop_days': [1, 2, 3, 5],
+}
+
+
+def space_size(space: dict) -> int:
+    return math.prod(len(values) for values in space.values())
+
+
+def sample_configs(space: dict, n: int, seed: int = 0) -> list:
+    """
+    從參數空間抽出 n 組不重複的組合；若空間本身不超過 n 組則全部列出。
+    """
+    keys = list(space.keys())
+    if space_size(space) <= n:
+        return [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+
+    rng = np.random.default_rng(seed)
+    seen = set()
+    configs = []
+    while len(configs) < n:
+        combo = tuple(int(rng.integers(len(space[k]))) for k in keys)
+        if combo in seen:
+            continue
+        seen.add(combo)
+        configs.append({k: space[k][i] for k, i in zip(keys, combo)})
+    return configs
+
+
+def slice_history(datasets: dict, fraction: float, time_column: str = 'datetime') -> dict:
+    """
+    只保留最近 fraction 比例的時間範圍 (以第一個資料集的起訖時間為準)。
+    指標暖機所需的 K 棒也包含在這段範圍內，因此短視窗的結果偏保守。
+    """
+    if fraction >= 1.0:
+        return datasets
+    first = next(iter(datasets.values()))
+    start, end = first[time_column].iloc[0], first[time_column].iloc[-1]
+    cutoff = end - (end - start) * fraction
+    return {
+        key: df[df[time_column] >= cutoff].reset_index(drop=True)
+        for key, df in datasets.items()
+    }
+
+
+def default_score(result: dict) -> float:
+    return float(result.get('PnL', 0.0))
+
+
+def successive_halving(evaluate, datasets: dict, space: dict, n_configs: int = 81, eta: int = 3,
+                       max_rungs: int = 4, min_fraction: float = None, score=default_score, seed: int = 0,
+                       max_workers: int = None, time_column: str = 'datetime'):
+    """
+    :param evaluate: 評估函式 evaluate(data, **params) -> dict
+    :param datasets: 完整歷史資料，例如 {'60m': df_60m, '1d': df_1d}
+    :param space: 參數空間 {名稱: 候選值列表}
+    :param n_configs: 第一輪評估的組合數
+    :param eta: 每輪保留 1/eta 並把資料長度放大 eta 倍
+    :param max_rungs: 最多幾輪 (限制第一輪資料不要短到連指標暖機都不夠)
+    :param min_fraction: 第一輪使用的資料比例，預設讓最後一輪剛好用到完整歷史
+    :param score: 由評估結果計算分數的函式 (越大越好)
+    :return: (最後一輪結果 DataFrame 依分數排序, 每一輪的紀錄列表)
+    """
+    configs = sample_configs(space, n_configs, seed)
+    n_rungs = int(math.floor(math.log(len(configs), eta))) + 1 if len(configs) > 1 else 1
+    n_rungs = min(n_rungs, max_rungs)
+    if min_fraction is None:
+        min_fraction = float(eta) ** -(n_rungs - 1)
+
+    history = []
+    results = []
+    for rung in range(n_rungs):
+        fraction = min(1.0, min_fraction * eta ** rung)
+        if rung == n_rungs - 1:
+            fraction = 1.0
+        data = slice_history(datasets, fraction, time_column)
+
+        print(f"[Search] Rung {rung + 1}/{n_rungs}: {len(configs)} configs on {fraction:.0%} of history")
+        results = GridRunner(evaluate, data, max_workers=max_workers).run(configs)
+        scores = [score(res) for res in results]
+        history.append({'rung': rung, 'fraction': fraction, 'configs': configs, 'scores': scores})
+
+        if rung == n_rungs - 1:
+            break
+        keep = max(1, len(configs) // eta)
+        order = np.argsort(-np.asarray(scores), kind='stable')[:keep]
+        configs = [configs[i] for i in order]
+
+    final = pd.DataFrame([
+        dict(cfg, **{k: v for k, v in res.items() if k not in cfg and k != 'trades'}, Score=score(res))
+        for cfg, res in zip(configs, results)
+    ])
+    final = final.sort_values(by='Score', ascending=False, kind='stable').reset_index(drop=True)
+    return final, history
@@ -0,0 +1,169 @@
+"""
+Walk-Forward 最佳化模組
+將歷史切成滾動的 (訓練, 測試) 視窗：每個訓練視窗各自挑出最佳參數，
+再用該參數跑緊接著的測試視窗，最後把所有樣本外 (OOS) 交易串成一條權益曲線。
+
+- 所有 fold 的訓練評估攤平成一批任務交給 GridRunner 平行執行
+- 每個 (參數, 視窗) 的結果寫入 ResultCache，新增一個 fold 只需計算新視窗
+- 子程序內會保留最近切出的視窗，同一視窗的多組參數共用同一份 DataFrame (與其特徵快取)
+"""
+from dataclasses import dataclass, field
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from .parallel_runner import GridRunner
+from .result_cache import dataset_hash
+from .search import default_score
+
+# 子程序中最近切出的資料視窗 {(id(data), start, end): (data, 視窗 datasets)}
+_WINDOW_MEMO = {}
+_WINDOW_MEMO_SIZE = 4
+
+
+@dataclass
+class Fold:
+    index: int
+    train_start: pd.Timestamp
+    train_end: pd.Timestamp
+    test_start: pd.Timestamp
+    test_end: pd.Timestamp
+
+
+@dataclass
+class WalkForwardResult:
+    folds: pd.DataFrame
+    oos_trades: pd.DataFrame
+    equity: pd.Series = field(default_factory=pd.Series)
+
+
+def make_folds(times, train_days: int, test_days: int, step_days: int = None) -> list:
+    """
+    依日曆天切出滾動視窗，最後一個測試視窗不超過資料結尾。
+    :param step_days: 每個 fold 往前推進的天數，預設等於 test_days (測試視窗首尾相接)
+    """
+    times = pd.to_datetime(pd.Series(times))
+    step = pd.Timedelta(days=step_days or test_days)
+    train_len, test_len = pd.Timedelta(days=train_days), pd.Timedelta(days=test_days)
+
+    start = times.iloc[0].normalize()
+    last = times.iloc[-1]
+    folds = []
+    while start + train_len + test_len <= last + pd.Timedelta(days=1):
+        train_end = start + train_len
+        folds.append(Fold(len(folds), start, train_end, train_end, train_end + test_len))
+        start += step
+    return folds
+
+
+def slice_window(datasets: dict, start, end, time_column: str = 'datetime') -> dict:
+    """取出 [start, end) 的資料"""
+    return {
+        key: df[(df[time_column] >= start) & (df[time_column] < end)].reset_index(drop=True)
+        for key, df in datasets.items()
+    }
+
+
+def _evaluate_window(evaluate, data, window_start, window_end, **params):
+    """GridRunner 任務: 在子程序內切出視窗 (同視窗重複使用) 後呼叫原本的評估函式"""
+    key = (id(data), window_start, window_end)
+    cached = _WINDOW_MEMO.get(key)
+    if cached is None or cached[0] is not data:
+        if len(_WINDOW_MEMO) >= _WINDOW_MEMO_SIZE:
+            _WINDOW_MEMO.pop(next(iter(_WINDOW_MEMO)))
+        cached = _WINDOW_MEMO[key] = (data, slice_window(data, window_start, window_end))
+    return evaluate(cached[1], **params)
+
+
+def walk_forward(evaluate, datasets: dict, params_list: list, train_days: int = 90, test_days: int = 30,
+                 step_days: int = None, warmup_days: int = 20, strategy: str = "strategy", version: str = "",
+                 cache=None, score=default_score, max_workers: int = None) -> WalkForwardResult:
+    """
+    :param evaluate: evaluate(data, **params) -> dict，結果需包含 'trades' (交易列表)
+    :param datasets: 完整歷史 {'60m': df_60m, '1d': df_1d}
+    :param params_list: 每個訓練視窗要評估的參數組合 (例如 param_grid(...) 或 sample_configs(...))
+    :param warmup_days: 測試視窗往前多帶的天數，只用於指標暖機，其間的進場不計入 OOS
+    :param strategy, version: ResultCache 鍵值的一部分 (version 建議用 code_version(...))
+    :param cache: ResultCache；None 則每次重算
+    """
+    first = next(iter(datasets.values()))
+    folds = make_folds(first['datetime'], train_days, test_days, step_days)
+    if not folds:
+        raise ValueError("資料長度不足以切出任何 walk-forward fold")
+
+    task = partial(_evaluate_window, evaluate)
+    runner = GridRunner(task, datasets, max_workers=max_workers)
+
+    def run_tasks(tasks: list) -> list:
+        """tasks: [(視窗起點, 視窗終點, 參數)]，依視窗雜湊查快取後只計算缺少者"""
+        if cache is None:
+            return runner.run([dict(p, window_start=s, window_end=e) for s, e, p in tasks])
+
+        results = [None] * len(tasks)
+        by_window = {}
+        for i, (s, e, p) in enumerate(tasks):
+            by_window.setdefault((s, e), []).append(i)
+
+        keys = {}
+        missing = []
+        for (s, e), idxs in by_window.items():
+            data_hash = dataset_hash(*slice_window(datasets, s, e).values())
+            for i in idxs:
+                keys[i] = cache.make_key(strategy, tasks[i][2], version, data_hash)
+                results[i] = cache.get(keys[i])
+                if results[i] is None:
+                    missing.append(i)
+
+        print(f"[WalkForward] {len(tasks) - len(missing)} cached / {len(missing)} to evaluate")
+        if missing:
+            computed = runner.run([dict(tasks[i][2], window_start=tasks[i][0], window_end=tasks[i][1])
+                                   for i in missing])
+            for i, res in zip(missing, computed):
+                cache.put(keys[i], res)
+                results[i] = res
+            cache.evict()
+        return results
+
+    # 1. 所有 fold 的訓練視窗一次平行評估
+    train_tasks = [(f.train_start, f.train_end, p) for f in folds for p in params_list]
+    train_results = run_tasks(train_tasks)
+
+    best_params = []
+    for k, fold in enumerate(folds):
+        chunk = train_results[k * len(params_list):(k + 1) * len(params_list)]
+        scores = np.asarray([score(res) for res in chunk])
+        best = int(np.argmax(scores))
+        best_params.append((params_list[best], float(scores[best])))
+
+    # 2. 以各 fold 的最佳參數跑測試視窗 (含暖機區間)
+    warmup = pd.Timedelta(days=warmup_days)
+    test_tasks = [(f.test_start - warmup, f.test_end, params) for f, (params, _) in zip(folds, best_params)]
+    test_results = run_tasks(test_tasks)
+
+    # 3. 串接樣本外交易
+    rows = []
+    oos = []
+    for fold, (params, train_score), res in zip(folds, best_params, test_results):
+        trades = [t for t in res.get('trades', [])
+                  if fold.test_start <= pd.Timestamp(t['entry_time']) < fold.test_end]
+        oos.extend(dict(t, fold=fold.index) for t in trades)
+        rows.append({
+            'fold': fold.index,
+            'train_start': fold.train_start,
+            'train_end': fold.train_end,
+            'test_start': fold.test_start,
+            'test_end': fold.test_end,
+            'params': params,
+            'train_score': train_score,
+            'oos_trades': len(trades),
+            'oos_pnl': sum(t['pnl'] for t in trades),
+        })
+
+    oos_df = pd.DataFrame(oos)
+    equity = pd.Series(dtype=float)
+    if not oos_df.empty:
+        oos_df = oos_df.sort_values('exit_time', kind='stable').reset_index(drop=True)
+        equity = pd.Series(oos_df['pnl'].cumsum().to_numpy(), index=pd.to_datetime(oos_df['exit_time']))
+
+    return WalkForwardResult(folds=pd.DataFrame(rows), oos_trades=oos_df, equity=equity)
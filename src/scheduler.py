@@ -0,0 +1,179 @@
+"""
+排程器 (Session Scheduler)
+取代 main.py 每 60 秒醒來比對 strftime("%H:%M") 的監控迴圈: 迴圈睡眠稍有延遲就可能跳過整個通知分鐘，
+而且每分鐘都重算到期日與日 K 趨勢。改為以最小堆積 (heapq) 保存各工作的下一次到期時間，
+主執行緒只睡到最早的到期時間，到期即執行:
+
+    scheduler = Scheduler()
+    scheduler.session('day_close', 'day_close', on_day_close, delay=timedelta(minutes=1))
+    scheduler.every(300, 'reconcile', engine.reconcile)
+    scheduler.call_at(roll_time, 'roll', check_rolls)
+    scheduler.run_forever()      # Ctrl+C (KeyboardInterrupt) 會中斷等待
+
+- 週期工作以「上次到期時間 + 間隔」排下一次，不累積執行時間造成的漂移；落後超過一個間隔時跳到下一個未來時點
+- 每日 / 交易時段工作依星期篩選 (SESSION_EVENTS)，錯過時點 (例如主機暫停) 時醒來後補執行一次
+- 工作拋出例外只記錄錯誤，不影響其他工作與下一次排程
+"""
+import heapq
+import itertools
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, time as dt_time, timedelta
+
+import pytz
+
+TW_TZ = pytz.timezone('Asia/Taipei')
+
+WEEKDAYS = (0, 1, 2, 3, 4)
+# 期交所交易時段 (台北時間): {事件: (時間, 星期 0=週一)}；夜盤跨日，週六清晨收盤
+SESSION_EVENTS = {
+    'day_open': (dt_time(8, 45), WEEKDAYS),
+    'day_close': (dt_time(13, 45), WEEKDAYS),
+    'night_open': (dt_time(15, 0), WEEKDAYS),
+    'night_close': (dt_time(5, 0), (1, 2, 3, 4, 5)),
+}
+
+
+@dataclass(order=True)
+class Job:
+    due: datetime
+    seq: int
+    name: str = field(compare=False)
+    fn: object = field(compare=False, repr=False)
+    interval: timedelta = field(default=None, compare=False)   # 週期工作
+    at: dt_time = field(default=None, compare=False)           # 每日工作
+    weekdays: tuple = field(default=None, compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+class Scheduler:
+    def __init__(self, tz=TW_TZ, clock=None, max_sleep: float = 300.0):
+        """
+        :param clock: 回傳目前時間 (含時區) 的函式，測試時可替換
+        :param max_sleep: 單次等待上限 (秒)；系統時間被調整時最晚在此時間內重新計算
+        """
+        self.tz = tz
+        self.clock = clock or (lambda: datetime.now(self.tz))
+        self.max_sleep = max_sleep
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+
+    # ------------------------------------------------------------------
+    # 排程
+    # ------------------------------------------------------------------
+    def _localize(self, when: datetime) -> datetime:
+        return self.tz.localize(when) if when.tzinfo is None else when.astimezone(self.tz)
+
+    def _push(self, job: Job) -> Job:
+        with self._lock:
+            job.seq = next(self._seq)
+            heapq.heappush(self._heap, job)
+        self._wakeup.set()
+        return job
+
+    def call_at(self, when: datetime, name: str, fn) -> Job:
+        """在指定時間執行一次 (未帶時區視為 tz 時間；已過去則下一輪立即執行)"""
+        return self._push(Job(self._localize(when), 0, name, fn))
+
+    def call_later(self, seconds: float, name: str, fn) -> Job:
+        return self.call_at(self.clock() + timedelta(seconds=seconds), name, fn)
+
+    def every(self, seconds: float, name: str, fn, first: datetime = None) -> Job:
+        """每 seconds 秒執行；first 為第一次執行時間 (預設為一個間隔之後)"""
+        interval = timedelta(seconds=seconds)
+        due = self._localize(first) if first is not None else self.clock() + interval
+        return self._push(Job(due, 0, name, fn, interval=interval))
+
+    def daily(self, at: dt_time, name: str, fn, weekdays: tuple = None) -> Job:
+        """每天 at 執行；weekdays 限定星期 (0=週一)"""
+        due = self._next_daily(self.clock(), at, weekdays)
+        return self._push(Job(due, 0, name, fn, at=at, weekdays=weekdays))
+
+    def session(self, event: str, name: str, fn, delay: timedelta = timedelta(0)) -> Job:
+        """
+        交易時段事件 (SESSION_EVENTS) 發生後 delay 執行
+        :param delay: 例如開盤後 1 分鐘才有開盤價、收盤後 1 分鐘才有最後成交
+        """
+        at, weekdays = SESSION_EVENTS[event]
+        shifted = datetime.combine(datetime(2000, 1, 3), at) + delay
+        if shifted.date() != datetime(2000, 1, 3).date():
+            raise ValueError(f"delay 不可讓 {event} 跨日: {delay}")
+        return self.daily(shifted.time(), name, fn, weekdays)
+
+    def cancel(self, job: Job):
+        job.cancelled = True
+
+    def _next_daily(self, after: datetime, at: dt_time, weekdays: tuple = None) -> datetime:
+        after = after.astimezone(self.tz)
+        for offset in range(8):
+            day = after.date() + timedelta(days=offset)
+            if weekdays is not None and day.weekday() not in weekdays:
+                continue
+            due = self.tz.localize(datetime.combine(day, at))
+            if due > after:
+                return due
+        raise ValueError(f"weekdays 沒有任何有效的星期: {weekdays}")
+
+    def _reschedule(self, job: Job, now: datetime):
+        if job.interval is not None:
+            missed = max(0, (now - job.due) // job.interval)
+            job.due = job.due + job.interval * (missed + 1)
+        elif job.at is not None:
+            job.due = self._next_daily(max(now, job.due), job.at, job.weekdays)
+        else:
+            return
+        self._push(job)
+
+    # ------------------------------------------------------------------
+    # 執行
+    # ------------------------------------------------------------------
+    def jobs(self) -> list:
+        """尚未取消的工作 (依到期時間排序)"""
+        with self._lock:
+            return sorted(job for job in self._heap if not job.cancelled)
+
+    def next_due(self):
+        with self._lock:
+            while self._heap and self._heap[0].cancelled:
+                heapq.heappop(self._heap)
+            return self._heap[0].due if self._heap else None
+
+    def run_pending(self, now: datetime = None) -> list:
+        """執行所有已到期的工作，回傳執行的工作名稱"""
+        now = self._localize(now) if now is not None else self.clock()
+        fired = []
+        while True:
+            with self._lock:
+                if not self._heap or self._heap[0].due > now:
+                    break
+                job = heapq.heappop(self._heap)
+            if job.cancelled:
+                continue
+            try:
+                job.fn()
+            except Exception as e:
+                logging.exception(f"[Scheduler] 工作 {job.name} 執行失敗: {e}")
+            fired.append(job.name)
+            if not job.cancelled:
+                self._reschedule(job, now)
+        return fired
+
+    def run_forever(self):
+        """阻塞執行直到 stop()；沒有到期工作時睡眠 (新增工作會提早喚醒)"""
+        self._stopped = False
+        while not self._stopped:
+            self._wakeup.clear()
+            self.run_pending()
+            due = self.next_due()
+            timeout = self.max_sleep
+            if due is not None:
+                timeout = min(timeout, max(0.0, (due - self.clock()).total_seconds()))
+            self._wakeup.wait(timeout)
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
@@ -0,0 +1,111 @@
+"""
+模擬用 PortfolioManager
+介面與 PortfolioManager 相同 (get_virtual_position / set_virtual_position / reconcile_positions)，
+但虛擬部位存在記憶體中、實體單只記錄不送出，不需要 PostgreSQL 與券商連線。
+
+用於多策略合併回測:
+- 與實盤相同地把各策略的虛擬部位淨額化，只有淨部位變動 (Delta) 才產生「實體單」
+- 統計實際送出的委託數、成交口數、手續費與期交稅
+- 依 contract_specs 的保證金計算淨部位與「未淨額化」(各策略各自持倉) 時的保證金占用；
+  策略方向相反時淨部位互相抵銷，這是淨額化主要省下的成本
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src.contract_specs import spec_for
+from src.research.execution import ExecutionModel
+
+
+class SimulatedPortfolioManager:
+    def __init__(self, execution: ExecutionModel = None, limit_offset: float = 50.0):
+        """
+        :param execution: 計算手續費與期交稅用的成本模型 (只取 commission / tax_rate)
+        :param limit_offset: 模擬 IOC 限價單的讓價點數，與 PortfolioManager 相同
+        """
+        self.api = None
+        self.execution = execution or ExecutionModel()
+        self.limit_offset = limit_offset
+        self.now = None  # 由回測迴圈在每根 K 棒更新，作為委託時間
+
+        self.positions = {}   # {(strategy_name, contract_symbol): 部位}
+        self.costs = {}       # {(strategy_name, contract_symbol): 平均成本}
+        self.net_positions = {}  # {contract_symbol: 淨部位}
+        self.orders = []
+        self.peak_margin = 0.0
+        self.peak_gross_margin = 0.0
+
+    def get_virtual_position(self, strategy_name: str, contract_symbol: str) -> int:
+        return self.positions.get((strategy_name, contract_symbol), 0)
+
+    def set_virtual_position(self, strategy_name: str, contract_symbol: str, new_position: int, contract_obj=None,
+                             average_cost: float = 0.0) -> bool:
+        """更新虛擬部位並淨額化；淨部位有變動時記錄一筆模擬實體單"""
+        key = (strategy_name, contract_symbol)
+        old_position = self.positions.get(key, 0)
+        old_net = self.net_positions.get(contract_symbol, 0)
+        new_net = old_net - old_position + new_position
+        delta = new_net - old_net
+
+        if delta != 0 and not self._execute_real_order(contract_symbol, delta, price=average_cost):
+            return False
+
+        self.positions[key] = new_position
+        self.costs[key] = average_cost
+        self.net_positions[contract_symbol] = new_net
+        self._update_margin()
+        return True
+
+    def _execute_real_order(self, contract_symbol: str, delta: int, price: float = 0.0) -> bool:
+        """記錄模擬實體單 (IOC 限價 ±limit_offset)，視為全數成交"""
+        spec = spec_for(contract_symbol)
+        qty = abs(delta)
+        order_price = price + self.limit_offset if delta > 0 else price - self.limit_offset
+        fee = self.execution.commission * qty
+        tax = self.execution.tax_rate * price * spec.point_value * qty
+        self.orders.append({
+            'time': self.now,
+            'contract': contract_symbol,
+            'action': 'Buy' if delta > 0 else 'Sell',
+            'quantity': qty,
+            'price': float(price),
+            'order_price': float(order_price),
+            'commission': fee,
+            'tax': tax,
+        })
+        logging.debug(f"[SimulatedPortfolio] [ORDER] {contract_symbol} Delta {delta} @ {price}")
+        return True
+
+    def _update_margin(self):
+        margin = self.margin_in_use()
+        gross = sum(abs(pos) * spec_for(symbol).initial_margin for (_, symbol), pos in self.positions.items())
+        self.peak_margin = max(self.peak_margin, margin)
+        self.peak_gross_margin = max(self.peak_gross_margin, gross)
+
+    def margin_in_use(self) -> float:
+        return sum(abs(pos) * spec_for(symbol).initial_margin for symbol, pos in self.net_positions.items())
+
+    def reconcile_positions(self, contract_symbol: str):
+        """模擬環境下實體部位即為淨部位，僅做一致性檢查"""
+        total = sum(pos for (_, symbol), pos in self.positions.items() if symbol == contract_symbol)
+        if total != self.net_positions.get(contract_symbol, 0):
+            logging.critical(f"[SimulatedPortfolio] {contract_symbol} 淨部位不一致: {total} != "
+                             f"{self.net_positions.get(contract_symbol, 0)}")
+
+    def orders_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self.orders, columns=['time', 'contract', 'action', 'quantity', 'price',
+                                                  'order_price', 'commission', 'tax'])
+
+    def summary(self) -> dict:
+        quantities = np.array([o['quantity'] for o in self.orders], dtype=float)
+        traded = float(quantities.sum())
+        return {
+            'orders': len(self.orders),
+            'contracts_traded': int(traded),
+            'commission': float(sum(o['commission'] for o in self.orders)),
+            'tax': float(sum(o['tax'] for o in self.orders)),
+            'peak_margin': self.peak_margin,
+            'peak_gross_margin': self.peak_gross_margin,
+            'open_net_positions': {k: v for k, v in self.net_positions.items() if v != 0},
+        }
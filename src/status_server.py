@@ -0,0 +1,164 @@
+"""
+交易狀態端點 (Status Server)
+儀表板原本在 Streamlit 行程內自行登入 Shioaji、每次重繪都呼叫 api.margin()，
+造成兩個券商連線、頁面多一次券商往返，並與交易主程式搶 API 流量限制。
+
+改由交易主程式在本機提供唯讀 HTTP 端點，儀表板只讀這裡，不再連券商:
+
+    GET /status            {"version": N, "updated_at": ..., "data": {...}}
+    GET /status?since=N    內容未變 (version 仍為 N) 時回傳 304，不傳內容
+    GET /health            200 ok
+
+StatusBoard 內容分兩種:
+- set(): 主程式推送的值 (例如權益數，只在主程式查詢券商時更新)
+- add_provider(): 每次請求時才呼叫的函式 (最新價、策略狀態)，讀的都是記憶體中的既有物件
+內容變動時 version +1，呼叫端可用 since 做低成本輪詢。
+"""
+import json
+import logging
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from urllib.request import urlopen
+from urllib.error import HTTPError
+
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+class StatusBoard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._providers = {}
+        self._last_body = None
+        self.version = 0
+        self.updated_at = None
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._values[key] = value
+
+    def add_provider(self, key: str, provider):
+        """provider() 在每次讀取時呼叫，例外時該欄位為 None"""
+        with self._lock:
+            self._providers[key] = provider
+
+    def snapshot(self) -> dict:
+        """目前的完整狀態；內容與上次不同時遞增 version"""
+        with self._lock:
+            data = dict(self._values)
+            providers = list(self._providers.items())
+        for key, provider in providers:
+            try:
+                data[key] = provider()
+            except Exception as e:
+                logging.error(f"[StatusServer] 讀取 {key} 失敗: {e}")
+                data[key] = None
+        body = json.dumps(data, default=_json_default, ensure_ascii=False, sort_keys=True)
+        with self._lock:
+            if body != self._last_body:
+                self._last_body = body
+                self.version += 1
+                self.updated_at = datetime.now().isoformat(timespec='seconds')
+            return {'version': self.version, 'updated_at': self.updated_at, 'data': json.loads(body)}
+
+
+def engine_status(engine) -> dict:
+    """交易引擎的即時狀態: 各合約最新價、各策略部位"""
+    prices = {code: pipeline.price for code, pipeline in engine.pipelines.items()}
+    strategies = []
+    for strategy in engine.strategies:
+        position = 1 if getattr(strategy, 'is_long', False) else -1 if getattr(strategy, 'is_short', False) else 0
+        strategies.append({
+            'name': strategy.name,
+            'contract': strategy.contract.code if strategy.contract is not None else None,
+            'position': position,
+            'entry_price': getattr(strategy, 'entry_price', None) if position else None,
+            'stop_loss': getattr(strategy, 'stop_loss', None) if position else None,
+        })
+    net = {}
+    for s in strategies:
+        if s['contract'] is not None:
+            net[s['contract']] = net.get(s['contract'], 0) + s['position']
+    return {'prices': prices, 'strategies': strategies, 'net_positions': net}
+
+
+class StatusServer:
+    def __init__(self, board: StatusBoard, host: str = "127.0.0.1", port: int = 8765):
+        """
+        :param host: 預設只綁本機 (儀表板與交易主程式在同一個容器)
+        :param port: 0 代表由系統指派 (測試用)，實際埠號見 self.port
+        """
+        self.board = board
+        board_ref = board
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/health":
+                    return self._send(200, b"ok", "text/plain")
+                if url.path != "/status":
+                    return self._send(404, b"not found", "text/plain")
+                snapshot = board_ref.snapshot()
+                since = parse_qs(url.query).get('since', [None])[0]
+                if since is not None and since == str(snapshot['version']):
+                    return self._send(304, b"", None)
+                body = json.dumps(snapshot, ensure_ascii=False).encode("utf-8")
+                return self._send(200, body, "application/json; charset=utf-8")
+
+            def _send(self, code, body, content_type):
+                self.send_response(code)
+                if content_type:
+                    self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # 儀表板每次重繪都會請求，不寫存取日誌
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/status"
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.httpd.serve_forever, name="StatusServer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.httpd.server_close()
+
+
+def fetch_status(url: str, since: int = None, timeout: float = 1.0):
+    """
+    讀取交易主程式的狀態 (儀表板使用)
+    :return: snapshot dict；since 與目前 version 相同時回傳 None；連線失敗時拋出例外
+    """
+    if since is not None:
+        url = f"{url}?since={since}"
+    try:
+        with urlopen(url, timeout=timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except HTTPError as e:
+        if e.code == 304:
+            return None
+        raise
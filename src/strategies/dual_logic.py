@@ -4,10 +4,11 @@ from datetime import datetime
 from .indicators import calculate_supertrend, calculate_ut_bot, calculate_atr
 from src.line_notify import send_line_push_message
 from src.db_logger import log_trade_entry, log_trade_exit
+from src.trade_ledger import TradeLedger
 import shioaji as sj
 
 class DualTimeframeStrategy:
-    def __init__(self, name="DualTimeframe", portfolio=None, contract=None):
+    def __init__(self, name="DualTimeframe", portfolio=None, contract=None, ledger=None):
         self.name = name
         self.portfolio = portfolio
         self.contract = contract
@@ -27,7 +28,8 @@ class DualTimeframeStrategy:
         self.break_even_triggered = False
         self.current_db_trade_id = -1
         
-        self.trades = [] # List to store trade history: {entry_time, exit_time, entry_price, exit_price, pnl, reason}
+        # 交易紀錄寫入共用帳本 (未提供則自建)，用法與原本的 list of dict 相同
+        self.trades = (ledger if ledger is not None else TradeLedger()).view(self.name)
         
         # Parameters
         self.be_threshold = 150.0  # 保本觸發點 (Optimized: 150)
@@ -124,7 +126,8 @@ class DualTimeframeStrategy:
                         strategy_name=self.name,
                         side="Buy",
                         entry_price=float(self.entry_price),
-                        entry_time=current_time
+                        entry_time=current_time,
+                        contract_symbol=self.contract.code if self.contract else None
                     )
 
             # Short Entry
@@ -177,7 +180,8 @@ class DualTimeframeStrategy:
                         strategy_name=self.name,
                         side="Sell",
                         entry_price=float(self.entry_price),
-                        entry_time=current_time
+                        entry_time=current_time,
+                        contract_symbol=self.contract.code if self.contract else None
                     )
 
         
@@ -207,28 +211,28 @@ class DualTimeframeStrategy:
             if exit_reason:
                 # 1. 嘗試發送實體平倉單
                 order_success = True
-                if "Backtest" not in self.name:
-                    if self.portfolio and self.contract:
-                        try:
-                            # 平倉，虛擬部位歸 0
-                            order_success = self.portfolio.set_virtual_position(
-                                strategy_name=self.name,
-                                contract_symbol=self.contract.code,
-                                new_position=0, 
-                                contract_obj=self.contract,
-                                average_cost=current_price
-                            )
-                            if order_success:
-                                logging.info(f"[{self.name}] [ORDER] 虛擬賣單 (平多單) 紀錄與實體單確認成功。")
-                        except Exception as e:
-                            error_msg = f"❌ [{self.name}] [ERROR] 委派平倉單失敗: {e}"
-                            logging.error(error_msg)
-                            order_success = False
+                if self.portfolio and self.contract:
+                    try:
+                        # 平倉，虛擬部位歸 0
+                        order_success = self.portfolio.set_virtual_position(
+                            strategy_name=self.name,
+                            contract_symbol=self.contract.code,
+                            new_position=0, 
+                            contract_obj=self.contract,
+                            average_cost=current_price
+                        )
+                        if order_success:
+                            logging.info(f"[{self.name}] [ORDER] 虛擬賣單 (平多單) 紀錄與實體單確認成功。")
+                    except Exception as e:
+                        error_msg = f"❌ [{self.name}] [ERROR] 委派平倉單失敗: {e}"
+                        logging.error(error_msg)
+                        order_success = False
                             
-                    if not order_success:
-                        msg = f"⚠️ 【{self.name}】平多單委託被拒絕，系統將保留當前內部部位！\n出局原因：{exit_reason}\n價格：{current_price}"
+                if not order_success:
+                    msg = f"⚠️ 【{self.name}】平多單委託被拒絕，系統將保留當前內部部位！\n出局原因：{exit_reason}\n價格：{current_price}"
+                    if "Backtest" not in self.name:
                         send_line_push_message(msg)
-                        return
+                    return
 
                 # 2. 成功後才清理內部狀態與回報交易紀錄
                 self.is_long = False
@@ -285,28 +289,28 @@ class DualTimeframeStrategy:
             if exit_reason:
                 # 1. 嘗試發送實體平倉單
                 order_success = True
-                if "Backtest" not in self.name:
-                    if self.portfolio and self.contract:
-                        try:
-                            # 平倉，虛擬部位歸 0
-                            order_success = self.portfolio.set_virtual_position(
-                                strategy_name=self.name,
-                                contract_symbol=self.contract.code,
-                                new_position=0, 
-                                contract_obj=self.contract,
-                                average_cost=current_price
-                            )
-                            if order_success:
-                                logging.info(f"[{self.name}] [ORDER] 虛擬買單 (平空單) 紀錄與實體單確認成功。")
-                        except Exception as e:
-                            error_msg = f"❌ [{self.name}] [ERROR] 委派平倉單失敗: {e}"
-                            logging.error(error_msg)
-                            order_success = False
+                if self.portfolio and self.contract:
+                    try:
+                        # 平倉，虛擬部位歸 0
+                        order_success = self.portfolio.set_virtual_position(
+                            strategy_name=self.name,
+                            contract_symbol=self.contract.code,
+                            new_position=0, 
+                            contract_obj=self.contract,
+                            average_cost=current_price
+                        )
+                        if order_success:
+                            logging.info(f"[{self.name}] [ORDER] 虛擬買單 (平空單) 紀錄與實體單確認成功。")
+                    except Exception as e:
+                        error_msg = f"❌ [{self.name}] [ERROR] 委派平倉單失敗: {e}"
+                        logging.error(error_msg)
+                        order_success = False
                             
-                    if not order_success:
-                        msg = f"⚠️ 【{self.name}】平空單委託被拒絕，系統將保留當前內部部位！\n出局原因：{exit_reason}\n價格：{current_price}"
+                if not order_success:
+                    msg = f"⚠️ 【{self.name}】平空單委託被拒絕，系統將保留當前內部部位！\n出局原因：{exit_reason}\n價格：{current_price}"
+                    if "Backtest" not in self.name:
                         send_line_push_message(msg)
-                        return
+                    return
 
                 # 2. 成功後才清理內部狀態與回報交易紀錄
                 self.is_short = False
@@ -4,9 +4,10 @@ from datetime import datetime
 from .indicators import calculate_sma, calculate_bias, calculate_atr
 from src.line_notify import send_line_push_message
 from src.db_logger import log_trade_entry, log_trade_exit
+from src.trade_ledger import TradeLedger
 
 class GatekeeperBNFBStrategy:
-    def __init__(self, name="Gatekeeper_BNF_B", portfolio=None, contract=None):
+    def __init__(self, name="Gatekeeper_BNF_B", portfolio=None, contract=None, ledger=None):
         """
         Gatekeeper BNF_B 摸底與摸頭逆勢策略
         核心邏輯：觀察 60MA 乖離率 (Bias) 與成交量，在大盤多頭極端負乖離時進場做多，空頭極端正乖離做空。
@@ -36,7 +37,7 @@ class GatekeeperBNFBStrategy:
         # 每日單次進場限制紀錄
         self.last_entry_date = None
         
-        self.trades = []
+        self.trades = (ledger if ledger is not None else TradeLedger()).view(self.name)
         self.current_db_trade_id = -1
         
         # 參數設定
@@ -149,7 +150,8 @@ class GatekeeperBNFBStrategy:
                                 strategy_name=self.name,
                                 side="Buy",
                                 entry_price=float(self.entry_price),
-                                entry_time=current_time
+                                entry_time=current_time,
+                                contract_symbol=self.contract.code if self.contract else None
                             )
                 else:
                     # 空頭趨勢 -> 只做空 (摸頭)
@@ -198,7 +200,8 @@ class GatekeeperBNFBStrategy:
                                 strategy_name=self.name,
                                 side="Sell",
                                 entry_price=float(self.entry_price),
-                                entry_time=current_time
+                                entry_time=current_time,
+                                contract_symbol=self.contract.code if self.contract else None
                             )
 
         # ====================
@@ -296,24 +299,24 @@ class GatekeeperBNFBStrategy:
         
         # 1. 先嘗試發送實體平倉單
         order_success = True
-        if "Backtest" not in self.name and "Opt" not in self.name:
-            if self.portfolio and self.contract:
-                try:
-                    order_success = self.portfolio.set_virtual_position(
-                        strategy_name=self.name,
-                        contract_symbol=self.contract.code,
-                        new_position=0, 
-                        contract_obj=self.contract,
-                        average_cost=current_price
-                    )
-                except Exception as e:
-                    logging.error(f"❌ [{self.name}] 委派平倉單失敗: {e}")
-                    order_success = False
+        if self.portfolio and self.contract:
+            try:
+                order_success = self.portfolio.set_virtual_position(
+                    strategy_name=self.name,
+                    contract_symbol=self.contract.code,
+                    new_position=0, 
+                    contract_obj=self.contract,
+                    average_cost=current_price
+                )
+            except Exception as e:
+                logging.error(f"❌ [{self.name}] 委派平倉單失敗: {e}")
+                order_success = False
             
-            if not order_success:
-                msg = f"⚠️ 【{self.name}】平倉委託被拒絕，系統將保留當前內部部位，請檢視環境與連線狀態！\n出局原因：{exit_reason}\n價格：{current_price}"
+        if not order_success:
+            msg = f"⚠️ 【{self.name}】平倉委託被拒絕，系統將保留當前內部部位，請檢視環境與連線狀態！\n出局原因：{exit_reason}\n價格：{current_price}"
+            if "Backtest" not in self.name and "Opt" not in self.name:
                 send_line_push_message(msg)
-                return
+            return
 
         # 2. 實體單與資料庫更新成功後，才清理內部狀態與回報交易紀錄
         self.is_long = False
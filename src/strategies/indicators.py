@@ -69,6 +69,69 @@ def calculate_ut_bot(df, key_value=2, atr_period=10):
         return "Sell"
     return "None"
 
+def calculate_supertrend_fast(df, period=10, multiplier=3.0):
+    """
+    與 calculate_supertrend 結果相同，但以 NumPy 陣列與純 float 迴圈計算 (不逐格寫回 DataFrame)，
+    供每根 K 棒都要重算的影子策略群組使用。
+    """
+    if len(df) < period: return None, None
+
+    atr = calculate_atr(df, period).to_numpy(dtype=float)
+    high = df['high'].to_numpy(dtype=float)
+    low = df['low'].to_numpy(dtype=float)
+    close = df['close'].to_numpy(dtype=float)
+    hl2 = (high + low) / 2
+    upper = (hl2 + multiplier * atr).tolist()
+    lower = (hl2 - multiplier * atr).tolist()
+    close = close.tolist()
+
+    is_uptrend = True
+    for i in range(1, len(close)):
+        if close[i] > upper[i - 1]:
+            is_uptrend = True
+        elif close[i] < lower[i - 1]:
+            is_uptrend = False
+        else:
+            if is_uptrend and lower[i] < lower[i - 1]:
+                lower[i] = lower[i - 1]
+            if not is_uptrend and upper[i] > upper[i - 1]:
+                upper[i] = upper[i - 1]
+
+    return is_uptrend, lower[-1] if is_uptrend else upper[-1]
+
+def calculate_ut_bot_multi(df, keys, atr_period=10, atr=None):
+    """
+    一次計算多個 key_value 的 UT Bot 訊號 (逐根迭代一次，key 維度以向量運算)，
+    每個 key 的結果與 calculate_ut_bot 相同。
+    :param atr: 已算好的 calculate_atr(df, atr_period) (呼叫端也需要 ATR 時傳入，避免重算)
+    Returns: np.ndarray[int8]，1 = Buy, -1 = Sell, 0 = None
+    """
+    keys = np.asarray(keys, dtype=float)
+    if len(df) < atr_period: return np.zeros(len(keys), dtype=np.int8)
+
+    if atr is None:
+        atr = calculate_atr(df, atr_period)
+    atr = np.asarray(atr, dtype=float)
+    close = df['close'].to_numpy(dtype=float)
+    stop = np.zeros(len(keys))
+    prev_stop = stop
+    for i in range(1, len(close)):
+        src = close[i]
+        loss = keys * atr[i]
+        prev_stop = stop
+        up = (src > prev_stop) & (close[i - 1] > prev_stop)
+        down = (src < prev_stop) & (close[i - 1] < prev_stop)
+        # Python 的 max(prev, x) / min(prev, x) 在 x 為 NaN 時保留 prev，這裡以比較式重現
+        up_stop = np.where(src - loss > prev_stop, src - loss, prev_stop)
+        down_stop = np.where(src + loss < prev_stop, src + loss, prev_stop)
+        flip_stop = np.where(src > prev_stop, src - loss, src + loss)
+        stop = np.where(up, up_stop, np.where(down, down_stop, flip_stop))
+
+    signal = np.zeros(len(keys), dtype=np.int8)
+    signal[(close[-1] > stop) & (close[-2] <= prev_stop)] = 1
+    signal[(close[-1] < stop) & (close[-2] >= prev_stop)] = -1
+    return signal
+
 def calculate_bollinger_bands(df, period=20, std_dev=2.5):
     """
     Calculate Bollinger Bands.
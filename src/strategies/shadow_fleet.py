@@ -0,0 +1,298 @@
+"""
+影子策略群組 (Shadow Fleet)
+在實盤同一份行情上同時跑數十組參數變體的紙上交易，用來持續驗證參數選擇:
+
+- 每根 60 分 K 只計算一次共用指標 (日 K Supertrend、ATR、60MA / Bias、量均)；
+  滾動平均類指標 (ATR、60MA、量均) 只取計算最新值所需的尾端視窗，日 K Supertrend 在日 K 改變時才重算。
+  UT Bot 的追蹤停損與整段視窗的起點有關 (與單一策略相同視窗才有相同結果)，仍以整段視窗計算
+- 參數維度以 NumPy 向量同時推進狀態機 (部位、進場價、停損、保本 / 移動停利旗標)，
+  UT Bot 依不同 key 以 calculate_ut_bot_multi 一次算完
+- 出場時把虛擬交易寫入 TradeLedger，不下單、不寫資料庫、不發 LINE
+
+每個變體的進出場規則與 DualTimeframeStrategy / GatekeeperBNFBStrategy 的 check_signals 相同。
+"""
+from importlib import import_module
+
+import numpy as np
+import pandas as pd
+
+from .indicators import calculate_atr, calculate_supertrend_fast, calculate_ut_bot_multi
+from src.research.parallel_runner import param_grid
+from src.trade_ledger import TradeLedger
+
+ONE_DAY = np.timedelta64(1, 'D')
+
+
+class ShadowFleet:
+    """影子群組基底: 參數向量、部位狀態與交易紀錄"""
+    PARAMS = ()
+    SHARED = ()     # 決定共用指標的參數，整個群組必須相同
+    PREFIX = "Shadow"
+    STRATEGY = None     # 對應的單一策略 (模組, 類別名稱)；延遲匯入，預設參數取自其實例
+
+    def __init__(self, variants: list, ledger: TradeLedger = None, prefix: str = None, names: list = None):
+        """
+        :param variants: 參數字典列表，未指定的參數沿用策略預設值
+        :param ledger: 寫入虛擬交易的帳本 (可與實盤策略共用)
+        :param prefix: 變體名稱前綴，預設名稱為 前綴[參數=值,...]
+        """
+        if not variants:
+            raise ValueError("至少需要一組參數")
+        defaults = self.default_params()
+        for variant in variants:
+            unknown = set(variant) - set(self.PARAMS) - set(self.SHARED)
+            if unknown:
+                raise ValueError(f"{type(self).__name__} 不支援的參數: {', '.join(sorted(unknown))}")
+            for key in self.SHARED:
+                if variant.get(key, defaults[key]) != defaults[key]:
+                    raise ValueError(f"{key} 決定共用指標，群組內不可變動")
+
+        self.variants = [dict(v) for v in variants]
+        self.params = {key: np.array([v.get(key, defaults[key]) for v in variants], dtype=float)
+                       for key in self.PARAMS}
+        self.shared = {key: defaults[key] for key in self.SHARED}
+        prefix = prefix or self.PREFIX
+        self.names = names or [f"{prefix}[{','.join(f'{k}={v}' for k, v in variant.items())}]"
+                               for variant in variants]
+        self.ledger = ledger if ledger is not None else TradeLedger()
+
+        n = len(variants)
+        self.position = np.zeros(n, dtype=np.int8)
+        self.entry_price = np.zeros(n)
+        self.entry_time = np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]')
+        self.stop_loss = np.zeros(n)
+        self.highest_price = np.zeros(n)
+        self.lowest_price = np.full(n, np.inf)
+        self.flag = np.zeros(n, dtype=bool)   # 保本已觸發 / 移動停利已啟動
+        self._trend_cache = (None, None)      # (日 K 識別 key, Supertrend 方向)
+
+    @classmethod
+    def default_params(cls) -> dict:
+        """對應策略的預設參數 (PARAMS 與 SHARED)"""
+        module, name = cls.STRATEGY
+        strategy_cls = getattr(import_module(module, __package__), name)
+        strategy = strategy_cls(name="Shadow_Opt", portfolio=None, contract=None)
+        return {key: getattr(strategy, key) for key in cls.PARAMS + cls.SHARED}
+
+    @classmethod
+    def grid(cls, ledger: TradeLedger = None, prefix: str = None, **ranges) -> "ShadowFleet":
+        """以參數網格建立群組，例如 grid(ut_bot_key=[2, 3, 4], trailing_stop_drop=[150, 200])"""
+        return cls(param_grid(**ranges), ledger=ledger, prefix=prefix)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _daily_trend(self, df_1d):
+        """日 K Supertrend 方向 (日 K 的筆數、首尾 K 線不變時沿用上次結果；日 K 不足時為 None)"""
+        key = (len(df_1d), tuple(df_1d.iloc[0]), tuple(df_1d.iloc[-1]))
+        if self._trend_cache[0] != key:
+            self._trend_cache = (key, calculate_supertrend_fast(df_1d)[0])
+        return self._trend_cache[1]
+
+    @staticmethod
+    def _last_atr(df, period: int):
+        """最新一根的 ATR: 滾動平均只需最後 period + 1 根 (第一根提供前收)，與整段計算的最後一值相同"""
+        return calculate_atr(df.iloc[-(period + 1):], period=period).iloc[-1]
+
+    def _enter(self, mask: np.ndarray, direction: int, price: float, time, stop: np.ndarray):
+        self.position[mask] = direction
+        self.entry_price[mask] = price
+        self.entry_time[mask] = time
+        self.stop_loss[mask] = stop[mask]
+        self.flag[mask] = False
+        if direction > 0:
+            self.highest_price[mask] = price
+        else:
+            self.lowest_price[mask] = price
+
+    def _exit(self, idx: np.ndarray, price: float, time, reasons: list):
+        for i, reason in zip(idx.tolist(), reasons):
+            direction = int(self.position[i])
+            pnl = (price - self.entry_price[i]) * direction
+            self.ledger.append({
+                'strategy': self.names[i],
+                'direction': 'Long' if direction > 0 else 'Short',
+                'entry_time': pd.Timestamp(self.entry_time[i]),
+                'exit_time': time,
+                'entry_price': float(self.entry_price[i]),
+                'exit_price': price,
+                'pnl': float(pnl),
+                'reason': reason,
+            })
+        self.position[idx] = 0
+
+    def roll(self, gap: float):
+        """換月時以價差平移持倉中變體的價格狀態 (與 roll_strategies 相同)"""
+        held = self.position != 0
+        for arr in (self.entry_price, self.stop_loss, self.highest_price, self.lowest_price):
+            arr[held & np.isfinite(arr) & (arr != 0)] += gap
+
+    def summary(self) -> pd.DataFrame:
+        """各變體的參數、已實現損益、交易次數與目前部位"""
+        pnl = self.ledger.pnl_by_strategy()
+        df = pd.DataFrame(self.variants, index=pd.Index(self.names, name='variant'))
+        df['trades'] = [self.ledger.count_between(strategy=name) for name in self.names]
+        df['pnl'] = [pnl.get(name, 0.0) for name in self.names]
+        df['position'] = self.position
+        return df.sort_values('pnl', ascending=False)
+
+
+class DualTimeframeFleet(ShadowFleet):
+    """DualTimeframeStrategy 的參數變體群組"""
+    PARAMS = ('ut_bot_key', 'trailing_stop_drop', 'be_threshold', 'body_filter')
+    PREFIX = "Shadow-MXF-V1"
+    STRATEGY = ('.dual_logic', 'DualTimeframeStrategy')
+
+    def __init__(self, variants: list, **kwargs):
+        super().__init__(variants, **kwargs)
+        # 同一個 key 只算一次 UT Bot
+        self._keys, self._key_index = np.unique(self.params['ut_bot_key'], return_inverse=True)
+
+    def check_signals(self, df_60m, df_1d):
+        if df_60m.empty or df_1d is None or df_1d.empty: return
+
+        is_bullish_1d = self._daily_trend(df_1d)
+        # UT Bot 與停損共用同一條 ATR(10)
+        atr_series = calculate_atr(df_60m, period=10)
+        signal = calculate_ut_bot_multi(df_60m, self._keys, atr=atr_series)[self._key_index]
+
+        current_bar = df_60m.iloc[-1]
+        price = float(current_bar['close'])
+        open_ = float(current_bar['open'])
+        time = current_bar.get('datetime')
+        atr = atr_series.iloc[-1]
+
+        p = self.params
+        flat = self.position == 0
+        longs = self.position > 0
+        shorts = self.position < 0
+
+        # 進場 (與出場互斥，依進場前的部位判斷)
+        if is_bullish_1d:
+            enter_long = flat & (signal == 1) & ((price - open_) > p['body_filter'])
+            enter_short = np.zeros_like(flat)
+        else:
+            enter_long = np.zeros_like(flat)
+            enter_short = flat & (signal == -1) & ((open_ - price) > p['body_filter'])
+
+        # 多單: 保本 → 折返停利 → 硬停損 (後者覆寫前者)
+        self.highest_price[longs] = np.maximum(self.highest_price[longs], price)
+        self.lowest_price[shorts] = np.minimum(self.lowest_price[shorts], price)
+        profit = np.where(longs, price - self.entry_price, self.entry_price - price)
+        trigger = (longs | shorts) & ~self.flag & (profit >= p['be_threshold'])
+        self.stop_loss[trigger] = self.entry_price[trigger]
+        self.flag |= trigger
+
+        trailing = (profit >= p['be_threshold']) & (
+            (longs & (price <= self.highest_price - p['trailing_stop_drop'])) |
+            (shorts & (price >= self.lowest_price + p['trailing_stop_drop'])))
+        stopped = (longs & (price <= self.stop_loss)) | (shorts & (price >= self.stop_loss))
+        exits = np.flatnonzero(trailing | stopped)
+        if len(exits):
+            reasons = ["Trailing Stop" if not stopped[i] else ("Break Even" if self.flag[i] else "Stop Loss")
+                       for i in exits.tolist()]
+            self._exit(exits, price, time, reasons)
+
+        if enter_long.any():
+            self._enter(enter_long, 1, price, time, np.full(len(self), price - 2.0 * atr))
+        if enter_short.any():
+            self._enter(enter_short, -1, price, time, np.full(len(self), price + 2.0 * atr))
+
+
+class GatekeeperBNFBFleet(ShadowFleet):
+    """GatekeeperBNFBStrategy 的參數變體群組 (sma_period / volume_ma_period 為共用指標參數)"""
+    PARAMS = ('bias_threshold', 'volume_spike_ratio', 'fixed_sl_points', 'partial_tp_points',
+              'trailing_atr_mult', 'time_stop_days')
+    SHARED = ('sma_period', 'volume_ma_period')
+    PREFIX = "Shadow-BNF-B"
+    STRATEGY = ('.gatekeeper_bnf_b', 'GatekeeperBNFBStrategy')
+
+    def __init__(self, variants: list, **kwargs):
+        super().__init__(variants, **kwargs)
+        self.last_entry_day = np.full(len(self), np.iinfo(np.int64).min, dtype=np.int64)
+
+    def check_signals(self, df_60m, df_1d=None):
+        if df_60m.empty: return
+
+        sma_period = self.shared['sma_period']
+        if len(df_60m) < sma_period: return
+        # 只取最新值所需的尾端視窗 (不足 window 根時為 NaN，與整段 rolling 相同)
+        sma = df_60m['close'].astype(float).iloc[-sma_period:].rolling(window=sma_period).mean().iloc[-1]
+        if pd.isna(sma): return
+        volume_ma_period = self.shared['volume_ma_period']
+        vol_ma = df_60m['volume'].iloc[-volume_ma_period:].rolling(window=volume_ma_period).mean().iloc[-1]
+        if pd.isna(vol_ma): return
+
+        current_bar = df_60m.iloc[-1]
+        price = float(current_bar['close'])
+        volume = float(current_bar.get('volume', 0))
+        time = current_bar.get('datetime')
+        bias = (price - sma) / sma * 100.0
+        atr = self._last_atr(df_60m, 14)
+        now = np.datetime64(pd.Timestamp(time).tz_localize(None), 'ns')
+        today = now.astype('datetime64[D]').astype(np.int64)
+
+        is_bull_trend = None
+        if df_1d is not None and not df_1d.empty:
+            is_bull_trend = self._daily_trend(df_1d)
+        if is_bull_trend is None:
+            is_bull_trend = True  # 與策略相同: 日 K 不足時預設偏多
+
+        p = self.params
+        flat = self.position == 0
+        longs = self.position > 0
+        shorts = self.position < 0
+
+        # 進場
+        can_enter = flat & (self.last_entry_day != today) & (volume > vol_ma * p['volume_spike_ratio'])
+        if is_bull_trend:
+            enter_long = can_enter & (bias < p['bias_threshold'])
+            enter_short = np.zeros_like(flat)
+        else:
+            enter_long = np.zeros_like(flat)
+            enter_short = can_enter & (bias > np.abs(p['bias_threshold']))
+
+        # 出場: 達標啟動移動停利 → 更新軌道 → 停損 / 均線修復 / 時間停損
+        self.highest_price[longs] = np.maximum(self.highest_price[longs], price)
+        self.lowest_price[shorts] = np.minimum(self.lowest_price[shorts], price)
+        profit = np.where(longs, price - self.entry_price, self.entry_price - price)
+        trail_long = self.highest_price - p['trailing_atr_mult'] * atr
+        trail_short = self.lowest_price + p['trailing_atr_mult'] * atr
+
+        activate = (longs | shorts) & ~self.flag & (profit >= p['partial_tp_points'])
+        self.stop_loss = np.where(activate & longs, np.maximum(self.entry_price, trail_long), self.stop_loss)
+        self.stop_loss = np.where(activate & shorts, np.minimum(self.entry_price, trail_short), self.stop_loss)
+        self.flag |= activate
+        self.stop_loss = np.where(self.flag & longs, np.maximum(self.stop_loss, trail_long), self.stop_loss)
+        self.stop_loss = np.where(self.flag & shorts, np.minimum(self.stop_loss, trail_short), self.stop_loss)
+
+        stopped = (longs & (price <= self.stop_loss)) | (shorts & (price >= self.stop_loss))
+        reverted = ~stopped & ((longs & (price >= sma)) | (shorts & (price <= sma)))
+        held = longs | shorts
+        held_days = np.zeros(len(self), dtype=np.int64)
+        held_days[held] = (now - self.entry_time[held]) // ONE_DAY
+        timed = ~stopped & ~reverted & held & (held_days >= p['time_stop_days'])
+        exits = np.flatnonzero(stopped | reverted | timed)
+        if len(exits):
+            reasons = ["Stop Loss/Trailing Stop" if stopped[i] else
+                       "Mean Reversion (Touch 60MA)" if reverted[i] else
+                       f"Time Stop (Max {p['time_stop_days'][i]:g} Days)" for i in exits.tolist()]
+            self._exit(exits, price, time, reasons)
+
+        entering = enter_long | enter_short
+        if entering.any():
+            self.last_entry_day[entering] = today
+            self._enter(enter_long, 1, price, time, price - p['fixed_sl_points'])
+            self._enter(enter_short, -1, price, time, price + p['fixed_sl_points'])
+
+
+def default_fleets(ledger: TradeLedger = None, suffix: str = "") -> list:
+    """預設影子群組: 兩個策略各 25 組主要參數 (共 50 組變體)"""
+    return [
+        DualTimeframeFleet(param_grid(ut_bot_key=[2.0, 3.0, 4.0, 5.0, 6.0],
+                                      trailing_stop_drop=[100.0, 150.0, 200.0, 250.0, 300.0]),
+                           ledger=ledger, prefix=DualTimeframeFleet.PREFIX + suffix),
+        GatekeeperBNFBFleet(param_grid(bias_threshold=[-1.0, -1.5, -2.0, -2.5, -3.0],
+                                       volume_spike_ratio=[1.5, 2.0, 2.5, 3.0, 3.5]),
+                            ledger=ledger, prefix=GatekeeperBNFBFleet.PREFIX + suffix),
+    ]
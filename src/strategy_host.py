@@ -0,0 +1,487 @@
+"""
+多行程策略主機
+策略數量多時，單一 Python 行程 (GIL + Shioaji callback 執行緒) 會成為瓶頸。
+MultiProcessEngine 與 TradingEngine 介面相同，但把策略分組放到多個 worker 行程執行:
+
+    Shioaji callback (行情行程) ──解析一次──▶ MarketBus (共享記憶體環狀緩衝區)
+                                               │ Tick / 完成的 60 分、日 K / 換月
+                     ┌─────────────────────────┼─────────────────────────┐
+                  worker 0                  worker 1                  worker N
+            (各自的 K 線歷史與策略)                                        │
+                     └──── 委託意圖 (SPSC 環狀緩衝區，無鎖) ────▶ OrderGateway (唯一持有 PortfolioManager)
+                     ◀──────────────── 成交回覆 ─────────────────┘
+
+- worker 內的策略透過 WorkerPortfolio 下單: set_virtual_position 送出意圖並等待閘道回覆，
+  因此策略看到的成功 / 失敗語意與單行程時相同
+- worker 的已平倉交易同步回傳給閘道，寫入主行程的 TradeLedger (每日損益統計不變)
+- 主行程保留 StrategyProxy (名稱、合約、方向、進場價) 供監控與換月使用
+"""
+import time
+import logging
+import threading
+import multiprocessing as mp
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from src.engine import TradingEngine, StrategySpec, quote_to_dict
+from src.market_bus import (ShmRing, MARKET_DTYPE, INTENT_DTYPE, KIND_TICK, KIND_BAR_60M, KIND_BAR_1D,
+                            KIND_ROLL, KIND_FLATTEN, KIND_STOP, INTENT_ORDER, INTENT_TRADE, INTENT_ACK)
+from src.processors.kline_maker import Bar, KLineMaker
+from src.trade_ledger import TradeLedger, DIRECTIONS
+from src.continuous_contract import roll_strategies, flatten_strategy, ROLL_KEPT_OLD, ROLL_FLATTENED
+from src.db_logger import set_async_writer, set_outbox
+from src.db_writer import DBWriter
+from src.db_outbox import Outbox
+
+IDLE_SLEEP = 0.0005     # 沒有新資料時的輪詢間隔 (秒)
+ACK_TIMEOUT = 30.0      # 等待閘道回覆的上限 (秒)
+
+
+def _to_us(ts) -> int:
+    """datetime / Timestamp / ISO 字串 → epoch 微秒 (時區資訊直接捨去，保留當地時間)"""
+    ts = pd.Timestamp(ts)
+    if ts is pd.NaT:
+        return np.iinfo(np.int64).min
+    if ts.tzinfo is not None:
+        ts = ts.tz_localize(None)
+    return ts.value // 1000
+
+
+def _from_us(value: int):
+    return pd.Timestamp(int(value), unit='us').to_pydatetime()
+
+
+class StrategyProxy:
+    """主行程中代表 worker 內策略的狀態 (由閘道依成交回覆更新)"""
+
+    def __init__(self, name: str, contract, position: int = 0):
+        self.name = name
+        self.contract = contract
+        self.is_long = position > 0
+        self.is_short = position < 0
+        self.entry_price = 0.0
+
+    def apply_position(self, position: int, price: float):
+        if position != 0 and not (self.is_long or self.is_short):
+            self.entry_price = price
+        self.is_long = position > 0
+        self.is_short = position < 0
+
+
+# ----------------------------------------------------------------------
+# worker 行程
+# ----------------------------------------------------------------------
+class WorkerPortfolio:
+    """worker 內策略使用的 PortfolioManager 替身: 部位變更轉成委託意圖送往閘道"""
+
+    def __init__(self, intents: ShmRing, acks: ShmRing, strategy_ids: dict, code_ids: dict, positions: dict):
+        self.api = None
+        self.intents = intents
+        self.acks = acks
+        self.strategy_ids = strategy_ids
+        self.code_ids = code_ids
+        self.positions = dict(positions)  # {(strategy_name, contract_symbol): 部位}
+        self._request = 0
+        self._ack_cursor = acks.head
+
+    def get_virtual_position(self, strategy_name: str, contract_symbol: str) -> int:
+        return self.positions.get((strategy_name, contract_symbol), 0)
+
+    def set_virtual_position(self, strategy_name: str, contract_symbol: str, new_position: int, contract_obj=None,
+                             average_cost: float = 0.0) -> bool:
+        self._request += 1
+        self.intents.publish(INTENT_ORDER, self.strategy_ids[strategy_name], self.code_ids[contract_symbol],
+                             int(new_position), float(average_cost), self._request, 0, 0, 0, 0.0, 0.0, 0.0, b"")
+        ok = self._wait_ack(self._request)
+        if ok:
+            self.positions[(strategy_name, contract_symbol)] = new_position
+        return ok
+
+    def _wait_ack(self, request: int) -> bool:
+        deadline = time.monotonic() + ACK_TIMEOUT
+        while time.monotonic() < deadline:
+            records, self._ack_cursor, _ = self.acks.read(self._ack_cursor)
+            for rec in records:
+                if rec['kind'] == INTENT_ACK and rec['request'] == request:
+                    return bool(rec['position'])
+            time.sleep(IDLE_SLEEP)
+        logging.critical(f"[StrategyHost] 等待下單閘道回覆逾時 (request {request})，部位狀態可能不同步！")
+        return False
+
+    def reconcile_positions(self, contract_symbol: str):
+        pass
+
+
+class ForwardingLedger(TradeLedger):
+    """worker 內的交易帳本: 本地記錄之外，同時把已平倉交易送回閘道"""
+
+    def __init__(self, intents: ShmRing, strategy_ids: dict):
+        super().__init__()
+        self.intents = intents
+        self.strategy_ids = strategy_ids
+
+    def append(self, trade: dict) -> int:
+        row = super().append(trade)
+        reason = str(trade.get('reason', '')).encode('utf-8')[:48]
+        self.intents.publish(
+            INTENT_TRADE, self.strategy_ids.get(trade.get('strategy'), -1), -1, 0, 0.0, 0,
+            DIRECTIONS.index(trade.get('direction', 'Long')),
+            _to_us(trade.get('entry_time')), _to_us(trade.get('exit_time')),
+            float(trade.get('entry_price', 0.0)), float(trade.get('exit_price', 0.0)),
+            float(trade.get('pnl', 0.0)), reason)
+        return row
+
+
+def run_worker(config: dict):
+    """
+    worker 行程進入點 (spawn 後以 config 重建策略)
+    config: bus / intents / acks 名稱、codes (合約代碼表)、contracts {代碼: delivery_date}、
+            strategies [(strategy_id, StrategySpec, 合約代碼)]、positions、history {代碼: (60 分 Bars, 日 K Bars)}、cursor、
+            async_db (是否啟用非同步批次寫入器)、outbox (本機 Outbox 路徑)
+    """
+    bus = ShmRing(MARKET_DTYPE, name=config['bus'])
+    intents = ShmRing(INTENT_DTYPE, name=config['intents'])
+    acks = ShmRing(INTENT_DTYPE, name=config['acks'])
+    codes = config['codes']
+    code_ids = {code: i for i, code in enumerate(codes)}
+    contracts = {code: SimpleNamespace(code=code, delivery_date=delivery)
+                 for code, delivery in config['contracts'].items()}
+    strategy_ids = {spec.name: sid for sid, spec, _ in config['strategies']}
+
+    portfolio = WorkerPortfolio(intents, acks, strategy_ids, code_ids, config['positions'])
+    ledger = ForwardingLedger(intents, strategy_ids)
+    writer = outbox = None
+    if config.get('outbox'):
+        outbox = Outbox(config['outbox'])
+        set_outbox(outbox)
+    elif config.get('async_db'):
+        writer = DBWriter().start()
+        set_async_writer(writer)
+
+    makers = {}          # {code_id: (maker_60m, maker_1d)}
+    by_code = {}         # {code_id: [strategy, ...]}
+    by_id = {}
+    for code, (bars_60m, bars_1d) in config['history'].items():
+        maker_60m, maker_1d = KLineMaker(timeframe=60), KLineMaker(timeframe=1440)
+        maker_60m.bars.extend(bars_60m)
+        maker_1d.bars.extend(bars_1d)
+        makers[code_ids[code]] = (maker_60m, maker_1d)
+    for sid, spec, code in config['strategies']:
+        strategy = spec.strategy_cls(name=spec.name, portfolio=portfolio, contract=contracts[code], ledger=ledger)
+        for attr, value in spec.params.items():
+            setattr(strategy, attr, value)
+        by_code.setdefault(code_ids[code], []).append(strategy)
+        by_id[sid] = strategy
+
+    cursor = config['cursor']
+    while True:
+        records, cursor, dropped = bus.read(cursor, limit=4096)
+        if dropped:
+            logging.warning(f"[StrategyHost] worker 落後，遺失 {dropped} 筆行情")
+        if len(records) == 0:
+            time.sleep(IDLE_SLEEP)
+            continue
+
+        # 策略只在 K 棒完成時判斷訊號，Tick 不逐筆迭代 (只處理 K 棒與控制訊息)
+        for rec in records[records['kind'] != KIND_TICK]:
+            kind, code_id = int(rec['kind']), int(rec['code'])
+            if kind == KIND_STOP:
+                if writer is not None:
+                    writer.close()
+                if outbox is not None:
+                    outbox.close()
+                bus.close()
+                intents.close()
+                acks.close()
+                return
+            if kind in (KIND_ROLL, KIND_FLATTEN):
+                new_id, new_code = int(rec['ref']), codes[int(rec['ref'])]
+                new_contract = contracts.setdefault(new_code, SimpleNamespace(code=new_code, delivery_date=None))
+                sid = int(rec['strategy'])
+                if kind == KIND_FLATTEN:
+                    # 換月失敗且舊合約無法回補: 部位已不存在，策略改為空手並改掛新合約
+                    strategy = by_id.get(sid)
+                    if strategy is not None:
+                        flatten_strategy(strategy, float(rec['open']), "換月失敗平倉")
+                        portfolio.positions.pop((strategy.name, codes[code_id]), None)
+                        strategy.contract = new_contract
+                        by_code[code_id].remove(strategy)
+                        by_code.setdefault(new_id, []).append(strategy)
+                elif sid < 0:
+                    # 平移並改掛 K 線歷史 (每次換月一筆，在各策略的換月通知之後)；
+                    # 仍有策略留在舊合約時保留一份未平移的舊合約 K 線，重試換月時新合約已有 K 線則捨棄舊的
+                    staying = by_code.get(code_id)
+                    if code_id in makers and new_id not in makers:
+                        makers[new_id] = tuple(m.clone() for m in makers[code_id]) if staying else makers.pop(code_id)
+                        for maker in makers[new_id]:
+                            maker.adjust_prices(float(rec['close']) - float(rec['open']))
+                    elif not staying:
+                        makers.pop(code_id, None)
+                elif sid in by_id:
+                    # 部位已由閘道移轉，這裡只平移進場價 / 停損並改掛新合約
+                    strategy = by_id[sid]
+                    roll_strategies(None, [strategy], contracts[codes[code_id]], new_contract,
+                                    float(rec['open']), float(rec['close']))
+                    pos = portfolio.positions.pop((strategy.name, codes[code_id]), 0)
+                    portfolio.positions[(strategy.name, new_code)] = pos
+                    by_code[code_id].remove(strategy)
+                    by_code.setdefault(new_id, []).append(strategy)
+                continue
+            if code_id not in makers:
+                makers[code_id] = (KLineMaker(timeframe=60), KLineMaker(timeframe=1440))
+            bar = Bar(time=_from_us(rec['ts']), open=float(rec['open']), high=float(rec['high']),
+                      low=float(rec['low']), close=float(rec['close']), volume=int(rec['volume']))
+            maker_60m, maker_1d = makers[code_id]
+            if kind == KIND_BAR_1D:
+                maker_1d.bars.append(bar)
+                continue
+            maker_60m.bars.append(bar)
+            strategies = by_code.get(code_id)
+            if not strategies:
+                continue
+            df_60m = maker_60m.get_dataframe()
+            df_1d = maker_1d.get_dataframe()
+            for strategy in strategies:
+                try:
+                    strategy.check_signals(df_60m, df_1d)
+                except Exception as e:
+                    logging.error(f"[StrategyHost] {strategy.name} check_signals 失敗: {e}")
+
+
+# ----------------------------------------------------------------------
+# 主行程: 下單閘道與引擎
+# ----------------------------------------------------------------------
+class OrderGateway:
+    """唯一持有 PortfolioManager 的下單閘道，輪詢各 worker 的委託意圖"""
+
+    def __init__(self, portfolio, ledger: TradeLedger, names: list, codes: list, contracts: dict, proxies: dict):
+        self.portfolio = portfolio
+        self.ledger = ledger
+        self.names = names
+        self.codes = codes
+        self.contracts = contracts      # {代碼: Shioaji 合約物件}
+        self.proxies = proxies          # {策略名稱: StrategyProxy}
+        self.channels = []              # [(intents, acks, cursor)]
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_channel(self, intents: ShmRing, acks: ShmRing):
+        self.channels.append([intents, acks, intents.head])
+
+    def poll(self) -> int:
+        """處理所有 worker 的新意圖，回傳處理筆數"""
+        handled = 0
+        for channel in self.channels:
+            intents, acks, cursor = channel
+            records, channel[2], dropped = intents.read(cursor)
+            if dropped:
+                logging.critical(f"[OrderGateway] 委託意圖遺失 {dropped} 筆！")
+            for rec in records:
+                handled += 1
+                if rec['kind'] == INTENT_ORDER:
+                    ok = self._handle_order(rec)
+                    acks.publish(INTENT_ACK, rec['strategy'], rec['code'], int(ok), 0.0, int(rec['request']),
+                                 0, 0, 0, 0.0, 0.0, 0.0, b"")
+                elif rec['kind'] == INTENT_TRADE and rec['strategy'] >= 0:
+                    with self.lock:
+                        self.ledger.append({
+                            'strategy': self.names[rec['strategy']],
+                            'direction': DIRECTIONS[rec['direction']],
+                            'entry_time': _from_us(rec['entry_ts']),
+                            'exit_time': _from_us(rec['exit_ts']),
+                            'entry_price': float(rec['entry_price']),
+                            'exit_price': float(rec['exit_price']),
+                            'pnl': float(rec['pnl']),
+                            'reason': bytes(rec['reason']).decode('utf-8', errors='ignore'),
+                        })
+        return handled
+
+    def _handle_order(self, rec) -> bool:
+        name, code = self.names[rec['strategy']], self.codes[rec['code']]
+        position, price = int(rec['position']), float(rec['price'])
+        with self.lock:
+            proxy = self.proxies.get(name)
+            if proxy is not None and proxy.contract.code != code:
+                # worker 在收到換月通知前送出的舊合約委託: 部位已移到新合約，拒絕 (策略視為下單失敗)
+                logging.warning(f"[OrderGateway] 拒絕 {name} 在 {code} 的委託: 策略已換月至 {proxy.contract.code}")
+                return False
+            try:
+                ok = self.portfolio.set_virtual_position(name, code, position,
+                                                         contract_obj=self.contracts.get(code), average_cost=price)
+            except Exception as e:
+                logging.error(f"[OrderGateway] {name} 更新部位失敗: {e}")
+                ok = False
+            if ok and name in self.proxies:
+                self.proxies[name].apply_position(position, price)
+        return ok
+
+    def start(self):
+        def loop():
+            while not self._stop.is_set():
+                if not self.poll():
+                    time.sleep(IDLE_SLEEP)
+        self._thread = threading.Thread(target=loop, name="OrderGateway", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class MultiProcessEngine(TradingEngine):
+    def __init__(self, portfolio=None, ledger: TradeLedger = None, workers: int = 2, capacity: int = 1 << 16,
+                 async_db: bool = False, outbox_path: str = None, recorder=None):
+        """
+        :param workers: 策略 worker 行程數 (策略依加入順序輪流分配)
+        :param capacity: 行情匯流排槽位數 (2 的次方)
+        :param async_db: worker 內的交易紀錄是否改用非同步批次寫入器 (DBWriter)
+        :param outbox_path: 本機 Outbox 檔案；設定後 worker 的交易紀錄寫入 Outbox (由主行程補寫資料庫)
+        """
+        super().__init__(portfolio=portfolio, ledger=ledger, recorder=recorder)
+        self.workers = workers
+        self.capacity = capacity
+        self.async_db = async_db
+        self.outbox_path = outbox_path
+        self.specs = []              # [(StrategySpec, 合約代碼)]
+        self.proxies = {}            # {策略名稱: StrategyProxy}
+        self.codes = []              # 合約代碼表 (含換月候選)，索引即共享記憶體中的代碼 ID
+        self.code_ids = {}
+        self.contracts_by_code = {}
+        self.bus = None
+        self.gateway = None
+        self.processes = []
+        self._rings = []
+
+    def register_contracts(self, contracts):
+        """登記合約代碼 (例如各商品所有月份)，換月後的新合約必須事先登記"""
+        for contract in contracts:
+            if contract.code not in self.code_ids:
+                self.code_ids[contract.code] = len(self.codes)
+                self.codes.append(contract.code)
+            self.contracts_by_code[contract.code] = contract
+
+    def add_contract(self, contract, history_1m: pd.DataFrame = None):
+        self.register_contracts([contract])
+        return super().add_contract(contract, history_1m)
+
+    def add_strategy(self, contract, strategy_cls, name: str, **params):
+        if name in self.proxies:
+            raise ValueError(f"策略名稱重複: {name}")
+        # 在主行程先建立一次 (不接部位) 以檢查參數名稱
+        probe = strategy_cls(name=name, portfolio=None, contract=None)
+        for attr in params:
+            if not hasattr(probe, attr):
+                raise AttributeError(f"{strategy_cls.__name__} 沒有參數 {attr}")
+        self.add_contract(contract)
+        position = self.portfolio.get_virtual_position(name, contract.code) if self.portfolio is not None else 0
+        proxy = StrategyProxy(name, self.contracts_by_code[contract.code], position)
+        self.proxies[name] = proxy
+        self.specs.append((StrategySpec(contract.code[:3], strategy_cls, name, dict(params)), contract.code))
+        return proxy
+
+    @property
+    def strategies(self) -> list:
+        return list(self.proxies.values())
+
+    def start(self):
+        """建立共享記憶體並啟動 worker 行程與下單閘道"""
+        self.bus = ShmRing(MARKET_DTYPE, self.capacity)
+        names = [spec.name for spec, _ in self.specs]
+        self.gateway = OrderGateway(self.portfolio, self.ledger, names, self.codes, self.contracts_by_code,
+                                    self.proxies)
+        history = {code: (list(p.maker_60m.bars), list(p.maker_1d.bars)) for code, p in self.pipelines.items()}
+        contracts = {code: getattr(c, 'delivery_date', None) for code, c in self.contracts_by_code.items()}
+        positions = {(proxy.name, proxy.contract.code): (1 if proxy.is_long else -1 if proxy.is_short else 0)
+                     for proxy in self.proxies.values()}
+
+        ctx = mp.get_context('spawn')
+        n_workers = max(1, min(self.workers, len(self.specs)))
+        for w in range(n_workers):
+            intents, acks = ShmRing(INTENT_DTYPE, 1 << 12), ShmRing(INTENT_DTYPE, 1 << 12)
+            self._rings += [intents, acks]
+            self.gateway.add_channel(intents, acks)
+            assigned = [(sid, spec, code) for sid, (spec, code) in enumerate(self.specs) if sid % n_workers == w]
+            config = {
+                'bus': self.bus.name, 'intents': intents.name, 'acks': acks.name,
+                'codes': list(self.codes), 'contracts': contracts, 'strategies': assigned,
+                'positions': positions, 'history': history, 'cursor': self.bus.head,
+                'async_db': self.async_db, 'outbox': self.outbox_path,
+            }
+            process = ctx.Process(target=run_worker, args=(config,), name=f"StrategyWorker-{w}", daemon=True)
+            process.start()
+            self.processes.append(process)
+        self.gateway.start()
+
+    def on_quote(self, exchange, quote):
+        """行情行程: 解析一次、更新本地 K 線 (監控用)，並把 Tick 與完成的 K 棒寫入匯流排"""
+        tick_data = quote_to_dict(quote)
+        pipeline = self.pipelines.get(tick_data.get('code'))
+        if pipeline is None:
+            return
+        pipeline.latest_quote.update(tick_data)
+        if 'close' not in tick_data or 'volume' not in tick_data or self.bus is None:
+            return
+        try:
+            code_id = self.code_ids[pipeline.code]
+            price = float(tick_data['close'])
+            volume = float(tick_data.get('volume') or 0)
+            # 日 K 先於 60 分 K 發佈，worker 收到 60 分 K 時日 K 已是最新
+            if pipeline.maker_1d.update_with_tick(tick_data):
+                self._publish_bar(KIND_BAR_1D, code_id, pipeline.maker_1d.bars[-1])
+            if pipeline.maker_60m.update_with_tick(tick_data):
+                self._publish_bar(KIND_BAR_60M, code_id, pipeline.maker_60m.bars[-1])
+                if pipeline.shadows:
+                    # 影子群組很輕量，直接在行情行程執行
+                    pipeline.run_shadows(pipeline.maker_60m.get_dataframe(), pipeline.maker_1d.get_dataframe())
+            self.bus.publish(KIND_TICK, code_id, _to_us(tick_data['datetime']), price, price, price, price,
+                             volume, -1, -1)
+        except Exception as e:
+            print(f"Error in on_quote strategy logic ({pipeline.code}): {e}")
+        self._record(pipeline.code, tick_data)
+
+    def _publish_bar(self, kind: int, code_id: int, bar: Bar):
+        self.bus.publish(kind, code_id, _to_us(bar.time), bar.open, bar.high, bar.low, bar.close,
+                         float(bar.volume), -1, -1)
+
+    def roll(self, old_code: str, new_contract, old_price: float, new_price: float) -> dict:
+        self.register_contracts([new_contract])
+        proxies = [p for p in self.proxies.values() if p.contract.code == old_code]
+        lock = self.gateway.lock if self.gateway is not None else threading.Lock()
+        with lock:
+            failed = roll_strategies(self.portfolio, proxies, self.contracts_by_code[old_code], new_contract,
+                                     old_price, new_price)
+        if self.bus is not None:
+            names = [spec.name for spec, _ in self.specs]
+            old_id, new_id = self.code_ids[old_code], self.code_ids[new_contract.code]
+            for proxy in proxies:
+                if proxy.name not in failed:
+                    self.bus.publish(KIND_ROLL, old_id, 0, old_price, 0.0, 0.0, new_price, 0.0, new_id,
+                                     names.index(proxy.name))
+                elif failed[proxy.name] == ROLL_FLATTENED:
+                    # 實際部位已不存在: 通知 worker 內的策略改為空手並改掛新合約
+                    self.bus.publish(KIND_FLATTEN, old_id, 0, old_price, 0.0, 0.0, old_price, 0.0, new_id,
+                                     names.index(proxy.name))
+            self.bus.publish(KIND_ROLL, old_id, 0, old_price, 0.0, 0.0, new_price, 0.0, new_id, -1)
+
+        # 部位仍在舊合約的策略留在舊合約管線，本行程繼續發佈舊合約 K 棒給它們
+        kept = {name for name, result in failed.items() if result == ROLL_KEPT_OLD}
+        self._move_pipeline(old_code, new_contract, new_price - old_price, kept)
+        return failed
+
+    def stop(self):
+        if self.bus is not None:
+            self.bus.publish(KIND_STOP, -1, 0, 0.0, 0.0, 0.0, 0.0, 0.0, -1, -1)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        if self.gateway is not None:
+            self.gateway.poll()
+            self.gateway.stop()
+        for ring in self._rings + ([self.bus] if self.bus is not None else []):
+            ring.close()
+        self.processes, self._rings, self.bus = [], [], None
@@ -0,0 +1,310 @@
+"""
+交易帳本 (Trade Ledger)
+所有策略共用的欄位式 (columnar) 交易紀錄。每個欄位是一段可擴充的連續 NumPy 緩衝區，
+字串欄位 (策略名稱、出場原因) 以整數代碼儲存，並維護兩組次級索引:
+- 依出場時間排序的全域 (時間, 累積損益) 序列
+- 每個策略各自的 (時間, 累積損益) 序列
+
+因此「某天 / 某週 / 某策略」的已實現損益都只需兩次二分搜尋 (O(log n))，
+匯出給 pandas 時直接以緩衝區切片建立 DataFrame，不複製資料。
+
+策略端透過 ledger.view(name) 取得與舊 self.trades 相容的列表介面 (append / len / 迭代 / 索引)。
+寫入與重建索引 (替換緩衝區) 以同一把鎖保護，行情執行緒、下單閘道與監控執行緒可同時使用。
+"""
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.contract_specs import NIGHT_SESSION_END, trading_day
+
+DIRECTIONS = ('Long', 'Short')
+
+_COLUMN_DTYPES = {
+    'strategy': np.int32,
+    'direction': np.int8,
+    'entry_time': 'datetime64[ns]',
+    'exit_time': 'datetime64[ns]',
+    'entry_price': np.float64,
+    'exit_price': np.float64,
+    'pnl': np.float64,
+    'reason': np.int32,
+}
+
+
+def _to_datetime64(value) -> np.datetime64:
+    """datetime / Timestamp / 字串 → datetime64[ns]；含時區者保留當地時間"""
+    if value is None:
+        return np.datetime64('NaT', 'ns')
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_localize(None)
+    return ts.to_datetime64().astype('datetime64[ns]')
+
+
+def _session_start(day) -> pd.Timestamp:
+    """交易日的起點 (當日 05:00)；day 為 datetime 時先換成所屬交易日"""
+    if isinstance(day, datetime):
+        day = trading_day(_to_datetime64(day))
+    return pd.Timestamp(day).normalize() + NIGHT_SESSION_END
+
+
+class _TimeIndex:
+    """依出場時間排序的 (時間, 累積損益, 列號) 序列，提供 O(log n) 區間查詢"""
+
+    def __init__(self, capacity: int = 64):
+        self.times = np.empty(capacity, dtype='datetime64[ns]')
+        self.cum_pnl = np.zeros(capacity + 1)
+        self.rows = np.empty(capacity, dtype=np.int64)
+        self.n = 0
+
+    def append(self, time, pnl: float, row: int):
+        if self.n == len(self.times):
+            capacity = len(self.times) * 2
+            self.times = np.resize(self.times, capacity)
+            self.cum_pnl = np.resize(self.cum_pnl, capacity + 1)
+            self.rows = np.resize(self.rows, capacity)
+        self.times[self.n] = time
+        self.cum_pnl[self.n + 1] = self.cum_pnl[self.n] + pnl
+        self.rows[self.n] = row
+        self.n += 1
+
+    def bounds(self, start, end):
+        """[start, end) 在序列中的位置範圍；None 代表不設限"""
+        times = self.times[:self.n]
+        i = 0 if start is None else int(np.searchsorted(times, _to_datetime64(start), side='left'))
+        j = self.n if end is None else int(np.searchsorted(times, _to_datetime64(end), side='left'))
+        return i, max(i, j)
+
+    def pnl_between(self, start, end) -> float:
+        i, j = self.bounds(start, end)
+        return float(self.cum_pnl[j] - self.cum_pnl[i])
+
+    def count_between(self, start, end) -> int:
+        i, j = self.bounds(start, end)
+        return j - i
+
+
+class TradeLedger:
+    def __init__(self, capacity: int = 256):
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in _COLUMN_DTYPES.items()}
+        self._n = 0
+        self.strategies = []  # 策略名稱表 (代碼 → 名稱)
+        self.reasons = []     # 出場原因表
+        self._strategy_codes = {}
+        self._reason_codes = {}
+        self._time_index = _TimeIndex()
+        self._strategy_index = {}
+        self._dirty = False  # 有出場時間較早的交易補記時，下次查詢前重建索引
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # 寫入
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _intern(value: str, table: list, codes: dict) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(table)
+            table.append(value)
+        return code
+
+    def append(self, trade: dict) -> int:
+        """
+        新增一筆已平倉交易 (欄位同策略的交易 dict)，回傳列號。
+        """
+        with self._lock:
+            return self._append(trade)
+
+    def _append(self, trade: dict) -> int:
+        if self._n == len(self._columns['pnl']):
+            capacity = self._n * 2
+            self._columns = {name: np.resize(col, capacity) for name, col in self._columns.items()}
+
+        row = self._n
+        strategy = self._intern(str(trade.get('strategy', '')), self.strategies, self._strategy_codes)
+        exit_time = _to_datetime64(trade.get('exit_time'))
+        pnl = float(trade.get('pnl', 0.0))
+
+        cols = self._columns
+        cols['strategy'][row] = strategy
+        cols['direction'][row] = DIRECTIONS.index(trade.get('direction', 'Long'))
+        cols['entry_time'][row] = _to_datetime64(trade.get('entry_time'))
+        cols['exit_time'][row] = exit_time
+        cols['entry_price'][row] = float(trade.get('entry_price', 0.0))
+        cols['exit_price'][row] = float(trade.get('exit_price', 0.0))
+        cols['pnl'][row] = pnl
+        cols['reason'][row] = self._intern(str(trade.get('reason', '')), self.reasons, self._reason_codes)
+        self._n += 1
+
+        if self._dirty:
+            return row
+        index = self._time_index
+        if index.n and exit_time < index.times[index.n - 1]:
+            self._dirty = True
+            return row
+        index.append(exit_time, pnl, row)
+        self._strategy_index.setdefault(strategy, _TimeIndex()).append(exit_time, pnl, row)
+        return row
+
+    def extend(self, trades):
+        for trade in trades:
+            self.append(trade)
+
+    def _reindex(self):
+        """依出場時間穩定排序並重建所有索引 (僅在補記較早的交易後觸發，呼叫端需持有 _lock)"""
+        n = self._n
+        order = np.argsort(self._columns['exit_time'][:n], kind='stable')
+        capacity = len(self._columns['pnl'])
+        columns = {}
+        for name, col in self._columns.items():
+            # 建立新緩衝區，已匯出的 DataFrame 仍指向舊資料而不受影響
+            columns[name] = np.empty(capacity, dtype=col.dtype)
+            columns[name][:n] = col[:n][order]
+        self._columns = columns
+
+        self._time_index = _TimeIndex(max(64, n))
+        self._strategy_index = {}
+        times, pnl, strategy = columns['exit_time'], columns['pnl'], columns['strategy']
+        for row in range(n):
+            self._time_index.append(times[row], pnl[row], row)
+            self._strategy_index.setdefault(int(strategy[row]), _TimeIndex()).append(times[row], pnl[row], row)
+        self._dirty = False
+
+    def _index_for(self, strategy: str = None):
+        with self._lock:
+            if self._dirty:
+                self._reindex()
+            if strategy is None:
+                return self._time_index
+            code = self._strategy_codes.get(strategy)
+            return self._strategy_index.get(code) if code is not None else None
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+    def __len__(self):
+        return self._n
+
+    def pnl_between(self, start=None, end=None, strategy: str = None) -> float:
+        """出場時間落在 [start, end) 的已實現損益 (點數)"""
+        with self._lock:
+            index = self._index_for(strategy)
+            return index.pnl_between(start, end) if index is not None else 0.0
+
+    def count_between(self, start=None, end=None, strategy: str = None) -> int:
+        with self._lock:
+            index = self._index_for(strategy)
+            return index.count_between(start, end) if index is not None else 0
+
+    def daily_pnl(self, day, strategy: str = None) -> float:
+        """
+        某交易日已實現損益 (與 metrics.daily_pnl 相同的交易日歸屬，見 contract_specs.trading_day)
+        :param day: 交易日 date / 'YYYY-MM-DD'；datetime 視為時間點，換成其所屬交易日
+        """
+        start = _session_start(day)
+        return self.pnl_between(start, start + timedelta(days=1), strategy)
+
+    def weekly_pnl(self, day, strategy: str = None) -> float:
+        """day 所在週 (週一的交易日起算) 的已實現損益"""
+        start = _session_start(day)
+        start -= timedelta(days=start.weekday())
+        return self.pnl_between(start, start + timedelta(days=7), strategy)
+
+    def pnl_by_strategy(self, start=None, end=None) -> dict:
+        return {name: self.pnl_between(start, end, name) for name in self.strategies}
+
+    def record(self, row: int) -> dict:
+        """以舊格式 (dict) 取出單筆交易"""
+        cols = self._columns
+        return {
+            'strategy': self.strategies[cols['strategy'][row]],
+            'direction': DIRECTIONS[cols['direction'][row]],
+            'entry_time': pd.Timestamp(cols['entry_time'][row]),
+            'exit_time': pd.Timestamp(cols['exit_time'][row]),
+            'entry_price': float(cols['entry_price'][row]),
+            'exit_price': float(cols['exit_price'][row]),
+            'pnl': float(cols['pnl'][row]),
+            'reason': self.reasons[cols['reason'][row]],
+        }
+
+    def __iter__(self):
+        index = self._index_for()
+        for row in index.rows[:index.n]:
+            yield self.record(row)
+
+    def columns(self) -> dict:
+        """各欄位目前有效範圍的 NumPy 檢視 (不複製，請勿寫入)"""
+        with self._lock:
+            if self._dirty:
+                self._reindex()
+            return {name: col[:self._n] for name, col in self._columns.items()}
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        匯出為 DataFrame。數值與時間欄位直接共用帳本緩衝區 (zero-copy)，
+        策略名稱、方向與出場原因以 Categorical 呈現。
+        """
+        cols = self.columns()
+        data = {
+            'strategy': pd.Categorical.from_codes(cols['strategy'], categories=pd.Index(self.strategies, dtype=object)),
+            'direction': pd.Categorical.from_codes(cols['direction'], categories=list(DIRECTIONS)),
+            'entry_time': cols['entry_time'],
+            'exit_time': cols['exit_time'],
+            'entry_price': cols['entry_price'],
+            'exit_price': cols['exit_price'],
+            'pnl': cols['pnl'],
+            'reason': pd.Categorical.from_codes(cols['reason'], categories=pd.Index(self.reasons, dtype=object)),
+        }
+        return pd.DataFrame(data, copy=False)
+
+    def view(self, strategy: str) -> "StrategyTrades":
+        return StrategyTrades(self, strategy)
+
+
+class StrategyTrades:
+    """
+    單一策略的交易列表檢視，提供與原本 self.trades (list of dict) 相同的用法，
+    資料實際寫入共用的 TradeLedger。
+    """
+
+    def __init__(self, ledger: TradeLedger, strategy: str):
+        self.ledger = ledger
+        self.strategy = strategy
+
+    def append(self, trade: dict):
+        self.ledger.append(dict(trade, strategy=self.strategy))
+
+    def _rows(self) -> np.ndarray:
+        index = self.ledger._index_for(self.strategy)
+        return index.rows[:index.n] if index is not None else np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        index = self.ledger._index_for(self.strategy)
+        return index.n if index is not None else 0
+
+    def __iter__(self):
+        for row in self._rows():
+            yield self.ledger.record(row)
+
+    def __getitem__(self, i):
+        rows = self._rows()
+        if isinstance(i, slice):
+            return [self.ledger.record(row) for row in rows[i]]
+        return self.ledger.record(rows[i])
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def daily_pnl(self, day) -> float:
+        return self.ledger.daily_pnl(day, self.strategy)
@@ -0,0 +1,245 @@
+"""
+儀表板查詢 (Trade Queries)
+app.py 每次 rerun 都直接掃描 trade_history；改為讀取觸發器維護的彙總表 (migrations 版本 5)，
+並提供 change_counter 讓 Streamlit 只在資料真的變動時才重新查詢:
+
+    counter = change_counter(conn)          # 每次 rerun 只有這一個單列查詢
+    summary = load_dashboard(counter)       # st.cache_data 以 counter 為 key
+
+所有查詢都走索引或小型彙總表，成本與歷史筆數無關。
+
+交易紀錄查詢 (trade_page / trade_stats / filter_options) 以 (entry_time DESC, id DESC) 做 keyset 分頁
+(migrations 版本 7 的索引)，翻頁不使用 OFFSET，也不把整張表讀進 pandas:
+
+    page, cursor = trade_page(conn, filters)                # 第一頁
+    page, cursor = trade_page(conn, filters, after=cursor)  # 下一頁；cursor 為 None 代表已是最後一頁
+"""
+import logging
+
+import pandas as pd
+
+RECENT_TRADE_COLUMNS = ['id', 'strategy_name', 'side', 'entry_price', 'entry_time', 'exit_price', 'exit_time',
+                        'pnl_points', 'status']
+TRADE_COLUMNS = RECENT_TRADE_COLUMNS + ['contract_symbol', 'exit_reason']
+# 可用等值篩選的欄位 (各有一個以該欄位開頭的索引)
+FILTER_COLUMNS = ('strategy_name', 'contract_symbol', 'exit_reason')
+STATS_COLUMNS = ['trades', 'open_trades', 'closed_trades', 'wins', 'losses', 'total_pnl', 'avg_pnl', 'best_pnl',
+                 'worst_pnl', 'first_entry', 'last_entry']
+
+
+def _frame(cursor, sql: str, columns: list, params: tuple = None) -> pd.DataFrame:
+    cursor.execute(sql, params)
+    return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+
+def change_counter(conn):
+    """dashboard_state 的變更計數；彙總表尚未建立 (遷移未套用) 時回傳 None"""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT change_counter FROM dashboard_state WHERE id = 1;")
+            row = cursor.fetchone()
+        conn.commit()
+        return row[0] if row else None
+    except Exception as e:
+        logging.warning(f"[TradeQueries] 無法讀取變更計數: {e}")
+        conn.rollback()
+        return None
+
+
+def dashboard_summary(conn, recent: int = 50, pnl_days: int = 30) -> dict:
+    """
+    儀表板所需的全部資料 (同一個交易內讀取)
+    :return: open_position (side, entry_price, entry_time) 或 None、latest_equity (total_equity, available_margin,
+             log_date) 或 None、weekly_pnl、recent_trades、daily_pnl (近 pnl_days 天各策略)、equity_curve、positions、
+             as_of (資料庫的 CURRENT_DATE，近 7 / pnl_days 天的基準日)、expires_at (資料庫換日的 epoch 秒數，
+             之後 weekly_pnl / daily_pnl 的日期範圍已過期，需重新載入)
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT CURRENT_DATE, EXTRACT(EPOCH FROM (CURRENT_DATE + 1)::timestamptz);")
+            as_of, expires_at = cursor.fetchone()
+
+            # 部分索引 trade_history_open_entry_time
+            cursor.execute("""
+                SELECT side, entry_price, entry_time FROM trade_history
+                WHERE status = 'Open' ORDER BY entry_time DESC LIMIT 1;
+            """)
+            open_position = cursor.fetchone()
+
+            cursor.execute("""
+                SELECT total_equity, available_margin, log_date FROM equity_logs
+                ORDER BY log_date DESC LIMIT 1;
+            """)
+            latest_equity = cursor.fetchone()
+
+            # 近 7 天已實現損益 (彙總表，每策略每天一列)
+            cursor.execute("""
+                SELECT SUM(pnl_points) FROM strategy_daily_pnl
+                WHERE trade_date >= CURRENT_DATE - INTERVAL '7 days';
+            """)
+            weekly_pnl = cursor.fetchone()[0]
+
+            recent_trades = _frame(cursor, f"""
+                SELECT {', '.join(RECENT_TRADE_COLUMNS)} FROM trade_history
+                ORDER BY id DESC LIMIT %s;
+            """, RECENT_TRADE_COLUMNS, (recent,))
+            daily_pnl = _frame(cursor, """
+                SELECT strategy_name, trade_date, pnl_points, trades FROM strategy_daily_pnl
+                WHERE trade_date >= CURRENT_DATE - %s ORDER BY trade_date, strategy_name;
+            """, ['strategy_name', 'trade_date', 'pnl_points', 'trades'], (pnl_days,))
+            equity_curve = _frame(cursor, """
+                SELECT log_date, total_equity FROM equity_logs ORDER BY log_date;
+            """, ['log_date', 'total_equity'])
+            positions = _frame(cursor, """
+                SELECT strategy_name, contract_symbol, position, average_cost, updated_at
+                FROM virtual_positions WHERE position <> 0 ORDER BY contract_symbol, strategy_name;
+            """, ['strategy_name', 'contract_symbol', 'position', 'average_cost', 'updated_at'])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    for df, cols in ((daily_pnl, ['pnl_points']), (equity_curve, ['total_equity']),
+                     (recent_trades, ['entry_price', 'exit_price', 'pnl_points'])):
+        for col in cols:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return {
+        'open_position': open_position,
+        'latest_equity': latest_equity,
+        'weekly_pnl': float(weekly_pnl) if weekly_pnl is not None else None,
+        'recent_trades': recent_trades,
+        'daily_pnl': daily_pnl,
+        'equity_curve': equity_curve,
+        'positions': positions,
+        'as_of': as_of,
+        'expires_at': float(expires_at),
+    }
+
+
+# ----------------------------------------------------------------------
+# 交易紀錄查詢
+# ----------------------------------------------------------------------
+def _where(filters: dict) -> tuple:
+    """
+    :param filters: strategy_name / contract_symbol / exit_reason (字串或列表)、start / end (entry_time 的 [start, end))
+    :return: (WHERE 條件列表, 參數列表)
+    """
+    filters = filters or {}
+    clauses, params = ["entry_time IS NOT NULL"], []
+    for column in FILTER_COLUMNS:
+        value = filters.get(column)
+        if value is None or value == [] or value == "":
+            continue
+        if isinstance(value, (list, tuple, set)):
+            clauses.append(f"{column} = ANY(%s)")
+            params.append(list(value))
+        else:
+            clauses.append(f"{column} = %s")
+            params.append(value)
+    if filters.get('start') is not None:
+        clauses.append("entry_time >= %s")
+        params.append(filters['start'])
+    if filters.get('end') is not None:
+        clauses.append("entry_time < %s")
+        params.append(filters['end'])
+    return clauses, params
+
+
+def trade_page(conn, filters: dict = None, after: tuple = None, page_size: int = 50) -> tuple:
+    """
+    依進場時間由新到舊取一頁交易紀錄
+    :param after: 上一頁回傳的 cursor (entry_time, id)，None 為第一頁
+    :return: (DataFrame, 下一頁 cursor 或 None)
+    """
+    clauses, params = _where(filters)
+    if after is not None:
+        clauses.append("(entry_time, id) < (%s, %s)")
+        params += list(after)
+    sql = f"""
+        SELECT {', '.join(TRADE_COLUMNS)} FROM trade_history
+        WHERE {' AND '.join(clauses)}
+        ORDER BY entry_time DESC, id DESC LIMIT %s;
+    """
+    try:
+        with conn.cursor() as cursor:
+            # 多取一筆判斷是否還有下一頁
+            df = _frame(cursor, sql, TRADE_COLUMNS, tuple(params + [page_size + 1]))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    next_cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        last = df.iloc[-1]
+        next_cursor = (last['entry_time'], int(last['id']))
+    for col in ('entry_price', 'exit_price', 'pnl_points'):
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df, next_cursor
+
+
+def trade_stats(conn, filters: dict = None, group_by: str = None) -> pd.DataFrame:
+    """
+    篩選條件下的彙總 (筆數、勝負、損益)；group_by 為 FILTER_COLUMNS 之一時逐組彙總，否則只有一列
+    """
+    if group_by is not None and group_by not in FILTER_COLUMNS:
+        raise ValueError(f"不支援的分組欄位: {group_by}")
+    clauses, params = _where(filters)
+    group_select = f"{group_by}, " if group_by else ""
+    sql = f"""
+        SELECT {group_select}
+            COUNT(*),
+            COUNT(*) FILTER (WHERE status = 'Open'),
+            COUNT(*) FILTER (WHERE status = 'Closed'),
+            COUNT(*) FILTER (WHERE status = 'Closed' AND pnl_points > 0),
+            COUNT(*) FILTER (WHERE status = 'Closed' AND pnl_points <= 0),
+            COALESCE(SUM(pnl_points) FILTER (WHERE status = 'Closed'), 0),
+            AVG(pnl_points) FILTER (WHERE status = 'Closed'),
+            MAX(pnl_points) FILTER (WHERE status = 'Closed'),
+            MIN(pnl_points) FILTER (WHERE status = 'Closed'),
+            MIN(entry_time),
+            MAX(entry_time)
+        FROM trade_history
+        WHERE {' AND '.join(clauses)}
+        {f"GROUP BY {group_by} ORDER BY {group_by}" if group_by else ""};
+    """
+    columns = ([group_by] if group_by else []) + STATS_COLUMNS
+    try:
+        with conn.cursor() as cursor:
+            df = _frame(cursor, sql, columns, tuple(params))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for col in ('total_pnl', 'avg_pnl', 'best_pnl', 'worst_pnl'):
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df['win_rate'] = (df['wins'] / df['closed_trades'].where(df['closed_trades'] > 0)).astype(float)
+    return df
+
+
+def filter_options(conn) -> dict:
+    """
+    各篩選欄位的所有值 {欄位: [值...]}
+    以遞迴 CTE 沿索引逐一跳到下一個不同的值 (skip scan)，成本與不同值的數量成正比，與歷史筆數無關
+    """
+    options = {}
+    try:
+        with conn.cursor() as cursor:
+            for column in FILTER_COLUMNS:
+                cursor.execute(f"""
+                    WITH RECURSIVE v AS (
+                        (SELECT {column} AS value FROM trade_history WHERE {column} IS NOT NULL
+                         ORDER BY {column} LIMIT 1)
+                        UNION ALL
+                        SELECT (SELECT {column} FROM trade_history WHERE {column} > v.value
+                                ORDER BY {column} LIMIT 1)
+                        FROM v WHERE v.value IS NOT NULL
+                    )
+                    SELECT value FROM v WHERE value IS NOT NULL;
+                """)
+                options[column] = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return options
@@ -0,0 +1,78 @@
+"""
+測試共用的資料庫替身 (psycopg2 連線 / 游標的最小介面)
+
+- execute 記錄 (sql, args) 到 conn.pending，commit 後移到 conn.executed，rollback 丟棄
+- errors {SQL 片段: 例外}: SQL 含該片段時拋出 (模擬語法錯誤、資料錯誤)
+- 查詢結果預設為 conn.rows；需要依查詢回傳不同結果時覆寫 respond()
+- mogrify 以 repr 呈現參數 (execute_values / execute_batch 組出的 SQL 可直接以字串比對)
+- copy_expert 記錄 (sql, 資料) 到 conn.copies
+"""
+from types import SimpleNamespace
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.connection = SimpleNamespace(encoding='UTF8')
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def mogrify(self, sql, args):
+        return repr(args).encode() if args is not None else sql
+
+    def execute(self, sql, args=None):
+        sql = sql.decode() if isinstance(sql, bytes) else sql
+        for marker, error in self.conn.errors.items():
+            if marker in sql:
+                raise error
+        self.conn.pending.append((sql, args))
+        self.result = self.conn.respond(sql, args)
+
+    def copy_expert(self, sql, buffer):
+        self.conn.copies.append((sql, buffer.read()))
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeConnection:
+    closed = 0
+
+    def __init__(self, rows=(), errors=None):
+        self.rows = list(rows)
+        self.errors = dict(errors or {})
+        self.pending = []
+        self.executed = []
+        self.copies = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def respond(self, sql: str, args) -> list:
+        return list(self.rows)
+
+    def statements(self) -> list:
+        """已 commit 的 SQL 字串"""
+        return [sql for sql, _ in self.executed]
+
+    def commit(self):
+        self.commits += 1
+        self.executed += self.pending
+        self.pending = []
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.pending = []
+
+    def close(self):
+        pass
@@ -0,0 +1,49 @@
+"""
+測試共用的行情產生器與參考策略執行 (多個測試模組共用，不含測試案例)
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+os.environ["DISABLE_LINE_NOTIFY"] = "true"
+
+from src.strategies.gatekeeper_bnf_b import GatekeeperBNFBStrategy
+
+OHLC = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+
+
+def make_60m_bars(n=1500, seed=7):
+    """產生帶有急跌與爆量的隨機 60 分 K，確保會觸發 BNF-B 的進出場"""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 40, n)
+    shocks = rng.random(n) < 0.03
+    returns[shocks] -= rng.uniform(150, 400, shocks.sum()) * rng.choice([1, -1], shocks.sum())
+    close = 20000 + np.cumsum(returns)
+    open_ = close - rng.normal(0, 20, n)
+    high = np.maximum(open_, close) + rng.uniform(0, 30, n)
+    low = np.minimum(open_, close) - rng.uniform(0, 30, n)
+    volume = rng.integers(500, 1500, n).astype(float)
+    volume[shocks] *= 4
+    times = pd.date_range("2025-08-01 08:00", periods=n, freq="60min")
+    return pd.DataFrame({
+        'datetime': times, 'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume
+    })
+
+
+def run_reference(df_60m, bias, vol_ratio, bullish=None, **params):
+    strategy = GatekeeperBNFBStrategy(name="Gatekeeper-BNF-B_Opt", portfolio=None, contract=None)
+    strategy.bias_threshold = bias
+    strategy.volume_spike_ratio = vol_ratio
+    for key, value in params.items():
+        setattr(strategy, key, value)
+    for i in range(len(df_60m)):
+        window = df_60m.iloc[max(0, i - 100):i + 1]
+        precalc = None if bullish is None else bool(bullish[i])
+        strategy.check_signals(window, None, precalc_bullish_1d=precalc)
+    return strategy.trades
+
+
+def to_daily(df_60m):
+    """60 分 K 合成日 K (略過沒有資料的日期)"""
+    return df_60m.set_index('datetime').resample('1D').agg(OHLC).dropna().reset_index()
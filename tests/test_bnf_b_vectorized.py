@@ -0,0 +1,55 @@
+import os
+import unittest
+import numpy as np
+import pandas as pd
+
+os.environ["DISABLE_LINE_NOTIFY"] = "true"
+
+from src.research.bnf_b_vectorized import BNFBFeatures, simulate_bnf_b, sweep_bnf_b
+from tests.helpers import make_60m_bars, run_reference
+
+
+class TestBNFBVectorized(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = make_60m_bars()
+        cls.features = BNFBFeatures.from_dataframe(cls.df)
+
+    def assertSameTrades(self, expected, actual):
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(len(expected), len(actual))
+        for e, a in zip(expected, actual):
+            self.assertEqual(e['direction'], a['direction'])
+            self.assertEqual(pd.Timestamp(e['entry_time']), a['entry_time'])
+            self.assertEqual(pd.Timestamp(e['exit_time']), a['exit_time'])
+            self.assertAlmostEqual(e['pnl'], a['pnl'], places=6)
+            self.assertEqual(e['reason'], a['reason'])
+
+    def test_matches_strategy_long_only(self):
+        for bias, vol in [(-1.0, 1.2), (-1.5, 2.0)]:
+            expected = run_reference(self.df, bias, vol)
+            actual = simulate_bnf_b(self.features, bias_threshold=bias, volume_spike_ratio=vol)
+            self.assertSameTrades(expected, actual)
+
+    def test_matches_strategy_with_trend_filter(self):
+        bullish = (np.arange(len(self.df)) // 200) % 2 == 0
+        expected = run_reference(self.df, -1.0, 1.5, bullish=bullish)
+        actual = simulate_bnf_b(self.features, bias_threshold=-1.0, volume_spike_ratio=1.5, bullish=bullish)
+        self.assertSameTrades(expected, actual)
+        self.assertIn('Short', {t['direction'] for t in actual})
+
+    def test_matches_strategy_time_stop(self):
+        params = {'fixed_sl_points': 600.0, 'partial_tp_points': 500.0, 'time_stop_days': 2}
+        expected = run_reference(self.df, -1.0, 1.2, **params)
+        actual = simulate_bnf_b(self.features, bias_threshold=-1.0, volume_spike_ratio=1.2, **params)
+        self.assertSameTrades(expected, actual)
+        self.assertTrue(any(t['reason'].startswith("Time Stop") for t in actual))
+
+    def test_sweep_shape(self):
+        res = sweep_bnf_b(self.df, [-1.0, -1.5, -2.0], [1.2, 2.0])
+        self.assertEqual(len(res), 6)
+        self.assertListEqual(list(res.columns), ['Bias', 'Vol_Ratio', 'Trades', 'Win_Rate', 'PnL'])
+
+
+if __name__ == '__main__':
+    unittest.main()
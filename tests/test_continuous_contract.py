@@ -0,0 +1,126 @@
+import unittest
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from src.bar_store import BarStore
+from src.continuous_contract import RollRule, build_continuous, roll_schedule, front_contract, roll_strategies, \
+    load_continuous, ROLL_KEPT_OLD, ROLL_FLATTENED
+from src.simulated_portfolio import SimulatedPortfolioManager
+
+
+def make_bars(start, end, base, volume=100):
+    times = pd.date_range(start, end, freq="60min")
+    close = base + np.arange(len(times), dtype=float)
+    return pd.DataFrame({'datetime': times, 'open': close, 'high': close + 5, 'low': close - 5,
+                         'close': close, 'volume': np.full(len(times), volume)})
+
+
+class TestContinuousContract(unittest.TestCase):
+    def setUp(self):
+        # 兩個月份重疊交易一段時間，次月比近月高 100 點
+        self.bars = {
+            'TMFA5': make_bars("2025-01-01", "2025-01-16 13:00", 20000),
+            'TMFB5': make_bars("2025-01-05", "2025-02-19 13:00", 20100 + 96),
+        }
+        self.expiries = {'TMFA5': '2025/01/15', 'TMFB5': '20250219'}
+
+    def test_schedule_and_back_adjust(self):
+        schedule = roll_schedule(self.bars, self.expiries, RollRule(days_before_expiry=1))
+        self.assertEqual(schedule['roll_at'].iloc[0], pd.Timestamp("2025-01-14 08:45"))
+        gap = schedule['new_price'].iloc[0] - schedule['old_price'].iloc[0]
+        self.assertAlmostEqual(gap, 100.0)
+
+        df = build_continuous(self.bars, self.expiries, adjust='back')
+        self.assertTrue(df['datetime'].is_monotonic_increasing)
+        self.assertEqual(list(df['contract'].unique()), ['TMFA5', 'TMFB5'])
+        # 調整後換月處沒有跳空，最新月份價格不變
+        self.assertTrue(np.all(np.diff(df['close'].to_numpy()) == 1.0))
+        last = self.bars['TMFB5']['close'].iloc[-1]
+        self.assertEqual(df['close'].iloc[-1], last)
+
+        raw = build_continuous(self.bars, self.expiries, adjust='none')
+        self.assertAlmostEqual(raw['close'].diff().max(), 101.0)
+        ratio = build_continuous(self.bars, self.expiries, adjust='ratio')
+        self.assertAlmostEqual(ratio['close'].iloc[0], 20000 * schedule['new_price'].iloc[0] / schedule['old_price'].iloc[0])
+
+    def test_volume_roll_is_earlier(self):
+        bars = dict(self.bars)
+        b = bars['TMFB5'].copy()
+        b.loc[b['datetime'] >= "2025-01-10", 'volume'] = 1000
+        bars['TMFB5'] = b
+        schedule = roll_schedule(bars, self.expiries, RollRule(days_before_expiry=1, by_volume=True))
+        self.assertEqual(schedule['roll_at'].iloc[0], pd.Timestamp("2025-01-11 08:45"))
+
+    def test_bar_store_round_trip(self):
+        with tempfile.TemporaryDirectory() as root:
+            store = BarStore(root)
+            store.save('TMFA5', self.bars['TMFA5'].iloc[:100], delivery_date='2025/01/15')
+            store.save('TMFA5', self.bars['TMFA5'].iloc[50:])  # 重疊部分去重
+            store.save('TMFB5', self.bars['TMFB5'], delivery_date='2025/02/19')
+            self.assertEqual(len(store.load('TMFA5')), len(self.bars['TMFA5']))
+            self.assertEqual(store.codes('TMF'), ['TMFA5', 'TMFB5'])
+            df = load_continuous(store, 'TMF')
+            self.assertEqual(df['contract'].nunique(), 2)
+
+    def test_front_contract_and_live_roll(self):
+        near = SimpleNamespace(code='TMFA5', delivery_date='2025/01/15')
+        far = SimpleNamespace(code='TMFB5', delivery_date='2025/02/19')
+        spread = SimpleNamespace(code='TMFR1', delivery_date='2025/01/15')
+        rule = RollRule(days_before_expiry=1)
+        self.assertIs(front_contract([far, spread, near], pd.Timestamp("2025-01-14 08:00"), rule), near)
+        self.assertIs(front_contract([far, near], pd.Timestamp("2025-01-14 08:45"), rule), far)
+
+        pm = SimulatedPortfolioManager()
+        strategy = SimpleNamespace(name="S", is_long=True, is_short=False, entry_price=20000.0,
+                                   stop_loss=19900.0, highest_price=20050.0, contract=near)
+        flat = SimpleNamespace(name="F", is_long=False, is_short=False, entry_price=0.0, contract=near)
+        pm.set_virtual_position("S", near.code, 1, average_cost=20000.0)
+        failed = roll_strategies(pm, [strategy, flat], near, far, 20030.0, 20130.0)
+        self.assertEqual(failed, {})
+        self.assertEqual(pm.get_virtual_position("S", near.code), 0)
+        self.assertEqual(pm.get_virtual_position("S", far.code), 1)
+        self.assertEqual(strategy.entry_price, 20100.0)
+        self.assertEqual(strategy.stop_loss, 20000.0)
+        self.assertIs(flat.contract, far)
+
+    def test_live_roll_failed_open(self):
+        near = SimpleNamespace(code='TMFA5', delivery_date='2025/01/15')
+        far = SimpleNamespace(code='TMFB5', delivery_date='2025/02/19')
+
+        class RejectingPortfolio(SimulatedPortfolioManager):
+            """新合約建倉一律失敗；reject_reopen 時舊合約回補也失敗"""
+            reject_reopen = False
+
+            def set_virtual_position(self, strategy_name, contract_symbol, new_position, **kwargs):
+                if contract_symbol == far.code or (self.reject_reopen and new_position != 0):
+                    return False
+                return super().set_virtual_position(strategy_name, contract_symbol, new_position, **kwargs)
+
+        def long_strategy():
+            return SimpleNamespace(name="S", is_long=True, is_short=False, entry_price=20000.0, stop_loss=19900.0,
+                                   contract=near, current_db_trade_id=-1)
+
+        pm = RejectingPortfolio()
+        pm.set_virtual_position("S", near.code, 1, average_cost=20000.0)
+        strategy = long_strategy()
+        self.assertEqual(roll_strategies(pm, [strategy], near, far, 20030.0, 20130.0), {"S": ROLL_KEPT_OLD})
+        self.assertEqual(pm.get_virtual_position("S", near.code), 1)   # 已回補舊合約
+        self.assertTrue(strategy.is_long)
+        self.assertIs(strategy.contract, near)
+        self.assertEqual(strategy.entry_price, 20000.0)
+
+        # 回補也失敗: 兩邊都沒有部位，策略不可再認為自己持倉
+        pm.reject_reopen = True
+        strategy = long_strategy()
+        self.assertEqual(roll_strategies(pm, [strategy], near, far, 20030.0, 20130.0), {"S": ROLL_FLATTENED})
+        self.assertEqual(pm.get_virtual_position("S", near.code), 0)
+        self.assertEqual(pm.get_virtual_position("S", far.code), 0)
+        self.assertFalse(strategy.is_long or strategy.is_short)
+        self.assertIs(strategy.contract, far)    # 已無部位，改掛新合約
+
+
+if __name__ == '__main__':
+    unittest.main()
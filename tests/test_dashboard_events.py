@@ -0,0 +1,115 @@
+import json
+import unittest
+from datetime import date, datetime
+
+import pandas as pd
+
+from src.dashboard_events import DashboardListener, apply_events, parse_event
+from src.trade_queries import RECENT_TRADE_COLUMNS
+
+
+def payload(table, op, row=None, old=None):
+    return json.dumps({'table': table, 'op': op, 'row': row, 'old': old})
+
+
+def trade(id, status='Open', exit_time=None, pnl=None, strategy='Dual_TMF'):
+    return {'id': id, 'strategy_name': strategy, 'side': 'Buy', 'entry_price': 20000, 'entry_time':
+            '2025-11-03T09:00:00', 'exit_price': 20050 if exit_time else None, 'exit_time': exit_time,
+            'pnl_points': pnl, 'status': status, 'client_key': None}
+
+
+def empty_summary():
+    return {
+        'open_position': None,
+        'latest_equity': (100000, 80000, date(2025, 11, 2)),
+        'weekly_pnl': None,
+        'recent_trades': pd.DataFrame(columns=RECENT_TRADE_COLUMNS),
+        'daily_pnl': pd.DataFrame(columns=['strategy_name', 'trade_date', 'pnl_points', 'trades']),
+        'equity_curve': pd.DataFrame([[date(2025, 11, 2), 100000.0]], columns=['log_date', 'total_equity']),
+        'positions': pd.DataFrame(columns=['strategy_name', 'contract_symbol', 'position', 'average_cost',
+                                           'updated_at']),
+        'as_of': date(2025, 11, 3),
+        'expires_at': 0.0,
+    }
+
+
+class TestDashboardEvents(unittest.TestCase):
+    def test_parse_event_kinds(self):
+        self.assertEqual(parse_event(payload('trade_history', 'INSERT', trade(1)))['kind'], 'trade_opened')
+        closed = trade(1, 'Closed', '2025-11-03T10:00:00', 50)
+        self.assertEqual(parse_event(payload('trade_history', 'UPDATE', closed, trade(1)))['kind'], 'trade_closed')
+        self.assertEqual(parse_event(payload('trade_history', 'UPDATE', closed, closed))['kind'], 'trade_updated')
+        self.assertEqual(parse_event(payload('virtual_positions', 'UPDATE', {}))['kind'], 'position_changed')
+        self.assertEqual(parse_event(payload('equity_logs', 'INSERT', {}))['kind'], 'equity_updated')
+
+    def test_listener_cursor(self):
+        listener = DashboardListener(connect=lambda: None, max_events=2)
+        listener.connected, listener.generation = True, 1
+        cursor = listener.cursor()
+        listener._push(payload('equity_logs', 'INSERT', {'log_date': '2025-11-03'}))
+        cursor, events = listener.read(cursor)
+        self.assertEqual([e['kind'] for e in events], ['equity_updated'])
+        self.assertEqual(listener.read(cursor), (cursor, []))
+
+        # 落後超過保留數量，或重新連線後 (generation 改變) 需重新載入
+        for _ in range(3):
+            listener._push(payload('equity_logs', 'INSERT', {'log_date': '2025-11-03'}))
+        self.assertIsNone(listener.read(cursor)[1])
+        cursor = listener.cursor()
+        listener.generation += 1
+        self.assertIsNone(listener.read(cursor)[1])
+
+    def test_apply_trade_lifecycle(self):
+        today = date(2025, 11, 3)
+        events = [parse_event(payload('trade_history', 'INSERT', trade(7)))]
+        summary = apply_events(empty_summary(), events, today=today)
+        self.assertEqual(summary['open_position'][0], 'Buy')
+        self.assertEqual(list(summary['recent_trades']['id']), [7])
+
+        closed = trade(7, 'Closed', '2025-11-03T10:00:00', 50)
+        events = [parse_event(payload('trade_history', 'UPDATE', closed, trade(7)))]
+        summary = apply_events(summary, events, today=today)
+        self.assertIsNone(summary['open_position'])
+        self.assertEqual(summary['weekly_pnl'], 50.0)
+        self.assertEqual(summary['daily_pnl'].iloc[0].tolist(), ['Dual_TMF', today, 50.0, 1])
+
+        # Outbox 補送同一筆平倉 (舊列已是 Closed): 先扣後加，不重複計算
+        corrected = trade(7, 'Closed', '2025-11-03T10:00:00', 40)
+        summary = apply_events(summary, [parse_event(payload('trade_history', 'UPDATE', corrected, closed))],
+                               today=today)
+        self.assertEqual(summary['weekly_pnl'], 40.0)
+        self.assertEqual(summary['daily_pnl'].iloc[0].tolist(), ['Dual_TMF', today, 40.0, 1])
+        self.assertEqual(len(summary['recent_trades']), 1)
+
+    def test_apply_uses_database_date(self):
+        # 未指定 today 時以載入 summary 時資料庫的日期為基準，而非本機時鐘
+        closed = trade(8, 'Closed', '2025-10-20T10:00:00', 30)
+        events = [parse_event(payload('trade_history', 'INSERT', closed))]
+        summary = apply_events(empty_summary(), events)
+        self.assertEqual(summary['weekly_pnl'], None)
+        self.assertEqual(summary['daily_pnl']['trade_date'].tolist(), [date(2025, 10, 20)])
+
+    def test_apply_equity_and_positions(self):
+        events = [
+            parse_event(payload('equity_logs', 'INSERT', {'log_date': '2025-11-03', 'total_equity': 101500,
+                                                          'available_margin': 81000})),
+            parse_event(payload('virtual_positions', 'INSERT', {
+                'strategy_name': 'Dual_TMF', 'contract_symbol': 'TMFK5', 'position': -1, 'average_cost': 20100,
+                'updated_at': '2025-11-03T10:00:00'})),
+        ]
+        original = empty_summary()
+        summary = apply_events(original, events)
+        self.assertEqual(summary['latest_equity'], (101500, 81000, date(2025, 11, 3)))
+        self.assertEqual(list(summary['equity_curve']['total_equity']), [100000.0, 101500.0])
+        self.assertEqual(summary['positions'].iloc[0]['position'], -1)
+        self.assertEqual(len(original['equity_curve']), 1)   # 不修改傳入的 summary
+
+        flat = parse_event(payload('virtual_positions', 'UPDATE',
+                                   {'strategy_name': 'Dual_TMF', 'contract_symbol': 'TMFK5', 'position': 0,
+                                    'average_cost': 0, 'updated_at': datetime(2025, 11, 3, 11).isoformat()},
+                                   {'strategy_name': 'Dual_TMF', 'contract_symbol': 'TMFK5', 'position': -1}))
+        self.assertTrue(apply_events(summary, [flat])['positions'].empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
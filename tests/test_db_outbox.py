@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+import psycopg2
+
+os.environ["DISABLE_LINE_NOTIFY"] = "true"
+
+from src import db_logger
+from src.db_outbox import Outbox, OutboxDrainer, MAX_ATTEMPTS
+from src.portfolio_manager import PortfolioManager
+from tests.fakes import FakeConnection
+
+
+class TestOutbox(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "outbox.sqlite3")
+        self.outbox = Outbox(self.path)
+
+    def tearDown(self):
+        db_logger.set_outbox(None)
+        self.outbox.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_records_survive_reopen(self):
+        db_logger.set_outbox(self.outbox)
+        key = db_logger.log_trade_entry("S1", "Buy", 20000.0, datetime(2025, 11, 3, 9, 0))
+        db_logger.log_trade_exit(key, 20050.0, datetime(2025, 11, 3, 10, 0), 50.0, "停利")
+        db_logger.log_daily_equity("2025-11-03", 100000.0, 80000.0)
+        self.outbox.close()
+
+        self.outbox = Outbox(self.path)
+        records = self.outbox.pending()
+        self.assertEqual([kind for _, kind, _, _ in records], ['trade_entry', 'trade_exit', 'equity'])
+        self.assertEqual(records[0][2]['client_key'], key)
+        self.assertEqual(records[1][2]['client_key'], key)
+        self.assertEqual(records[0][2]['entry_time'], "2025-11-03T09:00:00")
+
+    def test_portfolio_trades_without_database(self):
+        portfolio = PortfolioManager(api=None, outbox=self.outbox)
+        contract = SimpleNamespace(code="TMFK5")
+        self.assertTrue(portfolio.set_virtual_position("A", "TMFK5", 1, contract, average_cost=20000.0))
+        self.assertTrue(portfolio.set_virtual_position("B", "TMFK5", -1, contract, average_cost=20000.0))
+        self.assertEqual(portfolio.get_virtual_position("A", "TMFK5"), 1)
+        self.assertEqual(self.outbox.net_position("TMFK5"), 0)
+        self.assertEqual(self.outbox.pending_count(), 2)
+        # 仍有未補寫的部位時不以資料庫覆蓋本機
+        self.assertFalse(self.outbox.replace_positions([("A", "TMFK5", 0, 0)]))
+        self.assertEqual(portfolio.get_virtual_position("A", "TMFK5"), 1)
+
+    def test_drainer_retries_and_isolates_bad_records(self):
+        connections = [None]
+        drainer = OutboxDrainer(self.outbox, connect=lambda: connections[-1])
+        self.outbox.log_trade_entry("S1", "Buy", 20000.0, datetime(2025, 11, 3, 9, 0))
+        self.outbox.log_daily_equity("2025-11-03", 100000.0, 80000.0)
+
+        with self.assertRaises(ConnectionError):
+            drainer.drain_once()
+        self.assertEqual(self.outbox.pending_count(), 2)
+
+        conn = FakeConnection(errors={"POISON": psycopg2.DataError("invalid input syntax")})
+        connections.append(conn)
+        self.outbox.log_trade_entry("POISON", "Buy", 1.0, datetime(2025, 11, 3, 9, 0))
+        self.outbox.set_position("S1", "TMFK5", 1, 20000.0)
+        self.assertEqual(drainer.drain_once(), 3)
+        self.assertEqual(len(conn.executed), 3)
+        self.assertEqual(self.outbox.pending_count(), 1)
+
+        for _ in range(MAX_ATTEMPTS - 1):
+            drainer.drain_once()
+        self.assertEqual(self.outbox.pending_count(), 0)
+        dead = self.outbox.dead_letters()
+        self.assertEqual(len(dead), 1)
+        self.assertIn("invalid input syntax", dead[0][3])
+
+        # 補寫完成後以資料庫部位更新本機鏡像
+        conn.rows = [("S1", "TMFK5", 1, 20000.0), ("S2", "MXFK5", -2, 21000.0)]
+        self.assertTrue(drainer.sync_positions())
+        self.assertEqual(self.outbox.net_position("MXFK5"), -2)
+
+
+if __name__ == '__main__':
+    unittest.main()
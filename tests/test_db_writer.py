@@ -0,0 +1,116 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+
+import psycopg2
+
+from src.db_writer import DBWriter, TableSpec, WriteDropped, DEFAULT_TABLES
+from tests.fakes import FakeConnection
+
+
+class RecordingWriter(DBWriter):
+    """以記憶體取代資料庫: 記錄每批寫入，可模擬斷線與資料庫變慢"""
+    def __init__(self, **kwargs):
+        super().__init__(connect=lambda: None, **kwargs)
+        self.batches = []
+        self.next_id = 1
+        self.fail_times = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def _write(self, spec, rows):
+        self.gate.wait()
+        if self.fail_times:
+            self.fail_times -= 1
+            raise psycopg2.OperationalError("server closed the connection")
+        self.batches.append((spec.name, list(rows)))
+        if spec.returning:
+            ids = list(range(self.next_id, self.next_id + len(rows)))
+            self.next_id += len(rows)
+            return ids
+        return [None] * len(rows)
+
+
+class TestDBWriter(unittest.TestCase):
+    def test_batches_and_resolves_entry_ids_for_exits(self):
+        writer = RecordingWriter(batch_size=100, flush_interval=60.0).start()
+        try:
+            t = datetime(2025, 11, 3, 9, 0)
+            entries = [writer.submit('trade_entry', (f"S{i}", 'Long', 20000.0 + i, t, "TMFK5")) for i in range(3)]
+            exits = [writer.submit('trade_exit', (f, 20050.0, t, 50.0, '停利')) for f in entries]
+            self.assertFalse(any(f.done() for f in entries))   # 未達門檻前不寫入，submit 不等待
+            self.assertTrue(writer.flush(timeout=5))
+
+            self.assertEqual([f.result() for f in entries], [1, 2, 3])
+            self.assertTrue(all(f.done() for f in exits))
+            self.assertEqual([name for name, _ in writer.batches], ['trade_entry', 'trade_exit'])
+            self.assertEqual([row[0] for row in writer.batches[1][1]], [1, 2, 3])
+        finally:
+            writer.close()
+
+    def test_retries_after_disconnect(self):
+        writer = RecordingWriter(batch_size=2, flush_interval=60.0, max_retry_delay=0.01)
+        writer.fail_times = 2
+        writer.start()
+        try:
+            futures = [writer.submit('equity', (f"2025-11-0{i}", 100.0, 50.0)) for i in range(1, 4)]
+            self.assertTrue(writer.flush(timeout=5))
+            self.assertTrue(all(f.result() is None for f in futures))
+            self.assertEqual(sum(len(rows) for _, rows in writer.batches), 3)
+            self.assertEqual(writer.written['equity'], 3)
+        finally:
+            writer.close()
+
+    def test_bounded_queue_when_database_is_slow(self):
+        tables = DEFAULT_TABLES + (
+            TableSpec('ticks', 'ticks', ('code', 'ts', 'price'), mode='copy', max_rows=5, overflow='drop_oldest'),
+        )
+        writer = RecordingWriter(tables=tables, batch_size=1, flush_interval=0.0)
+        writer.gate.clear()    # 資料庫卡住
+        writer.start()
+        try:
+            first = writer.submit('ticks', ("TMFK5", 0, 1.0))
+            self.assertTrue(_wait(lambda: writer._in_flight == 1))
+            futures = [writer.submit('ticks', ("TMFK5", i, 1.0)) for i in range(1, 9)]
+            self.assertEqual(len(writer._queues['ticks']), 5)
+            self.assertEqual(writer.dropped['ticks'], 3)
+            self.assertIsInstance(futures[0].exception(timeout=1), WriteDropped)
+
+            writer.gate.set()
+            self.assertTrue(writer.flush(timeout=5))
+            self.assertIsNone(first.result())
+            written = [rows[0][1] for name, rows in writer.batches]
+            self.assertEqual(written, [0, 4, 5, 6, 7, 8])
+        finally:
+            writer.gate.set()
+            writer.close()
+
+    def test_copy_mode_escapes_text(self):
+        conn = FakeConnection()
+        writer = DBWriter(connect=lambda: conn, tables=(
+            TableSpec('signals', 'signals', ('name', 'ts', 'note'), mode='copy'),
+        ))
+        writer.submit('signals', ("A", datetime(2025, 11, 3, 9, 0), "x\ty"))
+        writer.submit('signals', ("B", datetime(2025, 11, 3, 10, 0), None))
+        writer._force = True
+        writer._flush_table('signals')
+        self.assertEqual(conn.commits, 1)
+        sql, data = conn.copies[0]
+        self.assertEqual(sql, "COPY signals (name, ts, note) FROM STDIN")
+        self.assertEqual(data, "A\t2025-11-03 09:00:00\tx\\ty\nB\t2025-11-03 10:00:00\t\\N\n")
+        writer.close()
+        self.assertIsInstance(writer.submit('signals', ("C", None, None)).exception(), WriteDropped)
+
+
+def _wait(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+if __name__ == '__main__':
+    unittest.main()
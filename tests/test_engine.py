@@ -0,0 +1,195 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pandas as pd
+
+os.environ["DISABLE_LINE_NOTIFY"] = "true"
+
+from src.engine import TradingEngine, default_specs
+from src.continuous_contract import ROLL_KEPT_OLD, ROLL_FLATTENED
+from src.simulated_portfolio import SimulatedPortfolioManager
+from src.strategies.gatekeeper_bnf_b import GatekeeperBNFBStrategy
+
+
+class RecordingStrategy:
+    """只記錄收到的 K 棒，用來檢查分派"""
+    def __init__(self, name, portfolio=None, contract=None, ledger=None):
+        self.name = name
+        self.portfolio = portfolio
+        self.contract = contract
+        self.threshold = 1.0
+        self.is_long = False
+        self.is_short = False
+        self.calls = []
+
+    def check_signals(self, df_60m, df_1d=None):
+        self.calls.append(float(df_60m.iloc[-1]['close']))
+
+
+class RejectingPortfolio(SimulatedPortfolioManager):
+    """rejected 中的策略在 reject_codes 上建倉一律失敗 (模擬換月時新合約下單失敗)"""
+    def __init__(self):
+        super().__init__()
+        self.rejected = set()
+        self.reject_codes = set()
+
+    def set_virtual_position(self, strategy_name, contract_symbol, new_position, **kwargs):
+        if strategy_name in self.rejected and new_position != 0 and contract_symbol in self.reject_codes:
+            return False
+        return super().set_virtual_position(strategy_name, contract_symbol, new_position, **kwargs)
+
+
+def tick(code, ts, price):
+    return {'code': code, 'datetime': ts, 'close': price, 'volume': 1}
+
+
+class TestTradingEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmf = SimpleNamespace(code="TMFK5", delivery_date="2025/11/19")
+        self.mxf = SimpleNamespace(code="MXFK5", delivery_date="2025/11/19")
+        self.engine = TradingEngine(portfolio=SimulatedPortfolioManager())
+
+    def test_routes_ticks_by_contract(self):
+        a = self.engine.add_strategy(self.tmf, RecordingStrategy, "A", threshold=2.0)
+        b = self.engine.add_strategy(self.mxf, RecordingStrategy, "B")
+        self.assertEqual(a.threshold, 2.0)
+
+        t0 = datetime(2025, 11, 3, 9, 0)
+        self.engine.on_quote(None, tick("TMFK5", t0, 20000))
+        self.engine.on_quote(None, tick("MXFK5", t0, 21000))
+        self.engine.on_quote(None, tick("TXFK5", t0, 22000))  # 未註冊的合約直接忽略
+        self.engine.on_quote(None, tick("TMFK5", t0 + timedelta(hours=1), 20050))
+
+        self.assertEqual(a.calls, [20000.0])
+        self.assertEqual(b.calls, [])
+        self.assertEqual(self.engine.pipelines["MXFK5"].price, 21000)
+        self.assertEqual(len(self.engine.pipelines["MXFK5"].maker_60m.bars), 0)
+        self.assertNotIn("TXFK5", self.engine.pipelines)
+
+        # BidAsk 只更新最新報價，不影響 K 線
+        self.engine.on_quote(None, {'code': "MXFK5", 'bid_price': [20999]})
+        self.assertEqual(self.engine.pipelines["MXFK5"].latest_quote['bid_price'], [20999])
+
+    def test_rejects_duplicate_name_and_unknown_param(self):
+        self.engine.add_strategy(self.tmf, RecordingStrategy, "A")
+        with self.assertRaises(ValueError):
+            self.engine.add_strategy(self.mxf, RecordingStrategy, "A")
+        with self.assertRaises(AttributeError):
+            self.engine.add_strategy(self.mxf, RecordingStrategy, "B", no_such_param=1)
+
+    def test_default_specs_and_shared_portfolio(self):
+        specs = default_specs(['TMF', 'MXF'])
+        self.assertEqual([s.name for s in specs],
+                         ["Gatekeeper-MXF-V1", "Gatekeeper-BNF-B",
+                          "Gatekeeper-MXF-V1-MXF", "Gatekeeper-BNF-B-MXF"])
+
+        s1 = self.engine.add_strategy(self.tmf, GatekeeperBNFBStrategy, "BNF-TMF_Backtest")
+        s2 = self.engine.add_strategy(self.mxf, GatekeeperBNFBStrategy, "BNF-MXF_Backtest", bias_threshold=-2.0)
+        self.assertIs(s1.portfolio, s2.portfolio)
+        self.assertIs(s1.trades.ledger, self.engine.ledger)
+        self.assertIs(s2.trades.ledger, self.engine.ledger)
+        self.assertEqual(s2.bias_threshold, -2.0)
+        self.assertEqual(len(self.engine.strategies), 2)
+
+    def test_load_history_and_roll(self):
+        times = pd.date_range("2025-11-03 08:45", periods=300, freq="1min")
+        df_1m = pd.DataFrame({'datetime': times, 'open': 20000.0, 'high': 20010.0,
+                              'low': 19990.0, 'close': 20000.0, 'volume': 10})
+        pipeline = self.engine.add_contract(self.tmf, history_1m=df_1m)
+        self.assertEqual(len(pipeline.maker_60m.bars), 6)
+
+        strategy = self.engine.add_strategy(self.tmf, RecordingStrategy, "A")
+        strategy.is_long, strategy.entry_price = True, 20000.0
+        self.engine.portfolio.set_virtual_position("A", "TMFK5", 1, average_cost=20000.0)
+
+        new = SimpleNamespace(code="TMFL5", delivery_date="2025/12/17")
+        failed = self.engine.roll("TMFK5", new, 20000.0, 20030.0)
+        self.assertEqual(failed, {})
+        self.assertEqual(list(self.engine.pipelines), ["TMFL5"])
+        self.assertIs(strategy.contract, new)
+        self.assertEqual(strategy.entry_price, 20030.0)
+        self.assertEqual(pipeline.maker_60m.bars[-1].close, 20030.0)
+        self.assertEqual(self.engine.portfolio.net_positions, {"TMFK5": 0, "TMFL5": 1})
+
+    def _roll_setup(self):
+        self.engine = TradingEngine(portfolio=RejectingPortfolio())
+        times = pd.date_range("2025-11-03 08:45", periods=300, freq="1min")
+        df_1m = pd.DataFrame({'datetime': times, 'open': 20000.0, 'high': 20010.0,
+                              'low': 19990.0, 'close': 20000.0, 'volume': 10})
+        self.engine.add_contract(self.tmf, history_1m=df_1m)
+        strategies = []
+        for name in ("A", "B"):
+            strategy = self.engine.add_strategy(self.tmf, RecordingStrategy, name)
+            strategy.is_long, strategy.entry_price = True, 20000.0
+            self.engine.portfolio.set_virtual_position(name, "TMFK5", 1, average_cost=20000.0)
+            strategies.append(strategy)
+        return strategies
+
+    def test_roll_kept_old_stays_on_old_pipeline_and_retries(self):
+        a, b = self._roll_setup()
+        new = SimpleNamespace(code="TMFL5", delivery_date="2025/12/17")
+        self.engine.portfolio.rejected = {"A"}
+        self.engine.portfolio.reject_codes = {"TMFL5"}
+        failed = self.engine.roll("TMFK5", new, 20000.0, 20300.0)
+        self.assertEqual(failed, {"A": ROLL_KEPT_OLD})
+
+        # A 的部位仍在舊合約: 留在舊合約管線，K 線不平移，繼續收到舊合約的 K 棒
+        self.assertEqual(list(self.engine.pipelines), ["TMFK5", "TMFL5"])
+        old, moved = self.engine.pipelines["TMFK5"], self.engine.pipelines["TMFL5"]
+        self.assertTrue(old.pending_roll)
+        self.assertEqual(old.strategies, [a])
+        self.assertEqual(moved.strategies, [b])
+        self.assertIs(a.contract, self.tmf)
+        self.assertEqual(a.entry_price, 20000.0)
+        self.assertEqual(old.maker_60m.bars[-1].close, 20000.0)
+        self.assertEqual(moved.maker_60m.bars[-1].close, 20300.0)
+        self.assertEqual(self.engine.pipeline_for_root("TMF").code, "TMFL5")
+
+        t0 = datetime(2025, 11, 3, 14, 0)
+        self.engine.on_quote(None, tick("TMFK5", t0, 20010))
+        self.engine.on_quote(None, tick("TMFK5", t0 + timedelta(hours=1), 20020))
+        self.assertEqual(a.calls, [20010.0])
+        self.assertEqual(b.calls, [])
+
+        # 重試換月成功: 舊合約管線移除，A 併入新合約管線
+        self.engine.portfolio.rejected = set()
+        failed = self.engine.roll("TMFK5", new, 20020.0, 20320.0)
+        self.assertEqual(failed, {})
+        self.assertEqual(list(self.engine.pipelines), ["TMFL5"])
+        self.assertEqual(moved.strategies, [b, a])
+        self.assertIs(a.contract, new)
+        self.assertEqual(a.entry_price, 20300.0)
+        self.assertEqual(moved.maker_60m.bars[-1].close, 20300.0)
+        self.assertEqual(self.engine.portfolio.net_positions, {"TMFK5": 0, "TMFL5": 2})
+
+    def test_roll_flattened_moves_to_new_contract(self):
+        a, b = self._roll_setup()
+        new = SimpleNamespace(code="TMFL5", delivery_date="2025/12/17")
+        # 新合約建倉與舊合約回補皆失敗
+        self.engine.portfolio.rejected = {"A"}
+        self.engine.portfolio.reject_codes = {"TMFK5", "TMFL5"}
+        failed = self.engine.roll("TMFK5", new, 20000.0, 20300.0)
+        self.assertEqual(failed, {"A": ROLL_FLATTENED})
+
+        self.assertEqual(list(self.engine.pipelines), ["TMFL5"])
+        self.assertEqual(self.engine.pipelines["TMFL5"].strategies, [a, b])
+        self.assertFalse(a.is_long)
+        self.assertIs(a.contract, new)
+        self.assertIs(b.contract, new)
+        self.assertEqual(self.engine.portfolio.get_virtual_position("A", "TMFK5"), 0)
+        self.assertEqual(self.engine.portfolio.get_virtual_position("A", "TMFL5"), 0)
+
+    def test_pipeline_for_root_survives_roll(self):
+        self.engine.add_contract(self.tmf)
+        self.engine.add_contract(self.mxf)
+        self.engine.roll("TMFK5", SimpleNamespace(code="TMFL5", delivery_date="2025/12/17"), 20000.0, 20030.0)
+        # 換月後 TMF 管線移到 dict 最後，依順序取第一個會變成 MXF
+        self.assertEqual(list(self.engine.pipelines), ["MXFK5", "TMFL5"])
+        self.assertEqual(self.engine.pipeline_for_root("TMF").code, "TMFL5")
+        self.assertIsNone(self.engine.pipeline_for_root("TXF"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from src.research.execution import ExecutionModel, apply_execution, apply_execution_batch
+from src.research.bnf_b_vectorized import sweep_bnf_b
+from tests.helpers import make_60m_bars
+
+
+def make_trades(df, pnls, start=0):
+    trades = []
+    for k, pnl in enumerate(pnls):
+        i = start + k * 5
+        trades.append({
+            'strategy': 'X', 'direction': 'Long',
+            'entry_time': df['datetime'].iloc[i], 'exit_time': df['datetime'].iloc[i + 3],
+            'entry_price': 20000.0, 'exit_price': 20000.0 + pnl, 'pnl': pnl,
+        })
+    return trades
+
+
+class TestExecutionModel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df = make_60m_bars()
+
+    def test_zero_cost_model_is_identity(self):
+        model = ExecutionModel(commission=0.0, tax_rate=0.0, slippage_ticks=0.0, slippage_range_frac=0.0,
+                               latency_range_frac=0.0)
+        trades = make_trades(self.df, [50.0, -30.0, 20.0])
+        result = apply_execution(trades, model, self.df)
+        np.testing.assert_allclose(result['net'], [50.0, -30.0, 20.0], atol=1e-6)
+        np.testing.assert_allclose(result['fill'], 1.0)
+
+    def test_costs_reduce_pnl_and_wide_bars_miss(self):
+        model = ExecutionModel(contract_code='TMF')
+        trades = make_trades(self.df, [50.0, -30.0, 20.0])
+        result = apply_execution(trades, model, self.df)
+        self.assertTrue(np.all(result['cost'] > 4.0))  # 來回手續費 40 TWD / 10 = 4 點以上
+        self.assertTrue(np.all(result['net'] < result['gross']))
+
+        wide = ExecutionModel(latency_range_frac=10.0)
+        self.assertLess(apply_execution(trades, wide, self.df)['fill'].max(), 0.9)
+
+    def test_batch_matches_single_runs(self):
+        model = ExecutionModel()
+        runs = [make_trades(self.df, [50.0, -30.0]), [], make_trades(self.df, [10.0, 80.0, -5.0], start=40)]
+        batch = apply_execution_batch(runs, model, self.df)
+        for trades, (_, row) in zip(runs, batch.iterrows()):
+            expected = apply_execution(trades, model, self.df)['net'].sum()
+            self.assertAlmostEqual(row['Net_PnL'], expected)
+        self.assertEqual(batch.loc[1, 'Fill_Rate'], 0.0)
+
+    def test_sampled_fill_is_binary(self):
+        trades = make_trades(self.df, [50.0] * 20)
+        result = apply_execution(trades, ExecutionModel(latency_range_frac=0.5), self.df,
+                                 rng=np.random.default_rng(0))
+        self.assertTrue(set(np.unique(result['fill'])) <= {0.0, 1.0})
+
+    def test_sweep_net_columns(self):
+        res = sweep_bnf_b(self.df, [-1.0, -1.5], [1.2], execution=ExecutionModel())
+        self.assertIn('Net_PnL', res.columns)
+        self.assertTrue(np.all(res['Net_PnL'] <= res['PnL'] + 1e-9))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import unittest
+import numpy as np
+import pandas as pd
+
+os.environ["DISABLE_LINE_NOTIFY"] = "true"
+
+from src.research.intrabar import simulate_mxf_intrabar, simulate_bnf_b_intrabar, trend_for_60m
+
+OHLC = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+
+
+def resample_60m(df_1m):
+    return df_1m.set_index('datetime').resample('60min', label='left', closed='left').apply(OHLC).dropna().reset_index()
+
+
+class TestIntrabar(unittest.TestCase):
+    def test_mxf_stop_hit_inside_bar(self):
+        # 進場後下一根 60 分 K 盤中急跌穿越停損再收回，60 分 K 收盤價看不出停損
+        times = pd.date_range("2025-09-01 09:00", periods=180, freq="1min")
+        close = np.full(180, 20000.0)
+        close[90] = 19850.0  # 盤中急殺
+        df_1m = pd.DataFrame({'datetime': times, 'open': close, 'high': close, 'low': close,
+                              'close': close, 'volume': 1})
+        df_60m = resample_60m(df_1m)
+        df_60m['signal'] = ["Buy", "None", "None"]
+        df_60m.loc[0, 'open'] = 19800.0  # 讓第一根滿足 body filter
+        df_60m['atr'] = 50.0
+
+        trades = simulate_mxf_intrabar(df_60m, df_1m, bullish=[True, True, True])
+        self.assertEqual(len(trades), 1)
+        self.assertEqual(trades[0]['reason'], "Stop Loss")
+        self.assertEqual(trades[0]['exit_time'], times[90])
+        self.assertAlmostEqual(trades[0]['exit_price'], 19850.0)  # 跳空穿越以開盤價成交
+        self.assertEqual(df_60m['close'].iloc[1], 20000.0)
+
+    def test_mxf_break_even_then_trailing(self):
+        prices = [20000] * 60 + list(np.linspace(20000, 20500, 60)) + list(np.linspace(20500, 20000, 60))
+        times = pd.date_range("2025-09-01 09:00", periods=len(prices), freq="1min")
+        close = np.asarray(prices, dtype=float)
+        df_1m = pd.DataFrame({'datetime': times, 'open': close, 'high': close, 'low': close,
+                              'close': close, 'volume': 1})
+        df_60m = resample_60m(df_1m)
+        df_60m['signal'] = ["Buy", "None", "None"]
+        df_60m.loc[0, 'open'] = 19800.0
+        df_60m['atr'] = 50.0
+
+        trades = simulate_mxf_intrabar(df_60m, df_1m, bullish=[True] * 3, trailing_drop=200.0)
+        self.assertEqual(trades[0]['reason'], "Trailing Stop")
+        self.assertAlmostEqual(trades[0]['pnl'], 300.0, delta=10)
+
+    def test_bnf_b_intrabar_runs_on_random_path(self):
+        rng = np.random.default_rng(3)
+        n = 60 * 24 * 40
+        steps = rng.normal(0, 6, n)
+        steps[rng.random(n) < 0.0008] -= 250
+        close = 20000 + np.cumsum(steps)
+        times = pd.date_range("2025-08-01", periods=n, freq="1min")
+        df_1m = pd.DataFrame({'datetime': times, 'open': np.roll(close, 1), 'high': close + 3,
+                              'low': close - 3, 'close': close,
+                              'volume': rng.integers(5, 20, n) * np.where(steps < -100, 30, 1)})
+        df_1m.loc[0, 'open'] = close[0]
+        df_60m = resample_60m(df_1m)
+
+        trades = simulate_bnf_b_intrabar(df_60m, df_1m, bias_threshold=-1.0, volume_spike_ratio=1.5)
+        self.assertGreater(len(trades), 0)
+        for prev, cur in zip(trades, trades[1:]):
+            self.assertGreater(cur['entry_time'] + pd.Timedelta(minutes=60), prev['exit_time'])
+
+    def test_trend_for_60m_uses_completed_day(self):
+        df_1d = pd.DataFrame({'datetime': pd.to_datetime(["2025-09-01", "2025-09-02"]), 'is_uptrend': [True, False]})
+        df_60m = pd.DataFrame({'datetime': pd.to_datetime(["2025-09-01 10:00", "2025-09-02 10:00", "2025-09-03 10:00"])})
+        self.assertListEqual(list(trend_for_60m(df_60m, df_1d)), [False, True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from src.db_writer import DBWriter
+from src.engine import TradingEngine
+from src.market_store import MarketStore
+from tests.fakes import FakeConnection
+
+
+class TestMarketStore(unittest.TestCase):
+    def test_engine_records_ticks_and_bars(self):
+        conn = FakeConnection()
+        writer = DBWriter(connect=lambda: conn, tables=())
+        store = MarketStore(writer=writer)
+        engine = TradingEngine(recorder=store)
+        engine.add_contract(SimpleNamespace(code="TMFK5", delivery_date="2025/11/19"))
+
+        t0 = datetime(2025, 11, 3, 23, 58, 50)
+        for i in range(4):
+            engine.on_quote(None, {'code': "TMFK5", 'datetime': t0 + timedelta(seconds=[0, 20, 60, 80][i]),
+                                   'close': 20000 + i, 'volume': 2})
+        writer._force = True
+        writer._flush_table('market_tick')
+        writer._flush_table('market_bar')
+
+        (copy_sql, data), = conn.copies
+        self.assertEqual(copy_sql, "COPY market_ticks (code, ts, price, volume) FROM STDIN")
+        self.assertEqual(len(data.splitlines()), 4)
+        ddl = [sql for sql in conn.statements() if sql.startswith("CREATE TABLE")]
+        self.assertEqual(len(ddl), 3)   # Tick 兩個日分區 + K 線一個月分區
+        self.assertTrue(any("market_ticks_20251104 PARTITION OF market_ticks" in sql for sql in ddl))
+        self.assertTrue(any("market_bars_202511 PARTITION OF market_bars" in sql for sql in ddl))
+        inserts = [sql for sql in conn.statements() if sql.startswith("INSERT INTO market_bars")]
+        self.assertEqual(len(inserts), 1)
+        # 23:58 只從 23:58:50 開始，不完整不寫入；只寫入完整的 23:59
+        self.assertNotIn("datetime.datetime(2025, 11, 3, 23, 58)", inserts[0])
+        self.assertIn("'TMFK5', 1, datetime.datetime(2025, 11, 3, 23, 59), 20001.0", inserts[0])
+        self.assertEqual(writer.written['market_tick'], 4)
+
+        # 已建立的分區不再重複下 DDL
+        engine.on_quote(None, {'code': "TMFK5", 'datetime': t0 + timedelta(seconds=100), 'close': 1, 'volume': 1})
+        writer._flush_table('market_tick')
+        self.assertEqual(len([sql for sql in conn.statements() if sql.startswith("CREATE TABLE")]), 3)
+        writer.close()
+
+    def test_load_bars_range(self):
+        conn = FakeConnection(rows=[(datetime(2025, 11, 3, 9, 0), 1.0, 2.0, 0.5, 1.5, 10)])
+        store = MarketStore(connect=lambda: conn)
+        df = store.load_bars("TMFK5", "2025-11-03", "2025-11-04")
+        self.assertEqual(list(df.columns), ['datetime', 'open', 'high', 'low', 'close', 'volume'])
+        self.assertEqual(len(df), 1)
+        sql, args = conn.executed[0]
+        self.assertIn("ts >= %s AND ts < %s ORDER BY ts", sql)
+        self.assertEqual(args[:2], ("TMFK5", 1))
+        self.assertTrue(MarketStore(connect=lambda: None).load_bars("TMFK5", "2025-11-03").empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from src.contract_specs import spec_for
+from src.research.metrics import (
+    compute_metrics, metrics_by_strategy, batch_metrics, max_drawdown, equity_curve, exposure, excursions,
+    as_columns, daily_pnl
+)
+
+
+def make_trades():
+    return [
+        {'strategy': 'A', 'direction': 'Long', 'entry_time': pd.Timestamp('2025-01-06 09:00'),
+         'exit_time': pd.Timestamp('2025-01-06 11:00'), 'entry_price': 100.0, 'exit_price': 150.0, 'pnl': 50.0},
+        {'strategy': 'B', 'direction': 'Short', 'entry_time': pd.Timestamp('2025-01-07 09:00'),
+         'exit_time': pd.Timestamp('2025-01-07 10:00'), 'entry_price': 200.0, 'exit_price': 230.0, 'pnl': -30.0},
+        {'strategy': 'A', 'direction': 'Long', 'entry_time': pd.Timestamp('2025-01-08 09:00'),
+         'exit_time': pd.Timestamp('2025-01-08 13:00'), 'entry_price': 100.0, 'exit_price': 80.0, 'pnl': -20.0},
+        {'strategy': 'B', 'direction': 'Short', 'entry_time': pd.Timestamp('2025-01-09 09:00'),
+         'exit_time': pd.Timestamp('2025-01-09 10:00'), 'entry_price': 200.0, 'exit_price': 160.0, 'pnl': 40.0},
+    ]
+
+
+class TestContractSpecs(unittest.TestCase):
+    def test_prefix_lookup(self):
+        self.assertEqual(spec_for('TMFC5').point_value, 10.0)
+        self.assertEqual(spec_for('MXF202510').point_value, 50.0)
+        self.assertEqual(spec_for('TXFR1').point_value, 200.0)
+        self.assertEqual(spec_for(None).root, 'TMF')
+
+
+class TestMetrics(unittest.TestCase):
+    def test_drawdown_matches_loop(self):
+        pnl = np.array([50.0, -30.0, -20.0, 40.0, -70.0, 10.0])
+        equity = equity_curve(pnl, 10.0, 1000.0)
+        peak, worst = equity[0], 0.0
+        for value in equity:
+            peak = max(peak, value)
+            worst = max(worst, peak - value)
+        self.assertAlmostEqual(max_drawdown(equity)[0], worst)
+
+    def test_compute_metrics(self):
+        m = compute_metrics(make_trades(), contract_code='TMFC5', initial_capital=100000)
+        self.assertEqual(m['trades'], 4)
+        self.assertAlmostEqual(m['win_rate'], 50.0)
+        self.assertAlmostEqual(m['pnl_points'], 40.0)
+        self.assertAlmostEqual(m['pnl_twd'], 400.0)
+        self.assertAlmostEqual(m['profit_factor'], 90.0 / 50.0)
+        self.assertAlmostEqual(m['max_drawdown_twd'], 500.0)
+        self.assertGreater(m['sharpe'], 0)
+
+    def test_empty(self):
+        m = compute_metrics([])
+        self.assertEqual(m['trades'], 0)
+        self.assertEqual(m['profit_factor'], 0.0)
+
+    def test_daily_pnl_keeps_friday_night_session(self):
+        # 2025-01-10 為週五: 週六凌晨 02:00 的夜盤出場屬於週五，週末沒有損益的日子不列入
+        exit_time = pd.to_datetime(['2025-01-10 10:00', '2025-01-11 02:00', '2025-01-13 10:00']).values
+        daily = daily_pnl(exit_time.astype('datetime64[ns]'), np.array([10.0, 25.0, -5.0]))
+        self.assertEqual(daily.tolist(), [35.0, -5.0])
+
+    def test_exposure_merges_overlap(self):
+        entry = np.array(['2025-01-01T00', '2025-01-01T01', '2025-01-01T06'], dtype='datetime64[ns]')
+        exit_ = np.array(['2025-01-01T03', '2025-01-01T02', '2025-01-01T10'], dtype='datetime64[ns]')
+        self.assertAlmostEqual(exposure(entry, exit_), 7 / 10)
+
+    def test_excursions(self):
+        bars = pd.DataFrame({
+            'datetime': pd.date_range('2025-01-06 09:00', periods=120, freq='min'),
+            'high': np.full(120, 110.0),
+            'low': np.full(120, 90.0),
+        })
+        bars.loc[30, 'high'] = 160.0
+        bars.loc[60, 'low'] = 70.0
+        cols = as_columns([make_trades()[0]])
+        mae, mfe = excursions(cols, bars)
+        self.assertAlmostEqual(mfe[0], 60.0)
+        self.assertAlmostEqual(mae[0], 30.0)
+
+    def test_excursions_start_after_entry_bar(self):
+        # 進場 K 棒 (09:00) 的高低點發生在以收盤價進場之前，不可計入
+        bars = pd.DataFrame({
+            'datetime': pd.date_range('2025-01-06 09:00', periods=3, freq='h'),
+            'high': [180.0, 110.0, 150.0],
+            'low': [40.0, 95.0, 100.0],
+        })
+        cols = as_columns(make_trades()[:1])
+        mae, mfe = excursions(cols, bars)
+        self.assertAlmostEqual(mfe[0], 50.0)
+        self.assertAlmostEqual(mae[0], 5.0)
+
+    def test_by_strategy(self):
+        df = metrics_by_strategy(make_trades(), multiplier=1.0)
+        self.assertEqual(list(df.index), ['A', 'B', 'ALL'])
+        self.assertAlmostEqual(df.loc['A', 'pnl_points'], 30.0)
+        self.assertAlmostEqual(df.loc['B', 'pnl_points'], 10.0)
+
+    def test_batch_matches_single(self):
+        rng = np.random.default_rng(0)
+        runs = [rng.normal(5, 50, size=n) for n in (0, 3, 17, 40)]
+        batch = batch_metrics(runs)
+        for run, (_, row) in zip(runs, batch.iterrows()):
+            single = compute_metrics({'pnl': run}, multiplier=1.0, initial_capital=0.0)
+            self.assertEqual(row['Trades'], len(run))
+            self.assertAlmostEqual(row['PnL'], single['pnl_points'])
+            self.assertAlmostEqual(row['Max_DD'], single['max_drawdown_twd'])
+            self.assertAlmostEqual(row['Win_Rate'], single['win_rate'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import os
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+
+import psycopg2
+
+from src.dashboard_events import parse_event
+from src.migrations import (MIGRATIONS, Migration, migrate, applied_versions, partition_bounds,
+                            ensure_partitions)
+from tests.fakes import FakeConnection
+
+ALL_VERSIONS = sorted(m.version for m in MIGRATIONS)
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+class MigrationConnection(FakeConnection):
+    """記錄 schema_migrations 版本的資料庫替身；SQL 含 FAIL 時拋出語法錯誤"""
+    def __init__(self, versions=()):
+        super().__init__(errors={"FAIL": RuntimeError("syntax error")})
+        self.versions = set(versions)
+        self.pending_versions = []
+
+    def respond(self, sql, args):
+        if sql.startswith("SELECT version"):
+            return [(v,) for v in sorted(self.versions)]
+        if sql.startswith("SELECT 1 FROM schema_migrations"):
+            return [(1,)] if args[0] in self.versions else []
+        if sql.startswith("INSERT INTO schema_migrations"):
+            self.pending_versions.append(args[0])
+        return []
+
+    def commit(self):
+        super().commit()
+        self.versions.update(self.pending_versions)
+        self.pending_versions = []
+
+    def rollback(self):
+        super().rollback()
+        self.pending_versions = []
+
+
+class TestMigrations(unittest.TestCase):
+    def test_applies_only_pending_versions(self):
+        conn = MigrationConnection(versions={1})
+        self.assertEqual(migrate(conn), ALL_VERSIONS[1:])
+        self.assertEqual(applied_versions(conn), set(ALL_VERSIONS))
+        self.assertTrue(any("WHERE status = 'Open'" in sql for sql in conn.statements()))
+        self.assertEqual(migrate(conn), [])
+
+    def test_target_and_failed_version_rolls_back(self):
+        migrations = MIGRATIONS + [Migration(10, "broken", "FAIL"),
+                                   Migration(11, "callable", lambda cur: cur.execute("SELECT 42;"))]
+        conn = MigrationConnection()
+        self.assertEqual(migrate(conn, migrations, target=2), [1, 2])
+        with self.assertRaises(RuntimeError):
+            migrate(conn, migrations)
+        self.assertEqual(conn.versions, set(ALL_VERSIONS))
+        self.assertNotIn("FAIL", conn.statements())
+
+        with self.assertRaises(ValueError):
+            migrate(MigrationConnection(), [Migration(1, "a", ""), Migration(1, "b", "")])
+
+    def test_partition_bounds(self):
+        bounds = partition_bounds(datetime(2025, 11, 20, 13, 45), date(2026, 1, 3))
+        self.assertEqual([b[0] for b in bounds], ["202511", "202512", "202601"])
+        self.assertEqual(bounds[1][1:], (date(2025, 12, 1), date(2026, 1, 1)))
+        days = partition_bounds(date(2025, 12, 31), date(2026, 1, 1), interval='day')
+        self.assertEqual([b[0] for b in days], ["20251231", "20260101"])
+
+        conn = FakeConnection()
+        with conn.cursor() as cursor:
+            names = ensure_partitions(cursor, "market_ticks", date(2025, 12, 5), date(2026, 1, 5))
+        self.assertEqual(names, ["market_ticks_202512", "market_ticks_202601"])
+        self.assertIn("FOR VALUES FROM ('2025-12-01') TO ('2026-01-01')", conn.pending[0][0])
+
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "需要 TEST_DATABASE_URL (可寫入的 Postgres) 才會執行")
+class TestMigrationsOnDatabase(unittest.TestCase):
+    """在獨立的 schema 實際套用所有版本，驗證觸發器、NOTIFY 與分區 (不只比對 SQL 字串)"""
+
+    def setUp(self):
+        self.schema = f"test_migrations_{os.getpid()}"
+        self.admin = psycopg2.connect(TEST_DATABASE_URL)
+        self.admin.autocommit = True
+        with self.admin.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {self.schema} CASCADE; CREATE SCHEMA {self.schema};")
+        self.conn = psycopg2.connect(TEST_DATABASE_URL, options=f"-c search_path={self.schema}")
+
+    def tearDown(self):
+        self.conn.close()
+        with self.admin.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {self.schema} CASCADE;")
+        self.admin.close()
+
+    def test_triggers_notify_and_partitions(self):
+        conn = self.conn
+        self.assertEqual(migrate(conn), ALL_VERSIONS)
+        self.assertEqual(migrate(conn), [])
+        with conn.cursor() as cursor:
+            cursor.execute("LISTEN dashboard_events;")
+        conn.commit()
+
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO trade_history (strategy_name, side, entry_price, entry_time, status)
+                VALUES ('MigrationTest', 'Buy', 20000, '2025-11-03 09:00', 'Open') RETURNING id;
+            """)
+            trade_id = cursor.fetchone()[0]
+        conn.commit()
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE trade_history SET status = 'Closed', exit_price = 20050, exit_time = '2025-11-03 10:00',
+                pnl_points = 50 WHERE id = %s;
+            """, (trade_id,))
+            # 修正已平倉紀錄的損益: 先扣舊貢獻再加新貢獻，不重複計算
+            cursor.execute("UPDATE trade_history SET pnl_points = 40 WHERE id = %s;", (trade_id,))
+        conn.commit()
+
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT trade_date, pnl_points, trades FROM strategy_daily_pnl "
+                           "WHERE strategy_name = 'MigrationTest';")
+            self.assertEqual(cursor.fetchall(), [(date(2025, 11, 3), Decimal("40"), 1)])
+            cursor.execute("SELECT change_counter FROM dashboard_state;")
+            self.assertEqual(cursor.fetchone()[0], 3)
+        conn.commit()
+        conn.poll()
+        events = [parse_event(n.payload) for n in conn.notifies]
+        events = [e for e in events if (e['row'] or e['old']).get('strategy_name') == 'MigrationTest']
+        self.assertEqual([e['kind'] for e in events], ['trade_opened', 'trade_closed', 'trade_updated'])
+        self.assertEqual(events[-1]['old']['pnl_points'], 50)
+
+        with conn.cursor() as cursor:
+            names = ensure_partitions(cursor, "market_bars", date(2025, 11, 3), date(2025, 11, 3))
+            cursor.execute("INSERT INTO market_bars VALUES ('TMFK5', 1, '2025-11-03 09:00', 1, 2, 0.5, 1.5, 10);")
+            cursor.execute("SELECT tableoid::regclass::text FROM market_bars;")
+            self.assertEqual(cursor.fetchone()[0], names[0])
+        conn.commit()
+        with self.assertRaises(psycopg2.IntegrityError):
+            with conn.cursor() as cursor:
+                # 沒有涵蓋的分區
+                cursor.execute("INSERT INTO market_bars VALUES ('TMFK5', 1, '2026-01-05 09:00', 1, 2, 0.5, 1.5, 10);")
+        conn.rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from src.engine import ContractPipeline
+from src.monitor_state import MonitorState
+from src.scheduler import TW_TZ
+from src.strategies.indicators import calculate_supertrend
+
+
+def daily_bars(n=30, start=datetime(2025, 10, 1)):
+    rng = np.random.default_rng(7)
+    close = 20000 + np.cumsum(rng.normal(0, 80, n))
+    return pd.DataFrame({'datetime': [start + timedelta(days=i) for i in range(n)], 'open': close - 10,
+                         'high': close + 60, 'low': close - 60, 'close': close, 'volume': 1000})
+
+
+class TestMonitorState(unittest.TestCase):
+    def setUp(self):
+        self.now = TW_TZ.localize(datetime(2025, 11, 17, 10, 0))
+        self.state = MonitorState(clock=lambda: self.now)
+        self.pipeline = ContractPipeline(SimpleNamespace(code="TMFL5", delivery_date="2025/11/19"))
+        self.pipeline.maker_1d.load_historical_dataframe(daily_bars())
+
+    def test_trend_recomputed_only_after_bar_completes(self):
+        expected, _ = calculate_supertrend(daily_bars())
+        trend = self.state.trend_status(self.pipeline)
+        self.assertEqual(trend, "BULL (多)" if expected else "BEAR (空)")
+        for _ in range(5):
+            self.state.trend_status(self.pipeline)
+        self.assertEqual(self.state.misses, 1)
+
+        # 同一根日 K 內的 Tick 不會失效；跨日完成一根日 K 才重算
+        maker = self.pipeline.maker_1d
+        maker.update_with_tick({'datetime': datetime(2025, 11, 1, 9, 0), 'close': 20000, 'volume': 1})
+        maker.update_with_tick({'datetime': datetime(2025, 11, 1, 9, 5), 'close': 20010, 'volume': 1})
+        self.state.trend_status(self.pipeline)
+        self.assertEqual(self.state.misses, 1)
+        maker.update_with_tick({'datetime': datetime(2025, 11, 2, 9, 0), 'close': 20020, 'volume': 1})
+        self.state.trend_status(self.pipeline)
+        self.assertEqual(self.state.misses, 2)
+
+    def test_expiry_days_follow_date(self):
+        contract = self.pipeline.contract
+        self.assertEqual(self.state.expiry_days(contract), 1)    # 同 (11/19 00:00 - 11/17 10:00).days
+        self.now += timedelta(hours=5)
+        self.assertEqual(self.state.expiry_days(contract), 1)
+        self.assertEqual(self.state.misses, 1)
+        self.now += timedelta(days=1)
+        self.assertEqual(self.state.expiry_days(contract), 0)
+        self.assertEqual(self.state.expiry_days(SimpleNamespace(code="X", delivery_date="")), "N/A")
+
+    def test_strategy_lines(self):
+        strategy = SimpleNamespace(name="Dual_TMF", contract=self.pipeline.contract, is_long=False, is_short=True,
+                                   entry_price=20100.0)
+        self.assertEqual(self.state.strategy_lines([strategy]),
+                         ["   -> [Dual_TMF] TMFL5 Position: SHORT | Entry: 20100.0"])
+        strategy.is_short = False
+        self.assertIn("Position: EMPTY", self.state.strategy_lines([strategy])[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import importlib
+import math
+import unittest
+from unittest import mock
+import numpy as np
+
+from src.research.monte_carlo import monte_carlo, resample_paths, block_indices, robustness_table
+
+mc = importlib.import_module('src.research.monte_carlo')   # src.research 的 monte_carlo 屬性是同名函式
+
+
+class TestMonteCarlo(unittest.TestCase):
+    def setUp(self):
+        self.pnl = np.array([120.0, -80.0, 60.0, -100.0, 200.0, -40.0, 90.0, -60.0, 150.0, -30.0, 70.0])
+
+    def test_shuffle_preserves_total(self):
+        paths = resample_paths(self.pnl, 500, 'shuffle', rng=np.random.default_rng(0))
+        np.testing.assert_allclose(paths.sum(axis=1), self.pnl.sum())
+        np.testing.assert_allclose(np.sort(paths, axis=1), np.tile(np.sort(self.pnl), (500, 1)))
+
+    def test_block_indices_are_contiguous(self):
+        idx = block_indices(11, 200, 3, np.random.default_rng(0))
+        self.assertEqual(idx.shape, (200, 11))
+        # 同一區塊內的索引為 (環狀) 連續
+        self.assertTrue(np.all((idx[:, 1] - idx[:, 0]) % 11 == 1))
+
+    def test_observed_and_ruin(self):
+        r = monte_carlo(self.pnl, n_paths=2000, method='sign', multiplier=10.0,
+                        initial_capital=1000.0, ruin_equity=500.0, seed=1)
+        self.assertAlmostEqual(r.observed_pnl, self.pnl.sum() * 10)
+        self.assertAlmostEqual(r.observed_drawdown, 1200.0)
+        self.assertGreater(r.ruined.mean(), 0.0)
+        summary = r.summary()
+        self.assertLessEqual(summary['dd_p50'], summary['dd_p95'])
+
+    def test_trade_dicts_and_table(self):
+        trades = [{'pnl': p} for p in self.pnl]
+        table = robustness_table([{'UT_Key': 4.0, 'trades': trades}, {'UT_Key': 3.0, 'trades': []}],
+                                 ['UT_Key'], n_paths=500, seed=0)
+        self.assertEqual(list(table['UT_Key']), [4.0, 3.0])
+        self.assertEqual(table.loc[1, 'Block_DD_p95'], 0.0)
+
+    def test_100k_paths_are_chunked(self):
+        # 以呼叫次數驗證向量化分塊 (每塊一次 2D 運算，而非逐條路徑)，不依賴執行時間
+        with mock.patch.object(mc, 'CHUNK_CELLS', 110_000), \
+                mock.patch.object(mc, 'resample_paths', wraps=mc.resample_paths) as resample:
+            r = monte_carlo(self.pnl, n_paths=100_000, method='block', seed=0)
+        self.assertEqual(len(r.max_drawdown), 100_000)
+        chunk = 110_000 // len(self.pnl)
+        self.assertEqual(resample.call_count, math.ceil(100_000 / chunk))
+        self.assertEqual(sum(call.args[1] for call in resample.call_args_list), 100_000)
+        self.assertTrue(all(call.args[1] * len(self.pnl) <= 110_000 for call in resample.call_args_list))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from src.research.parallel_runner import GridRunner, SharedFrame, param_grid
+
+
+def summarize(data, scale, offset):
+    df = data['bars']
+    return {
+        'scale': scale,
+        'offset': offset,
+        'value': float(df['close'].sum() * scale + offset),
+        'first_time': df['datetime'].iloc[0],
+        'bull_days': int(df['is_uptrend'].sum()),
+    }
+
+
+class TestGridRunner(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'datetime': pd.date_range("2025-01-01", periods=50, freq="60min"),
+            'close': np.arange(50, dtype=float),
+            'is_uptrend': np.arange(50) % 2 == 0,
+        })
+
+    def test_param_grid_order(self):
+        grid = param_grid(a=[1, 2], b=['x', 'y'])
+        self.assertEqual(grid, [{'a': 1, 'b': 'x'}, {'a': 1, 'b': 'y'}, {'a': 2, 'b': 'x'}, {'a': 2, 'b': 'y'}])
+
+    def test_shared_frame_roundtrip(self):
+        frame = SharedFrame(self.df)
+        try:
+            handles = []
+            attached = SharedFrame.attach(frame.spec, handles)
+            pd.testing.assert_frame_equal(attached, self.df)
+        finally:
+            for shm in handles:
+                shm.close()
+            frame.close()
+
+    def test_parallel_results_are_ordered(self):
+        grid = param_grid(scale=[1.0, 2.0, 3.0], offset=[0, 10, 20, 30])
+        serial = GridRunner(summarize, {'bars': self.df}, max_workers=1, progress=None).run(grid)
+        parallel = GridRunner(summarize, {'bars': self.df}, max_workers=2, chunk_size=1, progress=None).run(grid)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(parallel[5]['scale'], 2.0)
+        self.assertEqual(parallel[5]['offset'], 10)
+        self.assertEqual(parallel[0]['bull_days'], 25)
+
+    def test_object_columns_rejected(self):
+        with self.assertRaises(ValueError):
+            SharedFrame(pd.DataFrame({'signal': ["Buy", "None"]}))
+
+
+if __name__ == '__main__':
+    unittest.main()
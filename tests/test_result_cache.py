@@ -0,0 +1,70 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+import pandas as pd
+
+from src.research import result_cache
+from src.research.bnf_b_vectorized import simulate_bnf_b
+from src.research.result_cache import ResultCache, code_version, dataset_hash
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(root=self.tmp.name)
+        self.calls = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def compute(self, points):
+        self.calls.append(points)
+        return [{'PnL': p['a'] * 10, 'trades': [p['a']]} for p in points]
+
+    def test_only_new_points_are_computed(self):
+        first = self.cache.run("S", "v1", "d1", [{'a': 1}, {'a': 2}], self.compute)
+        second = self.cache.run("S", "v1", "d1", [{'a': 1}, {'a': 2}, {'a': 3}], self.compute)
+        self.assertEqual(self.calls, [[{'a': 1}, {'a': 2}], [{'a': 3}]])
+        self.assertEqual(second[:2], first)
+        self.assertEqual(second[2]['PnL'], 30)
+
+    def test_version_and_dataset_change_invalidate(self):
+        self.cache.run("S", "v1", "d1", [{'a': 1}], self.compute)
+        self.cache.run("S", "v2", "d1", [{'a': 1}], self.compute)
+        self.cache.run("S", "v2", "d2", [{'a': 1}], self.compute)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_dataset_hash_tracks_content(self):
+        df = pd.DataFrame({'close': [1.0, 2.0]})
+        self.assertEqual(dataset_hash(df), dataset_hash(df.copy()))
+        self.assertNotEqual(dataset_hash(df), dataset_hash(df.assign(close=[1.0, 2.5])))
+
+    def test_code_version_covers_shared_modules(self):
+        base = code_version(simulate_bnf_b)
+        self.assertEqual(code_version(simulate_bnf_b), base)
+        getsource = result_cache.inspect.getsource
+        for name in result_cache.SHARED_MODULES:
+            # 只改動指標 / 摘要指標模組 (不是傳入物件所在的模組) 也要讓版本改變
+            edited = lambda module, name=name: getsource(module) + ("# edited" if module.__name__ == name else "")
+            with mock.patch.object(result_cache.inspect, 'getsource', side_effect=edited):
+                self.assertNotEqual(code_version(simulate_bnf_b), base, name)
+
+    def test_evict_by_age_and_size(self):
+        for i in range(4):
+            self.cache.put(f"{i:02d}key", b"x" * 1000)
+        old_path = self.cache._path("00key")
+        past = time.time() - 40 * 86400
+        os.utime(old_path, (past, past))
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertIsNone(self.cache.get("00key"))
+
+        self.cache.max_bytes = 2500
+        self.assertEqual(self.cache.evict(), 1)
+        remaining = [k for k in ("01key", "02key", "03key") if self.cache.get(k) is not None]
+        self.assertEqual(len(remaining), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from datetime import datetime, time as dt_time, timedelta
+
+from src.scheduler import Scheduler, TW_TZ
+
+
+class FakeClock:
+    def __init__(self, start):
+        self.now = TW_TZ.localize(start)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, **kwargs):
+        self.now += timedelta(**kwargs)
+        return self.now
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        # 2025-11-07 為週五
+        self.clock = FakeClock(datetime(2025, 11, 7, 13, 40))
+        self.scheduler = Scheduler(clock=self.clock)
+        self.fired = []
+
+    def record(self, name):
+        return lambda: self.fired.append((name, self.clock().strftime("%a %H:%M")))
+
+    def test_session_events_follow_calendar(self):
+        delay = timedelta(minutes=1)
+        for event in ('day_open', 'day_close', 'night_open', 'night_close'):
+            self.scheduler.session(event, event, self.record(event), delay=delay)
+        self.assertEqual(self.scheduler.next_due(), TW_TZ.localize(datetime(2025, 11, 7, 13, 46)))
+
+        # 逐一跳到每個到期時間 (模擬 run_forever 的睡眠)，直到下週一收盤
+        while self.scheduler.next_due() <= TW_TZ.localize(datetime(2025, 11, 10, 13, 46)):
+            self.clock.now = self.scheduler.next_due()
+            self.scheduler.run_pending()
+        self.assertEqual(self.fired, [
+            ('day_close', 'Fri 13:46'), ('night_open', 'Fri 15:01'), ('night_close', 'Sat 05:01'),
+            ('day_open', 'Mon 08:46'), ('day_close', 'Mon 13:46'),
+        ])
+
+    def test_late_wakeup_fires_once_without_drift(self):
+        job = self.scheduler.every(60, 'monitor', self.record('monitor'))
+        self.scheduler.daily(dt_time(13, 46), 'close', self.record('close'))
+
+        # 睡過頭 3 分半: 每個工作只補執行一次，週期工作仍對齊原本的分鐘
+        self.scheduler.run_pending(self.clock.advance(minutes=7, seconds=30))
+        self.assertEqual(sorted(name for name, _ in self.fired), ['close', 'monitor'])
+        self.assertEqual(job.due, TW_TZ.localize(datetime(2025, 11, 7, 13, 48)))
+        self.assertEqual(self.scheduler.jobs()[-1].due, TW_TZ.localize(datetime(2025, 11, 8, 13, 46)))
+
+    def test_failure_and_cancel(self):
+        def boom():
+            raise RuntimeError("broker down")
+        failing = self.scheduler.every(60, 'failing', boom)
+        self.scheduler.call_later(30, 'once', self.record('once'))
+        with self.assertLogs(level='ERROR'):
+            self.assertEqual(self.scheduler.run_pending(self.clock.advance(minutes=1)), ['once', 'failing'])
+        self.assertEqual([j.name for j in self.scheduler.jobs()], ['failing'])   # 失敗的工作仍保留排程
+        self.scheduler.cancel(failing)
+        self.assertIsNone(self.scheduler.next_due())
+
+
+if __name__ == '__main__':
+    unittest.main()
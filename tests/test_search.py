@@ -0,0 +1,41 @@
+import unittest
+import pandas as pd
+
+from src.research.search import sample_configs, slice_history, successive_halving, space_size
+
+
+def quadratic(data, x, y):
+    # 最佳解為 x=3, y=-1
+    return {'PnL': -((x - 3) ** 2) - ((y + 1) ** 2), 'Bars': len(data['bars'])}
+
+
+class TestSuccessiveHalving(unittest.TestCase):
+    def setUp(self):
+        self.data = {'bars': pd.DataFrame({
+            'datetime': pd.date_range("2025-01-01", periods=270, freq="60min"),
+            'close': range(270),
+        })}
+        self.space = {'x': list(range(9)), 'y': [-3, -2, -1, 0, 1, 2]}
+
+    def test_sample_configs_unique(self):
+        configs = sample_configs(self.space, 20, seed=1)
+        self.assertEqual(len(configs), 20)
+        self.assertEqual(len({(c['x'], c['y']) for c in configs}), 20)
+        self.assertEqual(len(sample_configs(self.space, 1000)), space_size(self.space))
+
+    def test_slice_history_keeps_recent(self):
+        sliced = slice_history(self.data, 1 / 3)['bars']
+        self.assertEqual(sliced['datetime'].iloc[-1], self.data['bars']['datetime'].iloc[-1])
+        self.assertLess(len(sliced), 100)
+
+    def test_finds_optimum_and_halves(self):
+        final, history = successive_halving(quadratic, self.data, self.space, n_configs=54, eta=3,
+                                            max_workers=1)
+        self.assertEqual([len(h['configs']) for h in history], [54, 18, 6, 2])
+        self.assertEqual(history[-1]['fraction'], 1.0)
+        self.assertEqual(final.iloc[0]['Bars'], 270)
+        self.assertEqual((final.iloc[0]['x'], final.iloc[0]['y']), (3, -1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+os.environ["DISABLE_LINE_NOTIFY"] = "true"
+
+from src.engine import TradingEngine
+from src.research.parallel_runner import param_grid
+from src.strategies.dual_logic import DualTimeframeStrategy
+from src.strategies.gatekeeper_bnf_b import GatekeeperBNFBStrategy
+from src.strategies.indicators import (calculate_supertrend, calculate_supertrend_fast, calculate_ut_bot,
+                                       calculate_ut_bot_multi)
+from src.strategies.shadow_fleet import DualTimeframeFleet, GatekeeperBNFBFleet
+from src.trade_ledger import TradeLedger
+from tests.helpers import make_60m_bars, to_daily
+
+def run_side_by_side(fleet, strategy_cls, df_60m, df_1d=None, window=100, window_1d=100):
+    """逐根餵給影子群組與對應的單一策略實例，回傳 (策略交易列表, 群組帳本)"""
+    strategies = []
+    for variant, name in zip(fleet.variants, fleet.names):
+        strategy = strategy_cls(name=name + "_Backtest", portfolio=None, contract=None)
+        for key, value in variant.items():
+            setattr(strategy, key, value)
+        strategies.append(strategy)
+    for i in range(len(df_60m)):
+        w = df_60m.iloc[max(0, i - window + 1):i + 1]
+        w_1d = None
+        if df_1d is not None:
+            w_1d = df_1d[df_1d['datetime'] < w['datetime'].iloc[-1]].iloc[-window_1d:]
+        fleet.check_signals(w, w_1d)
+        for strategy in strategies:
+            strategy.check_signals(w, w_1d)
+    return [list(s.trades) for s in strategies]
+
+
+class TestFastIndicators(unittest.TestCase):
+    def test_match_reference(self):
+        df = make_60m_bars(300)
+        keys = [1.0, 2.0, 4.0, 6.0]
+        codes = {'Buy': 1, 'Sell': -1, 'None': 0}
+        signals = []
+        for end in range(5, 300, 11):
+            w = df.iloc[max(0, end - 60):end]
+            multi = calculate_ut_bot_multi(w, keys)
+            self.assertEqual(multi.tolist(), [codes[calculate_ut_bot(w, key_value=k)] for k in keys])
+            signals.extend(multi.tolist())
+            expected, fast = calculate_supertrend(w), calculate_supertrend_fast(w)
+            self.assertEqual(expected[0], fast[0])
+            if expected[1] is not None and not pd.isna(expected[1]):
+                self.assertAlmostEqual(expected[1], fast[1], places=9)
+        self.assertTrue({1, -1} <= set(signals))
+
+
+class TestShadowFleet(unittest.TestCase):
+    def assertSameTrades(self, fleet, expected_lists):
+        total = 0
+        for name, expected in zip(fleet.names, expected_lists):
+            rows = [fleet.ledger.record(r) for r in range(len(fleet.ledger))]
+            actual = [r for r in rows if r['strategy'] == name]
+            self.assertEqual(len(expected), len(actual), name)
+            for e, a in zip(expected, actual):
+                self.assertEqual(e['direction'], a['direction'])
+                self.assertEqual(pd.Timestamp(e['exit_time']), a['exit_time'])
+                self.assertAlmostEqual(e['pnl'], a['pnl'], places=6)
+                self.assertEqual(e['reason'], a['reason'])
+            total += len(expected)
+        self.assertGreater(total, 0)
+
+    def test_bnf_b_fleet_matches_strategy(self):
+        df = make_60m_bars(400)
+        fleet = GatekeeperBNFBFleet(param_grid(bias_threshold=[-0.5, -1.5], partial_tp_points=[40.0, 80.0],
+                                               time_stop_days=[1]))
+        self.assertSameTrades(fleet, run_side_by_side(fleet, GatekeeperBNFBStrategy, df))
+
+    def test_dual_fleet_matches_strategy(self):
+        df = make_60m_bars(220, seed=3)
+        df_1d = to_daily(df)
+        fleet = DualTimeframeFleet([{'ut_bot_key': 1.0, 'body_filter': 0.0, 'be_threshold': 40.0,
+                                     'trailing_stop_drop': 30.0},
+                                    {'ut_bot_key': 2.0, 'body_filter': 10.0}])
+        expected = run_side_by_side(fleet, DualTimeframeStrategy, df, df_1d, window=40, window_1d=12)
+        self.assertSameTrades(fleet, expected)
+
+    def test_validation_summary_and_roll(self):
+        with self.assertRaises(ValueError):
+            GatekeeperBNFBFleet([{'no_such_param': 1}])
+        with self.assertRaises(ValueError):
+            GatekeeperBNFBFleet([{'sma_period': 30}])
+
+        ledger = TradeLedger()
+        fleet = GatekeeperBNFBFleet.grid(ledger=ledger, bias_threshold=[-1.0, -2.0])
+        self.assertEqual(fleet.names, ["Shadow-BNF-B[bias_threshold=-1.0]", "Shadow-BNF-B[bias_threshold=-2.0]"])
+        fleet.position[:] = [1, 0]
+        fleet.entry_price[:] = [20000.0, 0.0]
+        fleet.stop_loss[:] = [19900.0, 0.0]
+        fleet.roll(30.0)
+        self.assertEqual(fleet.entry_price.tolist(), [20030.0, 0.0])
+        self.assertEqual(fleet.stop_loss.tolist(), [19930.0, 0.0])
+
+        summary = fleet.summary()
+        self.assertEqual(list(summary.columns), ['bias_threshold', 'trades', 'pnl', 'position'])
+        self.assertEqual(summary['position'].tolist(), [1, 0])
+
+    def test_defaults_and_daily_trend_cache(self):
+        self.assertEqual(GatekeeperBNFBFleet.default_params()['sma_period'], GatekeeperBNFBStrategy(
+            name="x", portfolio=None, contract=None).sma_period)
+        self.assertEqual(set(DualTimeframeFleet.default_params()), set(DualTimeframeFleet.PARAMS))
+
+        df = make_60m_bars(220, seed=3)
+        df_1d = to_daily(df)
+        fleet = DualTimeframeFleet([{'ut_bot_key': 2.0}])
+        with mock.patch('src.strategies.shadow_fleet.calculate_supertrend_fast',
+                        wraps=calculate_supertrend_fast) as trend:
+            run_side_by_side(fleet, DualTimeframeStrategy, df.iloc[:120], df_1d, window=40, window_1d=12)
+        # 日 K Supertrend 只在日 K 改變時重算，不是每根 60 分 K
+        days = df_1d['datetime'].searchsorted(df['datetime'].iloc[:120], side='left')
+        self.assertEqual(trend.call_count, len(set(days.tolist())))
+
+    def test_engine_runs_shadows_without_orders(self):
+        engine = TradingEngine()
+        contract = SimpleNamespace(code="TMFK5", delivery_date="2025/11/19")
+        fleet = engine.add_shadow(contract, GatekeeperBNFBFleet(param_grid(bias_threshold=[-0.5, -1.0]),
+                                                                ledger=engine.ledger))
+        df = make_60m_bars(300)
+        pipeline = engine.pipelines["TMFK5"]
+        for row in df.itertuples():
+            for price in (row.open, row.close):
+                pipeline.on_tick({'datetime': row.datetime, 'close': price, 'volume': row.volume / 2})
+        self.assertIs(engine.shadows[0], fleet)
+        self.assertGreater(len(engine.ledger), 0)
+        self.assertTrue(set(engine.ledger.strategies) <= set(fleet.names))
+
+
+if __name__ == '__main__':
+    unittest.main()
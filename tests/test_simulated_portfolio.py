@@ -0,0 +1,60 @@
+import unittest
+from types import SimpleNamespace
+
+from src.simulated_portfolio import SimulatedPortfolioManager
+from src.strategies.gatekeeper_bnf_b import GatekeeperBNFBStrategy
+from src.trade_ledger import TradeLedger
+from tests.helpers import make_60m_bars, run_reference
+
+
+class TestSimulatedPortfolioManager(unittest.TestCase):
+    def test_nets_opposite_positions(self):
+        pm = SimulatedPortfolioManager()
+        self.assertTrue(pm.set_virtual_position("A", "TMFC5", 1, average_cost=20000))
+        self.assertTrue(pm.set_virtual_position("B", "TMFC5", -1, average_cost=20010))
+        self.assertEqual(pm.net_positions["TMFC5"], 0)
+        self.assertEqual(len(pm.orders), 2)
+        # A 平倉時淨部位由 0 → -1，只需一口賣單；B 再平倉則由 -1 → 0
+        pm.set_virtual_position("A", "TMFC5", 0, average_cost=20050)
+        pm.set_virtual_position("B", "TMFC5", 0, average_cost=20040)
+        summary = pm.summary()
+        self.assertEqual(summary['contracts_traded'], 4)
+        self.assertEqual(summary['peak_margin'], 9200.0)
+        self.assertEqual(summary['peak_gross_margin'], 18400.0)
+
+        pm.set_virtual_position("A", "TMFC5", 1, average_cost=20000)
+        pm.set_virtual_position("B", "TMFC5", 1, average_cost=20000)
+        pm.set_virtual_position("C", "TMFC5", -1, average_cost=20000)
+        self.assertEqual(pm.net_positions["TMFC5"], 1)
+        self.assertEqual(pm.margin_in_use(), 9200.0)
+        self.assertEqual(pm.summary()['peak_gross_margin'], 27600.0)
+        self.assertEqual(pm.get_virtual_position("C", "TMFC5"), -1)
+
+    def test_backtest_strategies_route_entries_and_exits(self):
+        df = make_60m_bars()
+        contract = SimpleNamespace(code="TMFC5")
+        pm = SimulatedPortfolioManager()
+        ledger = TradeLedger()
+        strategies = [
+            GatekeeperBNFBStrategy(name="BNF-1_Backtest", portfolio=pm, contract=contract, ledger=ledger),
+            GatekeeperBNFBStrategy(name="BNF-2_Backtest", portfolio=pm, contract=contract, ledger=ledger),
+        ]
+        strategies[1].bias_threshold = -1.0
+        strategies[1].volume_spike_ratio = 1.2
+        for i in range(len(df)):
+            window = df.iloc[max(0, i - 100):i + 1]
+            for strategy in strategies:
+                strategy.check_signals(window, None)
+
+        # 與不經過 PortfolioManager 的結果一致
+        self.assertEqual([t['pnl'] for t in strategies[1].trades],
+                         [t['pnl'] for t in run_reference(df, -1.0, 1.2)])
+        self.assertGreater(len(ledger), 0)
+        open_positions = sum(1 for s in strategies if s.is_long) - sum(1 for s in strategies if s.is_short)
+        self.assertEqual(pm.net_positions.get("TMFC5", 0), open_positions)
+        self.assertEqual(pm.summary()['contracts_traded'], 2 * len(ledger) + abs(open_positions))
+        pm.reconcile_positions("TMFC5")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from types import SimpleNamespace
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from src.engine import TradingEngine
+from src.status_server import StatusBoard, StatusServer, engine_status, fetch_status
+
+
+class TestStatusServer(unittest.TestCase):
+    def setUp(self):
+        self.board = StatusBoard()
+        self.server = StatusServer(self.board, port=0).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_version_changes_only_on_new_content(self):
+        self.board.set('account', {'total_equity': 100000.0})
+        first = fetch_status(self.server.url)
+        self.assertEqual(first['data']['account']['total_equity'], 100000.0)
+        self.assertIsNone(fetch_status(self.server.url, since=first['version']))
+
+        self.board.set('account', {'total_equity': 101000.0})
+        second = fetch_status(self.server.url, since=first['version'])
+        self.assertEqual(second['version'], first['version'] + 1)
+
+        with self.assertRaises(HTTPError) as ctx:
+            urlopen(self.server.url.replace("/status", "/nope"), timeout=1)
+        self.assertEqual(ctx.exception.code, 404)
+
+    def test_engine_provider(self):
+        engine = TradingEngine()
+        pipeline = engine.add_contract(SimpleNamespace(code="TMFK5"))
+        pipeline.latest_quote = {'close': 20010.0}
+        strategy = SimpleNamespace(name="Dual_TMF", contract=pipeline.contract, is_long=False, is_short=True,
+                                   entry_price=20050.0, stop_loss=20150.0)
+        pipeline.strategies.append(strategy)
+        self.board.add_provider('engine', lambda: engine_status(engine))
+
+        data = fetch_status(self.server.url)['data']['engine']
+        self.assertEqual(data['prices'], {"TMFK5": 20010.0})
+        self.assertEqual(data['net_positions'], {"TMFK5": -1})
+        self.assertEqual(data['strategies'][0]['stop_loss'], 20150.0)
+
+        # 策略平倉後內容改變，version 遞增且不再回報停損價
+        version = self.board.snapshot()['version']
+        strategy.is_short = False
+        snapshot = self.board.snapshot()
+        self.assertEqual(snapshot['version'], version + 1)
+        self.assertIsNone(snapshot['data']['engine']['strategies'][0]['stop_loss'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+import os
+import time
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+os.environ["DISABLE_LINE_NOTIFY"] = "true"
+
+from src.market_bus import ShmRing, MARKET_DTYPE, INTENT_DTYPE, KIND_TICK, INTENT_ORDER
+from src.continuous_contract import ROLL_KEPT_OLD, ROLL_FLATTENED
+from src.simulated_portfolio import SimulatedPortfolioManager
+from src.strategy_host import MultiProcessEngine, OrderGateway, StrategyProxy
+from src.trade_ledger import TradeLedger
+
+
+class FlipStrategy:
+    """每根 60 分 K 在空手與做多之間切換；平倉時記錄一筆交易"""
+    def __init__(self, name, portfolio=None, contract=None, ledger=None):
+        self.name = name
+        self.portfolio = portfolio
+        self.contract = contract
+        self.trades = (ledger if ledger is not None else TradeLedger()).view(name)
+        self.is_long = False
+        self.is_short = False
+        self.entry_price = 0.0
+        self.entry_time = None
+        self.size = 1
+
+    def check_signals(self, df_60m, df_1d=None):
+        bar = df_60m.iloc[-1]
+        price = float(bar['close'])
+        if not self.is_long:
+            if self.portfolio.set_virtual_position(self.name, self.contract.code, self.size, average_cost=price):
+                self.is_long, self.entry_price, self.entry_time = True, price, bar['datetime']
+        elif self.portfolio.set_virtual_position(self.name, self.contract.code, 0, average_cost=price):
+            self.trades.append({'direction': 'Long', 'entry_time': self.entry_time, 'exit_time': bar['datetime'],
+                                'entry_price': self.entry_price, 'exit_price': price,
+                                'pnl': price - self.entry_price, 'reason': '測試出場'})
+            self.is_long = False
+
+
+def wait_for(predicate, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestShmRing(unittest.TestCase):
+    def test_overrun_reports_dropped(self):
+        ring = ShmRing(MARKET_DTYPE, capacity=8)
+        try:
+            reader = ShmRing(MARKET_DTYPE, name=ring.name)
+            for i in range(20):
+                ring.publish(KIND_TICK, 0, i, 0.0, 0.0, 0.0, float(i), 1.0, -1, -1)
+            records, cursor, dropped = reader.read(0)
+            self.assertEqual(cursor, 20)
+            self.assertEqual(dropped, 12)
+            self.assertEqual(records['close'].tolist(), [float(i) for i in range(12, 20)])
+            reader.close()
+        finally:
+            ring.close()
+
+
+class TestOrderGateway(unittest.TestCase):
+    def test_rejects_old_contract_intent_after_roll(self):
+        old, new = SimpleNamespace(code="TMFK5"), SimpleNamespace(code="TMFL5")
+        portfolio = SimulatedPortfolioManager()
+        proxy = StrategyProxy("A", old)
+        gateway = OrderGateway(portfolio, TradeLedger(), ["A"], ["TMFK5", "TMFL5"],
+                               {"TMFK5": old, "TMFL5": new}, {"A": proxy})
+        intents, acks = ShmRing(INTENT_DTYPE, 1 << 4), ShmRing(INTENT_DTYPE, 1 << 4)
+        try:
+            gateway.add_channel(intents, acks)
+            proxy.contract = new     # 已換月，但 worker 仍以舊合約送出委託
+            intents.publish(INTENT_ORDER, 0, 0, 1, 20000.0, 1, 0, 0, 0, 0.0, 0.0, 0.0, b"")
+            intents.publish(INTENT_ORDER, 0, 1, 1, 20050.0, 2, 0, 0, 0, 0.0, 0.0, 0.0, b"")
+            self.assertEqual(gateway.poll(), 2)
+            records, _, _ = acks.read(0)
+            self.assertEqual(records['position'].tolist(), [0, 1])
+            self.assertNotIn("TMFK5", portfolio.net_positions)
+            self.assertEqual(portfolio.net_positions["TMFL5"], 1)
+            self.assertTrue(proxy.is_long)
+        finally:
+            intents.close()
+            acks.close()
+
+
+class TestMultiProcessEngine(unittest.TestCase):
+    def test_workers_trade_through_gateway(self):
+        tmf = SimpleNamespace(code="TMFK5", delivery_date="2025/11/19")
+        mxf = SimpleNamespace(code="MXFK5", delivery_date="2025/11/19")
+        portfolio = SimulatedPortfolioManager()
+        engine = MultiProcessEngine(portfolio=portfolio, workers=2, capacity=1 << 10)
+        engine.add_strategy(tmf, FlipStrategy, "A")
+        engine.add_strategy(tmf, FlipStrategy, "B", size=2)
+        engine.add_strategy(mxf, FlipStrategy, "C")
+        with self.assertRaises(AttributeError):
+            engine.add_strategy(mxf, FlipStrategy, "D", no_such_param=1)
+
+        engine.start()
+        try:
+            t0 = datetime(2025, 11, 3, 9, 0)
+            for h, price in enumerate([20000, 20040, 20100]):
+                engine.on_quote(None, {'code': "TMFK5", 'datetime': t0 + timedelta(hours=h), 'close': price,
+                                       'volume': 1})
+            # 第二根 K 完成時 A / B 進場 (60m 第一根 20000)，第三根 Tick 讓第二根完成 → 平倉
+            self.assertTrue(wait_for(lambda: len(engine.ledger) == 2), "worker 未回傳交易")
+            self.assertEqual(portfolio.net_positions["TMFK5"], 0)
+            self.assertEqual(sorted(engine.ledger.pnl_by_strategy().items()), [("A", 40.0), ("B", 40.0)])
+            self.assertEqual(len(portfolio.orders), 4)
+
+            engine.on_quote(None, {'code': "MXFK5", 'datetime': t0, 'close': 21000, 'volume': 1})
+            engine.on_quote(None, {'code': "MXFK5", 'datetime': t0 + timedelta(hours=1), 'close': 21010,
+                                   'volume': 1})
+            self.assertTrue(wait_for(lambda: portfolio.net_positions.get("MXFK5") == 1))
+            self.assertTrue(engine.proxies["C"].is_long)
+            self.assertEqual(engine.proxies["C"].entry_price, 21000.0)
+            self.assertFalse(engine.proxies["A"].is_long)
+        finally:
+            engine.stop()
+
+    def test_roll_failures_keep_bar_feeds(self):
+        class RejectingPortfolio(SimulatedPortfolioManager):
+            rejected = {}   # {策略名稱: 建倉一律失敗的合約代碼}
+
+            def set_virtual_position(self, strategy_name, contract_symbol, new_position, **kwargs):
+                if new_position != 0 and contract_symbol in self.rejected.get(strategy_name, ()):
+                    return False
+                return super().set_virtual_position(strategy_name, contract_symbol, new_position, **kwargs)
+
+        old = SimpleNamespace(code="TMFK5", delivery_date="2025/11/19")
+        new = SimpleNamespace(code="TMFL5", delivery_date="2025/12/17")
+        portfolio = RejectingPortfolio()
+        engine = MultiProcessEngine(portfolio=portfolio, workers=2, capacity=1 << 10)
+        engine.register_contracts([old, new])
+        for name in ("A", "B", "C"):      # worker 0: A / C，worker 1: B
+            engine.add_strategy(old, FlipStrategy, name)
+
+        engine.start()
+        try:
+            t0 = datetime(2025, 11, 3, 9, 0)
+            for h, price in enumerate([20000, 20040]):
+                engine.on_quote(None, {'code': "TMFK5", 'datetime': t0 + timedelta(hours=h), 'close': price,
+                                       'volume': 1})
+            self.assertTrue(wait_for(lambda: portfolio.net_positions.get("TMFK5") == 3), "worker 未進場")
+
+            # A: 新合約建倉失敗 (留在舊合約)；B: 新舊合約皆失敗 (改為空手)；C: 換月成功
+            portfolio.rejected = {"A": {"TMFL5"}, "B": {"TMFK5", "TMFL5"}}
+            failed = engine.roll("TMFK5", new, 20000.0, 20300.0)
+            portfolio.rejected = {}
+            self.assertEqual(failed, {"A": ROLL_KEPT_OLD, "B": ROLL_FLATTENED})
+            self.assertEqual(list(engine.pipelines), ["TMFK5", "TMFL5"])
+            self.assertIs(engine.proxies["A"].contract, old)
+            self.assertIs(engine.proxies["B"].contract, new)
+
+            # 舊合約 K 棒 (未平移) 仍送到 A；新合約 K 棒送到 B / C
+            engine.on_quote(None, {'code': "TMFK5", 'datetime': t0 + timedelta(hours=2), 'close': 20050,
+                                   'volume': 1})
+            engine.on_quote(None, {'code': "TMFL5", 'datetime': t0 + timedelta(hours=2), 'close': 20360,
+                                   'volume': 1})
+            self.assertTrue(wait_for(lambda: len(engine.ledger) == 2 and portfolio.net_positions.get("TMFL5") == 1),
+                            "換月後 worker 未收到 K 棒")
+            self.assertEqual(sorted(engine.ledger.pnl_by_strategy().items()), [("A", 40.0), ("C", 40.0)])
+            self.assertEqual(portfolio.net_positions["TMFK5"], 0)
+            self.assertEqual(portfolio.get_virtual_position("B", "TMFL5"), 1)
+            self.assertTrue(engine.proxies["B"].is_long)
+        finally:
+            engine.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import pickle
+import threading
+import unittest
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from src.trade_ledger import TradeLedger
+from src.research.metrics import compute_metrics, daily_pnl
+
+
+def make_trade(strategy, exit_time, pnl, direction='Long', reason='Stop Loss'):
+    exit_time = pd.Timestamp(exit_time)
+    return {
+        'strategy': strategy, 'direction': direction,
+        'entry_time': exit_time - pd.Timedelta(hours=2), 'exit_time': exit_time,
+        'entry_price': 20000.0, 'exit_price': 20000.0 + pnl, 'pnl': pnl, 'reason': reason,
+    }
+
+
+class TestTradeLedger(unittest.TestCase):
+    def setUp(self):
+        self.ledger = TradeLedger(capacity=2)
+        self.trades = [
+            make_trade('A', '2025-03-03 10:00', 50.0),                   # 週一
+            make_trade('B', '2025-03-03 13:00', -20.0, 'Short'),
+            make_trade('A', '2025-03-05 11:00', 30.0, reason='Trailing Stop'),
+            make_trade('B', '2025-03-10 09:00', 15.0),                   # 下一週
+        ]
+        self.ledger.extend(self.trades)
+
+    def test_daily_weekly_and_strategy_pnl(self):
+        self.assertAlmostEqual(self.ledger.daily_pnl('2025-03-03'), 30.0)
+        self.assertAlmostEqual(self.ledger.daily_pnl(datetime(2025, 3, 3, 13, 46), 'A'), 50.0)
+        self.assertAlmostEqual(self.ledger.daily_pnl('2025-03-04'), 0.0)
+        self.assertAlmostEqual(self.ledger.weekly_pnl('2025-03-07'), 60.0)
+        self.assertEqual(self.ledger.pnl_by_strategy(), {'A': 80.0, 'B': -5.0})
+        self.assertAlmostEqual(self.ledger.daily_pnl('2025-03-03', 'Unknown'), 0.0)
+
+    def test_night_session_uses_trading_day(self):
+        # 2025-03-07 為週五: 週六凌晨 02:00 的夜盤出場屬於週五 (與 metrics.daily_pnl 相同)
+        ledger = TradeLedger()
+        ledger.extend([make_trade('A', '2025-03-07 10:00', 10.0), make_trade('A', '2025-03-08 02:00', 25.0),
+                       make_trade('A', '2025-03-10 10:00', -5.0)])
+        self.assertAlmostEqual(ledger.daily_pnl('2025-03-07'), 35.0)
+        self.assertAlmostEqual(ledger.daily_pnl('2025-03-08'), 0.0)
+        self.assertAlmostEqual(ledger.daily_pnl(datetime(2025, 3, 8, 2, 30)), 35.0)
+        self.assertAlmostEqual(ledger.weekly_pnl('2025-03-07'), 35.0)
+        self.assertAlmostEqual(ledger.weekly_pnl('2025-03-10'), -5.0)
+        self.assertEqual(daily_pnl(ledger.columns()['exit_time'], ledger.columns()['pnl']).tolist(), [35.0, -5.0])
+
+    def test_out_of_order_append_reindexes(self):
+        self.ledger.append(make_trade('A', '2025-03-04 09:00', 7.0))
+        self.assertAlmostEqual(self.ledger.daily_pnl('2025-03-04'), 7.0)
+        times = self.ledger.columns()['exit_time']
+        self.assertTrue(np.all(times[1:] >= times[:-1]))
+
+    def test_concurrent_out_of_order_appends(self):
+        ledger = TradeLedger(capacity=2)
+        base = pd.Timestamp('2025-03-03 09:00')
+
+        def writer(k):
+            # 出場時間交錯遞減，持續觸發補記重建索引 (替換緩衝區)
+            for i in range(200):
+                ledger.append(make_trade(f'S{k}', base + pd.Timedelta(minutes=(200 - i) * 4 + k), 1.0))
+
+        def reader():
+            for _ in range(200):
+                ledger.pnl_between()
+                ledger.columns()
+
+        threads = [threading.Thread(target=writer, args=(k,)) for k in range(4)] + [threading.Thread(target=reader)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(ledger), 800)
+        self.assertAlmostEqual(ledger.pnl_between(), 800.0)
+        self.assertEqual(ledger.count_between(strategy='S3'), 200)
+        times = ledger.columns()['exit_time']
+        self.assertEqual(len(np.unique(times)), 800)
+        self.assertTrue(np.all(times[1:] > times[:-1]))
+
+        copy = pickle.loads(pickle.dumps(ledger))
+        copy.append(make_trade('S0', base, 2.0))
+        self.assertAlmostEqual(copy.pnl_between(), 802.0)
+
+    def test_strategy_view_is_list_compatible(self):
+        view = self.ledger.view('A')
+        self.assertEqual(len(view), 2)
+        self.assertEqual(view[-1]['reason'], 'Trailing Stop')
+        self.assertEqual([t['pnl'] for t in view], [50.0, 30.0])
+        view.append(make_trade('A', '2025-03-11 09:00', -10.0))
+        self.assertEqual(len(view), 3)
+        self.assertEqual(len(self.ledger), 5)
+
+    def test_dataframe_export_is_zero_copy(self):
+        df = self.ledger.to_dataframe()
+        self.assertEqual(list(df['strategy']), ['A', 'B', 'A', 'B'])
+        self.assertEqual(df['direction'].iloc[1], 'Short')
+        self.assertTrue(np.shares_memory(df['pnl'].to_numpy(), self.ledger._columns['pnl']))
+        expected = compute_metrics(self.trades, multiplier=1.0)
+        self.assertAlmostEqual(compute_metrics(df, multiplier=1.0)['max_drawdown_twd'],
+                               expected['max_drawdown_twd'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+
+from src.trade_queries import change_counter, dashboard_summary, trade_page, trade_stats, filter_options
+
+
+class ScriptedCursor:
+    """依序回傳預先準備的查詢結果"""
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.conn.error:
+            raise self.conn.error
+        self.conn.sql.append(sql)
+        self.conn.params.append(params)
+        self.result = self.conn.results.pop(0)
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+
+class ScriptedConnection:
+    def __init__(self, results, error=None):
+        self.results = list(results)
+        self.error = error
+        self.sql = []
+        self.params = []
+        self.rollbacks = 0
+
+    def cursor(self):
+        return ScriptedCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class TestTradeQueries(unittest.TestCase):
+    def test_change_counter(self):
+        self.assertEqual(change_counter(ScriptedConnection([[(42,)]])), 42)
+        conn = ScriptedConnection([], error=RuntimeError('relation "dashboard_state" does not exist'))
+        self.assertIsNone(change_counter(conn))
+        self.assertEqual(conn.rollbacks, 1)
+
+    def test_dashboard_summary_reads_aggregates(self):
+        conn = ScriptedConnection([
+            [(date(2025, 11, 3), Decimal("1762185600"))],
+            [("Buy", Decimal("20000"), datetime(2025, 11, 3, 9, 0))],
+            [(Decimal("1000000"), Decimal("800000"), date(2025, 11, 3))],
+            [(Decimal("125.5"),)],
+            [(7, "Gatekeeper-BNF-B", "Buy", Decimal("20000"), datetime(2025, 11, 3, 9, 0), None, None, None, "Open")],
+            [("Gatekeeper-BNF-B", date(2025, 11, 3), Decimal("125.5"), 2)],
+            [(date(2025, 11, 3), Decimal("1000000"))],
+            [],
+        ])
+        summary = dashboard_summary(conn)
+        self.assertEqual(summary['weekly_pnl'], 125.5)
+        self.assertEqual(summary['open_position'][0], "Buy")
+        self.assertEqual(summary['recent_trades']['id'].tolist(), [7])
+        self.assertEqual(summary['daily_pnl']['pnl_points'].dtype.kind, 'f')
+        self.assertTrue(summary['positions'].empty)
+        # 本週損益讀彙總表，不再掃描 trade_history
+        self.assertIn("FROM strategy_daily_pnl", conn.sql[3])
+        # 日期範圍以資料庫的 CURRENT_DATE 為準，並記錄下一次換日的時間
+        self.assertEqual(summary['as_of'], date(2025, 11, 3))
+        self.assertEqual(summary['expires_at'], 1762185600.0)
+
+
+    def test_trade_page_keyset(self):
+        def row(i):
+            return (i, "Dual_TMF", "Buy", Decimal("20000"), datetime(2025, 11, 3, 9, i), None, None, None, "Open",
+                    "TMFK5", None)
+        conn = ScriptedConnection([[row(3), row(2), row(1)], [row(1)]])
+        filters = {'strategy_name': ["Dual_TMF"], 'contract_symbol': "TMFK5", 'exit_reason': [],
+                   'start': date(2025, 11, 1), 'end': None}
+        page, cursor = trade_page(conn, filters, page_size=2)
+        self.assertEqual(page['id'].tolist(), [3, 2])
+        self.assertEqual(cursor, (datetime(2025, 11, 3, 9, 2), 2))
+        self.assertIn("strategy_name = ANY(%s) AND contract_symbol = %s AND entry_time >= %s", conn.sql[0])
+        self.assertNotIn("OFFSET", conn.sql[0])
+        self.assertEqual(conn.params[0], (["Dual_TMF"], "TMFK5", date(2025, 11, 1), 3))
+
+        page, cursor = trade_page(conn, filters, after=cursor, page_size=2)
+        self.assertEqual(page['id'].tolist(), [1])
+        self.assertIsNone(cursor)
+        self.assertIn("(entry_time, id) < (%s, %s)", conn.sql[1])
+        self.assertEqual(conn.params[1][-3:], (datetime(2025, 11, 3, 9, 2), 2, 3))
+
+    def test_trade_stats_and_options(self):
+        conn = ScriptedConnection([
+            [(4, 1, 3, 2, 1, Decimal("80"), Decimal("26.67"), Decimal("60"), Decimal("-20"),
+              datetime(2025, 1, 2, 9, 0), datetime(2025, 11, 3, 9, 0))],
+            [("A",), ("B",)], [("TMFK5",)], [],
+        ])
+        stats = trade_stats(conn, {'exit_reason': "停損"}).iloc[0]
+        self.assertEqual((stats['trades'], stats['total_pnl']), (4, 80.0))
+        self.assertAlmostEqual(stats['win_rate'], 2 / 3)
+        self.assertEqual(conn.params[0], ("停損",))
+        with self.assertRaises(ValueError):
+            trade_stats(conn, group_by="side; DROP TABLE trade_history")
+
+        options = filter_options(conn)
+        self.assertEqual(options, {'strategy_name': ["A", "B"], 'contract_symbol': ["TMFK5"], 'exit_reason': []})
+        self.assertIn("WITH RECURSIVE", conn.sql[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
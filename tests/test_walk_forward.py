@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+
+os.environ["DISABLE_LINE_NOTIFY"] = "true"
+
+from src.research.bnf_b_vectorized import evaluate_bnf_b
+from src.research.parallel_runner import param_grid
+from src.research.result_cache import ResultCache
+from src.research.walk_forward import make_folds, walk_forward
+from tests.helpers import make_60m_bars
+
+CALLS = []
+
+
+def counting_evaluate(data, **params):
+    CALLS.append(params)
+    return evaluate_bnf_b(data, **params)
+
+
+class TestWalkForward(unittest.TestCase):
+    def setUp(self):
+        self.df = make_60m_bars(n=3000)
+        self.grid = param_grid(bias_threshold=[-1.0, -1.5], volume_spike_ratio=[1.2, 2.0])
+        CALLS.clear()
+
+    def test_make_folds_rolls_forward(self):
+        folds = make_folds(self.df['datetime'], train_days=30, test_days=10)
+        self.assertGreater(len(folds), 5)
+        for prev, cur in zip(folds, folds[1:]):
+            self.assertEqual(cur.test_start, prev.test_end)
+        self.assertLessEqual(folds[-1].test_end, self.df['datetime'].iloc[-1] + pd.Timedelta(days=1))
+
+    def test_oos_trades_stay_inside_test_windows(self):
+        res = walk_forward(evaluate_bnf_b, {'60m': self.df}, self.grid, train_days=30, test_days=10,
+                           warmup_days=5, max_workers=1)
+        self.assertFalse(res.oos_trades.empty)
+        for _, fold in res.folds.iterrows():
+            trades = res.oos_trades[res.oos_trades['fold'] == fold['fold']]
+            self.assertTrue((trades['entry_time'] >= fold['test_start']).all())
+            self.assertTrue((trades['entry_time'] < fold['test_end']).all())
+            self.assertAlmostEqual(trades['pnl'].sum(), fold['oos_pnl'])
+        self.assertAlmostEqual(res.equity.iloc[-1], res.oos_trades['pnl'].sum())
+
+    def test_new_fold_only_evaluates_new_window(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultCache(root=tmp)
+            kwargs = dict(train_days=30, test_days=10, warmup_days=5, strategy="BNF", version="v",
+                          cache=cache, max_workers=1)
+            short = self.df.iloc[:2600].reset_index(drop=True)
+            first = walk_forward(counting_evaluate, {'60m': short}, self.grid, **kwargs)
+            CALLS.clear()
+            second = walk_forward(counting_evaluate, {'60m': self.df}, self.grid, **kwargs)
+
+        new_folds = len(second.folds) - len(first.folds)
+        self.assertGreater(new_folds, 0)
+        # 每個新 fold: 訓練網格 + 1 次測試
+        self.assertEqual(len(CALLS), new_folds * (len(self.grid) + 1))
+
+
+if __name__ == '__main__':
+    unittest.main()